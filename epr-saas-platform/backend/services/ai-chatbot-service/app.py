@@ -1,11 +1,14 @@
 from fastapi import FastAPI, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel, field_validator
+from typing import List
 import openai
 import os
 
 from config import Config
-from middleware.auth import verify_token
+from middleware.auth import verify_admin_key
 from clients.package_client import PackageServiceClient
 from routes import api_routes
 
@@ -31,6 +34,7 @@ class AppState:
     package_client = None
     openai_client = None
     advanced_retriever_system = None
+    cache_warmer = None
 
 app.state = AppState()
 
@@ -100,6 +104,13 @@ async def startup_event():
         )
         print("✅ Advanced Query Handler initialized")
 
+        # Warm caches in the background (does not delay readiness)
+        if Config.ENABLE_CACHE_WARMUP:
+            from systems.cache_warmer import CacheWarmer
+            app.state.cache_warmer = CacheWarmer(app.state.query_handler)
+            app.state.cache_warmer.start_background()
+            print("✅ Cache warm-up started in background")
+
         print("\n" + "="*70)
         print("✅ TOP-TIER RAG SYSTEM READY!")
         print("="*70 + "\n")
@@ -169,9 +180,56 @@ async def health_check():
 async def get_system_stats():
     """Get system statistics"""
     if hasattr(app.state.query_handler, 'get_stats'):
-        return app.state.query_handler.get_stats()
+        stats = app.state.query_handler.get_stats()
+        if app.state.cache_warmer:
+            stats['cache_warmup'] = app.state.cache_warmer.stats
+        return stats
     return {"message": "Stats not available in legacy mode"}
 
+class CacheInvalidateRequest(BaseModel):
+    dieu: List[str] = []
+    documents: List[str] = []
+    full: bool = False
+
+    @field_validator("dieu", "documents", mode="before")
+    @classmethod
+    def _as_list(cls, value):
+        """Accept a single value ("15", 15) as a one-item list"""
+        if value is None:
+            return []
+        if isinstance(value, (str, int)):
+            value = [value]
+        if isinstance(value, (list, tuple)):
+            return [str(item).strip() for item in value if str(item).strip()]
+        return value
+
+@app.post("/system/cache/invalidate")
+async def invalidate_cache(payload: CacheInvalidateRequest, _: bool = Depends(verify_admin_key)):
+    """
+    Invalidate cached answers/rankings after the legal corpus changed.
+    Requires the X-Admin-Key service key.
+
+    Body: {"dieu": ["5", "54"], "documents": ["Nghị định 08/2022/NĐ-CP"]}
+    or {"full": true} to start a new corpus generation (full re-ingestion).
+    """
+    if not app.state.advanced_retriever_system:
+        return JSONResponse(status_code=503, content={"message": "Advanced RAG system not loaded"})
+
+    dieus = payload.dieu or None
+    documents = payload.documents or None
+    if not dieus and not documents and not payload.full:
+        return JSONResponse(
+            status_code=400,
+            content={"message": 'Give "dieu" and/or "documents", or {"full": true} for a full reload'}
+        )
+
+    # Re-reads chunks from Weaviate: keep it off the event loop
+    return await run_in_threadpool(
+        app.state.advanced_retriever_system.invalidate_corpus,
+        dieus=dieus,
+        documents=documents
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -15,6 +15,7 @@ class Config:
 
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 
     @classmethod
     def validate(cls):
@@ -43,6 +44,9 @@ class Config:
     JWT_SECRET = os.getenv("JWT_SECRET", "your-super-secret-jwt-key-change-this-in-production")
     JWT_ALGORITHM = "HS256"
 
+    # Service key for admin endpoints (X-Admin-Key header); empty disables them
+    ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
     # Microservices URLs
     PACKAGE_SERVICE_URL = os.getenv("PACKAGE_SERVICE_URL", "http://localhost:8002")
     USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:8001")
@@ -60,6 +64,43 @@ class Config:
     BM25_WEIGHT = float(os.getenv("BM25_WEIGHT", "0.3"))  # 30% keyword, 70% semantic
     VECTOR_WEIGHT = float(os.getenv("VECTOR_WEIGHT", "0.7"))
     HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "20"))
+    BM25_FOLD_DIACRITICS = os.getenv("BM25_FOLD_DIACRITICS", "True").lower() == "true"  # "tai che" matches "tái chế"
+    BM25_BIGRAMS = os.getenv("BM25_BIGRAMS", "True").lower() == "true"  # Syllable bigrams ("tái_chế")
+    BM25_LOAD_PAGE_SIZE = int(os.getenv("BM25_LOAD_PAGE_SIZE", "1000"))  # Weaviate cursor batch
+    ENABLE_BM25_SNAPSHOT = os.getenv("ENABLE_BM25_SNAPSHOT", "True").lower() == "true"
+    BM25_SNAPSHOT_DIR = os.getenv("BM25_SNAPSHOT_DIR", "./bm25_snapshots")  # mmap'd index per corpus version
+    BM25_MAX_DELTA_SEGMENTS = int(os.getenv("BM25_MAX_DELTA_SEGMENTS", "8"))  # Merge immediately above this
+    BM25_MERGE_DELAY_SECONDS = float(os.getenv("BM25_MERGE_DELAY_SECONDS", "30"))  # Quiet period before merging
+    # Leg pool sizing: one retrieval holds at most 1 BM25 task plus
+    # HYBRID_VECTOR_FANOUT vector search tasks (the embedding call finishes
+    # before the searches start), so HYBRID_CONCURRENT_RETRIEVALS x
+    # (1 + HYBRID_VECTOR_FANOUT) threads let that many retrievals per worker
+    # run without queueing: 8 x (1 + 2) = 24 with the defaults. Query
+    # variants beyond the fan-out are searched one after another.
+    HYBRID_CONCURRENT_RETRIEVALS = int(os.getenv("HYBRID_CONCURRENT_RETRIEVALS", "8"))
+    HYBRID_VECTOR_FANOUT = int(os.getenv("HYBRID_VECTOR_FANOUT", "2"))  # Parallel vector searches per retrieval
+    HYBRID_LEG_WORKERS = int(os.getenv(
+        "HYBRID_LEG_WORKERS", str(HYBRID_CONCURRENT_RETRIEVALS * (1 + HYBRID_VECTOR_FANOUT))
+    ))  # Threads running vector / BM25 legs
+    HYBRID_VECTOR_TIMEOUT_MS = int(os.getenv("HYBRID_VECTOR_TIMEOUT_MS", "3000"))  # Fuse without vector hits after this
+    HYBRID_BM25_TIMEOUT_MS = int(os.getenv("HYBRID_BM25_TIMEOUT_MS", "500"))  # Fuse without BM25 hits after this
+    HYBRID_LEG_QUEUE_TIMEOUT_MS = int(os.getenv("HYBRID_LEG_QUEUE_TIMEOUT_MS", "5000"))  # Drop a leg that never got a worker
+
+    # Vector backend: "weaviate" (remote search), or an in-process copy of the
+    # collection's vectors searched "flat" (exact) or with "hnsw" (needs hnswlib)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "weaviate").lower()
+    VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "./vector_snapshots")  # mmap'd vectors per corpus version
+    HNSW_M = int(os.getenv("HNSW_M", "32"))
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+    VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()  # "int8" / "binary" codes (flat backend)
+    VECTOR_RESCORE_CANDIDATES = int(os.getenv("VECTOR_RESCORE_CANDIDATES", "100"))  # Short-list rescored in float32
+    VECTOR_RECALL_SAMPLE = int(os.getenv("VECTOR_RECALL_SAMPLE", "50"))  # Queries in the build-time recall report
+
+    # Structured lookup (exact "Điều / Chương / Mục" references skip search)
+    ENABLE_STRUCTURED_LOOKUP = os.getenv("ENABLE_STRUCTURED_LOOKUP", "True").lower() == "true"
+    STRUCTURED_LOOKUP_MAX_CHUNKS = int(os.getenv("STRUCTURED_LOOKUP_MAX_CHUNKS", "4"))
+    STRUCTURED_LOOKUP_SUPPLEMENT_K = int(os.getenv("STRUCTURED_LOOKUP_SUPPLEMENT_K", "1"))  # Semantic extras, 0 = none
 
     # Query Transformation
     ENABLE_HYDE = os.getenv("ENABLE_HYDE", "True").lower() == "true"
@@ -67,6 +108,12 @@ class Config:
     NUM_MULTI_QUERIES = int(os.getenv("NUM_MULTI_QUERIES", "3"))
     ENABLE_STEP_BACK = os.getenv("ENABLE_STEP_BACK", "False").lower() == "true"
 
+    # Rank Fusion (multi-query results -> one candidate list for reranking)
+    RANK_FUSION_METHOD = os.getenv("RANK_FUSION_METHOD", "rrf")  # "rrf" or "score" (min-max normalized)
+    RANK_FUSION_K = int(os.getenv("RANK_FUSION_K", "60"))
+    RANK_FUSION_MAX_CANDIDATES = int(os.getenv("RANK_FUSION_MAX_CANDIDATES", "30"))  # Sent to the reranker
+    RANK_FUSION_ORIGINAL_WEIGHT = float(os.getenv("RANK_FUSION_ORIGINAL_WEIGHT", "1.5"))  # vs 1.0 per rewrite
+
     # Advanced Reranking
     ENABLE_CROSS_ENCODER_RERANK = os.getenv("ENABLE_CROSS_ENCODER_RERANK", "True").lower() == "true"
     ENABLE_LLM_RERANK = os.getenv("ENABLE_LLM_RERANK", "True").lower() == "true"
@@ -78,6 +125,22 @@ class Config:
     ENABLE_HIERARCHICAL_CHUNKING = os.getenv("ENABLE_HIERARCHICAL_CHUNKING", "True").lower() == "true"
     CHUNK_SIZES = [2048, 512, 128]  # Parent, Child, Grandchild
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
+    HIERARCHICAL_MIN_SIBLINGS = int(os.getenv("HIERARCHICAL_MIN_SIBLINGS", "2"))  # Hits needed to merge into the parent
+    HIERARCHICAL_MAX_PARENT_WORDS = int(os.getenv("HIERARCHICAL_MAX_PARENT_WORDS", str(CHUNK_SIZES[0])))  # Larger parents stay split
+
+    # Ingestion (python -m ingestion)
+    INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))  # Chunks per embeddings request
+    INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))  # Embedding requests in flight
+    INGEST_READ_AHEAD_BATCHES = int(os.getenv("INGEST_READ_AHEAD_BATCHES", "16"))  # Batches held while embedding
+    INGEST_UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "100"))  # Objects per Weaviate batch
+    INGEST_UPSERT_CONCURRENCY = int(os.getenv("INGEST_UPSERT_CONCURRENCY", "2"))  # Weaviate batch requests in flight
+    INGEST_PROGRESS_EVERY = int(os.getenv("INGEST_PROGRESS_EVERY", "500"))  # Chunks between progress logs
+    INGEST_EMBEDDING_STORE = os.getenv("INGEST_EMBEDDING_STORE", "./ingestion_store/embeddings.sqlite3")  # "" disables reuse
+    INGEST_DEDUP = os.getenv("INGEST_DEDUP", "False").lower() == "true"  # Drop near-duplicate chunks at ingestion
+
+    # Near-Duplicate Detection (MinHash over word 3-shingles)
+    ENABLE_NEAR_DUPLICATE_COLLAPSE = os.getenv("ENABLE_NEAR_DUPLICATE_COLLAPSE", "True").lower() == "true"
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))  # Estimated Jaccard similarity
 
     # Self-RAG Settings
     ENABLE_SELF_RAG = os.getenv("ENABLE_SELF_RAG", "True").lower() == "true"
@@ -94,6 +157,60 @@ class Config:
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))  # 1 hour
     CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    CACHE_INDEX_SYNC_INTERVAL_MS = int(os.getenv("CACHE_INDEX_SYNC_INTERVAL_MS", "250"))  # Stream poll interval
+    CACHE_INDEX_REBUILD_SECONDS = int(os.getenv("CACHE_INDEX_REBUILD_SECONDS", "300"))  # Full SCAN resync
+    CACHE_INDEX_STREAM_MAXLEN = int(os.getenv("CACHE_INDEX_STREAM_MAXLEN", "10000"))
+    CACHE_EMBEDDING_DTYPE = os.getenv("CACHE_EMBEDDING_DTYPE", "float16")  # float16 or float32
+
+    # Cache admission / eviction (TinyLFU + cost-aware priorities)
+    ENABLE_CACHE_ADMISSION = os.getenv("ENABLE_CACHE_ADMISSION", "True").lower() == "true"
+    CACHE_MAX_MEMORY_BYTES = int(os.getenv("CACHE_MAX_MEMORY_BYTES", str(256 * 1024 * 1024)))
+    CACHE_SKETCH_WIDTH = int(os.getenv("CACHE_SKETCH_WIDTH", "16384"))
+
+    # L1 in-process answer cache + stale-while-revalidate
+    ENABLE_L1_CACHE = os.getenv("ENABLE_L1_CACHE", "True").lower() == "true"
+    L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "2048"))
+    L1_CACHE_MAX_BYTES = int(os.getenv("L1_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 64 MB
+    CACHE_STALE_WINDOW_SECONDS = int(os.getenv("CACHE_STALE_WINDOW_SECONDS", "300"))  # Serve stale in last 5 min
+    CACHE_SWR_MIN_HITS = int(os.getenv("CACHE_SWR_MIN_HITS", "2"))  # Only refresh hot entries
+    CACHE_REFRESH_LOCK_SECONDS = int(os.getenv("CACHE_REFRESH_LOCK_SECONDS", "120"))
+    CACHE_REFRESH_WORKERS = int(os.getenv("CACHE_REFRESH_WORKERS", "2"))
+
+    # Singleflight: identical in-flight queries share one pipeline run
+    ENABLE_SINGLEFLIGHT = os.getenv("ENABLE_SINGLEFLIGHT", "True").lower() == "true"
+    SINGLEFLIGHT_LOCK_SECONDS = float(os.getenv("SINGLEFLIGHT_LOCK_SECONDS", "60"))
+    SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("SINGLEFLIGHT_WAIT_SECONDS", "45"))
+    SINGLEFLIGHT_RESULT_TTL_SECONDS = float(os.getenv("SINGLEFLIGHT_RESULT_TTL_SECONDS", "15"))
+    SINGLEFLIGHT_POLL_MS = int(os.getenv("SINGLEFLIGHT_POLL_MS", "50"))
+
+    # Classifier LLM sub-call cache (scope check, routing, FAQ/app-info matching)
+    ENABLE_LLM_CALL_CACHE = os.getenv("ENABLE_LLM_CALL_CACHE", "True").lower() == "true"
+    LLM_CALL_CACHE_TTL_SECONDS = int(os.getenv("LLM_CALL_CACHE_TTL_SECONDS", "604800"))  # 7 days
+    LLM_CALL_CACHE_LOCAL_ENTRIES = int(os.getenv("LLM_CALL_CACHE_LOCAL_ENTRIES", "4096"))
+
+    # Embedding Memoization
+    ENABLE_EMBEDDING_CACHE = os.getenv("ENABLE_EMBEDDING_CACHE", "True").lower() == "true"
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+    EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))  # 1 day
+    EMBEDDING_CACHE_REDIS = os.getenv("EMBEDDING_CACHE_REDIS", "True").lower() == "true"
+
+    # Retrieval Result Cache (ranked node IDs, separate from answer cache)
+    ENABLE_RETRIEVAL_CACHE = os.getenv("ENABLE_RETRIEVAL_CACHE", "True").lower() == "true"
+    RETRIEVAL_CACHE_TTL_SECONDS = int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "21600"))  # 6 hours
+    RETRIEVAL_CACHE_LOCAL_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_LOCAL_ENTRIES", "4096"))
+    NODE_STORE_TTL_SECONDS = int(os.getenv("NODE_STORE_TTL_SECONDS", "86400"))  # 1 day
+    CORPUS_VERSION = os.getenv("CORPUS_VERSION", "1")
+    CORPUS_GENERATION_REFRESH_SECONDS = float(os.getenv("CORPUS_GENERATION_REFRESH_SECONDS", "5"))
+
+    # Cache Warm-up (background replay of FAQ + popular queries at startup)
+    ENABLE_CACHE_WARMUP = os.getenv("ENABLE_CACHE_WARMUP", "False").lower() == "true"
+    CACHE_WARMUP_TOP_N = int(os.getenv("CACHE_WARMUP_TOP_N", "200"))
+    CACHE_WARMUP_WORKERS = int(os.getenv("CACHE_WARMUP_WORKERS", "4"))
+    CACHE_WARMUP_MAX_COST_USD = float(os.getenv("CACHE_WARMUP_MAX_COST_USD", "2.0"))
+    CACHE_WARMUP_LOOKBACK_DAYS = int(os.getenv("CACHE_WARMUP_LOOKBACK_DAYS", "30"))
+    CACHE_WARMUP_QUERY_LOG = os.getenv("CACHE_WARMUP_QUERY_LOG", "")  # exported log (.jsonl / .txt)
+    CACHE_WARMUP_DELAY_SECONDS = float(os.getenv("CACHE_WARMUP_DELAY_SECONDS", "5"))
+    DATABASE_URL = os.getenv("DATABASE_URL", "")
 
     # Agentic RAG
     ENABLE_QUERY_ROUTING = os.getenv("ENABLE_QUERY_ROUTING", "True").lower() == "true"
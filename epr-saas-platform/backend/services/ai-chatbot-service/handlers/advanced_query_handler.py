@@ -4,8 +4,16 @@ Integrates all advanced features for world-class RAG performance
 """
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, List
 from config import Config
+from systems.conversation_memory import is_follow_up_question
+from systems.corpus_version import public_metadata
+from systems.embedding_service import normalize_text
+from systems.singleflight import SingleFlight
+from systems.llm_call_cache import get_llm_call_cache
+from systems.near_duplicates import collapse_near_duplicates
+from systems.rank_fusion import fuse_nodes
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +53,7 @@ class AdvancedQueryHandler:
         self.retriever_system = advanced_retriever_system
         self.hybrid_retriever = advanced_retriever_system.get_retriever("hybrid")
         self.vector_retriever = advanced_retriever_system.get_retriever("vector")
+        self.hierarchical_merger = advanced_retriever_system.get_hierarchical_merger()
         self.reranker = advanced_retriever_system.get_reranker()
         self.query_transformer = advanced_retriever_system.get_query_transformer()
         self.semantic_cache = advanced_retriever_system.get_semantic_cache()
@@ -53,6 +62,15 @@ class AdvancedQueryHandler:
         self.query_router = advanced_retriever_system.get_query_router()
         self.llm = advanced_retriever_system.get_llm()
 
+        # Background refresh of stale cache entries (stale-while-revalidate)
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=Config.CACHE_REFRESH_WORKERS,
+            thread_name_prefix="cache-refresh"
+        )
+
+        # Coalesce identical concurrent queries (in-process and across workers)
+        self.singleflight = SingleFlight() if Config.ENABLE_SINGLEFLIGHT else None
+
         logger.info("Advanced Query Handler initialized")
 
     # ============================================
@@ -62,7 +80,9 @@ class AdvancedQueryHandler:
     def process_query(
         self,
         query_text: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        bypass_cache: bool = False,
+        evaluate: bool = True
     ) -> Dict:
         """
         Process query through advanced RAG pipeline
@@ -79,6 +99,12 @@ class AdvancedQueryHandler:
         9. Answer verification (if Self-RAG)
         10. Evaluation & metrics
         11. Cache result
+
+        Args:
+            query_text: User query
+            session_id: Optional conversation session
+            bypass_cache: Skip the cache lookup (used to refresh stale entries)
+            evaluate: Run evaluation/metrics (off for background refresh and warm-up)
         """
         start_time = time.time()
         logger.info(f"Processing query: {query_text[:60]}... [Session: {session_id}]")
@@ -88,18 +114,39 @@ class AdvancedQueryHandler:
         if session_id and self.conversation_memory:
             conversation_context = self.conversation_memory.get_context(session_id, max_messages=6)
 
+        # Follow-ups are cached per conversation state, everything else is shared
+        context_key = self._get_cache_context_key(query_text, session_id, conversation_context)
+
+        # Follow-ups citing "Điều 15" alone mean the document being discussed
+        # (part of the conversation state the context key is built from)
+        current_document = (
+            self.conversation_memory.get_current_document(session_id) if context_key else None
+        )
+
         # ============================================
         # STEP 1: SEMANTIC CACHE CHECK
         # ============================================
-        if self.semantic_cache:
-            cached = self.semantic_cache.get(query_text, session_id)
+        if self.semantic_cache and not bypass_cache:
+            cached = self.semantic_cache.get(query_text, session_id, context_key=context_key)
             if cached:
                 cached_response = cached.get('response', {})
                 logger.info(f"✅ CACHE HIT ({cached.get('cache_hit_type', 'unknown')})")
 
+                # Serve stale answer now, refresh it once in the background
+                if cached.get('needs_refresh'):
+                    self._schedule_refresh(cached.get('query') or query_text)
+
                 # Add cache metadata
                 cached_response['from_cache'] = True
                 cached_response['cache_similarity'] = cached.get('similarity_score')
+                cached_response['cache_stale'] = cached.get('is_stale', False)
+
+                # Keep the conversation (and its fingerprint) moving on cache hits too
+                self._update_conversation_memory(
+                    session_id, query_text, cached_response.get('answer', ''), 'cache',
+                    articles=self._source_articles(cached_response),
+                    documents=self._source_documents(cached_response)
+                )
 
                 return cached_response
 
@@ -112,7 +159,7 @@ class AdvancedQueryHandler:
         if faq_response:
             logger.info("✓ Handled as FAQ")
             self._update_conversation_memory(session_id, query_text, faq_response['answer'], 'faq')
-            self._cache_response(query_text, faq_response, session_id)
+            self._cache_response(query_text, faq_response, session_id, context_key)
             return faq_response
 
         # PDF Catalog
@@ -120,7 +167,7 @@ class AdvancedQueryHandler:
         if pdf_response:
             logger.info("✓ Handled as PDF catalog")
             self._update_conversation_memory(session_id, query_text, pdf_response['answer'], 'pdf_catalog')
-            self._cache_response(query_text, pdf_response, session_id)
+            self._cache_response(query_text, pdf_response, session_id, context_key)
             return pdf_response
 
         # App Info
@@ -128,7 +175,7 @@ class AdvancedQueryHandler:
         if app_info_response:
             logger.info("✓ Handled as app info")
             self._update_conversation_memory(session_id, query_text, app_info_response['answer'], 'app_info')
-            self._cache_response(query_text, app_info_response, session_id)
+            self._cache_response(query_text, app_info_response, session_id, context_key)
             return app_info_response
 
         # ============================================
@@ -167,18 +214,17 @@ class AdvancedQueryHandler:
 
         retrieval_start = time.time()
 
-        # Query routing
-        routing_decision = None
-        if self.query_router:
-            routing_decision = self.query_router.route(query_text)
-            logger.info(f"🧭 Routing: {routing_decision.reasoning}")
-
-        # Process legal query with advanced RAG
-        result = self._process_advanced_legal_query(
-            query_text,
-            conversation_context,
-            routing_decision
-        )
+        # Identical concurrent questions (same context) share one pipeline run
+        coalesced = False
+        if self.singleflight and not bypass_cache:
+            result, coalesced = self.singleflight.do(
+                f"{context_key}\x00{normalize_text(query_text)}",
+                lambda: self._run_rag_pipeline(query_text, conversation_context, current_document)
+            )
+            if coalesced:
+                logger.info("🔗 Coalesced with an in-flight identical query")
+        else:
+            result = self._run_rag_pipeline(query_text, conversation_context, current_document)
 
         retrieval_time = (time.time() - retrieval_start) * 1000
 
@@ -187,27 +233,28 @@ class AdvancedQueryHandler:
         # ============================================
 
         if session_id and self.conversation_memory:
-            articles = [src['metadata'].get('dieu') for src in result.get('sources', [])
-                       if 'metadata' in src and 'dieu' in src['metadata']]
-
             self.conversation_memory.add_message(session_id, 'user', query_text)
             self.conversation_memory.add_message(
                 session_id, 'assistant', result['answer'],
                 metadata={
                     'source_type': 'legal_rag',
                     'num_sources': result.get('num_sources', 0),
-                    'articles': articles
+                    'articles': self._source_articles(result),
+                    'documents': self._source_documents(result)
                 }
             )
 
-        # Cache the result
-        self._cache_response(query_text, result, session_id)
+        # Cache the result (keyed by the context the question was asked in);
+        # a coalesced result was already cached by the request that computed it
+        if not coalesced:
+            self._cache_response(query_text, result, session_id, context_key,
+                                 compute_ms=(time.time() - start_time) * 1000)
 
         # ============================================
         # STEP 6: EVALUATION & METRICS
         # ============================================
 
-        if self.evaluator:
+        if self.evaluator and evaluate and not coalesced:
             total_time = (time.time() - start_time) * 1000
 
             # Track performance
@@ -245,6 +292,7 @@ class AdvancedQueryHandler:
         # Add metadata
         result['processing_time_ms'] = (time.time() - start_time) * 1000
         result['from_cache'] = False
+        result['coalesced'] = coalesced
 
         return result
 
@@ -252,6 +300,71 @@ class AdvancedQueryHandler:
     # ADVANCED RAG PROCESSING
     # ============================================
 
+    def _run_rag_pipeline(self, query_text: str, conversation_context: List,
+                          current_document: Optional[str] = None) -> Dict:
+        """Route the query and run the advanced RAG pipeline"""
+        # Exact article / chapter citations skip routing, search and reranking
+        reference_result = self._process_reference_query(query_text, conversation_context, current_document)
+        if reference_result:
+            return reference_result
+
+        routing_decision = None
+        if self.query_router:
+            routing_decision = self.query_router.route(query_text)
+            logger.info(f"🧭 Routing: {routing_decision.reasoning}")
+
+        return self._process_advanced_legal_query(
+            query_text,
+            conversation_context,
+            routing_decision
+        )
+
+    def _process_reference_query(self, query_text: str, conversation_context: List,
+                                 current_document: Optional[str] = None) -> Optional[Dict]:
+        """
+        Answer from the chunks a question cites ("Điều 15", "Chương III"),
+        found by structured lookup, plus a few semantic hits as supplement
+
+        Returns None when the question cites nothing resolvable, or cites an
+        article of no named document that several documents have
+        """
+        if not Config.ENABLE_STRUCTURED_LOOKUP or not self.hybrid_retriever:
+            return None
+
+        nodes = self.hybrid_retriever.lookup_reference(query_text, document=current_document)
+        if not nodes:
+            return None
+        logger.info(f"📌 Structured lookup: {len(nodes)} cited chunks")
+
+        if Config.STRUCTURED_LOOKUP_SUPPLEMENT_K > 0:
+            try:
+                cited = {node.node.id_ for node in nodes}
+                supplement = [
+                    node for node in self.hybrid_retriever.retrieve(query_text)
+                    if node.node.id_ not in cited
+                ]
+                nodes = nodes + supplement[:Config.STRUCTURED_LOOKUP_SUPPLEMENT_K]
+            except Exception as e:
+                logger.warning(f"Semantic supplement failed, answering from cited chunks: {e}")
+
+        if self.hierarchical_merger:
+            nodes = self.hierarchical_merger.merge(nodes)
+        if Config.ENABLE_NEAR_DUPLICATE_COLLAPSE:
+            nodes = collapse_near_duplicates(nodes)
+
+        answer = self._generate_answer(query_text, nodes, conversation_context)
+        sources = self._format_sources(nodes[:5])
+
+        return {
+            'answer': answer,
+            'sources': sources,
+            'query': query_text,
+            'num_sources': len(sources),
+            'retrieval_strategy': 'structured_lookup',
+            'query_transform': 'none',
+            'rerank_strategy': 'none'
+        }
+
     def _process_advanced_legal_query(
         self,
         query_text: str,
@@ -314,17 +427,36 @@ class AdvancedQueryHandler:
             # Standard retrieval
             logger.info(f"🔍 Retrieval: {retrieval_strategy}")
 
-            all_nodes = []
-            for q in queries:
-                retriever = self._get_retriever(retrieval_strategy)
-                nodes = retriever.retrieve(q)
-                all_nodes.extend(nodes)
-
-            # Deduplicate
-            unique_nodes = self._deduplicate_nodes(all_nodes)
+            retriever = self._get_retriever(retrieval_strategy)
+            if hasattr(retriever, 'retrieve_batch'):
+                # All variants: one embeddings call, concurrent searches
+                results_per_query = retriever.retrieve_batch(queries)
+            else:
+                results_per_query = [retriever.retrieve(q) for q in queries]
+
+            # Fuse variant rankings into one bounded candidate list
+            weights = [
+                Config.RANK_FUSION_ORIGINAL_WEIGHT if q == query_text else 1.0
+                for q in queries
+            ]
+            unique_nodes = fuse_nodes(
+                results_per_query,
+                weights=weights,
+                limit=Config.RANK_FUSION_MAX_CANDIDATES
+            )
 
             logger.info(f"  Retrieved {len(unique_nodes)} unique documents")
 
+            # Siblings of one article -> the whole article, before reranking
+            if self.hierarchical_merger:
+                unique_nodes = self.hierarchical_merger.merge(unique_nodes)
+                logger.info(f"  Merged to {len(unique_nodes)} parents / chunks")
+
+            # Near-identical passages (definitions quoted across documents) keep one slot
+            if Config.ENABLE_NEAR_DUPLICATE_COLLAPSE:
+                unique_nodes = collapse_near_duplicates(unique_nodes)
+                logger.info(f"  {len(unique_nodes)} after near-duplicate collapse")
+
             # ============================================
             # RERANKING
             # ============================================
@@ -362,24 +494,13 @@ class AdvancedQueryHandler:
         else:
             return self.vector_retriever
 
-    def _deduplicate_nodes(self, nodes: List) -> List:
-        """Remove duplicate nodes"""
-        seen = set()
-        unique = []
-        for node in nodes:
-            node_id = node.node.id_ if hasattr(node, 'node') else str(node)
-            if node_id not in seen:
-                seen.add(node_id)
-                unique.append(node)
-        return unique
-
     def _format_sources(self, nodes: List) -> List[Dict]:
         """Format nodes as source dicts"""
         sources = []
         for node in nodes[:5]:
             if hasattr(node, 'node'):
                 sources.append({
-                    'metadata': node.node.metadata,
+                    'metadata': public_metadata(node.node.metadata),
                     'text': node.node.text,
                     'score': node.score if hasattr(node, 'score') else None
                 })
@@ -486,19 +607,62 @@ Trả lời:"""
             'scope_info': scope_info
         }
 
-    def _update_conversation_memory(self, session_id, query, answer, source_type):
+    def _update_conversation_memory(self, session_id, query, answer, source_type, articles=None,
+                                    documents=None):
         """Update conversation memory"""
         if session_id and self.conversation_memory:
+            metadata = {'source_type': source_type}
+            if articles:
+                metadata['articles'] = articles
+            if documents:
+                metadata['documents'] = documents
+
             self.conversation_memory.add_message(session_id, 'user', query)
-            self.conversation_memory.add_message(
-                session_id, 'assistant', answer,
-                metadata={'source_type': source_type}
-            )
+            self.conversation_memory.add_message(session_id, 'assistant', answer, metadata=metadata)
+
+    @staticmethod
+    def _source_articles(result: Dict) -> List:
+        """Legal articles (dieu) cited by a response's sources"""
+        return [src['metadata'].get('dieu') for src in result.get('sources', [])
+                if 'metadata' in src and 'dieu' in src['metadata']]
 
-    def _cache_response(self, query, response, session_id):
-        """Cache response"""
+    @staticmethod
+    def _source_documents(result: Dict) -> List:
+        """Legal documents cited by a response's sources, best source first"""
+        return [src['metadata']['document'] for src in result.get('sources', [])
+                if src.get('metadata', {}).get('document')]
+
+    def _get_cache_context_key(self, query, session_id, conversation_context) -> str:
+        """
+        Conversation fingerprint for cache scoping
+
+        Empty for self-contained questions (shared across sessions) and for
+        the first turn of a conversation; otherwise a hash of the topics and
+        articles discussed so far.
+        """
+        if not session_id or not conversation_context or not self.conversation_memory:
+            return ""
+        if not is_follow_up_question(query):
+            return ""
+        return self.conversation_memory.get_context_fingerprint(session_id)
+
+    def _cache_response(self, query, response, session_id, context_key="", compute_ms=None):
+        """Cache response (compute_ms weights the entry for eviction)"""
         if self.semantic_cache:
-            self.semantic_cache.set(query, response, session_id)
+            self.semantic_cache.set(query, response, session_id, context_key=context_key,
+                                    compute_ms=compute_ms)
+
+    def _schedule_refresh(self, query: str):
+        """Recompute a stale cached answer off the request path"""
+        logger.info(f"♻️  Scheduling background refresh: {query[:50]}...")
+        self._refresh_executor.submit(self._refresh_cached_answer, query)
+
+    def _refresh_cached_answer(self, query: str):
+        """Run the pipeline without cache lookup or session side effects"""
+        try:
+            self.process_query(query, session_id=None, bypass_cache=True, evaluate=False)
+        except Exception as e:
+            logger.error(f"Background cache refresh failed: {e}")
 
     # ============================================
     # STATISTICS
@@ -511,6 +675,24 @@ Trả lời:"""
             'evaluation': self.evaluator.get_aggregate_metrics() if self.evaluator else None,
         }
 
+        if self.singleflight:
+            stats['singleflight'] = self.singleflight.get_stats()
+
+        if self.hierarchical_merger:
+            stats['hierarchical_merge'] = self.hierarchical_merger.get_stats()
+
+        llm_call_cache = get_llm_call_cache()
+        if llm_call_cache is not None:
+            stats['llm_call_cache'] = llm_call_cache.get_stats()
+
+        retrieval_cache = self.retriever_system.get_retrieval_cache()
+        if retrieval_cache is not None:
+            stats['retrieval_cache'] = retrieval_cache.get_stats()
+
+        embed_model = self.retriever_system.get_embed_model()
+        if embed_model is not None and hasattr(embed_model, 'get_stats'):
+            stats['embeddings'] = embed_model.get_stats()
+
         if self.query_router and hasattr(self.query_router, 'get_strategy_stats'):
             stats['routing'] = self.query_router.get_strategy_stats()
 
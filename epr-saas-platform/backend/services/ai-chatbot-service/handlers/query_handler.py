@@ -11,6 +11,7 @@ from llama_index.core.prompts import PromptTemplate
 
 from config import Config
 from systems.conversation_memory import ConversationMemory
+from systems.corpus_version import public_metadata
 from systems.reranker import Reranker
 from systems.legal_prompts import (
     LEGAL_CONSULTANT_SYSTEM_PROMPT,
@@ -422,7 +423,7 @@ class QueryHandler:
             if article_id not in seen_articles and len(unique_sources) < max_sources:
                 seen_articles.add(article_id)
                 source_info = {
-                    'metadata': metadata,
+                    'metadata': public_metadata(metadata),
                     'text': node.node.text,
                     'score': node.score if hasattr(node, 'score') else None
                 }
@@ -0,0 +1,9 @@
+"""
+Ingestion package: streams legal PDFs into the vector store
+"""
+from .embedding_store import EmbeddingStore, manifest_target, open_embedding_store
+from .legal_splitter import LegalSplitter, Section
+from .pipeline import IngestionPipeline, IngestionStats, SourceDocument
+
+__all__ = ['EmbeddingStore', 'IngestionPipeline', 'IngestionStats', 'LegalSplitter', 'Section', 'SourceDocument',
+           'manifest_target', 'open_embedding_store']
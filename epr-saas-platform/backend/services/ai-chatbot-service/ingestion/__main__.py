@@ -0,0 +1,120 @@
+"""
+Ingestion CLI
+
+    python -m ingestion documents/                      # every PDF in a folder
+    python -m ingestion nd08.pdf --document "Nghị định 08/2022/NĐ-CP"
+    python -m ingestion documents/ --dry-run            # split only, no API calls
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+from config import Config
+from ingestion.embedding_store import open_embedding_store
+from ingestion.pipeline import IngestionPipeline, SourceDocument
+
+logger = logging.getLogger(__name__)
+
+
+def _load_catalog(path: str) -> Dict[str, Dict]:
+    """pdf_catalog.json entries keyed by PDF file name"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    return {os.path.basename(entry.get('file_path', '')): entry for entry in catalog.values()}
+
+
+def resolve_sources(paths: List[str], document: Optional[str] = None, pdf_url: str = "",
+                    catalog_path: Optional[str] = None) -> List[SourceDocument]:
+    """
+    PDF files to ingest (folders expand to their PDFs, sorted), named after
+    --document, else their pdf_catalog.json title, else the file name
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.pdf')
+            ))
+        else:
+            files.append(path)
+
+    if document and len(files) > 1:
+        raise ValueError("--document names a single PDF")
+
+    catalog = _load_catalog(catalog_path)
+    sources = []
+    for path in files:
+        entry = catalog.get(os.path.basename(path), {})
+        name = document or entry.get('title') or os.path.splitext(os.path.basename(path))[0]
+        sources.append(SourceDocument(path=path, document=name, pdf_url=pdf_url))
+    return sources
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ingestion",
+                                     description="Stream legal PDFs into the Weaviate collection")
+    parser.add_argument("paths", nargs="+", help="PDF files or folders of PDFs")
+    parser.add_argument("--document", help="Document name metadata (single PDF only)")
+    parser.add_argument("--pdf-url", default="", help="pdf_url metadata")
+    parser.add_argument("--catalog", default="pdf_catalog.json", help="Catalog used to name documents")
+    parser.add_argument("--no-replace", action="store_true",
+                        help="Keep objects of a previous ingestion of the same files")
+    parser.add_argument("--embedding-store", default=None,
+                        help="SQLite store of reused vectors (default: INGEST_EMBEDDING_STORE, '' disables)")
+    parser.add_argument("--dedup", action="store_true", default=None,
+                        help="Drop chunks near-identical to an earlier one (default: INGEST_DEDUP)")
+    parser.add_argument("--dry-run", action="store_true", help="Extract and split only")
+    parser.add_argument("--bump-generation", action="store_true",
+                        help="Start a new corpus generation afterwards (full re-ingestion)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        sources = resolve_sources(args.paths, args.document, args.pdf_url, args.catalog)
+    except ValueError as e:
+        parser.error(str(e))
+    if not sources:
+        parser.error("no PDF found")
+
+    if args.dry_run:
+        stats = IngestionPipeline(client=None, dedup=args.dedup).dry_run(sources)
+        print(json.dumps(stats.as_dict(), ensure_ascii=False))
+        return 0
+
+    import weaviate
+    from weaviate.classes.init import Auth
+
+    Config.validate()
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=Config.WEAVIATE_URL,
+        auth_credentials=Auth.api_key(Config.WEAVIATE_API_KEY),
+        skip_init_checks=True,
+    )
+    store = open_embedding_store(args.embedding_store)
+    try:
+        pipeline = IngestionPipeline(client, embedding_store=store, dedup=args.dedup)
+        stats = pipeline.run(sources, replace=not args.no_replace)
+    finally:
+        client.close()
+        if store is not None:
+            store.close()
+
+    if args.bump_generation:
+        # Workers rebuild their indexes for the new generation, caching nothing until done
+        from systems.corpus_version import get_corpus_registry
+        registry = get_corpus_registry()
+        generation = registry.next_generation()
+        registry.publish_index_event('reload', generation=generation)
+        registry.bump_generation(generation)
+
+    print(json.dumps(stats.as_dict(), ensure_ascii=False))
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
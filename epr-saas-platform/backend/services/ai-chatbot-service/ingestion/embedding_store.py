@@ -0,0 +1,197 @@
+"""
+Content-Addressed Embedding Store
+SQLite cache of chunk vectors keyed by a hash of (model, embedded text), plus
+a manifest of what was last written to Weaviate, so re-ingestion only embeds
+and upserts chunks that changed
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    content_hash TEXT PRIMARY KEY,
+    vector BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    target TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    object_hash TEXT NOT NULL,
+    PRIMARY KEY (target, object_id)
+);
+CREATE INDEX IF NOT EXISTS objects_by_file ON objects (target, file_name);
+"""
+
+# SQLite's default limit on host parameters is 999
+_QUERY_CHUNK = 500
+
+
+def _chunks(items: Sequence, size: int = _QUERY_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class EmbeddingStore:
+    """
+    Two tables in one SQLite file:
+
+    - embeddings: content_hash -> float32 vector. The hash covers the
+      embedding model and the exact text sent to it, so any edit (or a
+      model change) is a miss and everything else is reused.
+    - objects: Weaviate object ID -> hash of (vector, properties) last
+      upserted, per file and per target (cluster URL + collection). An
+      object whose hash is unchanged is skipped; IDs of a file that were
+      not produced again are stale.
+
+    The manifest only describes what this store wrote: the pipeline
+    clears it when it creates the collection and checks each file's object
+    count in Weaviate before trusting it.
+
+    Used from the ingestion thread only; writes commit once per batch.
+    """
+
+    def __init__(self, path: str, model: str, target: str = ""):
+        """
+        Args:
+            path: SQLite file (created if missing)
+            model: Embedding model name (part of every content hash)
+            target: Weaviate cluster URL + collection the manifest describes
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.model = model
+        self.target = target
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(objects)")}
+        if columns and "target" not in columns:
+            # Manifest written before it was keyed by target: unknown cluster, start over
+            logger.info("Dropping untargeted upsert manifest")
+            self.conn.execute("DROP TABLE objects")
+        self.conn.executescript(_SCHEMA)
+
+    # ============================================
+    # EMBEDDINGS
+    # ============================================
+
+    def content_hash(self, text: str) -> str:
+        """Key of the vector for `text` under this store's model"""
+        return hashlib.sha256(f"{self.model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_vectors(self, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """Stored vectors for the given content hashes (misses left out)"""
+        found = {}
+        for chunk in _chunks(list(dict.fromkeys(hashes))):
+            rows = self.conn.execute(
+                f"SELECT content_hash, vector FROM embeddings WHERE content_hash IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for content_hash, blob in rows:
+                found[content_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_vectors(self, items: Dict[str, Sequence[float]]):
+        """Store vectors by content hash"""
+        if not items:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (content_hash, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+
+    # ============================================
+    # UPSERT MANIFEST
+    # ============================================
+
+    @staticmethod
+    def object_hash(content_hash: str, properties: Dict) -> str:
+        """Identity of an object as upserted: its vector plus every property"""
+        payload = json.dumps(properties, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{content_hash}\x00{payload}".encode("utf-8")).hexdigest()
+
+    def get_object_hashes(self, object_ids: Sequence[str]) -> Dict[str, str]:
+        """Last upserted hash per object ID (never-written IDs left out)"""
+        found = {}
+        for chunk in _chunks(list(object_ids)):
+            rows = self.conn.execute(
+                f"SELECT object_id, object_hash FROM objects "
+                f"WHERE target = ? AND object_id IN ({','.join('?' * len(chunk))})",
+                [self.target, *chunk]
+            )
+            found.update(rows)
+        return found
+
+    def record_objects(self, items: Iterable[tuple]):
+        """Remember upserted objects: (object_id, file_name, object_hash) tuples"""
+        items = list(items)
+        if not items:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO objects (target, object_id, file_name, object_hash) VALUES (?, ?, ?, ?)",
+                [(self.target, *item) for item in items]
+            )
+
+    def file_objects(self, file_name: str) -> Set[str]:
+        """IDs of every object recorded for a file"""
+        rows = self.conn.execute("SELECT object_id FROM objects WHERE target = ? AND file_name = ?",
+                                 (self.target, file_name))
+        return {object_id for (object_id,) in rows}
+
+    def forget_objects(self, object_ids: Sequence[str]):
+        """Drop objects from the manifest (deleted, or their upsert failed)"""
+        with self.conn:
+            for chunk in _chunks(list(object_ids)):
+                self.conn.execute(
+                    f"DELETE FROM objects WHERE target = ? AND object_id IN ({','.join('?' * len(chunk))})",
+                    [self.target, *chunk]
+                )
+
+    def forget_file(self, file_name: str):
+        """Drop a file's manifest (its objects will all be written again)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM objects WHERE target = ? AND file_name = ?", (self.target, file_name))
+
+    def clear_objects(self):
+        """Drop the whole manifest of this target (e.g. the collection was created anew)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM objects WHERE target = ?", (self.target,))
+
+    def get_stats(self) -> Dict[str, int]:
+        (vectors,) = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        (objects,) = self.conn.execute("SELECT COUNT(*) FROM objects WHERE target = ?", (self.target,)).fetchone()
+        return {'vectors': vectors, 'objects': objects}
+
+    def close(self):
+        self.conn.close()
+
+
+def manifest_target(cluster_url: Optional[str] = None, class_name: Optional[str] = None) -> str:
+    """Manifest key of a collection: cluster URL (defaults to Config.WEAVIATE_URL) + collection"""
+    cluster_url = (cluster_url or Config.WEAVIATE_URL or "").rstrip("/")
+    return f"{cluster_url}/{class_name or Config.WEAVIATE_CLASS_NAME}"
+
+
+def open_embedding_store(path: Optional[str] = None, model: Optional[str] = None,
+                         target: Optional[str] = None) -> Optional[EmbeddingStore]:
+    """
+    Store at `path` (defaults to Config.INGEST_EMBEDDING_STORE), None when
+    the store is disabled (empty path); its manifest describes `target`
+    (defaults to manifest_target())
+    """
+    path = Config.INGEST_EMBEDDING_STORE if path is None else path
+    if not path:
+        return None
+    return EmbeddingStore(path, model or Config.EMBEDDING_MODEL, target or manifest_target())
@@ -0,0 +1,179 @@
+"""
+Legal Structure Splitter
+Splits streamed page text into Chương / Mục / Điều sections, then each
+section into child chunks sized for retrieval (Config.CHUNK_SIZES)
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import Config
+from ingestion.pdf_reader import Page
+
+
+_CHUONG_LINE = re.compile(r"^chương\s+([ivxlc]+|\d+)\b[.:]?\s*(.*)$", re.IGNORECASE)
+_MUC_LINE = re.compile(r"^mục\s+(\d+)\b[.:]?\s*(.*)$", re.IGNORECASE)
+# "Điều 5. Title" - the period keeps "Điều 5 của Luật này..." in running text
+_DIEU_LINE = re.compile(r"^điều\s+(\d+)\s*\.\s*(.*)$", re.IGNORECASE)
+
+
+@dataclass
+class Section:
+    """One article (or one part of a long article) and where it sits"""
+    chuong: str = ""
+    chuong_title: str = ""
+    muc: str = ""
+    muc_title: str = ""
+    dieu: str = ""
+    dieu_title: str = ""
+    part: int = 0
+    first_page: int = 0
+    last_page: int = 0
+    lines: List[str] = field(default_factory=list)
+    words: int = 0
+
+    @property
+    def pages(self) -> str:
+        """'12' or '12-13'"""
+        if self.first_page == self.last_page:
+            return str(self.first_page)
+        return f"{self.first_page}-{self.last_page}"
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def metadata(self) -> Dict[str, str]:
+        """Chunk metadata fields of the collection schema"""
+        return {
+            'chuong': self.chuong,
+            'chuong_title': self.chuong_title,
+            'muc': self.muc,
+            'muc_title': self.muc_title,
+            'dieu': self.dieu,
+            'dieu_title': self.dieu_title,
+            'pages': self.pages,
+        }
+
+    def continuation(self, page: int) -> "Section":
+        """Next part of the same article"""
+        return Section(
+            chuong=self.chuong, chuong_title=self.chuong_title,
+            muc=self.muc, muc_title=self.muc_title,
+            dieu=self.dieu, dieu_title=self.dieu_title,
+            part=self.part + 1, first_page=page, last_page=page
+        )
+
+
+class LegalSplitter:
+    """
+    Streaming splitter for Vietnamese legal documents
+
+    Sections (parents) are articles, cut into parts of at most
+    `parent_words`, so memory is bounded by one section whatever the
+    document size. Heading lines for chapters and sections are not body
+    text: they only set the metadata of the articles that follow.
+    """
+
+    def __init__(self, parent_words: Optional[int] = None, child_words: Optional[int] = None):
+        """
+        Args:
+            parent_words: Largest section (defaults to Config.CHUNK_SIZES[0])
+            child_words: Largest child chunk (defaults to Config.CHUNK_SIZES[1])
+        """
+        self.parent_words = parent_words or Config.CHUNK_SIZES[0]
+        self.child_words = child_words or Config.CHUNK_SIZES[1]
+
+    def sections(self, pages: Iterable[Page]) -> Iterator[Section]:
+        """
+        Split pages into sections as they stream in
+
+        Args:
+            pages: Pages in document order
+
+        Yields:
+            Non-empty sections in document order
+        """
+        context = Section()
+        current: Optional[Section] = None
+        pending_title = None  # "chuong" / "muc" while its title lines follow the heading
+
+        for page in pages:
+            for raw_line in page.text.splitlines():
+                line = " ".join(raw_line.split())
+                if not line or line.isdigit():  # Blank lines, page numbers
+                    continue
+
+                chuong_match = _CHUONG_LINE.match(line)
+                muc_match = _MUC_LINE.match(line)
+                dieu_match = _DIEU_LINE.match(line)
+                heading = chuong_match or muc_match or dieu_match
+
+                # Upper-case lines right after a heading are its title
+                if pending_title and not heading and line.upper() == line:
+                    title_field = f"{pending_title}_title"
+                    title = getattr(context, title_field)
+                    setattr(context, title_field, f"{title} {line}".strip())
+                    continue
+                pending_title = None
+
+                if heading:
+                    if current and current.lines:
+                        yield current
+                    current = None
+
+                if chuong_match:
+                    context = Section(chuong=chuong_match.group(1).upper(),
+                                      chuong_title=chuong_match.group(2))
+                    pending_title = "chuong"
+                    continue
+                if muc_match:
+                    context.muc, context.muc_title = muc_match.group(1), muc_match.group(2)
+                    pending_title = "muc"
+                    continue
+
+                if dieu_match or current is None:
+                    current = Section(
+                        chuong=context.chuong, chuong_title=context.chuong_title,
+                        muc=context.muc, muc_title=context.muc_title,
+                        dieu=dieu_match.group(1) if dieu_match else "",
+                        dieu_title=dieu_match.group(2) if dieu_match else "",
+                        first_page=page.number, last_page=page.number
+                    )
+
+                words = len(line.split())
+                if current.lines and current.words + words > self.parent_words:
+                    yield current
+                    current = current.continuation(page.number)
+
+                current.lines.append(line)
+                current.words += words
+                current.last_page = page.number
+
+        if current and current.lines:
+            yield current
+
+    def chunks(self, section: Section) -> List[str]:
+        """
+        Child chunks of a section, packed from whole lines (over-long lines
+        are cut into word windows); together they are exactly the section
+        """
+        chunks = []
+        current: List[str] = []
+        count = 0
+        for line in section.lines:
+            words = line.split()
+            pieces = [line] if len(words) <= self.child_words else [
+                " ".join(words[start:start + self.child_words])
+                for start in range(0, len(words), self.child_words)
+            ]
+            for piece in pieces:
+                size = len(piece.split())
+                if current and count + size > self.child_words:
+                    chunks.append("\n".join(current))
+                    current, count = [], 0
+                current.append(piece)
+                count += size
+
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
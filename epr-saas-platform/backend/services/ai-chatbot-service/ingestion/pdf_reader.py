@@ -0,0 +1,46 @@
+"""
+PDF Page Reader
+Yields page text one page at a time, so large documents never sit in memory
+"""
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import Iterator
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Only needed for ingestion
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Page:
+    """Extracted text of one PDF page"""
+    number: int  # 1-based
+    text: str
+
+
+def iter_pages(path: str) -> Iterator[Page]:
+    """
+    Stream the pages of a PDF
+
+    Args:
+        path: PDF file path
+
+    Yields:
+        Pages in order, text NFC-normalized (empty for image-only pages)
+    """
+    if PdfReader is None:
+        raise RuntimeError("pypdf is required for PDF ingestion (pip install pypdf)")
+
+    # pypdf parses pages lazily, one at a time
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, 1):
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"{path} page {number}: text extraction failed: {e}")
+            text = ""
+        yield Page(number=number, text=unicodedata.normalize("NFC", text))
@@ -0,0 +1,480 @@
+"""
+Streaming Ingestion Pipeline
+PDF pages -> legal sections -> child chunks -> embedding batches -> Weaviate
+batch upserts, chained as generators so memory stays flat with corpus size
+"""
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from llama_index.core.schema import MetadataMode, TextNode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from config import Config
+from ingestion.embedding_store import EmbeddingStore, manifest_target
+from ingestion.legal_splitter import LegalSplitter, Section
+from ingestion.pdf_reader import iter_pages
+from systems.corpus_version import BOOKKEEPING_METADATA
+from systems.near_duplicates import MINHASH_METADATA_KEY, MinHashIndex, encode_signature, minhash
+
+logger = logging.getLogger(__name__)
+
+try:
+    from weaviate.classes.query import Filter
+except ImportError:
+    Filter = None
+
+
+@dataclass
+class SourceDocument:
+    """One PDF to ingest"""
+    path: str
+    document: str  # 'document' metadata, e.g. "Nghị định 08/2022/NĐ-CP"
+    pdf_url: str = ""
+
+    @property
+    def file_name(self) -> str:
+        return os.path.basename(self.path)
+
+
+@dataclass
+class IngestionStats:
+    """Counters of one ingestion run"""
+    documents: int = 0
+    pages: int = 0
+    sections: int = 0
+    chunks: int = 0
+    embedded: int = 0   # Sent to the embedding model
+    reused: int = 0     # Vector found in the embedding store
+    unchanged: int = 0  # Identical to the last upsert, skipped
+    deleted: int = 0    # Stale objects removed
+    duplicates: int = 0  # Near-duplicates of an earlier chunk, dropped
+    resynced: int = 0   # Files whose manifest disagreed with Weaviate, fully re-upserted
+    failed: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'documents': self.documents,
+            'pages': self.pages,
+            'sections': self.sections,
+            'chunks': self.chunks,
+            'embedded': self.embedded,
+            'reused': self.reused,
+            'unchanged': self.unchanged,
+            'deleted': self.deleted,
+            'duplicates': self.duplicates,
+            'resynced': self.resynced,
+            'failed': self.failed,
+            'seconds': round(self.seconds, 2),
+            'chunks_per_second': round(self.chunks_per_second, 1),
+        }
+
+
+@dataclass
+class _EmbedJob:
+    """One batch on its way through the embedding stage"""
+    nodes: List[TextNode]
+    hashes: List[Optional[str]]
+    vectors: List[Optional[List[float]]]
+    missing: List[int]  # Positions that need the model
+    missing_texts: List[str]
+    future: Optional[object] = None  # Request carrying the misses
+    offset: int = 0  # Where they start in its result
+
+
+def node_properties(node: TextNode) -> Dict:
+    """Weaviate properties for a node, laid out as WeaviateVectorStore writes them"""
+    properties = {"text": node.get_content(metadata_mode=MetadataMode.NONE) or ""}
+    properties.update(node_to_metadata_dict(node, remove_text=True, flat_metadata=False))
+    return properties
+
+
+class IngestionPipeline:
+    """
+    Streams legal PDFs into the Weaviate collection
+
+    Every stage is a generator, so at any time only one page, one section,
+    INGEST_READ_AHEAD_BATCHES embedding batches and one Weaviate batch are
+    held. Embedding requests run concurrently but results are consumed in
+    order; Weaviate batch uploads run in the client's background threads.
+
+    Chunks carry parent_id (their section), so the hierarchical merger
+    can reassemble whole articles at query time. Object IDs are derived
+    from file name, article and position within it, so re-ingesting a file
+    overwrites it and an edit only moves the IDs of its own article.
+
+    Every chunk carries a MinHash signature in its metadata; with `dedup`,
+    chunks near-identical to one already seen in the run are dropped
+    (the first occurrence, in input order, is kept).
+
+    With an EmbeddingStore, vectors are reused by content hash and objects
+    identical to their last upsert are skipped: re-ingesting a corpus with
+    1% changed text costs 1% of the embedding calls and upserts. The
+    manifest is kept per cluster and collection, cleared when the
+    collection is created, and a file whose object count in Weaviate does
+    not match it is re-upserted in full.
+    """
+
+    def __init__(
+        self,
+        client,
+        embed_model=None,
+        class_name: str = None,
+        splitter: Optional[LegalSplitter] = None,
+        embed_batch_size: int = None,
+        embed_concurrency: int = None,
+        upsert_batch_size: int = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        dedup: Optional[bool] = None,
+        cluster_url: Optional[str] = None
+    ):
+        """
+        Args:
+            client: Connected Weaviate v4 client
+            embed_model: LlamaIndex embedding model (defaults to OpenAIEmbedding(Config.EMBEDDING_MODEL))
+            class_name: Target collection (defaults to Config.WEAVIATE_CLASS_NAME)
+            splitter: Section / chunk splitter
+            embed_batch_size: Chunks per embeddings request
+            embed_concurrency: Embedding requests in flight
+            upsert_batch_size: Objects per Weaviate batch request
+            embedding_store: Content-addressed vector cache and upsert manifest
+            dedup: Drop near-duplicate chunks (defaults to Config.INGEST_DEDUP)
+            cluster_url: Weaviate cluster the client points at (defaults to
+                Config.WEAVIATE_URL); keys the store's upsert manifest
+        """
+        self.client = client
+        self._embed_model = embed_model
+        self.class_name = class_name or Config.WEAVIATE_CLASS_NAME
+        self.splitter = splitter or LegalSplitter()
+        self.embed_batch_size = embed_batch_size or Config.INGEST_EMBED_BATCH_SIZE
+        self.embed_concurrency = embed_concurrency or Config.INGEST_EMBED_CONCURRENCY
+        self.upsert_batch_size = upsert_batch_size or Config.INGEST_UPSERT_BATCH_SIZE
+        self.embedding_store = embedding_store
+        if embedding_store is not None:
+            embedding_store.target = manifest_target(cluster_url, self.class_name)
+        self.dedup = Config.INGEST_DEDUP if dedup is None else dedup
+        self._seen: Optional[MinHashIndex] = None
+        self.stats = IngestionStats()
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            # Not the memoizing query embedder: document vectors are never looked up again
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            self._embed_model = OpenAIEmbedding(model=Config.EMBEDDING_MODEL)
+        return self._embed_model
+
+    # ============================================
+    # STAGES
+    # ============================================
+
+    def _pages(self, source: SourceDocument):
+        for page in iter_pages(source.path):
+            self.stats.pages += 1
+            yield page
+
+    def document_nodes(self, source: SourceDocument) -> Iterator[TextNode]:
+        """
+        Child chunk nodes of one PDF, in document order
+
+        Args:
+            source: PDF and its document-level metadata
+        """
+        self.stats.documents += 1
+        used_keys = set()
+        for section_index, section in enumerate(self.splitter.sections(self._pages(source))):
+            self.stats.sections += 1
+            key = self._section_key(section, section_index)
+            if key in used_keys:  # e.g. an article number repeated in an annex
+                key = f"{key}@{section_index}"
+            used_keys.add(key)
+            parent_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source.file_name}#{key}"))
+            metadata = section.metadata()
+            metadata.update({
+                'document': source.document,
+                'file_name': source.file_name,
+                'pdf_url': source.pdf_url,
+                'parent_id': parent_id,
+            })
+
+            for chunk_index, text in enumerate(self.splitter.chunks(section)):
+                chunk_metadata = dict(metadata)
+                signature = minhash(text)
+                if signature is not None:
+                    if self._seen is not None and not self._seen.add_if_new(signature):
+                        self.stats.duplicates += 1
+                        continue
+                    chunk_metadata[MINHASH_METADATA_KEY] = encode_signature(signature)
+
+                yield TextNode(
+                    id_=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{parent_id}/{chunk_index}")),
+                    text=text,
+                    metadata=chunk_metadata,
+                    excluded_embed_metadata_keys=list(BOOKKEEPING_METADATA),
+                    excluded_llm_metadata_keys=list(BOOKKEEPING_METADATA)
+                )
+
+    @staticmethod
+    def _section_key(section: Section, section_index: int) -> str:
+        """Stable name of a section within its file"""
+        if section.dieu:
+            return f"{section.chuong}/{section.dieu}.{section.part}"
+        return str(section_index)
+
+    @staticmethod
+    def _batched(nodes: Iterable[TextNode], size: int) -> Iterator[List[TextNode]]:
+        batch = []
+        for node in nodes:
+            batch.append(node)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _embedded(self, batches: Iterable[List[TextNode]]) -> Iterator[Tuple[List[TextNode], List, List]]:
+        """
+        Embed batches, yielding (nodes, content hashes, vectors) in input order
+
+        Vectors found in the embedding store are reused. Misses of several
+        batches are pooled into requests of up to `embed_batch_size` texts,
+        so sparse edits cost a few requests rather than one per batch. At
+        most INGEST_READ_AHEAD_BATCHES batches are held and
+        `embed_concurrency` requests run at once.
+        """
+        store = self.embedding_store
+        pending = deque()  # _EmbedJob per batch, input order
+        pooled: List[_EmbedJob] = []  # Jobs whose misses are not submitted yet
+        pooled_texts = 0
+
+        def _submit():
+            nonlocal pooled, pooled_texts
+            texts = [text for job in pooled for text in job.missing_texts]
+            future = executor.submit(self.embed_model.get_text_embedding_batch, texts)
+            offset = 0
+            for job in pooled:
+                job.future, job.offset = future, offset
+                offset += len(job.missing)
+            pooled, pooled_texts = [], 0
+
+        def _complete(job: "_EmbedJob"):
+            if job.missing:
+                if job.future is None:
+                    _submit()
+                fresh = job.future.result()[job.offset:job.offset + len(job.missing)]
+                for i, vector in zip(job.missing, fresh):
+                    job.vectors[i] = vector
+                if store is not None:
+                    store.put_vectors({job.hashes[i]: job.vectors[i] for i in job.missing})
+            return job.nodes, job.hashes, job.vectors
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency,
+                                thread_name_prefix="ingest-embed") as executor:
+            for batch in batches:
+                texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+                hashes = [None] * len(batch)
+                vectors = [None] * len(batch)
+                if store is not None:
+                    hashes = [store.content_hash(text) for text in texts]
+                    stored = store.get_vectors(hashes)
+                    vectors = [stored.get(content_hash) for content_hash in hashes]
+
+                missing = [i for i, vector in enumerate(vectors) if vector is None]
+                self.stats.embedded += len(missing)
+                self.stats.reused += len(batch) - len(missing)
+                job = _EmbedJob(batch, hashes, vectors, missing, [texts[i] for i in missing])
+                pending.append(job)
+                if missing:
+                    if pooled and pooled_texts + len(missing) > self.embed_batch_size:
+                        _submit()
+                    pooled.append(job)
+                    pooled_texts += len(missing)
+                    if pooled_texts >= self.embed_batch_size:
+                        _submit()
+
+                # Backpressure: stop reading the PDF until the oldest batch is embedded
+                if len(pending) >= Config.INGEST_READ_AHEAD_BATCHES:
+                    yield _complete(pending.popleft())
+
+            while pending:
+                yield _complete(pending.popleft())
+
+    def _delete_document(self, source: SourceDocument):
+        """Drop the objects of a previous ingestion of the same file"""
+        if Filter is None:
+            raise RuntimeError("weaviate-client v4 is required to replace documents")
+        collection = self.client.collections.get(self.class_name)
+        result = collection.data.delete_many(
+            where=Filter.by_property("file_name").equal(source.file_name)
+        )
+        logger.info(f"  Replaced {getattr(result, 'successful', 0)} objects of {source.file_name}")
+
+    def _delete_objects(self, object_ids: List[str]):
+        """Delete objects by ID, a few hundred per request"""
+        collection = self.client.collections.get(self.class_name)
+        for start in range(0, len(object_ids), self.upsert_batch_size):
+            collection.data.delete_many(
+                where=Filter.by_id().contains_any(object_ids[start:start + self.upsert_batch_size])
+            )
+
+    def _count_objects(self, file_name: str) -> int:
+        """Objects of a file in the collection"""
+        collection = self.client.collections.get(self.class_name)
+        result = collection.aggregate.over_all(
+            filters=Filter.by_property("file_name").equal(file_name),
+            total_count=True
+        )
+        return result.total_count or 0
+
+    def _verify_manifest(self, source: SourceDocument):
+        """
+        Forget a file's manifest when the collection does not hold what it
+        lists (collection dropped or emptied, objects deleted elsewhere)
+        """
+        recorded = len(self.embedding_store.file_objects(source.file_name))
+        if not recorded:
+            return
+        stored = self._count_objects(source.file_name)
+        if stored != recorded:
+            logger.warning(f"  Manifest lists {recorded} objects of {source.file_name} but "
+                           f"{self.class_name} holds {stored}; re-upserting the file")
+            self.embedding_store.forget_file(source.file_name)
+            self.stats.resynced += 1
+
+    def _source_nodes(self, sources: Iterable[SourceDocument], replace: bool,
+                      produced: Dict[str, Set[str]]) -> Iterator[TextNode]:
+        for source in sources:
+            logger.info(f"📄 {source.file_name} -> {source.document}")
+            produced[source.file_name] = set()
+            if self.embedding_store is not None:
+                self._verify_manifest(source)
+            # Files the store has a manifest for are pruned after the run instead
+            if replace and (self.embedding_store is None or not self.embedding_store.file_objects(source.file_name)):
+                # Runs as the file's first chunk is pulled, after the previous file was queued
+                self._delete_document(source)
+            for node in self.document_nodes(source):
+                produced[source.file_name].add(node.node_id)
+                yield node
+
+    def _prune_stale(self, produced: Dict[str, Set[str]]):
+        """Delete objects recorded for a file that this run no longer produced"""
+        if Filter is None:
+            raise RuntimeError("weaviate-client v4 is required to replace documents")
+        for file_name, object_ids in produced.items():
+            stale = sorted(self.embedding_store.file_objects(file_name) - object_ids)
+            if not stale:
+                continue
+            self._delete_objects(stale)
+            self.embedding_store.forget_objects(stale)
+            self.stats.deleted += len(stale)
+            logger.info(f"  Deleted {len(stale)} stale objects of {file_name}")
+
+    def _log_progress(self, previous: int):
+        if self.stats.chunks // Config.INGEST_PROGRESS_EVERY > previous // Config.INGEST_PROGRESS_EVERY:
+            logger.info(f"  {self.stats.chunks} chunks, {self.stats.pages} pages "
+                      f"({self.stats.chunks_per_second:.1f} chunks/s)")
+
+    # ============================================
+    # RUN
+    # ============================================
+
+    def ensure_collection(self) -> bool:
+        """
+        Create the collection with the LlamaIndex schema if it does not exist
+        (a new collection holds nothing the upsert manifest lists)
+
+        Returns:
+            True if it was created
+        """
+        if self.client.collections.exists(self.class_name):
+            return False
+
+        from llama_index.vector_stores.weaviate import WeaviateVectorStore
+        WeaviateVectorStore(weaviate_client=self.client, index_name=self.class_name)
+        if self.embedding_store is not None:
+            self.embedding_store.clear_objects()
+        logger.info(f"Created collection {self.class_name}")
+        return True
+
+    def run(self, sources: Iterable[SourceDocument], replace: bool = True) -> IngestionStats:
+        """
+        Ingest PDFs end to end
+
+        Args:
+            sources: PDFs to ingest
+            replace: Remove each file's previous objects (with an embedding
+                store: only the stale ones, once the new ones are written)
+
+        Returns:
+            Run statistics (chunks/sec included)
+        """
+        self.stats = IngestionStats()
+        self._seen = MinHashIndex() if self.dedup else None
+        self.ensure_collection()
+        collection = self.client.collections.get(self.class_name)
+
+        store = self.embedding_store
+        produced: Dict[str, Set[str]] = {}
+        written = []  # (object_id, file_name, object_hash) for the manifest
+
+        batches = self._batched(self._source_nodes(sources, replace, produced), self.embed_batch_size)
+        with collection.batch.fixed_size(
+            batch_size=self.upsert_batch_size,
+            concurrent_requests=Config.INGEST_UPSERT_CONCURRENCY
+        ) as batch:
+            for nodes, hashes, vectors in self._embedded(batches):
+                last_written = store.get_object_hashes([node.node_id for node in nodes]) if store else {}
+                for node, content_hash, vector in zip(nodes, hashes, vectors):
+                    properties = node_properties(node)
+                    if store is not None:
+                        object_hash = store.object_hash(content_hash, properties)
+                        if last_written.get(node.node_id) == object_hash:
+                            self.stats.unchanged += 1
+                            continue
+                        written.append((node.node_id, node.metadata['file_name'], object_hash))
+                    batch.add_object(properties=properties, uuid=node.node_id, vector=vector)
+                previous = self.stats.chunks
+                self.stats.chunks += len(nodes)
+                self._log_progress(previous)
+
+        failed = collection.batch.failed_objects
+        self.stats.failed = len(failed)
+        for failure in failed[:5]:
+            logger.warning(f"  Upsert failed: {failure.message}")
+
+        if store is not None:
+            # Only what Weaviate accepted counts as written
+            failed_ids = {str(failure.object_.uuid) for failure in failed}
+            store.record_objects(item for item in written if item[0] not in failed_ids)
+            if replace:
+                self._prune_stale(produced)
+
+        self.stats.finished = time.perf_counter()
+        logger.info(f"✓ Ingested {self.stats.chunks} chunks from {self.stats.documents} documents "
+                  f"in {self.stats.seconds:.1f}s ({self.stats.chunks_per_second:.1f} chunks/s, "
+                  f"{self.stats.embedded} embedded, {self.stats.unchanged} unchanged, "
+                  f"{self.stats.resynced} files resynced, {self.stats.failed} failed)")
+        return self.stats
+
+    def dry_run(self, sources: Iterable[SourceDocument]) -> IngestionStats:
+        """Extract and split only (no embeddings, no writes)"""
+        self.stats = IngestionStats()
+        self._seen = MinHashIndex() if self.dedup else None
+        for source in sources:
+            for _ in self.document_nodes(source):
+                self.stats.chunks += 1
+        self.stats.finished = time.perf_counter()
+        return self.stats
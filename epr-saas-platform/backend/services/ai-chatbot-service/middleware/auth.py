@@ -1,9 +1,11 @@
+import hmac
 from fastapi import HTTPException, Security, status
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt, ExpiredSignatureError
 from config import Config
 
 security = HTTPBearer()
+admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """
@@ -45,3 +47,23 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token không hợp lệ hoặc đã bị thay đổi"
         )
+
+
+def verify_admin_key(api_key: str = Security(admin_key_header)) -> bool:
+    """
+    Verify the service key of admin endpoints (cache invalidation etc.).
+    End-user tokens carry no role, so they are never enough here.
+    """
+    if not Config.ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled (ADMIN_API_KEY not set)"
+        )
+
+    if not api_key or not hmac.compare_digest(api_key.encode(), Config.ADMIN_API_KEY.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key"
+        )
+
+    return True
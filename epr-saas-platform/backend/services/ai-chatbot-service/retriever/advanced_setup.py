@@ -3,19 +3,25 @@ Advanced Retriever Setup
 Integrates all top-tier RAG components
 """
 import logging
+import threading
+import time
 import weaviate
 from weaviate.classes.init import Auth
 from llama_index.vector_stores.weaviate import WeaviateVectorStore
 from llama_index.core import VectorStoreIndex
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.openai import OpenAIEmbedding
 
 from config import Config
+from retriever.hierarchical_merger import HierarchicalMerger
 from retriever.hybrid_retriever import HybridRetrieverFactory
+from retriever.local_vector_store import LocalVectorRetriever, load_local_vector_index
 from systems.advanced_reranker import MultiStageReranker, DiversityReranker
 from systems.query_transforms import QueryTransformPipeline
 from systems.semantic_cache import get_semantic_cache
+from systems.embedding_service import get_embedding_service
+from systems.retrieval_cache import get_retrieval_cache
+from systems.corpus_version import get_corpus_registry
 from systems.evaluation import EvaluationFramework
 from systems.self_rag import SelfRAG
 from systems.query_router import QueryRouter, AdaptiveRouter
@@ -33,9 +39,11 @@ class AdvancedRetrieverSystem:
         self.index = None
         self.vector_retriever = None
         self.hybrid_retriever = None
+        self.hierarchical_merger = None
         self.reranker = None
         self.query_transformer = None
         self.semantic_cache = None
+        self.retrieval_cache = None
         self.evaluator = None
         self.self_rag = None
         self.query_router = None
@@ -60,8 +68,13 @@ class AdvancedRetrieverSystem:
             # 2. Connect to Weaviate
             self._init_weaviate()
 
-            # 3. Setup retrievers
+            # 3. Setup retrievers (with retrieval result cache); snapshots are
+            # caught up to the current revision, corpus changes published
+            # while the indexes load are applied afterwards
+            index_revision, index_events_from = get_corpus_registry().start_index_tracking()
+            self._init_retrieval_cache()
             self._init_retrievers()
+            self._catch_up_indexes(index_revision)
 
             # 4. Setup reranker
             self._init_reranker()
@@ -81,6 +94,9 @@ class AdvancedRetrieverSystem:
             # 9. Setup query router
             self._init_query_router()
 
+            # 10. Apply corpus changes made through other workers
+            self._start_index_event_listener(index_events_from)
+
             logger.info("="*60)
             logger.info("✅ TOP-TIER RAG SYSTEM READY!")
             logger.info("="*60)
@@ -104,12 +120,12 @@ class AdvancedRetrieverSystem:
             temperature=Config.LLM_TEMPERATURE
         )
 
-        self.embed_model = OpenAIEmbedding(
-            model="text-embedding-3-small"
-        )
+        # Shared, memoized embedding model for cache + retrievers
+        self.embed_model = get_embedding_service()
 
         logger.info(f"  ✓ LLM: {Config.LLM_MODEL}")
-        logger.info(f"  ✓ Embeddings: text-embedding-3-small")
+        logger.info(f"  ✓ Embeddings: {Config.EMBEDDING_MODEL} "
+                    f"(memoized={Config.ENABLE_EMBEDDING_CACHE})")
 
     def _init_weaviate(self):
         """Initialize Weaviate connection"""
@@ -127,8 +143,11 @@ class AdvancedRetrieverSystem:
             index_name=Config.WEAVIATE_CLASS_NAME
         )
 
-        # Load index
-        self.index = VectorStoreIndex.from_vector_store(vector_store)
+        # Load index (query embeddings go through the shared embedding service)
+        self.index = VectorStoreIndex.from_vector_store(
+            vector_store,
+            embed_model=self.embed_model
+        )
 
         logger.info(f"  ✓ Connected to Weaviate")
         logger.info(f"  ✓ Index: {Config.WEAVIATE_CLASS_NAME}")
@@ -137,12 +156,14 @@ class AdvancedRetrieverSystem:
         """Initialize retrieval systems"""
         logger.info("🔍 Initializing retrievers...")
 
-        # Base vector retriever
-        self.vector_retriever = VectorIndexRetriever(
-            index=self.index,
-            similarity_top_k=Config.SIMILARITY_TOP_K
-        )
-        logger.info(f"  ✓ Vector retriever (top_k={Config.SIMILARITY_TOP_K})")
+        # Base vector retriever (Weaviate, or an in-process copy of its vectors)
+        self.vector_retriever = self._init_local_vector_retriever()
+        if self.vector_retriever is None:
+            self.vector_retriever = VectorIndexRetriever(
+                index=self.index,
+                similarity_top_k=Config.SIMILARITY_TOP_K
+            )
+            logger.info(f"  ✓ Vector retriever (top_k={Config.SIMILARITY_TOP_K})")
 
         # Hybrid retriever (Vector + BM25)
         if Config.ENABLE_HYBRID_SEARCH:
@@ -152,7 +173,10 @@ class AdvancedRetrieverSystem:
                     index=self.index,
                     vector_weight=Config.VECTOR_WEIGHT,
                     bm25_weight=Config.BM25_WEIGHT,
-                    top_k=Config.HYBRID_TOP_K
+                    top_k=Config.HYBRID_TOP_K,
+                    retrieval_cache=self.retrieval_cache,
+                    weaviate_client=self.client,
+                    corpus_version=get_corpus_registry().get_generation()
                 )
                 logger.info(f"  ✓ Hybrid retriever ({Config.VECTOR_WEIGHT:.1%} vector + "
                           f"{Config.BM25_WEIGHT:.1%} BM25)")
@@ -160,6 +184,49 @@ class AdvancedRetrieverSystem:
                 logger.warning(f"  ⚠ Hybrid retriever failed: {e}")
                 self.hybrid_retriever = None
 
+        # Sibling chunks -> their parent article (needs the keyword index)
+        if Config.ENABLE_HIERARCHICAL_CHUNKING and self.hybrid_retriever:
+            self.hierarchical_merger = HierarchicalMerger(self.hybrid_retriever)
+            logger.info(f"  ✓ Hierarchical merging (≥{Config.HIERARCHICAL_MIN_SIBLINGS} siblings, "
+                      f"≤{Config.HIERARCHICAL_MAX_PARENT_WORDS} words)")
+
+    def _init_local_vector_retriever(self):
+        """Local vector backend (VECTOR_BACKEND=flat|hnsw), None to search Weaviate"""
+        if Config.VECTOR_BACKEND == "weaviate":
+            return None
+
+        try:
+            generation = get_corpus_registry().get_generation()
+            retriever = LocalVectorRetriever(
+                load_local_vector_index(self.client, generation),
+                embed_model=self.embed_model,
+                similarity_top_k=Config.SIMILARITY_TOP_K,
+                weaviate_client=self.client,
+                corpus_version=generation
+            )
+            stats = retriever.get_stats()
+            logger.info(f"  ✓ Local vector retriever ({stats['backend']}, {stats['vectors']} vectors, "
+                      f"top_k={Config.SIMILARITY_TOP_K})")
+            return retriever
+        except Exception as e:
+            logger.warning(f"  ⚠ Local vector backend failed, searching Weaviate: {e}")
+            return None
+
+    def _init_retrieval_cache(self):
+        """Initialize retrieval result cache"""
+        logger.info("🗂  Initializing retrieval cache...")
+
+        if Config.ENABLE_RETRIEVAL_CACHE:
+            try:
+                self.retrieval_cache = get_retrieval_cache()
+                logger.info(f"  ✓ Retrieval cache (TTL={Config.RETRIEVAL_CACHE_TTL_SECONDS}s, "
+                          f"corpus={self.retrieval_cache.corpus_version if self.retrieval_cache else '-'})")
+            except Exception as e:
+                logger.warning(f"  ⚠ Retrieval cache failed: {e}")
+                self.retrieval_cache = None
+        else:
+            logger.info("  ⊝ Retrieval cache disabled")
+
     def _init_reranker(self):
         """Initialize reranking system"""
         logger.info("🎯 Initializing reranker...")
@@ -170,7 +237,8 @@ class AdvancedRetrieverSystem:
             openai_client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
 
             self.reranker = MultiStageReranker(
-                llm_client=openai_client
+                llm_client=openai_client,
+                retrieval_cache=self.retrieval_cache
             )
 
             features = []
@@ -217,7 +285,7 @@ class AdvancedRetrieverSystem:
 
         if Config.ENABLE_SEMANTIC_CACHE:
             try:
-                self.semantic_cache = get_semantic_cache()
+                self.semantic_cache = get_semantic_cache(embed_model=self.embed_model)
                 if self.semantic_cache:
                     logger.info(f"  ✓ Semantic cache (TTL={Config.CACHE_TTL_SECONDS}s, "
                               f"threshold={Config.CACHE_SIMILARITY_THRESHOLD})")
@@ -325,6 +393,10 @@ class AdvancedRetrieverSystem:
         else:
             return self.vector_retriever
 
+    def get_hierarchical_merger(self):
+        """Get sibling-to-parent merger"""
+        return self.hierarchical_merger
+
     def get_reranker(self):
         """Get reranker instance"""
         return self.reranker
@@ -337,6 +409,10 @@ class AdvancedRetrieverSystem:
         """Get semantic cache"""
         return self.semantic_cache
 
+    def get_retrieval_cache(self):
+        """Get retrieval result cache"""
+        return self.retrieval_cache
+
     def get_evaluator(self):
         """Get evaluation framework"""
         return self.evaluator
@@ -357,6 +433,166 @@ class AdvancedRetrieverSystem:
         """Get embedding model"""
         return self.embed_model
 
+    # ============================================
+    # CORPUS CHANGES
+    # ============================================
+
+    def _refresh_indexes(self, dieus: list = None, documents: list = None, revision: int = 0) -> int:
+        """
+        Re-read changed articles / documents into the keyword and local
+        vector indexes; returns once both are swapped in
+
+        Args:
+            dieus: Changed article numbers
+            documents: Changed document names
+            revision: Index event being applied (recorded with persisted snapshots)
+
+        Returns:
+            Number of chunks now in the keyword index for those sources
+        """
+        vector_job = None
+        if isinstance(self.vector_retriever, LocalVectorRetriever):
+            try:
+                vector_job = self.vector_retriever.refresh_sources(dieus, documents, revision)
+            except Exception as e:
+                logger.warning(f"Vector index refresh failed: {e}")
+
+        keyword_chunks = 0
+        if self.hybrid_retriever:
+            try:
+                keyword_chunks = self.hybrid_retriever.refresh_sources(dieus, documents, revision)
+            except Exception as e:
+                logger.warning(f"Keyword index refresh failed: {e}")
+
+        if vector_job is not None:
+            vector_job.join()
+        return keyword_chunks
+
+    def _reload_indexes(self, generation: str, min_revision: int = 0):
+        """
+        Rebuild the keyword and local vector indexes for a corpus generation
+        (snapshots older than min_revision are not reused); blocks
+        """
+        jobs = []
+        if self.hybrid_retriever:
+            jobs.append(self.hybrid_retriever.reload_corpus(generation, min_revision))
+        if isinstance(self.vector_retriever, LocalVectorRetriever):
+            jobs.append(self.vector_retriever.reload(generation, min_revision))
+        for job in jobs:
+            if job is not None:
+                job.join()
+
+    def _loaded_revision(self, revision: int) -> int:
+        """Oldest index event revision included by the loaded indexes (`revision` if none)"""
+        revisions = [revision]
+        if self.hybrid_retriever:
+            revisions.append(self.hybrid_retriever.index.snapshot.revision)
+        if isinstance(self.vector_retriever, LocalVectorRetriever):
+            revisions.append(self.vector_retriever.vector_index.revision)
+        return min(revisions)
+
+    def _catch_up_indexes(self, revision: int):
+        """
+        Bring indexes loaded from snapshots up to `revision`, then mark them
+        current: replay the index events the snapshots predate (a targeted
+        refresh persists only with the next merge), or rebuild them if the
+        event stream no longer holds those events
+        """
+        registry = get_corpus_registry()
+        loaded = self._loaded_revision(revision)
+        if loaded < revision:
+            events = registry.index_events_between(loaded, revision)
+            if events is None:
+                logger.warning(f"Index snapshots at revision {loaded} predate the event stream, "
+                               f"rebuilding for revision {revision}")
+                self._reload_indexes(registry.get_generation(), min_revision=revision)
+            else:
+                logger.info(f"Replaying {len(events)} index events since snapshot revision {loaded}")
+                reloads = [i for i, event in enumerate(events) if event['op'] == 'reload']
+                if reloads:
+                    # Only the latest full reload matters; refreshes before it are included
+                    reload = events[reloads[-1]]
+                    self._reload_indexes(reload['generation'], min_revision=reload['revision'])
+                    events = events[reloads[-1] + 1:]
+                for event in events:
+                    if event['op'] == 'refresh':
+                        self._refresh_indexes(event['dieus'], event['documents'], event['revision'])
+        registry.mark_applied(revision)
+
+    def _start_index_event_listener(self, last_id: str):
+        """
+        Apply index events published by other workers (or the ingestion CLI)
+        to this worker's indexes, in order
+        """
+        registry = get_corpus_registry()
+        if registry.redis_client is None:
+            return
+
+        def _listen(last_id: str):
+            while True:
+                try:
+                    events = registry.read_index_events(last_id)
+                except Exception as e:
+                    logger.warning(f"Index event read failed: {e}")
+                    time.sleep(5)
+                    continue
+
+                for event_id, event in events:
+                    last_id = event_id
+                    if event['own']:
+                        continue  # Applied by invalidate_corpus
+                    logger.info(f"Applying index event {event['op']} (revision {event['revision']})")
+                    if event['op'] == 'refresh':
+                        self._refresh_indexes(event['dieus'], event['documents'], event['revision'])
+                    elif event['op'] == 'reload':
+                        self._reload_indexes(event['generation'])
+                    registry.mark_applied(event['revision'])
+
+        threading.Thread(target=_listen, args=(last_id,), name="index-events", daemon=True).start()
+        logger.info("  ✓ Listening for corpus index events")
+
+    def invalidate_corpus(self, dieus: list = None, documents: list = None) -> dict:
+        """
+        Invalidate cached data after the corpus changed
+
+        The change is published as an index event so every worker updates
+        its own indexes; a worker writes no rankings or answers to the shared
+        caches until it has (CorpusRegistry.indexes_current).
+
+        With articles / documents given, their chunks are re-read into the
+        keyword index (and the local vector index) first, and only once both
+        are swapped in are the entries that depend on them evicted. Without,
+        both indexes are rebuilt in the background and the new corpus
+        generation starts when they are ready (full re-ingest).
+        """
+        registry = get_corpus_registry()
+
+        if not dieus and not documents:
+            generation = registry.next_generation()
+            revision = registry.publish_index_event('reload', generation=generation)
+
+            def _reload():
+                self._reload_indexes(generation)
+                registry.bump_generation(generation)
+                registry.mark_applied(revision)
+
+            threading.Thread(target=_reload, name="corpus-reload", daemon=True).start()
+            return {"scope": "full", "corpus_generation": generation, "status": "reloading"}
+
+        revision = registry.publish_index_event('refresh', dieus, documents)
+        keyword_chunks = self._refresh_indexes(dieus, documents, revision)
+
+        result = {
+            "scope": "targeted",
+            "answers_evicted": self.semantic_cache.invalidate_sources(dieus, documents)
+                if self.semantic_cache else 0,
+            "rankings_evicted": self.retrieval_cache.invalidate_sources(dieus, documents)
+                if self.retrieval_cache else 0,
+            "keyword_chunks_refreshed": keyword_chunks,
+        }
+        registry.mark_applied(revision)
+        return result
+
     def get_system_info(self) -> dict:
         """Get comprehensive system information"""
         return {
@@ -365,6 +601,11 @@ class AdvancedRetrieverSystem:
                 "retrieval": {
                     "hybrid_search": self.hybrid_retriever is not None,
                     "vector_only": self.vector_retriever is not None,
+                    "vector_backend": self.vector_retriever.get_stats()
+                        if isinstance(self.vector_retriever, LocalVectorRetriever) else "weaviate",
+                    "keyword_index": self.hybrid_retriever.get_index_stats()
+                        if self.hybrid_retriever else None,
+                    "indexes_current": get_corpus_registry().indexes_current(),
                 },
                 "reranking": {
                     "enabled": self.reranker is not None,
@@ -379,6 +620,7 @@ class AdvancedRetrieverSystem:
                 "caching": {
                     "enabled": self.semantic_cache is not None,
                     "type": "semantic",
+                    "retrieval_cache": self.retrieval_cache is not None,
                 },
                 "self_rag": {
                     "enabled": self.self_rag is not None,
@@ -0,0 +1,346 @@
+"""
+Sparse BM25 Index
+Okapi BM25 over a term -> postings CSR matrix (NumPy). Scoring only touches
+the postings of the query terms; scores match rank_bm25.BM25Okapi
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+from collections import Counter
+from typing import List, Tuple, Sequence, Dict, Optional
+import numpy as np
+from retriever.vietnamese_analyzer import get_analyzer
+
+logger = logging.getLogger(__name__)
+
+
+# Postings x ratio below corpus size -> accumulate sparsely (np.unique) instead of densely
+SPARSE_ACCUMULATE_RATIO = 16
+
+INDEX_ARRAYS = ("term_hashes", "indptr", "posting_docs", "posting_tfs", "impacts", "doc_len")
+
+
+def tokenize(text: str) -> List[str]:
+    """Analysis shared by indexing and querying (see VietnameseAnalyzer)"""
+    return get_analyzer().analyze(text)
+
+
+def tokenizer_version() -> str:
+    """Analyzer identity; persisted indexes built with another one are rebuilt"""
+    return get_analyzer().version
+
+
+def term_hash(term: str) -> int:
+    """Stable 64-bit term hash (vocabulary lookups work on memory-mapped arrays)"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class BM25Index:
+    """
+    Inverted-index BM25 (Okapi variant, same formula and idf floor as rank_bm25)
+
+    The corpus is stored as a CSR matrix with one row per term:
+    `indptr[t]:indptr[t+1]` slices `posting_docs` / `posting_tfs` / `impacts`
+    for term t, where the impact is the term's full BM25 contribution to that
+    document (idf x saturated tf). A query is scored by gathering its terms' postings
+    and summing impacts per document, so cost grows with the postings of the
+    query terms instead of with the corpus size.
+
+    Rows are ordered by `term_hashes`, so the vocabulary is a sorted array
+    searched with np.searchsorted and the whole index can be saved and
+    memory-mapped back without rebuilding a dict.
+    """
+
+    def __init__(
+        self,
+        tokenized_corpus: Optional[Sequence[Sequence[str]]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ):
+        """
+        Args:
+            tokenized_corpus: One token list per document (None for load())
+            k1: Term frequency saturation
+            b: Length normalization
+            epsilon: Floor for negative idf, as a fraction of the average idf
+        """
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        if tokenized_corpus is not None:
+            self._build(tokenized_corpus)
+
+    def _build(self, tokenized_corpus: Sequence[Sequence[str]]):
+        hash_of: Dict[str, int] = {}
+        posting_hashes = []
+        posting_docs = []
+        posting_tfs = []
+        doc_len = np.zeros(len(tokenized_corpus), dtype=np.float64)
+
+        for doc_idx, tokens in enumerate(tokenized_corpus):
+            doc_len[doc_idx] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                h = hash_of.get(term)
+                if h is None:
+                    h = hash_of[term] = term_hash(term)
+                posting_hashes.append(h)
+                posting_docs.append(doc_idx)
+                posting_tfs.append(tf)
+
+        self._build_from_postings(
+            np.asarray(posting_hashes, dtype=np.uint64),
+            np.asarray(posting_docs, dtype=np.int64),
+            np.asarray(posting_tfs, dtype=np.uint32),
+            doc_len
+        )
+
+    @classmethod
+    def from_postings(
+        cls,
+        hashes: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+    ) -> "BM25Index":
+        """
+        Build from (term hash, doc, tf) triples instead of token lists
+
+        Used by segment merges, which reuse the term frequencies cached in
+        existing segments instead of re-analyzing chunk texts.
+        """
+        index = cls(k1=k1, b=b, epsilon=epsilon)
+        index._build_from_postings(hashes, docs, tfs, doc_len)
+        return index
+
+    def _build_from_postings(self, hashes: np.ndarray, docs: np.ndarray,
+                             tfs: np.ndarray, doc_len: np.ndarray):
+        self.corpus_size = len(doc_len)
+        self.doc_len = np.asarray(doc_len, dtype=np.float64)
+        self.avgdl = float(self.doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+
+        # Term rows in hash order; postings grouped by term, documents ascending
+        self.term_hashes, terms = np.unique(hashes, return_inverse=True)
+        order = np.lexsort((docs, terms))
+        terms = terms[order]
+        self.posting_docs = docs[order].astype(np.int32)
+        self.posting_tfs = tfs[order].astype(np.uint32)
+
+        doc_freq = np.bincount(terms, minlength=len(self.term_hashes))
+        self.indptr = np.zeros(len(self.term_hashes) + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=self.indptr[1:])
+
+        idf = self._idf(doc_freq)
+        if len(terms):
+            tf = self.posting_tfs.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[self.posting_docs] / self.avgdl)
+            self.impacts = idf[terms] * (tf * (self.k1 + 1) / (tf + norm))
+        else:
+            self.impacts = np.zeros(0, dtype=np.float64)
+
+        logger.debug(f"BM25 index: {self.corpus_size} docs, {len(self.term_hashes)} terms, "
+                     f"{len(self.posting_docs)} postings")
+
+    def posting_triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(term hash, doc, tf) for every posting (inverse of from_postings)"""
+        rows = np.repeat(np.arange(len(self.term_hashes)), np.diff(self.indptr))
+        return self.term_hashes[rows], np.asarray(self.posting_docs), np.asarray(self.posting_tfs)
+
+    def _idf(self, doc_freq: np.ndarray) -> np.ndarray:
+        """log((N - n + 0.5) / (n + 0.5)), negatives floored to epsilon x average idf"""
+        self.average_idf = 0.0
+        if not len(doc_freq):
+            return np.zeros(0, dtype=np.float64)
+
+        # math.log per term keeps results bit-identical to rank_bm25
+        n = self.corpus_size
+        idf = np.array(
+            [math.log(n - df + 0.5) - math.log(df + 0.5) for df in doc_freq.tolist()],
+            dtype=np.float64
+        )
+        self.average_idf = sum(idf.tolist()) / len(idf)
+        idf[idf < 0] = self.epsilon * self.average_idf
+        return idf
+
+    # ============================================
+    # SCORING
+    # ============================================
+
+    def _term_row(self, term: str) -> Optional[int]:
+        """CSR row of a term, None if it is not in the vocabulary"""
+        key = np.uint64(term_hash(term))
+        row = int(np.searchsorted(self.term_hashes, key))
+        if row < len(self.term_hashes) and self.term_hashes[row] == key:
+            return row
+        return None
+
+    def doc_freq(self, term: str) -> int:
+        """Number of documents containing a term"""
+        row = self._term_row(term)
+        return 0 if row is None else int(self.indptr[row + 1] - self.indptr[row])
+
+    def term_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(docs, raw term frequencies) of a term, None if it is not in the vocabulary"""
+        row = self._term_row(term)
+        if row is None:
+            return None
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.posting_docs[start:end], self.posting_tfs[start:end]
+
+    def _postings(self, query_tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated (doc_ids, impacts) of the query terms; repeated terms count again"""
+        slices = []
+        for term, count in Counter(query_tokens).items():
+            row = self._term_row(term)
+            if row is None:
+                continue
+            start, end = self.indptr[row], self.indptr[row + 1]
+            impacts = self.impacts[start:end]
+            slices.append((self.posting_docs[start:end], impacts * count if count > 1 else impacts))
+
+        if not slices:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+        if len(slices) == 1:
+            return slices[0]
+        return (np.concatenate([docs for docs, _ in slices]),
+                np.concatenate([impacts for _, impacts in slices]))
+
+    @staticmethod
+    def _top_k(docs: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Best top_k (doc, score), ties broken by document order"""
+        if len(scores) > top_k:
+            # Everything tied with the k-th score stays a candidate, so the
+            # sort below (not argpartition) decides which ties make the cut
+            threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            keep = scores >= threshold
+            docs, scores = docs[keep], scores[keep]
+        order = np.lexsort((docs, -scores))[:top_k]
+        return [(int(docs[i]), float(scores[i])) for i in order]
+
+    def top_k(
+        self,
+        query_tokens: Sequence[str],
+        top_k: int = 10,
+        exclude: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Best-scoring documents for a query
+
+        Only documents sharing at least one term with the query are returned.
+
+        Args:
+            query_tokens: Tokenized query
+            top_k: Number of results
+            exclude: Sorted document indexes to leave out (e.g. deleted chunks)
+
+        Returns:
+            (doc_index, score) tuples, best first
+        """
+        return self.top_k_batch([query_tokens], top_k, exclude)[0]
+
+    def top_k_batch(
+        self,
+        queries: Sequence[Sequence[str]],
+        top_k: int = 10,
+        exclude: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Score several queries (e.g. rewrites of one question) in one call
+
+        Returns:
+            One (doc_index, score) list per query
+        """
+        if top_k <= 0 or not self.corpus_size:
+            return [[] for _ in queries]
+        if exclude is not None and not len(exclude):
+            exclude = None
+        return [self._score_top_k(tokens, top_k, exclude) for tokens in queries]
+
+    def _score_top_k(self, query_tokens: Sequence[str], top_k: int,
+                     exclude: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        docs, impacts = self._postings(query_tokens)
+        if not len(docs):
+            return []
+
+        if len(docs) * SPARSE_ACCUMULATE_RATIO < self.corpus_size:
+            # Few postings: sort-based accumulation, never touches the full corpus
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=impacts)
+            if exclude is not None:
+                keep = ~np.isin(candidates, exclude, assume_unique=True)
+                candidates, scores = candidates[keep], scores[keep]
+        else:
+            # Stopword-heavy queries: a dense accumulator is cheaper than sorting
+            dense = np.bincount(docs, weights=impacts, minlength=self.corpus_size)
+            # Documents without any query term must not fill up the top-k
+            dense[np.bincount(docs, minlength=self.corpus_size) == 0] = -np.inf
+            if exclude is not None:
+                dense[exclude] = -np.inf
+            if self.corpus_size > top_k:
+                threshold = np.partition(dense, self.corpus_size - top_k)[self.corpus_size - top_k]
+                candidates = np.flatnonzero(dense >= threshold)  # Ties at the cut included
+            else:
+                candidates = np.arange(self.corpus_size)
+            candidates = candidates[dense[candidates] > -np.inf]
+            scores = dense[candidates]
+        return self._top_k(candidates, scores, top_k)
+
+    def get_scores(self, query_tokens: Sequence[str]) -> np.ndarray:
+        """Dense score vector over the whole corpus (rank_bm25-compatible)"""
+        scores = np.zeros(self.corpus_size, dtype=np.float64)
+        docs, impacts = self._postings(query_tokens)
+        if len(docs):
+            scores += np.bincount(docs, weights=impacts, minlength=self.corpus_size)
+        return scores
+
+    def __len__(self) -> int:
+        return self.corpus_size
+
+    # ============================================
+    # PERSISTENCE
+    # ============================================
+
+    def save(self, directory: str):
+        """Write the index as .npy arrays plus a small JSON header"""
+        os.makedirs(directory, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "bm25.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                'k1': self.k1,
+                'b': self.b,
+                'epsilon': self.epsilon,
+                'avgdl': self.avgdl,
+                'average_idf': self.average_idf,
+                'corpus_size': self.corpus_size,
+                'tokenizer': tokenizer_version()
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "BM25Index":
+        """
+        Load an index written by save()
+
+        Args:
+            directory: Directory passed to save()
+            mmap: Memory-map the arrays instead of reading them into memory
+        """
+        with open(os.path.join(directory, "bm25.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get('tokenizer') != tokenizer_version():
+            raise ValueError(f"BM25 index built with tokenizer {header.get('tokenizer')}, "
+                             f"expected {tokenizer_version()}")
+
+        index = cls(k1=header['k1'], b=header['b'], epsilon=header['epsilon'])
+        index.avgdl = header['avgdl']
+        index.average_idf = header.get('average_idf', 0.0)
+        index.corpus_size = header['corpus_size']
+        for name in INDEX_ARRAYS:
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"),
+                                         mmap_mode="r" if mmap else None))
+        return index
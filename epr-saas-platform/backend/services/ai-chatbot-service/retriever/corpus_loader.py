@@ -0,0 +1,393 @@
+"""
+Keyword Corpus Loader
+Streams the Weaviate collection with the cursor iterator to build the BM25
+corpus, and persists it as a memory-mapped snapshot keyed by corpus version
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from config import Config
+from retriever.bm25_index import BM25Index, tokenize, tokenizer_version
+from retriever.structured_index import StructuredIndex
+from systems.corpus_version import get_corpus_registry
+
+logger = logging.getLogger(__name__)
+
+try:
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+except ImportError:
+    metadata_dict_to_node = None
+
+try:
+    from weaviate.classes.query import Filter
+except ImportError:
+    Filter = None
+
+
+# Properties LlamaIndex stores next to node metadata in Weaviate
+NODE_INTERNAL_PROPERTIES = {"text", "_node_content", "_node_type", "doc_id", "ref_doc_id", "document_id"}
+
+
+# ============================================
+# LAZY DOCUMENT VIEWS
+# ============================================
+
+class BlobSequence(Sequence):
+    """
+    Read-only sequence of strings packed in one UTF-8 blob
+
+    Items are decoded on access, so a memory-mapped blob costs nothing until
+    a document is actually returned.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, decode=None):
+        """
+        Args:
+            blob: uint8 array with all items concatenated
+            offsets: int64 array of len(items) + 1 boundaries
+            decode: Optional function applied to each decoded string
+        """
+        self.blob = blob
+        self.offsets = offsets
+        self.decode = decode
+
+    @classmethod
+    def pack(cls, items: Sequence[str]):
+        """Build (blob, offsets) for a list of strings"""
+        encoded = [item.encode("utf-8") for item in items]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        value = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+        return self.decode(value) if self.decode else value
+
+
+class SnapshotDocuments(Sequence):
+    """Documents of a snapshot as {'id', 'text', 'metadata'} dicts"""
+
+    def __init__(self, doc_ids: BlobSequence, texts: BlobSequence, metadata: BlobSequence):
+        self.doc_ids = doc_ids
+        self.texts = texts
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return {'id': self.doc_ids[i], 'text': self.texts[i], 'metadata': self.metadata[i]}
+
+
+def save_columns(directory: str, columns: Dict[str, Sequence[str]]):
+    """Write string columns as packed blob + offsets arrays"""
+    for name, items in columns.items():
+        blob, offsets = BlobSequence.pack(items)
+        np.save(os.path.join(directory, f"{name}_blob.npy"), blob)
+        np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+def load_column(directory: str, name: str, decode=None) -> BlobSequence:
+    """Memory-map a column written by save_columns()"""
+    return BlobSequence(
+        np.load(os.path.join(directory, f"{name}_blob.npy"), mmap_mode="r"),
+        np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r"),
+        decode
+    )
+
+
+def document_columns(doc_ids: Sequence, texts: Sequence[str], doc_metadata: Sequence) -> Dict[str, List[str]]:
+    """ids / texts / JSON metadata columns of a set of chunks"""
+    return {
+        'ids': [str(doc_id) for doc_id in doc_ids],
+        'texts': list(texts),
+        'metadata': [json.dumps(meta, ensure_ascii=False, default=str) for meta in doc_metadata]
+    }
+
+
+class BM25Corpus:
+    """
+    A BM25 index together with the documents it was built from
+
+    Attributes:
+        bm25: BM25Index
+        documents: Sequence of {'id', 'text', 'metadata'} dicts
+        doc_ids: Sequence of node IDs (same order as documents)
+        doc_metadata: Sequence of metadata dicts
+        revision: Last corpus index event (CorpusRegistry revision) included
+    """
+
+    def __init__(self, bm25: BM25Index, documents: Sequence, doc_ids: Sequence, doc_metadata: Sequence,
+                 revision: int = 0):
+        self.bm25 = bm25
+        self.documents = documents
+        self.doc_ids = doc_ids
+        self.doc_metadata = doc_metadata
+        self.revision = revision
+        self._structured: Optional[StructuredIndex] = None
+
+    def structured_index(self) -> StructuredIndex:
+        """Exact-reference index over this corpus (built on first use)"""
+        if self._structured is None:
+            self._structured = StructuredIndex(self.doc_metadata)
+        return self._structured
+
+    @classmethod
+    def build(cls, documents: List[Dict]) -> "BM25Corpus":
+        """Tokenize and index a list of {'id', 'text', 'metadata'} dicts"""
+        bm25 = BM25Index([tokenize(doc['text']) for doc in documents])
+        return cls(
+            bm25,
+            documents,
+            [doc['id'] for doc in documents],
+            [doc['metadata'] for doc in documents]
+        )
+
+    def save(self, directory: str):
+        """Write index arrays plus packed ids / texts / metadata"""
+        self.bm25.save(directory)
+        save_columns(directory, document_columns(
+            self.doc_ids, [doc['text'] for doc in self.documents], self.doc_metadata
+        ))
+        with open(os.path.join(directory, "corpus.json"), "w") as f:
+            json.dump({"revision": self.revision}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Corpus":
+        """Memory-map a snapshot written by save()"""
+        bm25 = BM25Index.load(directory, mmap=True)
+        doc_ids = load_column(directory, 'ids')
+        doc_metadata = load_column(directory, 'metadata', json.loads)
+        texts = load_column(directory, 'texts')
+        revision = 0  # Snapshots without a header may predate any index event
+        header_path = os.path.join(directory, "corpus.json")
+        if os.path.exists(header_path):
+            with open(header_path) as f:
+                revision = json.load(f).get("revision", 0)
+        return cls(bm25, SnapshotDocuments(doc_ids, texts, doc_metadata), doc_ids, doc_metadata, revision)
+
+
+# ============================================
+# WEAVIATE STREAMING
+# ============================================
+
+class WeaviateCorpusLoader:
+    """
+    Pages through a Weaviate collection with the cursor iterator
+
+    The iterator walks the collection by UUID cursor in `page_size` batches
+    without vectors, so memory stays flat and no offset limit applies.
+    """
+
+    def __init__(self, client, collection_name: str = None, page_size: int = None):
+        """
+        Args:
+            client: Connected weaviate v4 client
+            collection_name: Collection to read (LlamaIndex index_name)
+            page_size: Objects fetched per round trip
+        """
+        self.client = client
+        self.collection_name = collection_name or Config.WEAVIATE_CLASS_NAME
+        self.page_size = page_size or Config.BM25_LOAD_PAGE_SIZE
+
+    @staticmethod
+    def _to_document(uuid, properties: Dict) -> Dict:
+        """Weaviate object -> {'id', 'text', 'metadata'} (node ID as LlamaIndex sees it)"""
+        properties = dict(properties or {})
+        text = properties.get("text") or ""
+
+        if metadata_dict_to_node is not None and properties.get("_node_content"):
+            try:
+                node = metadata_dict_to_node(properties)
+                return {'id': node.id_, 'text': text or node.get_content(), 'metadata': node.metadata}
+            except Exception:
+                pass
+
+        metadata = {k: v for k, v in properties.items() if k not in NODE_INTERNAL_PROPERTIES}
+        return {'id': str(uuid), 'text': text, 'metadata': metadata}
+
+    @staticmethod
+    def _vector(obj) -> Optional[List[float]]:
+        """Default vector of an object (the v4 client returns named vectors as a dict)"""
+        vector = obj.vector
+        if isinstance(vector, dict):
+            vector = vector.get("default") or next(iter(vector.values()), None)
+        return vector
+
+    def iter_documents(self) -> Iterator[Dict]:
+        """Yield every chunk of the collection"""
+        collection = self.client.collections.get(self.collection_name)
+        for obj in collection.iterator(include_vector=False, cache_size=self.page_size):
+            yield self._to_document(obj.uuid, obj.properties)
+
+    def iter_vectors(self) -> Iterator[Tuple[Dict, Optional[List[float]]]]:
+        """Yield (chunk, embedding) for every chunk of the collection"""
+        collection = self.client.collections.get(self.collection_name)
+        for obj in collection.iterator(include_vector=True, cache_size=self.page_size):
+            yield self._to_document(obj.uuid, obj.properties), self._vector(obj)
+
+    def iter_sources(self, dieus: Iterable = (), documents: Iterable = ()) -> Iterator[Dict]:
+        """
+        Yield the chunks of specific articles / documents
+        """
+        for obj in self._iter_source_objects(dieus, documents, include_vector=False):
+            yield self._to_document(obj.uuid, obj.properties)
+
+    def iter_source_vectors(self, dieus: Iterable = (), documents: Iterable = ()
+                            ) -> Iterator[Tuple[Dict, Optional[List[float]]]]:
+        """Yield (chunk, embedding) for specific articles / documents"""
+        for obj in self._iter_source_objects(dieus, documents, include_vector=True):
+            yield self._to_document(obj.uuid, obj.properties), self._vector(obj)
+
+    def _iter_source_objects(self, dieus: Iterable, documents: Iterable, include_vector: bool):
+        """
+        Objects of specific articles / documents
+
+        Cursor paging does not combine with filters in Weaviate, so filtered
+        reads page with offsets (fine for the few hundred chunks of a decree).
+        """
+        if Filter is None:
+            raise RuntimeError("weaviate client library not installed")
+
+        conditions = [Filter.by_property("dieu").equal(str(d)) for d in dieus or ()]
+        conditions += [Filter.by_property("document").equal(str(d)) for d in documents or ()]
+        if not conditions:
+            return
+
+        collection = self.client.collections.get(self.collection_name)
+        offset = 0
+        while True:
+            response = collection.query.fetch_objects(
+                filters=Filter.any_of(conditions),
+                limit=self.page_size,
+                offset=offset,
+                include_vector=include_vector
+            )
+            yield from response.objects
+            if len(response.objects) < self.page_size:
+                break
+            offset += self.page_size
+
+    def load_documents(self) -> List[Dict]:
+        """All chunks with non-empty text"""
+        start = time.time()
+        documents = [doc for doc in self.iter_documents() if doc['text']]
+        logger.info(f"Streamed {len(documents)} chunks from {self.collection_name} "
+                    f"in {time.time() - start:.1f}s")
+        return documents
+
+
+# ============================================
+# SNAPSHOTS
+# ============================================
+
+def snapshot_path(corpus_version: str, snapshot_dir: str = None) -> str:
+    """Snapshot directory for a corpus version and tokenizer"""
+    safe_version = re.sub(r"[^A-Za-z0-9._-]", "_", str(corpus_version))
+    return os.path.join(snapshot_dir or Config.BM25_SNAPSHOT_DIR,
+                        f"{Config.WEAVIATE_CLASS_NAME}-{safe_version}-{tokenizer_version()}")
+
+
+def write_snapshot(corpus, path: str, replace: bool = False, prefix: str = None):
+    """
+    Write a snapshot atomically (temp dir + rename) and drop older ones
+
+    If another worker published the same snapshot first, ours is discarded,
+    unless replace is set (a merged index superseding the one on disk).
+
+    Args:
+        corpus: Anything with save(directory) (BM25Corpus, LocalVectorIndex)
+        path: Snapshot directory
+        replace: Supersede an existing snapshot at path
+        prefix: Name prefix of the older snapshots to drop (default: BM25 ones)
+    """
+    parent = os.path.dirname(path) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".bm25-", dir=parent)
+    try:
+        corpus.save(tmp_dir)
+        if replace and os.path.isdir(path):
+            # Readers that still map the old files keep them until they close
+            os.rename(path, f"{path}.old-{time.time_ns()}")
+        os.rename(tmp_dir, path)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+        return
+
+    prefix = prefix or f"{Config.WEAVIATE_CLASS_NAME}-"
+    for name in os.listdir(parent):
+        old = os.path.join(parent, name)
+        if name.startswith(prefix) and old != path:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_bm25_corpus(
+    client,
+    corpus_version: str,
+    snapshot_dir: str = None,
+    use_snapshot: bool = None,
+    min_revision: int = 0
+) -> BM25Corpus:
+    """
+    BM25 corpus for the current corpus version
+
+    Memory-maps the snapshot if one exists for this version; otherwise
+    streams the collection from Weaviate, builds the index and writes the
+    snapshot for the next start. The corpus records the index event
+    revision it includes (see CorpusRegistry.start_index_tracking).
+
+    Args:
+        client: Connected weaviate v4 client
+        corpus_version: Corpus generation the snapshot must match
+        snapshot_dir: Where snapshots live
+        use_snapshot: Read / write snapshots (defaults to Config.ENABLE_BM25_SNAPSHOT)
+        min_revision: Rebuild instead of loading a snapshot older than this
+    """
+    use_snapshot = Config.ENABLE_BM25_SNAPSHOT if use_snapshot is None else use_snapshot
+    path = snapshot_path(corpus_version, snapshot_dir)
+
+    if use_snapshot and os.path.isdir(path):
+        try:
+            start = time.perf_counter()
+            corpus = BM25Corpus.load(path)
+            if corpus.revision >= min_revision:
+                logger.info(f"BM25 snapshot loaded ({len(corpus.documents)} chunks, revision "
+                            f"{corpus.revision}, {(time.perf_counter() - start) * 1000:.1f} ms): {path}")
+                return corpus
+            logger.info(f"BM25 snapshot at revision {corpus.revision} is older than {min_revision}, rebuilding")
+        except Exception as e:
+            logger.warning(f"BM25 snapshot unreadable, rebuilding: {e}")
+
+    revision = get_corpus_registry().current_revision()
+    documents = WeaviateCorpusLoader(client).load_documents()
+    start = time.time()
+    corpus = BM25Corpus.build(documents)
+    corpus.revision = revision
+    logger.info(f"BM25 index built over {len(documents)} chunks in {time.time() - start:.1f}s")
+
+    if use_snapshot:
+        try:
+            write_snapshot(corpus, path, replace=min_revision > 0)
+            logger.info(f"BM25 snapshot written: {path}")
+        except Exception as e:
+            logger.warning(f"Could not write BM25 snapshot: {e}")
+
+    return corpus
@@ -0,0 +1,101 @@
+"""
+Hierarchical Merger
+Search runs over small child chunks; when several siblings of one article
+are hit, they are replaced by their parent so generation sees whole sections
+"""
+import logging
+from typing import Dict, List, Optional
+from llama_index.core.schema import NodeWithScore
+from config import Config
+from retriever.structured_index import parent_key
+
+logger = logging.getLogger(__name__)
+
+
+class HierarchicalMerger:
+    """
+    Merges retrieved sibling chunks into their parent (auto-merging)
+
+    Children are grouped by parent_key(): an explicit parent_id, otherwise
+    the article (document, dieu). Parents with enough hits are fetched in one
+    batch and take the place of their best-ranked child with its score; the
+    other siblings are dropped. Parents over the size budget stay split.
+    """
+
+    def __init__(
+        self,
+        hybrid_retriever,
+        min_siblings: Optional[int] = None,
+        max_parent_words: Optional[int] = None
+    ):
+        """
+        Args:
+            hybrid_retriever: HybridRetriever whose keyword index holds the chunks
+            min_siblings: Sibling hits needed to merge (defaults to Config.HIERARCHICAL_MIN_SIBLINGS)
+            max_parent_words: Largest parent sent whole (defaults to Config.HIERARCHICAL_MAX_PARENT_WORDS)
+        """
+        self.hybrid_retriever = hybrid_retriever
+        self.min_siblings = min_siblings or Config.HIERARCHICAL_MIN_SIBLINGS
+        self.max_parent_words = max_parent_words or Config.HIERARCHICAL_MAX_PARENT_WORDS
+
+        self.merged_parents = 0
+        self.merged_children = 0
+        self.oversized_parents = 0
+
+    def merge(self, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        """
+        Replace sibling groups by their parent, keeping rank order
+
+        Args:
+            nodes: Retrieved chunks, best first
+
+        Returns:
+            Parents and unmerged chunks, best first
+        """
+        keys = [parent_key(node.node.metadata) for node in nodes]
+        counts: Dict[tuple, int] = {}
+        for key in keys:
+            if key is not None:
+                counts[key] = counts.get(key, 0) + 1
+
+        candidates = [key for key, count in counts.items() if count >= self.min_siblings]
+        if not candidates:
+            return nodes
+
+        try:
+            parents = self.hybrid_retriever.fetch_parents(candidates)
+        except Exception as e:
+            logger.warning(f"Parent fetch failed, keeping child chunks: {e}")
+            return nodes
+
+        for key in list(parents):
+            if len(parents[key].text.split()) > self.max_parent_words:
+                self.oversized_parents += 1
+                del parents[key]
+        if not parents:
+            return nodes
+
+        merged = []
+        emitted = set()
+        for node, key in zip(nodes, keys):
+            if key not in parents:
+                merged.append(node)
+                continue
+            self.merged_children += 1
+            if key not in emitted:
+                # The parent takes its best child's place
+                emitted.add(key)
+                merged.append(NodeWithScore(node=parents[key], score=node.score))
+
+        self.merged_parents += len(emitted)
+        logger.debug(f"Merged {len(nodes) - len(merged) + len(emitted)} chunks "
+                     f"into {len(emitted)} parents")
+        return merged
+
+    def get_stats(self) -> Dict[str, int]:
+        """Merge counters"""
+        return {
+            'merged_parents': self.merged_parents,
+            'merged_children': self.merged_children,
+            'oversized_parents': self.oversized_parents,
+        }
@@ -3,15 +3,47 @@ Hybrid Retriever combining Vector Search (semantic) and BM25 (keyword)
 Uses Reciprocal Rank Fusion (RRF) to merge results
 """
 import logging
-from typing import List, Dict, Optional
-from rank_bm25 import BM25Okapi
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Dict, Optional, Sequence
 from llama_index.core import QueryBundle
 from llama_index.core.schema import NodeWithScore, TextNode
 from config import Config
+from retriever.bm25_index import tokenize
+from retriever.corpus_loader import BM25Corpus, WeaviateCorpusLoader, load_bm25_corpus, snapshot_path
+from retriever.segmented_index import SegmentedBM25Index, IndexSnapshot
+from retriever.structured_index import parse_reference
+from systems.corpus_version import invalidation_tags
+from systems.near_duplicates import MINHASH_METADATA_KEY
+from systems.rank_fusion import RankedList, fuse_rankings
 
 logger = logging.getLogger(__name__)
 
 
+class _LegTask:
+    """
+    A retrieval leg submitted to the shared pool
+
+    Records when a worker actually picks it up, so the leg's timeout
+    measures its own run time rather than time spent queued behind the
+    legs of other requests.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, fn, *args):
+        self.started_at: Optional[float] = None
+        self._started = threading.Event()
+        self.future = executor.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        self.started_at = time.monotonic()
+        self._started.set()
+        return fn(*args)
+
+    def wait_started(self, timeout: Optional[float]) -> bool:
+        return self._started.wait(timeout)
+
+
 class HybridRetriever:
     """
     Combines vector search (semantic) with BM25 (keyword) search
@@ -24,7 +56,11 @@ class HybridRetriever:
         documents: List[Dict],
         vector_weight: float = 0.7,
         bm25_weight: float = 0.3,
-        top_k: int = 10
+        top_k: int = 10,
+        retrieval_cache=None,
+        corpus: Optional[BM25Corpus] = None,
+        weaviate_client=None,
+        corpus_version: Optional[str] = None
     ):
         """
         Args:
@@ -33,81 +69,246 @@ class HybridRetriever:
             vector_weight: Weight for vector search results (0-1)
             bm25_weight: Weight for BM25 results (0-1)
             top_k: Number of results to return
+            retrieval_cache: Optional RetrievalCache for ranked results
+            corpus: Prebuilt BM25 corpus (e.g. a snapshot); replaces documents
+            weaviate_client: Client for refreshing chunks from Weaviate
+            corpus_version: Corpus generation of `corpus` (keys its snapshot)
         """
         self.vector_retriever = vector_retriever
         self.vector_weight = vector_weight
         self.bm25_weight = bm25_weight
         self.top_k = top_k
-
-        # Build BM25 index
-        self._build_bm25_index(documents)
+        self.retrieval_cache = retrieval_cache
+        self.weaviate_client = weaviate_client
+
+        # Build BM25 index (or adopt a prebuilt one) as the base segment
+        if corpus is None:
+            corpus = self._build_bm25_index(documents)
+        self.index = SegmentedBM25Index(corpus, snapshot_path=self._snapshot_path(corpus_version))
+
+        # Vector and BM25 legs run side by side (latency = slower leg, not the sum)
+        self._leg_executor = ThreadPoolExecutor(
+            max_workers=Config.HYBRID_LEG_WORKERS,
+            thread_name_prefix="hybrid-leg"
+        )
+        self.leg_timeouts = {'vector': Config.HYBRID_VECTOR_TIMEOUT_MS / 1000,
+                             'bm25': Config.HYBRID_BM25_TIMEOUT_MS / 1000}
+        self.leg_queue_timeout = Config.HYBRID_LEG_QUEUE_TIMEOUT_MS / 1000
+        self.vector_fanout = max(1, Config.HYBRID_VECTOR_FANOUT)
+        self.leg_failures = {'vector': 0, 'bm25': 0}
 
         logger.info(f"HybridRetriever initialized with {len(self.documents)} documents")
         logger.info(f"Weights: Vector={vector_weight}, BM25={bm25_weight}")
 
-    def _build_bm25_index(self, documents: List[Dict]):
+    def _snapshot_path(self, corpus_version: Optional[str]) -> Optional[str]:
+        """Where merged indexes are persisted (Weaviate-backed corpora only)"""
+        if self.weaviate_client is None or not corpus_version or not Config.ENABLE_BM25_SNAPSHOT:
+            return None
+        return snapshot_path(corpus_version)
+
+    @staticmethod
+    def _to_document(doc) -> Dict:
+        """
+        Normalize a node / NodeWithScore / dict to {'id', 'text', 'metadata'}
+        """
+        if hasattr(doc, 'node'):
+            return {'id': doc.node.id_, 'text': doc.node.text, 'metadata': doc.node.metadata}
+        if hasattr(doc, 'get_content'):
+            return {'id': doc.id_, 'text': doc.get_content(), 'metadata': doc.metadata}
+        return {'id': doc.get('id', ''), 'text': doc.get('text', ''), 'metadata': doc.get('metadata', {})}
+
+    def _build_bm25_index(self, documents: List[Dict]) -> BM25Corpus:
         """
         Build BM25 index from documents
         """
-        self.documents = documents
-        self.doc_ids = []
-        self.doc_metadata = []
+        corpus = BM25Corpus.build([self._to_document(doc) for doc in documents])
+        logger.info(f"BM25 index built with {len(corpus.documents)} documents")
+        return corpus
 
-        # Tokenize documents for BM25
-        tokenized_corpus = []
-        for doc in documents:
-            # Get text content
-            text = doc.get('text', '')
-            if hasattr(doc, 'node'):
-                text = doc.node.text
-            elif hasattr(doc, 'get_content'):
-                text = doc.get_content()
+    # Current keyword index snapshot (retrieve() pins one for the whole request)
+    @property
+    def documents(self):
+        return self.index.snapshot.documents
 
-            # Simple tokenization (split by whitespace)
-            tokens = text.lower().split()
-            tokenized_corpus.append(tokens)
+    @property
+    def doc_ids(self):
+        return self.index.snapshot.doc_ids
+
+    @property
+    def doc_metadata(self):
+        return self.index.snapshot.doc_metadata
+
+    @staticmethod
+    def _node_at(snapshot: IndexSnapshot, doc_idx: int) -> TextNode:
+        """TextNode for a keyword index position"""
+        return TextNode(
+            text=snapshot.documents[doc_idx].get('text', ''),
+            id_=snapshot.doc_ids[doc_idx],
+            metadata=snapshot.doc_metadata[doc_idx]
+        )
 
-            # Store metadata
-            if hasattr(doc, 'node'):
-                self.doc_ids.append(doc.node.id_)
-                self.doc_metadata.append(doc.node.metadata)
-            else:
-                self.doc_ids.append(doc.get('id', ''))
-                self.doc_metadata.append(doc.get('metadata', {}))
+    def lookup_reference(self, query: str, limit: Optional[int] = None,
+                         document: Optional[str] = None) -> List[NodeWithScore]:
+        """
+        Chunks of the articles / chapters a question cites exactly
+        ("Điều 15", "Chương III Nghị định 08/2022"), without any search
 
-        # Build BM25 index
-        self.bm25 = BM25Okapi(tokenized_corpus)
+        A reference naming no document is resolved in `document` (the
+        conversation's current one) if given and it has a match; when it
+        still matches several documents (Điều 15 of every law) it is
+        ambiguous and nothing is returned, so the question goes through
+        search and reranking instead.
 
-        logger.info(f"BM25 index built with {len(tokenized_corpus)} documents")
+        Args:
+            query: Query string
+            limit: Maximum chunks (defaults to Config.STRUCTURED_LOOKUP_MAX_CHUNKS)
+            document: Document to resolve unqualified references in
 
-    def _bm25_retrieve(self, query: str, top_k: int = 10) -> List[tuple]:
+        Returns:
+            Matching chunks in citation order (empty if nothing is cited)
+        """
+        reference = parse_reference(query)
+        if reference is None:
+            return []
+
+        snapshot = self.index.snapshot
+        positions = []
+        if document and not reference.document_numbers:
+            positions = snapshot.lookup_reference(reference, document)
+        if not positions:
+            positions = snapshot.lookup_reference(reference)
+            if not reference.document_numbers:
+                documents = {(snapshot.doc_metadata[i] or {}).get('document') for i in positions}
+                if len(documents) > 1:
+                    logger.info(f"Structured lookup {reference} matches {len(documents)} documents, "
+                                f"leaving it to search")
+                    return []
+
+        limit = limit or Config.STRUCTURED_LOOKUP_MAX_CHUNKS
+        logger.debug(f"Structured lookup {reference}: {len(positions)} chunks")
+        return [NodeWithScore(node=self._node_at(snapshot, i), score=1.0) for i in positions[:limit]]
+
+    def fetch_parents(self, keys: Sequence[tuple]) -> Dict[tuple, TextNode]:
+        """
+        Parent nodes for parent_key()s, each assembled from all of its child
+        chunks in index order, in one pass over a single pinned snapshot
+
+        Args:
+            keys: Parent keys (("parent", id) or ("dieu", document, dieu))
+
+        Returns:
+            Parent node per key found; missing keys are left out
+        """
+        snapshot = self.index.snapshot
+        parents = {}
+        for key in dict.fromkeys(keys):
+            positions = snapshot.lookup_key(key)
+            if not positions:
+                continue
+            # Article-wide metadata comes from the first child (not its signature)
+            metadata = dict(snapshot.doc_metadata[positions[0]] or {})
+            metadata.pop(MINHASH_METADATA_KEY, None)
+            metadata['child_count'] = len(positions)
+            parents[key] = TextNode(
+                text="\n".join(snapshot.documents[i].get('text', '') for i in positions),
+                id_=key[1] if key[0] == "parent" else f"{key[1] or ''}#dieu-{key[2]}",
+                metadata=metadata
+            )
+        return parents
+
+    def _bm25_retrieve(self, query: str, top_k: int = 10,
+                       snapshot: Optional[IndexSnapshot] = None) -> List[tuple]:
         """
         Retrieve using BM25 keyword search
         Returns list of (doc_index, score) tuples
         """
+        snapshot = snapshot or self.index.snapshot
+
         # Tokenize query
-        query_tokens = query.lower().split()
+        query_tokens = tokenize(query)
 
-        # Get BM25 scores
-        scores = self.bm25.get_scores(query_tokens)
+        # Score only documents sharing a term with the query
+        results = snapshot.top_k(query_tokens, top_k=top_k)
 
-        # Get top k results
-        top_indices = sorted(
-            range(len(scores)),
-            key=lambda i: scores[i],
-            reverse=True
-        )[:top_k]
+        logger.debug(f"BM25 retrieved {len(results)} results")
+        return results
 
-        results = [(idx, scores[idx]) for idx in top_indices]
+    def _bm25_retrieve_batch(self, queries: List[str], top_k: int = 10,
+                             snapshot: Optional[IndexSnapshot] = None) -> List[List[tuple]]:
+        """
+        BM25 for several queries in one pass over the same snapshot
+        Returns one list of (doc_index, score) tuples per query
+        """
+        snapshot = snapshot or self.index.snapshot
+        return snapshot.top_k_batch([tokenize(query) for query in queries], top_k=top_k)
 
-        logger.debug(f"BM25 retrieved {len(results)} results")
+    def _embed_queries(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """
+        Query embeddings for all variants in a single embeddings request
+        (None entries let the vector retriever embed on its own)
+        """
+        embed_model = getattr(self.vector_retriever, '_embed_model', None)
+        if embed_model is None:
+            return [None] * len(queries)
+        if hasattr(embed_model, 'get_query_embeddings'):
+            return embed_model.get_query_embeddings(queries)
+        # text-embedding-3 uses the same engine for queries and documents
+        return embed_model.get_text_embedding_batch(queries)
+
+    def _vector_search_chunk(self, bundles: List[QueryBundle]) -> List[Optional[List[NodeWithScore]]]:
+        """
+        Vector searches for a share of the query variants, one after another
+
+        Stops searching once the leg timeout has passed (the caller has
+        already given up); a failed search leaves None for its query.
+        """
+        deadline = time.monotonic() + self.leg_timeouts['vector']
+        results = []
+        for bundle in bundles:
+            if time.monotonic() >= deadline:
+                results.append(None)
+                continue
+            try:
+                results.append(self.vector_retriever.retrieve(bundle))
+            except Exception as e:
+                self.leg_failures['vector'] += 1
+                logger.warning(f"Hybrid vector search failed, fusing without it: {e}")
+                results.append(None)
+        return results
+
+    def _vector_retrieve_batch(self, queries: List[str]) -> List[Optional[List[NodeWithScore]]]:
+        """
+        Vector leg for several queries: one embeddings call, then the
+        searches split over at most HYBRID_VECTOR_FANOUT pool tasks
+        (None for a failed / late search)
+        """
+        embeddings = self._collect_leg(
+            "vector", _LegTask(self._leg_executor, self._embed_queries, queries)
+        )
+        if embeddings is None:
+            return [None] * len(queries)
+
+        bundles = [QueryBundle(query_str=query, embedding=embedding)
+                   for query, embedding in zip(queries, embeddings)]
+        fanout = min(self.vector_fanout, len(bundles))
+        tasks = [
+            _LegTask(self._leg_executor, self._vector_search_chunk, bundles[i::fanout])
+            for i in range(fanout)
+        ]
+
+        results: List[Optional[List[NodeWithScore]]] = [None] * len(queries)
+        for i, task in enumerate(tasks):
+            chunk = self._collect_leg("vector", task)
+            if chunk is not None:
+                results[i::fanout] = chunk
         return results
 
     def _reciprocal_rank_fusion(
         self,
         vector_results: List[NodeWithScore],
         bm25_results: List[tuple],
-        k: int = 60
+        k: int = 60,
+        snapshot: Optional[IndexSnapshot] = None
     ) -> List[NodeWithScore]:
         """
         Merge results using Reciprocal Rank Fusion (RRF)
@@ -118,59 +319,37 @@ class HybridRetriever:
             vector_results: Results from vector search
             bm25_results: Results from BM25 search (doc_index, score)
             k: Constant for RRF (typically 60)
+            snapshot: Keyword index snapshot the BM25 results came from
 
         Returns:
             Merged and reranked results
         """
-        # Build score dict
-        rrf_scores = {}
-
-        # Add vector search scores
-        for rank, node_with_score in enumerate(vector_results, 1):
-            doc_id = node_with_score.node.id_
-            rrf_scores[doc_id] = rrf_scores.get(doc_id, 0) + \
-                                 self.vector_weight * (1 / (k + rank))
-
-        # Add BM25 scores
-        for rank, (doc_idx, bm25_score) in enumerate(bm25_results, 1):
-            doc_id = self.doc_ids[doc_idx]
-            rrf_scores[doc_id] = rrf_scores.get(doc_id, 0) + \
-                                 self.bm25_weight * (1 / (k + rank))
+        snapshot = snapshot or self.index.snapshot
+
+        # Two-list special case of the N-way weighted fusion
+        fused = fuse_rankings(
+            [
+                RankedList([(n.node.id_, n.score) for n in vector_results], self.vector_weight),
+                RankedList([(snapshot.doc_ids[i], score) for i, score in bm25_results], self.bm25_weight)
+            ],
+            method="rrf",
+            k=k,
+            limit=self.top_k
+        )
 
-        # Create merged results
+        # Keep vector nodes as returned; build nodes for BM25-only hits
+        vector_nodes = {n.node.id_: n.node for n in vector_results}
+        bm25_positions = {snapshot.doc_ids[i]: i for i, _ in bm25_results}
         merged_results = []
-
-        # Use vector results as base and update scores
-        for node_with_score in vector_results:
-            doc_id = node_with_score.node.id_
-            if doc_id in rrf_scores:
-                # Update score with RRF score
-                node_with_score.score = rrf_scores[doc_id]
-                merged_results.append(node_with_score)
-                del rrf_scores[doc_id]
-
-        # Add BM25-only results (not in vector results)
-        for rank, (doc_idx, bm25_score) in enumerate(bm25_results):
-            doc_id = self.doc_ids[doc_idx]
-            if doc_id in rrf_scores:
-                # Create NodeWithScore from BM25 result
-                node = TextNode(
-                    text=self.documents[doc_idx].get('text', ''),
-                    id_=doc_id,
-                    metadata=self.doc_metadata[doc_idx]
-                )
-                node_with_score = NodeWithScore(
-                    node=node,
-                    score=rrf_scores[doc_id]
-                )
-                merged_results.append(node_with_score)
-
-        # Sort by RRF score
-        merged_results.sort(key=lambda x: x.score, reverse=True)
+        for doc_id, rrf_score in fused:
+            node = vector_nodes.get(doc_id)
+            if node is None:
+                node = self._node_at(snapshot, bm25_positions[doc_id])
+            merged_results.append(NodeWithScore(node=node, score=rrf_score))
 
         logger.debug(f"RRF merged {len(merged_results)} unique documents")
 
-        return merged_results[:self.top_k]
+        return merged_results
 
     def retrieve(self, query: str) -> List[NodeWithScore]:
         """
@@ -182,35 +361,177 @@ class HybridRetriever:
         Returns:
             List of NodeWithScore objects
         """
-        logger.info(f"Hybrid retrieval for query: {query[:50]}...")
+        return self.retrieve_batch([query])[0]
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[NodeWithScore]]:
+        """
+        Hybrid search for several query variants (original + rewrites)
 
-        # 1. Vector search
-        query_bundle = QueryBundle(query_str=query)
-        vector_results = self.vector_retriever.retrieve(query_bundle)
-        logger.debug(f"Vector search returned {len(vector_results)} results")
+        All variants are embedded in one request, their vector searches run
+        on up to HYBRID_VECTOR_FANOUT workers and BM25 scores them in one
+        pass, so multi-query costs a few round trips instead of one per variant.
 
-        # 2. BM25 search
-        bm25_results = self._bm25_retrieve(query, top_k=self.top_k * 2)
-        logger.debug(f"BM25 search returned {len(bm25_results)} results")
+        Args:
+            queries: Query strings
 
-        # 3. Merge with RRF
-        merged_results = self._reciprocal_rank_fusion(
-            vector_results,
-            bm25_results
+        Returns:
+            One list of NodeWithScore objects per query (as retrieve() would give)
+        """
+        for query in queries:
+            logger.info(f"Hybrid retrieval for query: {query[:50]}...")
+        results: List[Optional[List[NodeWithScore]]] = [None] * len(queries)
+
+        # 0. Cached rankings for these queries/strategy/corpus
+        cache_keys = [None] * len(queries)
+        if self.retrieval_cache:
+            for i, query in enumerate(queries):
+                cache_keys[i] = self.retrieval_cache.make_key(
+                    query, "hybrid", self.top_k,
+                    extra=f"{self.vector_weight}:{self.bm25_weight}"
+                )
+                results[i] = self.retrieval_cache.get_nodes(cache_keys[i])
+                if results[i] is not None:
+                    logger.info(f"Hybrid retrieval cache hit ({len(results[i])} results)")
+
+        pending = [i for i, nodes in enumerate(results) if nodes is None]
+        if not pending:
+            return results
+        pending_queries = [queries[i] for i in pending]
+
+        # 1-2. Vector and BM25 search, concurrently
+        snapshot = self.index.snapshot
+        bm25_task = _LegTask(
+            self._leg_executor, self._bm25_retrieve_batch, pending_queries, self.top_k * 2, snapshot
         )
+        vector_batches = self._vector_retrieve_batch(pending_queries)
+        bm25_batches = self._collect_leg("bm25", bm25_task) or [None] * len(pending)
 
-        logger.info(f"Hybrid retrieval returned {len(merged_results)} results")
+        for i, vector_results, bm25_results in zip(pending, vector_batches, bm25_batches):
+            if vector_results is None and bm25_results is None:
+                raise RuntimeError("Hybrid retrieval failed: neither vector nor BM25 search returned")
 
-        return merged_results
+            # 3. Merge with RRF (a late or failed leg contributes nothing)
+            results[i] = self._reciprocal_rank_fusion(
+                vector_results or [],
+                bm25_results or [],
+                snapshot=snapshot
+            )
+            logger.info(f"Hybrid retrieval returned {len(results[i])} results")
+
+            # Degraded rankings are not cached
+            if cache_keys[i] and vector_results is not None and bm25_results is not None:
+                self.retrieval_cache.set_nodes(cache_keys[i], results[i])
+
+        return results
+
+    def _collect_leg(self, leg: str, task: _LegTask) -> Optional[list]:
+        """
+        Result of one retrieval leg, or None if it failed or missed its timeout
+
+        The leg timeout runs from when a worker started the leg. A leg still
+        queued after HYBRID_LEG_QUEUE_TIMEOUT_MS is cancelled; one already
+        running cannot be interrupted, its late result is discarded.
+
+        Args:
+            leg: 'vector' or 'bm25'
+            task: Submitted leg
+        """
+        if not task.wait_started(self.leg_queue_timeout):
+            if task.future.cancel():
+                self.leg_failures[leg] += 1
+                logger.warning(f"Hybrid {leg} search waited {self.leg_queue_timeout * 1000:.0f} ms "
+                               f"for a free worker, fusing without it")
+                return None
+            task.wait_started(None)  # Picked up just now
+
+        remaining = max(0.0, task.started_at + self.leg_timeouts[leg] - time.monotonic())
+        try:
+            results = task.future.result(timeout=remaining)
+        except FutureTimeout:
+            self.leg_failures[leg] += 1
+            logger.warning(f"Hybrid {leg} search exceeded {self.leg_timeouts[leg] * 1000:.0f} ms, "
+                           f"fusing without it")
+            return None
+        except Exception as e:
+            self.leg_failures[leg] += 1
+            logger.warning(f"Hybrid {leg} search failed, fusing without it: {e}")
+            return None
+
+        logger.debug(f"{leg} search returned {len(results)} results "
+                     f"in {(time.monotonic() - task.started_at) * 1000:.0f} ms")
+        return results
 
     def update_documents(self, documents: List[Dict]):
         """
         Update BM25 index with new documents
+
+        Replaces the whole corpus; the new index is built aside and swapped in.
         """
         logger.info("Updating BM25 index...")
-        self._build_bm25_index(documents)
+        self.index.reset(self._build_bm25_index(documents))
         logger.info("BM25 index updated")
 
+    def upsert_documents(self, documents: List[Dict]):
+        """
+        Add or replace chunks (by node ID) through a delta segment
+        """
+        self.index.upsert([self._to_document(doc) for doc in documents])
+
+    def delete_documents(self, node_ids: List[str]):
+        """
+        Remove chunks by node ID
+        """
+        self.index.delete(node_ids)
+
+    def refresh_sources(self, dieus: list = None, documents: list = None, revision: int = 0) -> int:
+        """
+        Re-read the chunks of changed articles / documents from Weaviate and
+        replace them in the keyword index (as of index event `revision`)
+
+        Returns:
+            Number of chunks now indexed for those sources
+        """
+        if self.weaviate_client is None:
+            return 0
+        chunks = [
+            doc for doc in WeaviateCorpusLoader(self.weaviate_client).iter_sources(dieus, documents)
+            if doc['text']
+        ]
+        self.index.replace_sources(invalidation_tags(dieus, documents), chunks, revision)
+        logger.info(f"BM25 refreshed {len(chunks)} chunks for dieu={dieus or []} document={documents or []}")
+        return len(chunks)
+
+    def reload_corpus(self, corpus_version: str, min_revision: int = 0) -> Optional[threading.Thread]:
+        """
+        Rebuild the keyword index from Weaviate in the background (full
+        re-ingest); queries keep using the current snapshot until the swap
+
+        Args:
+            corpus_version: Corpus generation to load
+            min_revision: Rebuild instead of loading a snapshot older than this
+        """
+        if self.weaviate_client is None:
+            return None
+
+        def _job():
+            try:
+                corpus = load_bm25_corpus(self.weaviate_client, corpus_version, min_revision=min_revision)
+                self.index.reset(corpus, self._snapshot_path(corpus_version))
+                logger.info(f"BM25 corpus reloaded for generation {corpus_version}")
+            except Exception as e:
+                logger.error(f"BM25 corpus reload failed: {e}")
+
+        thread = threading.Thread(target=_job, name="bm25-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def get_index_stats(self) -> Dict[str, int]:
+        """Keyword index segment statistics, plus legs dropped from fusion"""
+        stats = self.index.get_stats()
+        stats['vector_leg_failures'] = self.leg_failures['vector']
+        stats['bm25_leg_failures'] = self.leg_failures['bm25']
+        return stats
+
 
 class HybridRetrieverFactory:
     """
@@ -223,7 +544,10 @@ class HybridRetrieverFactory:
         index,
         vector_weight: Optional[float] = None,
         bm25_weight: Optional[float] = None,
-        top_k: Optional[int] = None
+        top_k: Optional[int] = None,
+        retrieval_cache=None,
+        weaviate_client=None,
+        corpus_version: Optional[str] = None
     ) -> HybridRetriever:
         """
         Create HybridRetriever from vector index
@@ -234,6 +558,10 @@ class HybridRetrieverFactory:
             vector_weight: Weight for vector search
             bm25_weight: Weight for BM25 search
             top_k: Number of results
+            retrieval_cache: Optional RetrievalCache
+            weaviate_client: Client used to stream the corpus when the
+                index has no local docstore (Weaviate-backed indexes)
+            corpus_version: Corpus generation keying the BM25 snapshot
 
         Returns:
             HybridRetriever instance
@@ -258,11 +586,23 @@ class HybridRetrieverFactory:
             # Fallback: use empty list (BM25 disabled)
             documents = []
 
+        # Vector-store-backed indexes keep their nodes in Weaviate only
+        corpus = None
+        if not documents and weaviate_client is not None:
+            try:
+                corpus = load_bm25_corpus(weaviate_client, corpus_version or Config.CORPUS_VERSION)
+            except Exception as e:
+                logger.error(f"Failed to load BM25 corpus from Weaviate: {e}")
+
         # Create hybrid retriever
         return HybridRetriever(
             vector_retriever=vector_retriever,
             documents=documents,
             vector_weight=vector_weight,
             bm25_weight=bm25_weight,
-            top_k=top_k
+            top_k=top_k,
+            retrieval_cache=retrieval_cache,
+            corpus=corpus,
+            weaviate_client=weaviate_client if corpus is not None else None,
+            corpus_version=corpus_version or Config.CORPUS_VERSION
         )
@@ -0,0 +1,518 @@
+"""
+Local Vector Store
+In-process semantic search over a memory-mapped copy of the Weaviate
+embeddings (flat exact search, int8 / binary quantized candidates with
+full-precision rescoring, or HNSW); Weaviate stays the system of record
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+from config import Config
+from retriever.corpus_loader import (
+    WeaviateCorpusLoader, document_columns, load_column, save_columns, write_snapshot
+)
+from systems.corpus_version import get_corpus_registry, invalidation_tags, source_tags
+
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+VECTOR_BACKENDS = ("weaviate", "flat", "hnsw")
+QUANTIZATIONS = ("none", "int8", "binary")
+VECTOR_SNAPSHOT_PREFIX = "vectors-"
+
+# Rows converted to float32 at a time when scoring int8 codes (cache-sized)
+SCORE_BLOCK_ROWS = 128
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[values]
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorIndex:
+    """
+    Embedding matrix plus the chunks it belongs to
+
+    Vectors are stored L2-normalized as float32 and memory-mapped when
+    loaded, so every worker shares the page cache instead of a private copy.
+    With backend "hnsw" (requires hnswlib) an HNSW graph is built next to
+    the matrix; otherwise search is an exact matrix-vector product.
+
+    With int8 or binary quantization, the flat scan runs over compact codes
+    (4x / 32x smaller than float32) to pick candidates, and only those rows
+    of the float32 matrix are read to rescore them exactly.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        doc_ids: Sequence,
+        texts: Sequence[str],
+        doc_metadata: Sequence,
+        backend: str = "flat",
+        hnsw=None,
+        quantization: str = "none",
+        codes: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        recall: Optional[Dict] = None,
+        revision: int = 0
+    ):
+        """
+        Args:
+            vectors: (n, dim) float32, rows L2-normalized
+            doc_ids: Node ID per row
+            texts: Chunk text per row
+            doc_metadata: Metadata dict per row
+            backend: "flat" or "hnsw"
+            hnsw: Prebuilt hnswlib.Index (backend "hnsw")
+            quantization: "none", "int8" or "binary" candidate codes (flat only)
+            codes: Prebuilt codes for the quantization
+            scales: Per-dimension int8 scales
+            recall: Recall report of the quantized search (see recall_report)
+            revision: Last corpus index event (CorpusRegistry revision) included
+        """
+        self.vectors = vectors
+        self.doc_ids = doc_ids
+        self.texts = texts
+        self.doc_metadata = doc_metadata
+        self.backend = backend
+        self.hnsw = hnsw
+        self.quantization = quantization
+        self.codes = codes
+        self.scales = scales
+        self.recall = recall
+        self.revision = revision
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[Dict, Optional[List[float]]]],
+              backend: str = "flat", quantization: str = "none") -> "LocalVectorIndex":
+        """
+        Index (chunk, embedding) pairs; chunks without text or vector are skipped
+        """
+        documents, vectors = [], []
+        for document, vector in records:
+            if document['text'] and vector is not None:
+                documents.append(document)
+                vectors.append(vector)
+
+        if vectors:
+            matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        index = cls(
+            matrix,
+            [doc['id'] for doc in documents],
+            [doc['text'] for doc in documents],
+            [doc['metadata'] for doc in documents],
+            backend=backend,
+            quantization=quantization
+        )
+        index._build_hnsw()
+        index._quantize()
+        return index
+
+    def _build_hnsw(self):
+        if self.backend != "hnsw" or not len(self):
+            return
+        if hnswlib is None:
+            logger.warning("hnswlib not installed, local vector search falls back to flat")
+            self.backend = "flat"
+            return
+
+        hnsw = hnswlib.Index(space="ip", dim=self.dim)
+        hnsw.init_index(max_elements=len(self), M=Config.HNSW_M,
+                        ef_construction=Config.HNSW_EF_CONSTRUCTION)
+        hnsw.add_items(np.asarray(self.vectors), np.arange(len(self)))
+        hnsw.set_ef(Config.HNSW_EF_SEARCH)
+        self.hnsw = hnsw
+
+    def _quantize(self):
+        """Compute candidate codes (and their recall) for the quantization"""
+        if self.backend == "hnsw":
+            # The graph searches full vectors; codes would only cost memory
+            self.quantization = "none"
+        if self.quantization == "none" or not len(self):
+            return
+
+        if self.quantization == "int8":
+            # Symmetric per-dimension scale; the scale is folded into the query at search time
+            scales = np.abs(self.vectors).max(axis=0).astype(np.float32) / 127.0
+            scales[scales == 0] = 1.0
+            self.scales = scales
+            self.codes = np.empty(self.vectors.shape, dtype=np.int8)
+            for start in range(0, len(self), SCORE_BLOCK_ROWS):
+                block = np.asarray(self.vectors[start:start + SCORE_BLOCK_ROWS]) / scales
+                self.codes[start:start + len(block)] = np.clip(np.rint(block), -127, 127)
+        elif self.quantization == "binary":
+            self.codes = np.packbits(np.asarray(self.vectors) > 0, axis=1)
+        else:
+            raise ValueError(f"Unknown vector quantization: {self.quantization}")
+
+        self.recall = self.recall_report()
+        logger.info(f"Vector quantization {self.quantization}: recall@{self.recall['top_k']}="
+                    f"{self.recall['recall']:.3f}, {self.recall['compression']:.0f}x smaller scan")
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    # ============================================
+    # SEARCH
+    # ============================================
+
+    def search(self, query_vector: Sequence[float], top_k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Nearest chunks by cosine similarity
+
+        Returns:
+            (row, similarity) tuples, best first
+        """
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        if self.hnsw is not None:
+            labels, distances = self.hnsw.knn_query(query, k=top_k)
+            # hnswlib "ip" distance is 1 - dot product
+            return [(int(row), float(1.0 - dist)) for row, dist in zip(labels[0], distances[0])]
+
+        if self.codes is None:
+            return self._exact(query, top_k)
+
+        # Phase 1: candidates from the compact codes
+        candidates = self._best_rows(self._code_scores(query), max(top_k, Config.VECTOR_RESCORE_CANDIDATES))
+        # Phase 2: exact cosine on the short-list (sorted rows read the mmap in order)
+        candidates = np.sort(candidates)
+        scores = np.asarray(self.vectors[candidates]) @ query
+        best = self._best_rows(scores, top_k)
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def _exact(self, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        scores = self.vectors @ query
+        return [(int(row), float(scores[row])) for row in self._best_rows(scores, top_k)]
+
+    @staticmethod
+    def _best_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Indexes of the top_k scores, best first (ties by index)"""
+        if len(scores) > top_k:
+            rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            rows = np.arange(len(scores))
+        return rows[np.lexsort((rows, -scores[rows]))]
+
+    def _code_scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of every row from the quantized codes"""
+        if self.quantization == "binary":
+            # Fewer differing sign bits = closer; Hamming over packed bytes
+            query_bits = np.packbits(query > 0)
+            distances = _popcount(np.bitwise_xor(self.codes, query_bits)).sum(axis=1, dtype=np.int32)
+            return -distances.astype(np.float32)
+
+        scaled_query = query * self.scales
+        scores = np.empty(len(self), dtype=np.float32)
+        buffer = np.empty((SCORE_BLOCK_ROWS, self.dim), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = self.codes[start:start + SCORE_BLOCK_ROWS]
+            converted = buffer[:len(block)]
+            converted[...] = block
+            scores[start:start + len(block)] = converted @ scaled_query
+        return scores
+
+    def recall_report(self, query_vectors: Optional[np.ndarray] = None, top_k: int = 10) -> Dict:
+        """
+        recall@k of the quantized search against exact float32 search
+
+        Args:
+            query_vectors: (q, dim) queries; defaults to a sample of indexed
+                vectors with noise added (Config.VECTOR_RECALL_SAMPLE)
+            top_k: k of recall@k
+
+        Returns:
+            {'quantization', 'top_k', 'queries', 'recall', 'float_bytes',
+             'code_bytes', 'compression'}
+        """
+        if query_vectors is None:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(self), size=min(Config.VECTOR_RECALL_SAMPLE, len(self)), replace=False)
+            query_vectors = np.asarray(self.vectors[np.sort(sample)])
+            query_vectors = query_vectors + rng.normal(0, 0.5 / np.sqrt(self.dim), query_vectors.shape)
+        query_vectors = _normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+
+        hits = 0
+        for query in query_vectors:
+            expected = {row for row, _ in self._exact(query, top_k)}
+            hits += len(expected & {row for row, _ in self.search(query, top_k)})
+
+        float_bytes = len(self) * self.dim * 4
+        code_bytes = self.codes.nbytes if self.codes is not None else float_bytes
+        return {
+            'quantization': self.quantization,
+            'top_k': top_k,
+            'queries': len(query_vectors),
+            'recall': hits / (len(query_vectors) * min(top_k, len(self))) if len(query_vectors) else 1.0,
+            'float_bytes': float_bytes,
+            'code_bytes': code_bytes,
+            'compression': float_bytes / code_bytes if code_bytes else 1.0
+        }
+
+    def node(self, row: int, score: float) -> NodeWithScore:
+        """NodeWithScore for a row"""
+        return NodeWithScore(
+            node=TextNode(text=self.texts[row], id_=self.doc_ids[row], metadata=self.doc_metadata[row]),
+            score=score
+        )
+
+    # ============================================
+    # UPDATES / PERSISTENCE
+    # ============================================
+
+    def replace_sources(self, tags: Set[str],
+                        records: Iterable[Tuple[Dict, Optional[List[float]]]]) -> "LocalVectorIndex":
+        """
+        New index with every chunk of the given sources replaced
+
+        Args:
+            tags: Source tags ("dieu:<n>", "document:<name>") being replaced
+            records: Current (chunk, embedding) pairs of those sources
+        """
+        keep = [row for row in range(len(self)) if not source_tags([self.doc_metadata[row]]) & tags]
+        kept = (
+            ({'id': self.doc_ids[row], 'text': self.texts[row], 'metadata': self.doc_metadata[row]},
+             self.vectors[row])
+            for row in keep
+        )
+        return LocalVectorIndex.build(list(kept) + list(records), backend=self.backend,
+                                      quantization=self.quantization)
+
+    def save(self, directory: str):
+        """Write vectors, chunk columns and (if built) the HNSW graph"""
+        np.save(os.path.join(directory, "vectors.npy"), np.asarray(self.vectors, dtype=np.float32))
+        save_columns(directory, document_columns(self.doc_ids, self.texts, self.doc_metadata))
+        if self.hnsw is not None:
+            self.hnsw.save_index(os.path.join(directory, "hnsw.bin"))
+        if self.codes is not None:
+            np.save(os.path.join(directory, f"codes_{self.quantization}.npy"), self.codes)
+        if self.scales is not None:
+            np.save(os.path.join(directory, "scales.npy"), self.scales)
+        with open(os.path.join(directory, "vectors.json"), "w") as f:
+            json.dump({"backend": self.backend, "count": len(self), "dim": self.dim,
+                       "model": Config.EMBEDDING_MODEL, "quantization": self.quantization,
+                       "recall": self.recall, "revision": self.revision}, f)
+
+    @classmethod
+    def load(cls, directory: str, backend: str = None, quantization: str = None) -> "LocalVectorIndex":
+        """
+        Memory-map a snapshot written by save()
+
+        Codes for another quantization than the saved one are recomputed.
+        """
+        with open(os.path.join(directory, "vectors.json")) as f:
+            header = json.load(f)
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        index = cls(
+            vectors,
+            load_column(directory, 'ids'),
+            load_column(directory, 'texts'),
+            load_column(directory, 'metadata', json.loads),
+            backend=backend or header["backend"],
+            quantization=quantization or header.get("quantization", "none"),
+            revision=header.get("revision", 0)
+        )
+
+        codes_path = os.path.join(directory, f"codes_{index.quantization}.npy")
+        if index.quantization == header.get("quantization") and os.path.exists(codes_path):
+            index.codes = np.load(codes_path, mmap_mode="r")
+            if index.quantization == "int8":
+                index.scales = np.load(os.path.join(directory, "scales.npy"))
+            index.recall = header.get("recall")
+        else:
+            index._quantize()
+
+        hnsw_path = os.path.join(directory, "hnsw.bin")
+        if index.backend == "hnsw" and hnswlib is not None and os.path.exists(hnsw_path):
+            hnsw = hnswlib.Index(space="ip", dim=index.dim)
+            hnsw.load_index(hnsw_path, max_elements=len(index))
+            hnsw.set_ef(Config.HNSW_EF_SEARCH)
+            index.hnsw = hnsw
+        else:
+            index._build_hnsw()
+        return index
+
+
+def vector_snapshot_path(corpus_version: str, snapshot_dir: str = None) -> str:
+    """Snapshot directory for a corpus version and embedding model"""
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", f"{corpus_version}-{Config.EMBEDDING_MODEL}")
+    return os.path.join(snapshot_dir or Config.VECTOR_SNAPSHOT_DIR,
+                        f"{VECTOR_SNAPSHOT_PREFIX}{Config.WEAVIATE_CLASS_NAME}-{safe_name}")
+
+
+def load_local_vector_index(client, corpus_version: str, backend: str = None,
+                            quantization: str = None, snapshot_dir: str = None,
+                            min_revision: int = 0) -> LocalVectorIndex:
+    """
+    Local vector index for the current corpus version
+
+    Memory-maps the snapshot if one exists; otherwise exports every vector
+    from Weaviate (cursor iterator), builds the index and writes the snapshot.
+    The index records the index event revision it includes.
+
+    Args:
+        client: Connected weaviate v4 client
+        corpus_version: Corpus generation the snapshot must match
+        backend: "flat" or "hnsw" (defaults to Config.VECTOR_BACKEND)
+        quantization: "none", "int8" or "binary" (defaults to Config.VECTOR_QUANTIZATION)
+        snapshot_dir: Where snapshots live
+        min_revision: Re-export instead of loading a snapshot older than this
+    """
+    backend = backend or Config.VECTOR_BACKEND
+    quantization = quantization or Config.VECTOR_QUANTIZATION
+    path = vector_snapshot_path(corpus_version, snapshot_dir)
+
+    if os.path.isdir(path):
+        try:
+            start = time.perf_counter()
+            index = LocalVectorIndex.load(path, backend, quantization)
+            if index.revision >= min_revision:
+                logger.info(f"Vector snapshot loaded ({len(index)} vectors, revision {index.revision}, "
+                            f"{(time.perf_counter() - start) * 1000:.1f} ms): {path}")
+                return index
+            logger.info(f"Vector snapshot at revision {index.revision} is older than {min_revision}, "
+                        f"re-exporting")
+        except Exception as e:
+            logger.warning(f"Vector snapshot unreadable, re-exporting: {e}")
+
+    start = time.time()
+    revision = get_corpus_registry().current_revision()
+    index = LocalVectorIndex.build(WeaviateCorpusLoader(client).iter_vectors(), backend, quantization)
+    index.revision = revision
+    logger.info(f"Exported {len(index)} vectors ({backend}) in {time.time() - start:.1f}s")
+
+    try:
+        write_snapshot(index, path, replace=min_revision > 0,
+                       prefix=f"{VECTOR_SNAPSHOT_PREFIX}{Config.WEAVIATE_CLASS_NAME}-")
+        logger.info(f"Vector snapshot written: {path}")
+    except Exception as e:
+        logger.warning(f"Could not write vector snapshot: {e}")
+    return index
+
+
+class LocalVectorRetriever(BaseRetriever):
+    """
+    Drop-in replacement for VectorIndexRetriever that searches in-process
+
+    Queries are embedded with the shared embedding model (unless the bundle
+    already carries an embedding) and matched against the local index.
+    Updates rebuild the index in the background and swap it in.
+    """
+
+    def __init__(self, vector_index: LocalVectorIndex, embed_model,
+                 similarity_top_k: int = None, weaviate_client=None,
+                 corpus_version: Optional[str] = None):
+        """
+        Args:
+            vector_index: Local index to search
+            embed_model: Embedding model for query strings
+            similarity_top_k: Results per query
+            weaviate_client: Client used to re-export changed chunks
+            corpus_version: Corpus generation of vector_index (keys its snapshot)
+        """
+        super().__init__()
+        self.vector_index = vector_index
+        self._embed_model = embed_model
+        self.similarity_top_k = similarity_top_k or Config.SIMILARITY_TOP_K
+        self.weaviate_client = weaviate_client
+        self.corpus_version = corpus_version
+        self._update_lock = threading.Lock()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        embedding = query_bundle.embedding
+        if embedding is None:
+            embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+
+        vector_index = self.vector_index
+        hits = vector_index.search(embedding, self.similarity_top_k)
+        return [vector_index.node(row, score) for row, score in hits]
+
+    def _update_in_background(self, name: str, build) -> Optional[threading.Thread]:
+        if self.weaviate_client is None:
+            return None
+
+        def _job():
+            with self._update_lock:
+                try:
+                    self.vector_index = build()
+                    logger.info(f"Local vector index {name} ({len(self.vector_index)} vectors)")
+                except Exception as e:
+                    logger.error(f"Local vector index {name} failed: {e}")
+
+        thread = threading.Thread(target=_job, name=f"vectors-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def reload(self, corpus_version: str, min_revision: int = 0) -> Optional[threading.Thread]:
+        """Re-export all vectors for a corpus generation (snapshots older than min_revision are not reused)"""
+        def _build():
+            vector_index = load_local_vector_index(self.weaviate_client, corpus_version,
+                                                   self.vector_index.backend,
+                                                   self.vector_index.quantization,
+                                                   min_revision=min_revision)
+            self.corpus_version = corpus_version
+            return vector_index
+
+        return self._update_in_background("reloaded", _build)
+
+    def refresh_sources(self, dieus: list = None, documents: list = None,
+                        revision: int = 0) -> Optional[threading.Thread]:
+        """Re-read the chunks of changed articles / documents (index event `revision`) and persist the result"""
+        def _build():
+            records = list(WeaviateCorpusLoader(self.weaviate_client).iter_source_vectors(dieus, documents))
+            vector_index = self.vector_index.replace_sources(invalidation_tags(dieus, documents), records)
+            vector_index.revision = max(self.vector_index.revision, revision)
+            if self.corpus_version:
+                try:
+                    write_snapshot(vector_index, vector_snapshot_path(self.corpus_version), replace=True,
+                                   prefix=f"{VECTOR_SNAPSHOT_PREFIX}{Config.WEAVIATE_CLASS_NAME}-")
+                except Exception as e:
+                    logger.warning(f"Could not persist refreshed vector index: {e}")
+            return vector_index
+
+        return self._update_in_background("refreshed", _build)
+
+    def get_stats(self) -> Dict:
+        """Backend, size and quantization recall of the local index"""
+        vector_index = self.vector_index
+        return {
+            'backend': vector_index.backend,
+            'vectors': len(vector_index),
+            'dim': vector_index.dim,
+            'quantization': vector_index.quantization,
+            'recall': vector_index.recall
+        }
@@ -0,0 +1,527 @@
+"""
+Segmented Keyword Index
+Append-only BM25 updates: a large base segment plus small delta segments
+and tombstones, published as immutable snapshots and compacted by a
+background merge
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from config import Config
+from retriever.bm25_index import BM25Index, term_hash, tokenize
+from retriever.corpus_loader import BM25Corpus, write_snapshot
+from retriever.structured_index import LegalReference, StructuredIndex, key_positions, lookup_positions
+from systems.corpus_version import source_tags
+
+logger = logging.getLogger(__name__)
+
+
+class ChainedSequence(Sequence):
+    """Read-only concatenation of sequences (global index -> owning part)"""
+
+    def __init__(self, parts: Sequence[Sequence]):
+        self.parts = list(parts)
+        self.starts = []
+        total = 0
+        for part in self.parts:
+            self.starts.append(total)
+            total += len(part)
+        self.total = total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += self.total
+        if not 0 <= i < self.total:
+            raise IndexError(i)
+        part = bisect.bisect_right(self.starts, i) - 1
+        return self.parts[part][i - self.starts[part]]
+
+
+class DeltaSegment:
+    """
+    Small in-memory segment holding raw term frequencies
+
+    Impacts are computed at query time from collection-wide statistics, so
+    a delta costs only its own analysis to build. The per-chunk term
+    frequencies are kept so a merge never runs the analyzer again. It also
+    records the write that produced it (deleted node IDs / source tags),
+    which lets a merge replay writes that raced with it.
+    """
+
+    def __init__(self, documents: List[Dict], delete_ids: Iterable[str] = (),
+                 delete_tags: Iterable[str] = (), revision: int = 0):
+        """
+        Args:
+            documents: Added or changed chunks as {'id', 'text', 'metadata'}
+            delete_ids: Node IDs removed by this write
+            delete_tags: Source tags ("dieu:5", "document:X") removed by this write
+            revision: Corpus index event this write applies (0 if none)
+        """
+        self.documents = documents
+        self.revision = revision
+        self.doc_ids = [doc['id'] for doc in documents]
+        self.doc_metadata = [doc['metadata'] for doc in documents]
+        self.delete_ids = frozenset(delete_ids)
+        self.delete_tags = frozenset(delete_tags)
+        self.structured = StructuredIndex(self.doc_metadata)
+
+        counts = [Counter(tokenize(doc['text'])) for doc in documents]
+        self.doc_len = np.array([sum(c.values()) for c in counts], dtype=np.float64)
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for local_idx, counter in enumerate(counts):
+            for term, tf in counter.items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(local_idx)
+                tfs.append(tf)
+        self.postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float64))
+            for term, (docs, tfs) in postings.items()
+        }
+
+    def posting_triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(term hash, local doc, tf) for every posting"""
+        if not self.postings:
+            return (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64),
+                    np.zeros(0, dtype=np.uint32))
+        hashes = np.concatenate([
+            np.full(len(docs), term_hash(term), dtype=np.uint64)
+            for term, (docs, _) in self.postings.items()
+        ])
+        docs = np.concatenate([docs for docs, _ in self.postings.values()])
+        tfs = np.concatenate([tfs for _, tfs in self.postings.values()]).astype(np.uint32)
+        return hashes, docs, tfs
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+class IndexSnapshot:
+    """
+    Immutable view of the keyword index
+
+    Readers take a reference to the current snapshot and use it for the whole
+    request (scores, node IDs and texts all come from the same version).
+    Deleted or superseded chunks stay in their segment but are listed in
+    `tombstones` until the next merge.
+    """
+
+    def __init__(self, base: BM25Corpus, deltas: Tuple[DeltaSegment, ...] = (),
+                 tombstones: Optional[np.ndarray] = None):
+        self.base = base
+        self.deltas = deltas
+        self.tombstones = tombstones if tombstones is not None else np.zeros(0, dtype=np.int64)
+        self.revision = max([base.revision] + [d.revision for d in deltas])
+
+        self.documents = ChainedSequence([base.documents] + [d.documents for d in deltas])
+        self.doc_ids = ChainedSequence([base.doc_ids] + [d.doc_ids for d in deltas])
+        self.doc_metadata = ChainedSequence([base.doc_metadata] + [d.doc_metadata for d in deltas])
+
+        # Collection statistics over the live chunks of all segments (what a
+        # merge would compute), so base and delta scores stay comparable
+        self.base_size = len(base.documents)
+        self.corpus_size = self.base_size + sum(len(d) for d in deltas)
+        total_tokens = float(np.sum(base.bm25.doc_len)) + sum(float(d.doc_len.sum()) for d in deltas)
+        dead_tokens = sum(self._doc_len(int(position)) for position in self.tombstones)
+        self.avgdl = (total_tokens - dead_tokens) / self.live_size if self.live_size else 0.0
+        self._doc_freq_cache: Dict[str, int] = {}
+
+    @property
+    def live_size(self) -> int:
+        return self.corpus_size - len(self.tombstones)
+
+    def _doc_len(self, position: int) -> float:
+        if position < self.base_size:
+            return float(self.base.bm25.doc_len[position])
+        offset = self.base_size
+        for delta in self.deltas:
+            if position < offset + len(delta):
+                return float(delta.doc_len[position - offset])
+            offset += len(delta)
+        raise IndexError(position)
+
+    def _segment_postings(self, term: str) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(global docs, tfs, doc lengths) of a term in every segment"""
+        parts = []
+        posting = self.base.bm25.term_postings(term)
+        if posting is not None:
+            docs, tfs = posting
+            parts.append((np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float64),
+                          np.asarray(self.base.bm25.doc_len)[docs]))
+        offset = self.base_size
+        for delta in self.deltas:
+            posting = delta.postings.get(term)
+            if posting is not None:
+                docs, tfs = posting
+                parts.append((docs + offset, tfs, delta.doc_len[docs]))
+            offset += len(delta)
+        return parts
+
+    def _idf(self, term: str, parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> float:
+        """
+        Okapi idf from live document frequencies (the negative-idf floor keeps
+        the base segment's average idf until the next merge)
+        """
+        df = self._doc_freq_cache.get(term)
+        if df is None:
+            df = sum(len(docs) for docs, _, _ in parts)
+            if len(self.tombstones):
+                df -= sum(int(np.isin(docs, self.tombstones).sum()) for docs, _, _ in parts)
+            self._doc_freq_cache[term] = df
+        bm25 = self.base.bm25
+        idf = math.log(self.live_size - df + 0.5) - math.log(df + 0.5)
+        return idf if idf >= 0 else bm25.epsilon * bm25.average_idf
+
+    def _score(self, query_tokens: Sequence[str], top_k: int) -> List[Tuple[int, float]]:
+        """Score every segment with the snapshot's statistics, tombstones excluded"""
+        bm25 = self.base.bm25
+        all_docs, all_scores = [], []
+        for term, count in Counter(query_tokens).items():
+            parts = self._segment_postings(term)
+            if not parts:
+                continue
+            idf = self._idf(term, parts)
+            for docs, tfs, doc_len in parts:
+                norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / self.avgdl)
+                all_docs.append(docs)
+                all_scores.append(count * idf * (tfs * (bm25.k1 + 1) / (tfs + norm)))
+        if not all_docs:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        if len(self.tombstones):
+            keep = ~np.isin(candidates, self.tombstones)
+            candidates, scores = candidates[keep], scores[keep]
+        return BM25Index._top_k(candidates, scores, top_k)
+
+    def top_k(self, query_tokens: Sequence[str], top_k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Best (global doc index, score) over all segments, tombstones excluded
+        """
+        return self.top_k_batch([query_tokens], top_k)[0]
+
+    def top_k_batch(self, queries: Sequence[Sequence[str]], top_k: int = 10) -> List[List[Tuple[int, float]]]:
+        """
+        top_k() for several queries against the same snapshot in one pass
+
+        A base without deltas or tombstones uses its precomputed impacts;
+        otherwise every segment is scored from raw term frequencies.
+        """
+        if not self.deltas and not len(self.tombstones):
+            return self.base.bm25.top_k_batch(queries, top_k)
+        if top_k <= 0 or not self.live_size:
+            return [[] for _ in queries]
+        return [self._score(query_tokens, top_k) for query_tokens in queries]
+
+    def _structured_segments(self) -> List[Tuple[StructuredIndex, int]]:
+        segments = [(self.base.structured_index(), 0)]
+        offset = self.base_size
+        for delta in self.deltas:
+            segments.append((delta.structured, offset))
+            offset += len(delta)
+        return segments
+
+    def _live(self, positions: List[int]) -> List[int]:
+        if positions and len(self.tombstones):
+            dead = set(self.tombstones[np.isin(self.tombstones, positions)].tolist())
+            positions = [p for p in positions if p not in dead]
+        return positions
+
+    def lookup_reference(self, reference: LegalReference, document: Optional[str] = None) -> List[int]:
+        """
+        Global doc indexes of the chunks an exact reference points to,
+        tombstones excluded (`document` scopes references that name none)
+        """
+        return self._live(lookup_positions(self._structured_segments(), reference, document))
+
+    def lookup_key(self, key: tuple) -> List[int]:
+        """
+        Global doc indexes filed under a structured index key (e.g. a
+        parent_key()), in index order, tombstones excluded
+        """
+        return self._live(key_positions(self._structured_segments(), key))
+
+    def compact(self) -> BM25Corpus:
+        """
+        Fold segments and tombstones into a single base corpus
+
+        Works on the cached term frequencies (no re-analysis): live postings
+        of every segment are renumbered and rebuilt into one CSR index with
+        exact collection statistics.
+        """
+        live = np.ones(self.corpus_size, dtype=bool)
+        live[self.tombstones] = False
+        new_position = np.cumsum(live) - 1
+
+        bm25 = self.base.bm25
+        hashes, docs, tfs = bm25.posting_triples()
+        keep = live[docs]
+        parts = [(hashes[keep], new_position[docs[keep]], tfs[keep])]
+        doc_len = [np.asarray(bm25.doc_len)[live[:self.base_size]]]
+
+        offset = self.base_size
+        for delta in self.deltas:
+            if len(delta):
+                hashes, docs, tfs = delta.posting_triples()
+                docs = docs + offset
+                keep = live[docs]
+                parts.append((hashes[keep], new_position[docs[keep]], tfs[keep]))
+                doc_len.append(delta.doc_len[live[offset:offset + len(delta)]])
+            offset += len(delta)
+
+        index = BM25Index.from_postings(
+            np.concatenate([p[0] for p in parts]),
+            np.concatenate([p[1] for p in parts]),
+            np.concatenate([p[2] for p in parts]),
+            np.concatenate(doc_len),
+            k1=bm25.k1, b=bm25.b, epsilon=bm25.epsilon
+        )
+        documents = [self.documents[i] for i in np.flatnonzero(live).tolist()]
+        return BM25Corpus(
+            index,
+            documents,
+            [doc['id'] for doc in documents],
+            [doc['metadata'] for doc in documents],
+            revision=self.revision
+        )
+
+
+class _PositionLookup:
+    """
+    Writer-side map of node ID / source tag -> global doc indexes
+
+    Only touched under the index's write lock; entries of deleted chunks may
+    linger (re-tombstoning them is harmless).
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, Set[int]] = {}
+        self.by_tag: Dict[str, Set[int]] = {}
+
+    def add(self, doc_ids: Sequence, doc_metadata: Sequence, offset: int):
+        for i in range(len(doc_ids)):
+            position = offset + i
+            self.by_id.setdefault(doc_ids[i], set()).add(position)
+            for tag in source_tags([doc_metadata[i]]):
+                self.by_tag.setdefault(tag, set()).add(position)
+
+    def pop(self, node_ids: Iterable[str], tags: Iterable[str]) -> Set[int]:
+        positions = set()
+        for node_id in node_ids:
+            positions |= self.by_id.pop(node_id, set())
+        for tag in tags:
+            positions |= self.by_tag.pop(tag, set())
+        return positions
+
+
+class SegmentedBM25Index:
+    """
+    Keyword index with incremental, non-blocking updates
+
+    Writes (serialized by a lock) tokenize only the changed chunks into a new
+    delta segment, tombstone the chunks they replace and publish a new
+    IndexSnapshot with a single reference swap. Once enough deltas pile up,
+    or after a quiet period, a background thread folds everything into a new
+    base segment from the cached term frequencies (exact BM25 statistics
+    again), replays writes that arrived meanwhile and swaps it in.
+    """
+
+    def __init__(
+        self,
+        base: BM25Corpus,
+        max_deltas: int = None,
+        merge_delay_seconds: float = None,
+        snapshot_path: Optional[str] = None
+    ):
+        """
+        Args:
+            base: Initial base segment
+            max_deltas: Delta segments that trigger an immediate merge
+            merge_delay_seconds: Quiet period after a write before merging
+            snapshot_path: Where merged bases are persisted (None: not persisted)
+        """
+        self.max_deltas = max_deltas or Config.BM25_MAX_DELTA_SEGMENTS
+        self.merge_delay = (Config.BM25_MERGE_DELAY_SECONDS
+                            if merge_delay_seconds is None else merge_delay_seconds)
+        self.snapshot_path = snapshot_path
+
+        self._snapshot = IndexSnapshot(self._prepare(base))
+        self._write_lock = threading.RLock()
+        self._lookup: Optional[_PositionLookup] = None
+        self._merge_lock = threading.Lock()
+        self._merge_timer: Optional[threading.Timer] = None
+
+        self.merges = 0
+        self.writes = 0
+
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        """Current immutable snapshot (take once per request)"""
+        return self._snapshot
+
+    @staticmethod
+    def _prepare(base: BM25Corpus) -> BM25Corpus:
+        """Build lazy side indexes of a base before readers see it"""
+        if Config.ENABLE_STRUCTURED_LOOKUP:
+            base.structured_index()
+        return base
+
+    # ============================================
+    # WRITES
+    # ============================================
+
+    def _positions(self) -> _PositionLookup:
+        """Lookup for the current snapshot, built on first write"""
+        if self._lookup is None:
+            snapshot = self._snapshot
+            lookup = _PositionLookup()
+            lookup.add(snapshot.base.doc_ids, snapshot.base.doc_metadata, 0)
+            offset = snapshot.base_size
+            for delta in snapshot.deltas:
+                lookup.add(delta.doc_ids, delta.doc_metadata, offset)
+                offset += len(delta)
+            self._lookup = lookup
+        return self._lookup
+
+    @staticmethod
+    def _apply(snapshot: IndexSnapshot, lookup: _PositionLookup, delta: DeltaSegment) -> IndexSnapshot:
+        """New snapshot = snapshot + delta (pure apart from the lookup)"""
+        dead = lookup.pop(set(delta.delete_ids) | set(delta.doc_ids), delta.delete_tags)
+        tombstones = snapshot.tombstones
+        if dead:
+            tombstones = np.union1d(tombstones, np.fromiter(dead, dtype=np.int64))
+
+        # Pure deletes are kept as empty segments so a merge can replay them
+        lookup.add(delta.doc_ids, delta.doc_metadata, snapshot.corpus_size)
+        return IndexSnapshot(snapshot.base, snapshot.deltas + (delta,), tombstones)
+
+    def _write(self, delta: DeltaSegment) -> IndexSnapshot:
+        with self._write_lock:
+            snapshot = self._apply(self._snapshot, self._positions(), delta)
+            self._snapshot = snapshot
+            self.writes += 1
+            self._schedule_merge(immediate=len(snapshot.deltas) >= self.max_deltas)
+        return snapshot
+
+    def upsert(self, documents: List[Dict]) -> IndexSnapshot:
+        """
+        Add or replace chunks (matched by node ID)
+
+        Args:
+            documents: Chunks as {'id', 'text', 'metadata'}
+        """
+        return self._write(DeltaSegment(documents))
+
+    def delete(self, node_ids: Iterable[str]) -> IndexSnapshot:
+        """Remove chunks by node ID"""
+        return self._write(DeltaSegment([], delete_ids=node_ids))
+
+    def replace_sources(self, tags: Iterable[str], documents: List[Dict], revision: int = 0) -> IndexSnapshot:
+        """
+        Replace every chunk of the given sources with a fresh set
+
+        Args:
+            tags: Source tags ("dieu:<n>", "document:<name>") being replaced
+            documents: Current chunks of those sources
+            revision: Corpus index event being applied (persisted with merged bases)
+        """
+        return self._write(DeltaSegment(documents, delete_tags=tags, revision=revision))
+
+    def reset(self, base: BM25Corpus, snapshot_path: Optional[str] = None):
+        """Swap in a completely rebuilt base, dropping all deltas"""
+        self._prepare(base)
+        with self._write_lock:
+            self._snapshot = IndexSnapshot(base)
+            self._lookup = None
+            self.snapshot_path = snapshot_path
+
+    # ============================================
+    # MERGE
+    # ============================================
+
+    def _schedule_merge(self, immediate: bool = False):
+        """Debounced background merge (caller holds the write lock)"""
+        if self._merge_timer is not None:
+            self._merge_timer.cancel()
+        self._merge_timer = threading.Timer(0 if immediate else self.merge_delay, self._merge_in_background)
+        self._merge_timer.daemon = True
+        self._merge_timer.start()
+
+    def _merge_in_background(self):
+        self.merge()
+        with self._write_lock:
+            # Writes that arrived during the merge still need one
+            if self._snapshot.deltas and not self._merge_lock.locked():
+                self._schedule_merge()
+
+    def merge(self) -> bool:
+        """
+        Fold deltas and tombstones into a new base segment
+
+        Runs without blocking readers or writers except for the final replay
+        of writes that landed while the base was being rebuilt.
+
+        Returns:
+            True if a merge happened
+        """
+        if not self._merge_lock.acquire(blocking=False):
+            return False
+        try:
+            start = time.time()
+            with self._write_lock:
+                source = self._snapshot
+            if not source.deltas and not len(source.tombstones):
+                return False
+
+            base = self._prepare(source.compact())
+            lookup = _PositionLookup()
+            lookup.add(base.doc_ids, base.doc_metadata, 0)
+
+            with self._write_lock:
+                current = self._snapshot
+                if current.base is not source.base:
+                    # reset() replaced the base meanwhile; this merge is obsolete
+                    return False
+                merged = IndexSnapshot(base)
+                for delta in current.deltas[len(source.deltas):]:
+                    merged = self._apply(merged, lookup, delta)
+                self._snapshot = merged
+                self._lookup = lookup
+                self.merges += 1
+
+            logger.info(f"BM25 merge: {source.live_size} chunks in {time.time() - start:.1f}s "
+                        f"({len(source.deltas)} deltas, {len(source.tombstones)} tombstones folded)")
+
+            if self.snapshot_path:
+                try:
+                    write_snapshot(base, self.snapshot_path, replace=True)
+                except Exception as e:
+                    logger.warning(f"Could not persist merged BM25 index: {e}")
+            return True
+        except Exception as e:
+            logger.error(f"BM25 merge failed: {e}")
+            return False
+        finally:
+            self._merge_lock.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Segment counters"""
+        snapshot = self._snapshot
+        return {
+            'chunks': snapshot.live_size,
+            'delta_segments': len(snapshot.deltas),
+            'tombstones': len(snapshot.tombstones),
+            'writes': self.writes,
+            'merges': self.merges
+        }
@@ -0,0 +1,217 @@
+"""
+Structured Reference Index
+Maps (document, chuong, muc, dieu) from chunk metadata to chunk positions,
+so citation-style questions ("Điều 15 quy định gì?") resolve without search
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+_DIEU_PATTERN = re.compile(r"\b(?:điều|dieu)\s+(\d+)\b")
+_CHUONG_PATTERN = re.compile(r"\b(?:chương|chuong)\s+([ivxlc]+|\d+)\b")
+_MUC_PATTERN = re.compile(r"\b(?:mục|muc)\s+(\d+)\b")
+# "08/2022" in "Nghị định 08/2022/NĐ-CP"
+_DOCUMENT_NUMBER_PATTERN = re.compile(r"(?<!\d)(\d{1,3})\s*/\s*(\d{4})(?!\d)")
+
+_ROMAN_VALUES = [(100, "C"), (90, "XC"), (50, "L"), (40, "XL"), (10, "X"), (9, "IX"),
+                 (5, "V"), (4, "IV"), (1, "I")]
+
+
+def _to_roman(number: int) -> str:
+    roman = ""
+    for value, symbol in _ROMAN_VALUES:
+        while number >= value:
+            roman += symbol
+            number -= value
+    return roman
+
+
+@lru_cache(maxsize=4096)
+def _normalize_number(value: str) -> Optional[str]:
+    """'15', 'Điều 15' -> '15'"""
+    match = re.search(r"\d+", value)
+    return str(int(match.group())) if match else None
+
+
+@lru_cache(maxsize=1024)
+def _normalize_chuong(value: str) -> Optional[str]:
+    """'III', 'Chương III', '3' -> 'III'"""
+    text = value.strip().upper()
+    match = re.search(r"\b([IVXLC]+|\d+)\b", text.replace("CHƯƠNG", " "))
+    if not match:
+        return None
+    token = match.group(1)
+    return _to_roman(int(token)) if token.isdigit() else token
+
+
+def document_numbers(text: str) -> Set[str]:
+    """Decree / law numbers in a text ('Nghị định 08/2022/NĐ-CP' -> {'8/2022'})"""
+    return {f"{int(number)}/{year}" for number, year in _DOCUMENT_NUMBER_PATTERN.findall(text or "")}
+
+
+def _field(metadata: Dict, name: str) -> str:
+    value = metadata.get(name)
+    return str(value).strip() if value is not None else ""
+
+
+def parent_key(metadata: Optional[Dict]) -> Optional[tuple]:
+    """
+    Index key of a chunk's parent: its parent_id if it has one, otherwise
+    the article (document, dieu) it belongs to
+    """
+    metadata = metadata or {}
+    parent_id = _field(metadata, 'parent_id')
+    if parent_id:
+        return ("parent", parent_id)
+    dieu = _normalize_number(_field(metadata, 'dieu'))
+    if dieu:
+        return ("dieu", _field(metadata, 'document') or None, dieu)
+    return None
+
+
+@dataclass(frozen=True)
+class LegalReference:
+    """Exact reference found in a question"""
+    dieus: Tuple[str, ...] = ()
+    chuong: Optional[str] = None
+    muc: Optional[str] = None
+    document_numbers: Tuple[str, ...] = ()
+
+
+def parse_reference(query: str) -> Optional[LegalReference]:
+    """
+    Article / chapter / section reference in a question, None if there is none
+
+    "So sánh Điều 5 và Điều 7 Nghị định 08/2022" ->
+        LegalReference(dieus=('5', '7'), document_numbers=('8/2022',))
+    """
+    text = unicodedata.normalize("NFC", query or "").lower()
+    dieus = tuple(dict.fromkeys(str(int(d)) for d in _DIEU_PATTERN.findall(text)))
+    chuong_match = _CHUONG_PATTERN.search(text)
+    if not dieus and not chuong_match:
+        return None
+
+    muc_match = _MUC_PATTERN.search(text)
+    return LegalReference(
+        dieus=dieus,
+        chuong=_normalize_chuong(chuong_match.group(1)) if chuong_match else None,
+        muc=_normalize_number(muc_match.group(1)) if muc_match else None,
+        document_numbers=tuple(sorted(document_numbers(text)))
+    )
+
+
+class StructuredIndex:
+    """
+    Exact-reference lookup over one segment's chunk metadata
+
+    Each chunk is filed under its article, its section and its chapter, both
+    within its document and document-agnostic (and under its parent node,
+    if it has one), so any reference resolves with one dict lookup.
+    Positions are local to the segment.
+    """
+
+    def __init__(self, doc_metadata: Sequence[Optional[Dict]]):
+        """
+        Args:
+            doc_metadata: Metadata dict per chunk (dieu, chuong, muc, document)
+        """
+        self.entries: Dict[tuple, List[int]] = {}
+        self.documents_by_number: Dict[str, Set[str]] = {}
+        self._documents: Set[str] = set()
+        for position, metadata in enumerate(doc_metadata):
+            self._add(position, metadata or {})
+
+    def _add(self, position: int, metadata: Dict):
+        document = _field(metadata, 'document') or None
+        chuong = _normalize_chuong(_field(metadata, 'chuong'))
+        muc = _normalize_number(_field(metadata, 'muc'))
+        dieu = _normalize_number(_field(metadata, 'dieu'))
+
+        if document and document not in self._documents:
+            self._documents.add(document)
+            for number in document_numbers(document):
+                self.documents_by_number.setdefault(number, set()).add(document)
+
+        parent_id = _field(metadata, 'parent_id')
+        if parent_id:
+            self.entries.setdefault(("parent", parent_id), []).append(position)
+
+        for scope in {None, document}:
+            if dieu:
+                self.entries.setdefault(("dieu", scope, dieu), []).append(position)
+            if chuong:
+                self.entries.setdefault(("chuong", scope, chuong), []).append(position)
+                if muc:
+                    self.entries.setdefault(("muc", scope, chuong, muc), []).append(position)
+
+    def get(self, key: tuple) -> List[int]:
+        return self.entries.get(key, [])
+
+    def has_document(self, document: str) -> bool:
+        return document in self._documents
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def reference_keys(reference: LegalReference, documents: Sequence[Optional[str]]) -> List[tuple]:
+    """
+    Index keys for a reference, most specific level only (articles beat
+    sections beat chapters), in the order the question names them
+    """
+    keys = []
+    for document in documents:
+        if reference.dieus:
+            keys.extend(("dieu", document, dieu) for dieu in reference.dieus)
+        elif reference.chuong and reference.muc:
+            keys.append(("muc", document, reference.chuong, reference.muc))
+        elif reference.chuong:
+            keys.append(("chuong", document, reference.chuong))
+    return keys
+
+
+def key_positions(segments: Sequence[Tuple[StructuredIndex, int]], key: tuple) -> List[int]:
+    """Global chunk positions filed under one key, in segment order"""
+    positions = []
+    for index, offset in segments:
+        positions.extend(offset + position for position in index.get(key))
+    return positions
+
+
+def lookup_positions(segments: Sequence[Tuple[StructuredIndex, int]],
+                     reference: LegalReference,
+                     document: Optional[str] = None) -> List[int]:
+    """
+    Global chunk positions matching a reference across segments
+
+    Args:
+        segments: (index, offset of its first chunk) per segment
+        reference: Parsed reference
+        document: Document to resolve the reference in when it names none
+            (e.g. the conversation's current one)
+
+    Returns:
+        Positions in question order, then segment order; empty if the
+        question names (or `document` is) a document not in the corpus
+    """
+    documents: Sequence[Optional[str]] = [None]
+    if not reference.document_numbers and document:
+        if not any(index.has_document(document) for index, _ in segments):
+            return []
+        documents = [document]
+    elif reference.document_numbers:
+        named = set()
+        for index, _ in segments:
+            for number in reference.document_numbers:
+                named |= index.documents_by_number.get(number, set())
+        if not named:
+            return []
+        documents = sorted(named)
+
+    positions = []
+    for key in reference_keys(reference, documents):
+        positions.extend(key_positions(segments, key))
+    return list(dict.fromkeys(positions))
@@ -0,0 +1,105 @@
+"""
+Vietnamese Keyword Analyzer
+NFC normalization, punctuation stripping, diacritic-folded shadow terms and
+syllable bigram shingles, shared by BM25 indexing and querying
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional
+from config import Config
+
+
+# Word characters (letters incl. Vietnamese, digits); everything else separates.
+# "_" is excluded: it is the bigram joiner, and pre-segmented input ("tái_chế")
+# must yield the syllables and their bigram, not a term that collides with it
+_WORD_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+# Punctuation that ends a phrase: bigrams never span it ("08/2022/NĐ-CP" stays one phrase)
+_PHRASE_BREAK_PATTERN = re.compile(r"[.,;:!?()\[\]{}\"“”‘’«»…\n\r\t|–—]+")
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+BIGRAM_JOINER = "_"
+
+
+@lru_cache(maxsize=65536)
+def fold_diacritics(term: str) -> str:
+    """'tái chế' -> 'tai che', 'đ' -> 'd'"""
+    folded = _COMBINING_MARKS.sub("", unicodedata.normalize("NFD", term))
+    return unicodedata.normalize("NFC", folded).replace("đ", "d").replace("Đ", "D")
+
+
+class VietnameseAnalyzer:
+    """
+    Turns text into BM25 terms
+
+    "Điều 15, tái chế bao bì" ->
+        điều 15 tái chế bao bì                      (syllables)
+        điều_15 tái_chế chế_bao bao_bì              (bigrams within a phrase)
+        dieu_15 tai_che che_bao bao_bi              (folded shadows)
+
+    Shadow terms let queries typed without diacritics still match, while an
+    exact-diacritic match scores on both the exact and the shadow term.
+    Only bigrams get shadows: a folded single syllable ("tai" for tái / tài /
+    tại / tai) is too ambiguous to help and would double the postings.
+    """
+
+    def __init__(self, fold: bool = True, bigrams: bool = True):
+        """
+        Args:
+            fold: Emit diacritic-folded shadow terms (of bigrams, or of
+                syllables when bigrams are off)
+            bigrams: Emit syllable bigram shingles
+        """
+        self.fold = fold
+        self.bigrams = bigrams
+
+    @property
+    def version(self) -> str:
+        """Identifies the analyzer output (persisted indexes must match it)"""
+        return f"vi2{'f' if self.fold else ''}{'b' if self.bigrams else ''}"
+
+    def analyze(self, text: str) -> List[str]:
+        """Text -> list of terms (repeats preserved for term frequency)"""
+        if not text:
+            return []
+        text = unicodedata.normalize("NFC", text).lower()
+
+        terms = []
+        for phrase in _PHRASE_BREAK_PATTERN.split(text):
+            syllables = _WORD_PATTERN.findall(phrase)
+            terms.extend(syllables)
+            if self.bigrams:
+                terms.extend(
+                    f"{syllables[i]}{BIGRAM_JOINER}{syllables[i + 1]}"
+                    for i in range(len(syllables) - 1)
+                )
+
+        if self.fold:
+            shadows = []
+            for term in terms:
+                if self.bigrams and BIGRAM_JOINER not in term:
+                    continue
+                folded = fold_diacritics(term)
+                if folded != term:
+                    shadows.append(folded)
+            terms.extend(shadows)
+        return terms
+
+
+# Singleton instance
+_analyzer_instance: Optional[VietnameseAnalyzer] = None
+
+
+def get_analyzer() -> VietnameseAnalyzer:
+    """
+    Get or create the analyzer configured for keyword search
+    """
+    global _analyzer_instance
+
+    if _analyzer_instance is None:
+        _analyzer_instance = VietnameseAnalyzer(
+            fold=Config.BM25_FOLD_DIACRITICS,
+            bigrams=Config.BM25_BIGRAMS
+        )
+
+    return _analyzer_instance
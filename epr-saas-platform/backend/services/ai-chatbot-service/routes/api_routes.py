@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 from middleware.auth import verify_token
@@ -46,9 +47,11 @@ async def query_endpoint(
             detail=error_msg or "Quota exceeded"
         )
 
-    # 2. Process query
+    # 2. Process query (off the event loop: the pipeline blocks on retrieval/LLM
+    # calls, and concurrent identical queries must overlap to be coalesced)
     try:
-        result = query_handler.process_query(
+        result = await run_in_threadpool(
+            query_handler.process_query,
             query_text=query_req.query,
             session_id=query_req.session_id
         )
@@ -92,7 +95,7 @@ async def search_endpoint(
         raise HTTPException(status_code=503, detail="Service not ready")
 
     try:
-        result = query_handler.search_documents(query_req.query)
+        result = await run_in_threadpool(query_handler.search_documents, query_req.query)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,6 +4,7 @@ Stage 1: Cross-Encoder Reranking
 Stage 2: LLM-based Reranking for final refinement
 """
 import logging
+import hashlib
 from typing import List, Dict, Optional
 from config import Config
 
@@ -20,14 +21,17 @@ class MultiStageReranker:
     def __init__(
         self,
         cross_encoder_model: Optional[object] = None,
-        llm_client: Optional[object] = None
+        llm_client: Optional[object] = None,
+        retrieval_cache: Optional[object] = None
     ):
         """
         Args:
             cross_encoder_model: Sentence transformer cross-encoder
             llm_client: OpenAI client for LLM reranking
+            retrieval_cache: Optional RetrievalCache for rerank results
         """
         self.llm_client = llm_client
+        self.retrieval_cache = retrieval_cache
 
         # Initialize cross-encoder
         if Config.ENABLE_CROSS_ENCODER_RERANK:
@@ -259,6 +263,17 @@ Chỉ trả về JSON, không giải thích."""
         if not nodes:
             return nodes
 
+        # Same query over the same candidate set → reuse the ranking
+        cache_key = None
+        candidates = nodes
+        if self.retrieval_cache:
+            cache_key = self._rerank_cache_key(query, nodes, stage)
+            if cache_key:
+                cached = self._apply_cached_ranking(cache_key, nodes)
+                if cached is not None:
+                    logger.info(f"Rerank cache hit: {len(cached)} nodes")
+                    return cached
+
         logger.info(f"Multi-stage reranking: {len(nodes)} nodes, stage={stage}")
 
         # Stage 1: Cross-encoder (fast, many documents)
@@ -279,8 +294,44 @@ Chỉ trả về JSON, không giải thích."""
 
         logger.info(f"Final reranked result: {len(nodes)} nodes")
 
+        if cache_key:
+            self.retrieval_cache.set_ranked(
+                cache_key,
+                [(n.node.node_id, float(getattr(n, 'score', 0) or 0)) for n in nodes],
+                nodes=candidates
+            )
+
         return nodes
 
+    def _rerank_cache_key(self, query: str, nodes: List, stage: str) -> Optional[str]:
+        """Key over query, stage and the candidate set (order-independent)"""
+        if not all(hasattr(n, 'node') for n in nodes):
+            return None
+
+        candidates = hashlib.sha1(
+            "|".join(sorted(n.node.node_id for n in nodes)).encode("utf-8")
+        ).hexdigest()
+        return self.retrieval_cache.make_key(
+            query, f"rerank:{stage}", Config.LLM_RERANK_TOP_K,
+            extra=f"{Config.CROSS_ENCODER_TOP_K}:{candidates}"
+        )
+
+    def _apply_cached_ranking(self, cache_key: str, nodes: List) -> Optional[List]:
+        """Reorder the given nodes by a cached ranking"""
+        ranked = self.retrieval_cache.get_ranked(cache_key)
+        if ranked is None:
+            return None
+
+        by_id = {n.node.node_id: n for n in nodes}
+        result = []
+        for node_id, score in ranked:
+            node = by_id.get(node_id)
+            if node is None:
+                return None
+            node.score = score
+            result.append(node)
+        return result
+
     # ============================================
     # UTILITIES
     # ============================================
@@ -4,9 +4,13 @@ App Info System - Handles application information queries
 import logging
 from typing import Optional, Dict
 from config import Config
+from systems.llm_call_cache import cached_chat_completion
 
 logger = logging.getLogger(__name__)
 
+# Bump when the matching prompt changes (invalidates cached decisions)
+APP_INFO_PROMPT_VERSION = "1"
+
 class AppInfoSystem:
     def __init__(self, openai_client):
         self.openai_client = openai_client
@@ -96,14 +100,14 @@ Trả lời chỉ một trong các giá trị sau:
 
 Chỉ trả lời MỘT SỐ duy nhất:"""
 
-            response = self.openai_client.chat.completions.create(
+            result = cached_chat_completion(
+                self.openai_client, "app_info_match", APP_INFO_PROMPT_VERSION, question,
+                context="\n".join(app_questions),
                 model=Config.LLM_MODEL,
                 messages=[{"role": "user", "content": similarity_prompt}],
                 max_tokens=10,
                 temperature=0
             )
-            
-            result = response.choices[0].message.content.strip()
             app_keys = list(self.app_info.keys())
             
             if result in ["1", "2", "3", "4"]:
@@ -0,0 +1,166 @@
+"""
+Binary Cache Entry Codec
+Versioned Redis hash layout for semantic cache entries:
+- embedding stored as raw float16/float32 bytes in its own field
+- response body serialized with msgpack (fallback: JSON) and
+  compressed with zstd (fallback: zlib)
+"""
+import logging
+import json
+import zlib
+from typing import Optional, Dict, Any
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+FORMAT_VERSION = 2
+
+# Redis hash fields
+FIELD_VERSION = "v"
+FIELD_EMBEDDING = "emb"
+FIELD_DTYPE = "dt"
+FIELD_CODEC = "codec"
+FIELD_BODY = "body"
+FIELD_CONTEXT = "ctx"
+
+SUPPORTED_DTYPES = ("float16", "float32")
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+
+def default_body_codec() -> str:
+    """Best body codec available in this environment"""
+    serializer = "msgpack" if msgpack else "json"
+    compressor = "zstd" if zstandard else "zlib"
+    return f"{serializer}+{compressor}"
+
+
+def encode_embedding(embedding, dtype: str = "float16") -> bytes:
+    """Pack an embedding as little-endian raw bytes"""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return np.asarray(embedding, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()
+
+
+def decode_embedding(data: bytes, dtype: str = "float16") -> np.ndarray:
+    """Unpack raw embedding bytes into a float32 vector"""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder("<")).astype(np.float32)
+
+
+def encode_body(body: Dict[str, Any], codec: Optional[str] = None) -> bytes:
+    """Serialize and compress a response body"""
+    codec = codec or default_body_codec()
+    serializer, compressor = codec.split("+")
+
+    if serializer == "msgpack":
+        raw = msgpack.packb(body, use_bin_type=True, default=str)
+    else:
+        raw = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+
+    if compressor == "zstd":
+        return _zstd_compressor.compress(raw)
+    return zlib.compress(raw, 6)
+
+
+def decode_body(data: bytes, codec: str) -> Dict[str, Any]:
+    """Decompress and deserialize a response body"""
+    serializer, compressor = codec.split("+")
+
+    if compressor == "zstd":
+        if _zstd_decompressor is None:
+            raise RuntimeError("zstandard is required to read this cache entry")
+        raw = _zstd_decompressor.decompress(data)
+    else:
+        raw = zlib.decompress(data)
+
+    if serializer == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read this cache entry")
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw.decode("utf-8"))
+
+
+def encode_entry(
+    embedding,
+    body: Dict[str, Any],
+    dtype: str = "float16",
+    context_key: str = ""
+) -> Dict[str, bytes]:
+    """
+    Build the Redis hash mapping for a cache entry
+
+    Args:
+        embedding: Query embedding
+        body: Everything except the embedding (query, response, metadata)
+        dtype: Storage precision for the embedding
+        context_key: Conversation fingerprint ("" for context-free entries)
+
+    Returns:
+        Field → value mapping for HSET
+    """
+    codec = default_body_codec()
+    return {
+        FIELD_VERSION: str(FORMAT_VERSION),
+        FIELD_EMBEDDING: encode_embedding(embedding, dtype),
+        FIELD_DTYPE: dtype,
+        FIELD_CODEC: codec,
+        FIELD_BODY: encode_body(body, codec),
+        FIELD_CONTEXT: context_key or "",
+    }
+
+
+def _to_str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def decode_entry_body(codec, body: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """Decode the body field of a hash entry"""
+    if codec is None or body is None:
+        return None
+    return decode_body(body, _to_str(codec))
+
+
+def decode_entry_context(value) -> str:
+    """Decode the context field of a hash entry (missing = context-free)"""
+    return _to_str(value) if value else ""
+
+
+def decode_entry_embedding(data: Optional[bytes], dtype) -> Optional[np.ndarray]:
+    """Decode the embedding field of a hash entry"""
+    if not data:
+        return None
+    return decode_embedding(data, _to_str(dtype or "float32"))
+
+
+def decode_legacy_entry(data) -> Optional[Dict[str, Any]]:
+    """
+    Read a version-1 entry (a single JSON string with the embedding inline)
+
+    Returns:
+        Dict with 'body' and 'embedding' keys, or None if unreadable
+    """
+    try:
+        entry = json.loads(data)
+    except (TypeError, ValueError) as e:
+        logger.debug(f"Unreadable legacy cache entry: {e}")
+        return None
+
+    embedding = entry.pop('query_embedding', None)
+    return {
+        'body': entry,
+        'embedding': np.asarray(embedding, dtype=np.float32) if embedding else None,
+    }
@@ -0,0 +1,237 @@
+"""
+In-process Vector Index for Semantic Cache
+Keeps normalized cache embeddings in one contiguous matrix for fast top-1 lookup
+"""
+import logging
+import threading
+import time
+from typing import Optional, Dict, List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CacheVectorIndex:
+    """
+    Flat cosine index over cached query embeddings
+
+    Vectors are L2-normalized float32 rows of a single matrix, so a lookup
+    is one matrix-vector product plus an argmax regardless of cache size.
+    Rows carry an expiry timestamp mirroring the Redis TTL of their entry,
+    and a conversation context code so follow-up entries only match
+    queries asked in the same conversation context ("" = context-free).
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        """
+        Args:
+            initial_capacity: Number of rows allocated up front (grows by doubling)
+        """
+        self.initial_capacity = initial_capacity
+
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._expires_at = np.zeros(0, dtype=np.float64)
+        self._contexts = np.zeros(0, dtype=np.int32)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # context fingerprint -> small int code (0 = context-free); a code is
+        # freed for reuse when the last row using it goes away
+        self._context_codes: Dict[str, int] = {"": 0}
+        self._context_names: Dict[int, str] = {0: ""}
+        self._context_rows: Dict[int, int] = {}
+        self._free_codes: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    @staticmethod
+    def _normalize(vector) -> Optional[np.ndarray]:
+        """Convert to a unit-length float32 vector"""
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        if norm == 0 or not np.isfinite(norm):
+            return None
+        return vec / norm
+
+    def _context_code(self, context_key: str) -> Optional[int]:
+        """Integer code of a context fingerprint, None if no row uses it (lock held)"""
+        return self._context_codes.get(context_key or "")
+
+    def _acquire_context(self, context_key: str) -> int:
+        """Code for a new row in this context, allocated if needed (lock held)"""
+        context_key = context_key or ""
+        code = self._context_codes.get(context_key)
+        if code is None:
+            code = self._free_codes.pop() if self._free_codes else len(self._context_names)
+            self._context_codes[context_key] = code
+            self._context_names[code] = context_key
+        self._context_rows[code] = self._context_rows.get(code, 0) + 1
+        return code
+
+    def _release_context(self, code: int):
+        """A row using `code` went away; free the code with its last row (lock held)"""
+        remaining = self._context_rows.get(code, 0) - 1
+        if remaining > 0:
+            self._context_rows[code] = remaining
+            return
+        self._context_rows.pop(code, None)
+        if code != 0:
+            del self._context_codes[self._context_names.pop(code)]
+            self._free_codes.append(code)
+
+    def _ensure_capacity(self, dim: int, needed: int):
+        """Allocate or grow the backing matrix"""
+        if self._matrix is None:
+            capacity = max(self.initial_capacity, needed)
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+            self._expires_at = np.zeros(capacity, dtype=np.float64)
+            self._contexts = np.zeros(capacity, dtype=np.int32)
+            return
+
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        matrix[:len(self._keys)] = self._matrix[:len(self._keys)]
+        expires_at = np.zeros(capacity, dtype=np.float64)
+        expires_at[:len(self._keys)] = self._expires_at[:len(self._keys)]
+        contexts = np.zeros(capacity, dtype=np.int32)
+        contexts[:len(self._keys)] = self._contexts[:len(self._keys)]
+
+        self._matrix = matrix
+        self._expires_at = expires_at
+        self._contexts = contexts
+
+    def upsert(self, key: str, embedding, expires_at: float, context_key: str = ""):
+        """
+        Insert or replace the vector for a cache key
+
+        Args:
+            key: Redis key of the cache entry
+            embedding: Query embedding (any float sequence)
+            expires_at: Unix timestamp when the entry expires
+            context_key: Conversation fingerprint the entry belongs to
+        """
+        vec = self._normalize(embedding)
+        if vec is None:
+            return
+
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != vec.shape[0]:
+                logger.warning(f"Cache index dimension mismatch ({vec.shape[0]} vs "
+                               f"{self._matrix.shape[1]}), skipping {key}")
+                return
+
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._keys)
+                self._ensure_capacity(vec.shape[0], row + 1)
+                self._keys.append(key)
+                self._rows[key] = row
+            else:
+                self._release_context(int(self._contexts[row]))
+
+            self._matrix[row] = vec
+            self._expires_at[row] = expires_at
+            self._contexts[row] = self._acquire_context(context_key)
+
+    def remove(self, key: str):
+        """Remove a key, moving the last row into its slot"""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            self._release_context(int(self._contexts[row]))
+
+            last = len(self._keys) - 1
+            if row != last:
+                last_key = self._keys[last]
+                self._matrix[row] = self._matrix[last]
+                self._expires_at[row] = self._expires_at[last]
+                self._contexts[row] = self._contexts[last]
+                self._keys[row] = last_key
+                self._rows[last_key] = row
+
+            self._keys.pop()
+
+    def clear(self):
+        """Drop every row (keeps the allocated matrix)"""
+        with self._lock:
+            self._keys = []
+            self._rows = {}
+            self._context_codes = {"": 0}
+            self._context_names = {0: ""}
+            self._context_rows = {}
+            self._free_codes = []
+
+    def prune_expired(self, now: Optional[float] = None) -> int:
+        """Remove rows whose entry TTL has passed"""
+        now = now or time.time()
+        with self._lock:
+            n = len(self._keys)
+            if n == 0:
+                return 0
+            expired_rows = np.nonzero(self._expires_at[:n] <= now)[0]
+            expired_keys = [self._keys[i] for i in expired_rows]
+            for key in expired_keys:
+                self.remove(key)
+            return len(expired_keys)
+
+    def search(
+        self,
+        query_embedding,
+        now: Optional[float] = None,
+        context_key: str = ""
+    ) -> Tuple[Optional[str], float]:
+        """
+        Find the most similar live entry within one conversation context
+
+        Args:
+            query_embedding: Query vector
+            now: Current timestamp (defaults to time.time())
+            context_key: Conversation fingerprint ("" = context-free entries)
+
+        Returns:
+            (cache_key, cosine_similarity) or (None, 0.0) if index is empty
+        """
+        vec = self._normalize(query_embedding)
+        if vec is None:
+            return None, 0.0
+
+        now = now or time.time()
+        with self._lock:
+            n = len(self._keys)
+            if n == 0 or self._matrix.shape[1] != vec.shape[0]:
+                return None, 0.0
+
+            code = self._context_code(context_key)
+            if code is None:
+                return None, 0.0
+
+            scores = self._matrix[:n] @ vec
+            scores[(self._expires_at[:n] <= now) | (self._contexts[:n] != code)] = -np.inf
+
+            best = int(np.argmax(scores))
+            best_score = float(scores[best])
+            if not np.isfinite(best_score):
+                return None, 0.0
+
+            return self._keys[best], best_score
+
+    def context_count(self) -> int:
+        """Conversation contexts with at least one row (plus the context-free one)"""
+        return len(self._context_codes)
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the backing arrays"""
+        if self._matrix is None:
+            return 0
+        return int(self._matrix.nbytes + self._expires_at.nbytes + self._contexts.nbytes)
@@ -0,0 +1,303 @@
+"""
+Cost-aware Cache Admission & Eviction
+TinyLFU frequency sketch for admission plus GreedyDual-Size-Frequency
+priorities (frequency x recompute cost / bytes) under a Redis memory budget
+"""
+import hashlib
+import logging
+import threading
+from typing import Optional, List, Dict, Any
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+POLICY_BATCH_SIZE = 500
+
+
+def entry_cost(compute_ms: Optional[float] = None, tokens: int = 0) -> float:
+    """
+    Recompute cost of an answer in abstract units
+
+    1 unit per entry, plus one per second of pipeline time and one per
+    1000 tokens, so an 8-call Self-RAG answer weighs ~10-20x a canned reply.
+    """
+    return 1.0 + (compute_ms or 0.0) / 1000.0 + (tokens or 0) / 1000.0
+
+
+class FrequencySketch:
+    """
+    TinyLFU frequency estimator
+
+    A count-min sketch of 4-bit counters behind a doorkeeper bloom filter:
+    one-hit wonders only touch the doorkeeper. After `sample_size` events
+    every counter is halved and the doorkeeper cleared, so old popularity
+    fades.
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = None, depth: int = 4, sample_size: int = None):
+        """
+        Args:
+            width: Counters per row (roughly 4x the expected number of hot keys)
+            depth: Number of hash rows
+            sample_size: Events between aging steps (defaults to 10 x width)
+        """
+        self.width = width or Config.CACHE_SKETCH_WIDTH
+        self.depth = depth
+        self.sample_size = sample_size or self.width * 10
+
+        self._lock = threading.Lock()
+        self._counters = np.zeros((depth, self.width), dtype=np.uint8)
+        self._doorkeeper = np.zeros(self.width * depth, dtype=bool)
+        self._rows = np.arange(depth)
+        self._events = 0
+
+    def _indexes(self, key: str):
+        """Counter columns and doorkeeper bits (double hashing)"""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        hashes = [(h1 + i * h2) for i in range(self.depth)]
+        columns = np.array([h % self.width for h in hashes])
+        bits = np.array([h % self._doorkeeper.shape[0] for h in hashes])
+        return columns, bits
+
+    def _estimate(self, columns, bits) -> int:
+        base = int(self._counters[self._rows, columns].min())
+        return base + int(self._doorkeeper[bits].all())
+
+    def estimate(self, key: str) -> int:
+        """Approximate recent frequency of a key"""
+        columns, bits = self._indexes(key)
+        with self._lock:
+            return self._estimate(columns, bits)
+
+    def increment(self, key: str) -> int:
+        """Record one access and return the new estimate"""
+        columns, bits = self._indexes(key)
+        with self._lock:
+            if not self._doorkeeper[bits].all():
+                self._doorkeeper[bits] = True
+            else:
+                # Conservative update: only raise the smallest counters
+                values = self._counters[self._rows, columns]
+                low = values.min()
+                if low < self.MAX_COUNT:
+                    rows = self._rows[values == low]
+                    self._counters[rows, columns[rows]] += 1
+
+            self._events += 1
+            if self._events >= self.sample_size:
+                self._counters >>= 1
+                self._doorkeeper[:] = False
+                self._events = 0
+
+            return self._estimate(columns, bits)
+
+
+class CachePolicy:
+    """
+    Admission and eviction for the semantic cache
+
+    Redis keeps, per namespace:
+    - a ZSET of cache key -> priority (clock + frequency x cost / bytes)
+    - a HASH of cache key -> "bytes:cost"
+    - a byte counter and the GreedyDual "clock" (priority of the last victim)
+
+    When the budget is full, a new entry is only admitted if its priority
+    beats the current lowest one; writers then pop the lowest-priority
+    entries until the store is back under budget.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        namespace: str = "semantic_cache",
+        max_bytes: int = None,
+        sketch: Optional[FrequencySketch] = None
+    ):
+        """
+        Args:
+            redis_client: Redis client shared with the cache
+            namespace: Prefix for the policy's Redis keys
+            max_bytes: Memory budget for entry payloads
+            sketch: Frequency sketch (defaults to a new per-process one)
+        """
+        self.redis_client = redis_client
+        self.max_bytes = max_bytes or Config.CACHE_MAX_MEMORY_BYTES
+        self.sketch = sketch or FrequencySketch()
+
+        self.priority_key = f"{namespace}_policy:priority"
+        self.meta_key = f"{namespace}_policy:meta"
+        self.bytes_key = f"{namespace}_policy:bytes"
+        self.clock_key = f"{namespace}_policy:clock"
+
+        self._clock = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _to_str(value) -> str:
+        return value.decode() if isinstance(value, bytes) else str(value)
+
+    def priority(self, frequency: int, cost: float, size_bytes: int) -> float:
+        """GreedyDual-Size-Frequency priority"""
+        return self._clock + max(1, frequency) * cost / max(1, size_bytes)
+
+    # ============================================
+    # ACCESS TRACKING
+    # ============================================
+
+    def record(self, key: str) -> int:
+        """Count a lookup (hit or miss) for a key"""
+        return self.sketch.increment(key)
+
+    def touch(self, key: str, frequency: int, cost: float, size_bytes: int):
+        """Raise a hit entry's priority (never lowers it)"""
+        try:
+            self.redis_client.zadd(
+                self.priority_key,
+                {key: self.priority(frequency, cost, size_bytes)},
+                xx=True, gt=True
+            )
+        except Exception as e:
+            logger.debug(f"Cache policy touch failed: {e}")
+
+    # ============================================
+    # ADMISSION & EVICTION
+    # ============================================
+
+    def admit(self, key: str, cost: float, size_bytes: int) -> bool:
+        """
+        Decide whether a new entry may be stored
+
+        Always admitted while under budget; otherwise it must outrank the
+        entry that would be evicted to make room.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(self.bytes_key)
+        pipe.get(self.clock_key)
+        pipe.zrange(self.priority_key, 0, 0, withscores=True)
+        used, clock, lowest = pipe.execute()
+        self._clock = float(clock or 0.0)
+
+        if int(used or 0) + size_bytes <= self.max_bytes or not lowest:
+            self.admitted += 1
+            return True
+
+        candidate = self.priority(self.sketch.estimate(key), cost, size_bytes)
+        if candidate > lowest[0][1]:
+            self.admitted += 1
+            return True
+
+        self.rejected += 1
+        return False
+
+    def on_insert(self, key: str, cost: float, size_bytes: int):
+        """Account for a stored entry"""
+        old = self.redis_client.hget(self.meta_key, key)
+        old_size = int(self._to_str(old).split(":")[0]) if old else 0
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(self.meta_key, key, f"{size_bytes}:{cost:.3f}")
+        pipe.zadd(self.priority_key, {key: self.priority(self.sketch.estimate(key), cost, size_bytes)})
+        pipe.incrby(self.bytes_key, size_bytes - old_size)
+        pipe.execute()
+
+    def evict_over_budget(self) -> List[str]:
+        """
+        Pop lowest-priority entries until the store fits the budget
+
+        Returns:
+            Cache keys the caller must delete
+        """
+        victims = []
+        try:
+            while int(self.redis_client.get(self.bytes_key) or 0) > self.max_bytes:
+                popped = self.redis_client.zpopmin(self.priority_key, count=1)
+                if not popped:
+                    break
+
+                keys = [self._to_str(member) for member, _ in popped]
+                self._clock = max(self._clock, max(score for _, score in popped))
+                victims.extend(keys)
+
+                self._release(keys)
+                self.redis_client.set(self.clock_key, self._clock)
+        except Exception as e:
+            logger.warning(f"Cache eviction failed: {e}")
+
+        if victims:
+            self.evicted += len(victims)
+            logger.info(f"Cache policy evicted {len(victims)} entries (budget {self.max_bytes} bytes)")
+        return victims
+
+    def _release(self, keys: List[str]):
+        """Drop policy metadata for keys and give their bytes back"""
+        sizes = self.redis_client.hmget(self.meta_key, keys)
+        freed = sum(int(self._to_str(s).split(":")[0]) for s in sizes if s)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hdel(self.meta_key, *keys)
+        pipe.zrem(self.priority_key, *keys)
+        if freed:
+            pipe.decrby(self.bytes_key, freed)
+        pipe.execute()
+
+    def forget(self, keys: List[str]):
+        """Account for entries deleted by invalidation"""
+        if keys:
+            try:
+                self._release(keys)
+            except Exception as e:
+                logger.debug(f"Cache policy forget failed: {e}")
+
+    def reconcile(self):
+        """
+        Drop metadata of entries that expired through their TTL and
+        recompute the byte counter from what is still live
+        """
+        members = [self._to_str(m) for m in self.redis_client.zrange(self.priority_key, 0, -1)]
+        dead = []
+        for start in range(0, len(members), POLICY_BATCH_SIZE):
+            batch = members[start:start + POLICY_BATCH_SIZE]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in batch:
+                pipe.exists(key)
+            dead.extend(key for key, alive in zip(batch, pipe.execute()) if not alive)
+
+        if dead:
+            self._release(dead)
+
+        sizes = self.redis_client.hvals(self.meta_key)
+        self.redis_client.set(
+            self.bytes_key, sum(int(self._to_str(s).split(":")[0]) for s in sizes)
+        )
+
+    def clear(self):
+        """Forget all policy state"""
+        self.redis_client.delete(self.priority_key, self.meta_key, self.bytes_key, self.clock_key)
+        self._clock = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Budget usage and admission counters"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(self.bytes_key)
+            pipe.hlen(self.meta_key)
+            used, entries = pipe.execute()
+            used = int(used or 0)
+        except Exception:
+            used, entries = None, None
+        return {
+            'bytes_used': used,
+            'entries': entries,
+            'max_bytes': self.max_bytes,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'evicted': self.evicted
+        }
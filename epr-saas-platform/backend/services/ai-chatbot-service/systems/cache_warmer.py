@@ -0,0 +1,245 @@
+"""
+Startup Cache Warmer
+Replays FAQ questions and the most frequent historical queries through the
+query pipeline in the background, so answer / retrieval / embedding caches
+are warm shortly after a deploy or a Redis flush
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional
+from config import Config
+from systems.embedding_service import normalize_text
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+# Most frequent user questions, from chat history and query analytics events
+HISTORY_SQL = """
+    SELECT query, COUNT(*) AS n FROM (
+        SELECT content AS query
+        FROM conversations
+        WHERE role = 'user' AND created_at > NOW() - make_interval(days => %(days)s)
+        UNION ALL
+        SELECT event_data->>'query' AS query
+        FROM analytics_events
+        WHERE event_data ? 'query' AND created_at > NOW() - make_interval(days => %(days)s)
+    ) q
+    WHERE query IS NOT NULL AND length(query) > 3
+    GROUP BY query
+    ORDER BY n DESC
+    LIMIT %(limit)s
+"""
+
+
+class CacheWarmer:
+    """
+    Background cache warm-up job
+
+    Queries are replayed with bounded concurrency. Every query that misses
+    the cache reserves MAX_COST_PER_QUERY_USD from the budget before it is
+    submitted, so the job never exceeds its cost cap; cache hits are free.
+    """
+
+    def __init__(
+        self,
+        query_handler,
+        max_workers: int = None,
+        max_cost_usd: float = None,
+        top_n: int = None,
+        query_log_path: str = None,
+        database_url: str = None
+    ):
+        """
+        Args:
+            query_handler: Handler exposing process_query()
+            max_workers: Concurrent pipeline runs
+            max_cost_usd: Total spend allowed for the warm-up
+            top_n: Number of historical queries to replay
+            query_log_path: Exported query log (.jsonl with 'query' / 'content', or one query per line)
+            database_url: PostgreSQL URL with conversations / analytics_events tables
+        """
+        self.query_handler = query_handler
+        self.max_workers = max_workers or Config.CACHE_WARMUP_WORKERS
+        self.max_cost_usd = Config.CACHE_WARMUP_MAX_COST_USD if max_cost_usd is None else max_cost_usd
+        self.top_n = top_n or Config.CACHE_WARMUP_TOP_N
+        self.query_log_path = query_log_path if query_log_path is not None else Config.CACHE_WARMUP_QUERY_LOG
+        self.database_url = database_url if database_url is not None else Config.DATABASE_URL
+        self.cost_per_query = Config.MAX_COST_PER_QUERY_USD
+
+        self.stats = {
+            'queued': 0,
+            'completed': 0,
+            'already_cached': 0,
+            'failed': 0,
+            'skipped_budget': 0,
+            'estimated_cost_usd': 0.0,
+            'duration_s': 0.0,
+            'running': False
+        }
+
+    # ============================================
+    # QUERY SOURCES
+    # ============================================
+
+    def _faq_questions(self) -> List[str]:
+        """Questions from faq.json"""
+        try:
+            with open('faq.json', 'r', encoding='utf-8') as f:
+                raw_data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Warm-up: could not read faq.json: {e}")
+            return []
+
+        items = raw_data.get('meta', []) if isinstance(raw_data, dict) else raw_data
+        return [
+            item.get('Câu hỏi') or item.get('question')
+            for item in items
+            if isinstance(item, dict) and (item.get('Câu hỏi') or item.get('question'))
+        ]
+
+    def _history_from_database(self) -> List[str]:
+        """Top-N user queries from PostgreSQL"""
+        if not self.database_url:
+            return []
+        if psycopg2 is None:
+            logger.warning("Warm-up: psycopg2 not installed, skipping query history")
+            return []
+
+        try:
+            with psycopg2.connect(self.database_url) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(HISTORY_SQL, {
+                        'days': Config.CACHE_WARMUP_LOOKBACK_DAYS,
+                        'limit': self.top_n
+                    })
+                    return [row[0] for row in cur.fetchall()]
+        except Exception as e:
+            logger.warning(f"Warm-up: query history unavailable: {e}")
+            return []
+
+    def _history_from_log(self) -> List[str]:
+        """Top-N queries from an exported log file"""
+        if not self.query_log_path:
+            return []
+
+        counts = Counter()
+        try:
+            with open(self.query_log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if line.startswith('{'):
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if record.get('role', 'user') != 'user':
+                            continue
+                        line = record.get('query') or record.get('content') or ''
+                    if line:
+                        counts[line] += 1
+        except Exception as e:
+            logger.warning(f"Warm-up: could not read query log {self.query_log_path}: {e}")
+            return []
+
+        return [query for query, _ in counts.most_common(self.top_n)]
+
+    def collect_queries(self) -> List[str]:
+        """FAQ questions first, then popular history, de-duplicated on normalized text"""
+        seen = set()
+        queries = []
+        for query in self._faq_questions() + self._history_from_database() + self._history_from_log():
+            key = normalize_text(query)
+            if key and key not in seen:
+                seen.add(key)
+                queries.append(query)
+        return queries
+
+    # ============================================
+    # REPLAY
+    # ============================================
+
+    def _warm_one(self, query: str) -> Dict:
+        return self.query_handler.process_query(query, session_id=None, evaluate=False)
+
+    def run(self, queries: Optional[List[str]] = None) -> Dict:
+        """
+        Replay queries through the pipeline (blocking)
+
+        Returns:
+            Warm-up statistics
+        """
+        queries = self.collect_queries() if queries is None else queries
+        start = time.time()
+        self.stats['running'] = True
+        self.stats['queued'] = len(queries)
+        logger.info(f"🔥 Cache warm-up: {len(queries)} queries, "
+                    f"{self.max_workers} workers, budget ${self.max_cost_usd:.2f}")
+
+        reserved = 0.0
+        pending = {}
+        remaining = iter(queries)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cache-warmup") as pool:
+            while True:
+                # Keep at most max_workers queries in flight, within budget
+                while len(pending) < self.max_workers:
+                    query = next(remaining, None)
+                    if query is None:
+                        break
+                    if reserved + self.cost_per_query > self.max_cost_usd + 1e-9:
+                        self.stats['skipped_budget'] += 1
+                        continue
+                    reserved += self.cost_per_query
+                    pending[pool.submit(self._warm_one, query)] = query
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query = pending.pop(future)
+                    try:
+                        result = future.result()
+                        if result and result.get('from_cache'):
+                            # Served from cache: release its reservation
+                            reserved -= self.cost_per_query
+                            self.stats['already_cached'] += 1
+                        self.stats['completed'] += 1
+                    except Exception as e:
+                        self.stats['failed'] += 1
+                        logger.debug(f"Warm-up query failed ({query[:50]}...): {e}")
+
+        self.stats['estimated_cost_usd'] = round(reserved, 4)
+        self.stats['duration_s'] = round(time.time() - start, 1)
+        self.stats['running'] = False
+        logger.info(f"🔥 Cache warm-up done: {self.stats}")
+        return self.stats
+
+    def start_background(self, delay_seconds: float = None) -> threading.Thread:
+        """
+        Run the warm-up in a daemon thread so startup / readiness is not blocked
+        """
+        delay = Config.CACHE_WARMUP_DELAY_SECONDS if delay_seconds is None else delay_seconds
+
+        def _job():
+            time.sleep(delay)
+            try:
+                self.run()
+            except Exception as e:
+                self.stats['running'] = False
+                logger.error(f"Cache warm-up failed: {e}")
+
+        thread = threading.Thread(target=_job, name="cache-warmup", daemon=True)
+        thread.start()
+        return thread
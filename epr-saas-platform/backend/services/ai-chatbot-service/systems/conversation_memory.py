@@ -3,6 +3,8 @@ Advanced Conversation Memory System - Professional LLM-style memory management
 Implements context-aware conversation tracking with smart history management
 """
 import logging
+import re
+import hashlib
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from collections import deque
@@ -11,6 +13,45 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Real back-references to earlier turns: a demonstrative after a referring
+# noun ("điều đó", "trường hợp này"), "nêu trên"/"vừa rồi", the pronoun "nó",
+# the elliptical "còn ... thì sao" and a leading "vậy/thế thì". Bare "thế",
+# "vậy", "này" or "còn" are not enough: "như thế nào", "Nghị định này" and
+# "còn hiệu lực" occur in self-contained questions.
+_FOLLOW_UP_PATTERN = re.compile(
+    r"\b(?:điều|việc|cái|trường hợp|quy định|văn bản|vấn đề|nội dung|khoản|"
+    r"mức|chi phí|phần|ý)\s+(?:đó|này|ấy|kia|trên)\b|"
+    r"\b(?:nêu trên|ở trên|vừa rồi|vừa nói|tương tự như vậy|nó)\b|"
+    r"^\s*còn\b.*\bthì sao\b|"
+    r"^\s*(?:vậy|thế|vậy thì|thế thì|thế còn|vậy còn)\b",
+    re.IGNORECASE
+)
+
+# Explicit anchors that make a question self-contained: an article number,
+# a document number or an EPR topic noun
+_ANCHOR_PATTERN = re.compile(
+    r"\b(?:điều|khoản)\s+\d+|\bchương\s+[ivx]+\b|"
+    r"\b(?:nghị định|luật|thông tư|quyết định)\s+(?:số\s+)?\d+|\d+/\d{4}/[\w-]+|"
+    r"\b(?:epr|bao bì|tái chế|pin|ắc quy|lốp|săm|dầu nhớt|điện tử|nhựa|"
+    r"thu gom|nhà sản xuất|nhập khẩu|xử lý chất thải|bảo vệ môi trường)\b",
+    re.IGNORECASE
+)
+
+def is_follow_up_question(query: str, max_short_words: int = 6) -> bool:
+    """
+    Heuristic: does the question depend on earlier conversation turns?
+
+    An explicit anchor (Điều N, a document number, an EPR topic) makes the
+    question self-contained. Otherwise it is a follow-up if it contains a
+    back-reference, or if it is short (e.g. "chi phí là bao nhiêu?").
+    """
+    text = query.strip().lower()
+    if _ANCHOR_PATTERN.search(text):
+        return False
+    if _FOLLOW_UP_PATTERN.search(text):
+        return True
+    return len(text.split()) <= max_short_words
+
 class Message:
     """Represents a single message in conversation"""
     def __init__(self, role: str, content: str, metadata: Optional[Dict] = None):
@@ -128,6 +169,24 @@ class ConversationMemory:
             return self.sessions[session_id].summary
         return None
 
+    def get_context_fingerprint(self, session_id: str) -> str:
+        """
+        Compact fingerprint of the conversation state for cache keys
+        Empty string when the session has no history
+        """
+        session = self.sessions.get(session_id)
+        if not session:
+            return ""
+        return session.fingerprint()
+
+    def get_current_document(self, session_id: str) -> Optional[str]:
+        """
+        Legal document the conversation is currently about (cited by the
+        latest answer that had legal sources), None if there is none
+        """
+        session = self.sessions.get(session_id)
+        return session.current_document if session else None
+
     def get_session(self, session_id: str) -> Optional['ConversationSession']:
         """Get a session object by ID"""
         return self.sessions.get(session_id)
@@ -166,6 +225,7 @@ class ConversationSession:
         self.messages: deque = deque(maxlen=max_messages)
         self.summary: Optional[str] = None
         self.topics: set = set()  # Track discussed topics
+        self.current_document: Optional[str] = None  # Main document of the latest legal answer
         self.last_activity = datetime.now()
         self.created_at = datetime.now()
         self.metadata: Dict = {}
@@ -183,6 +243,11 @@ class ConversationSession:
             if 'articles' in metadata:
                 # Track legal articles discussed
                 self.topics.update(f"Điều {art}" for art in metadata['articles'])
+            if metadata.get('documents'):
+                # Most cited document of this answer becomes the current one
+                documents = metadata['documents']
+                self.current_document = max(documents, key=documents.count)
+                self.topics.update(documents)
 
         logger.debug(f"Added {role} message to session {self.session_id}")
 
@@ -248,6 +313,21 @@ class ConversationSession:
 
         return relevant_context
 
+    def fingerprint(self) -> str:
+        """
+        Short hash of what the conversation is about
+        Uses tracked topics/articles, falling back to the last user turns
+        """
+        if self.topics:
+            state = "|".join(sorted(self.topics))
+        else:
+            recent = [msg.content for msg in self.messages if msg.role == 'user'][-2:]
+            state = "|".join(" ".join(c.lower().split()) for c in recent)
+
+        if not state:
+            return ""
+        return hashlib.sha1(state.encode("utf-8")).hexdigest()[:16]
+
     def should_summarize(self) -> bool:
         """Check if conversation should be summarized"""
         return len(self.messages) >= self.summarize_threshold and not self.summary
@@ -0,0 +1,353 @@
+"""
+Corpus Generation Registry
+Tracks which ingestion of the legal corpus cached data was built from,
+which cache keys depend on which documents / articles (dieu), and whether
+this worker's search indexes have caught up with the latest corpus change
+"""
+import json
+import logging
+import time
+import uuid
+from typing import Optional, Iterable, Set, Dict, List, Tuple
+import redis
+from config import Config
+from systems.near_duplicates import MINHASH_METADATA_KEY
+
+logger = logging.getLogger(__name__)
+
+
+GENERATION_KEY = "corpus:generation"
+REVISION_KEY = "corpus:revision"
+INDEX_STREAM_KEY = "corpus:index_events"
+INDEX_STREAM_MAXLEN = 1000
+TAG_KEY_PREFIX = "corpus_tags:"
+
+# Chunk metadata kept out of embeddings, prompts and API responses (bookkeeping only)
+BOOKKEEPING_METADATA = ['pages', 'file_name', 'pdf_url', 'parent_id', MINHASH_METADATA_KEY]
+
+
+def source_tags(metadatas: Iterable[Optional[Dict]]) -> Set[str]:
+    """
+    Dependency tags ("dieu:<n>", "document:<name>") for a set of source metadata dicts
+    """
+    tags = set()
+    for metadata in metadatas:
+        if not metadata:
+            continue
+        if metadata.get('dieu'):
+            tags.add(f"dieu:{str(metadata['dieu']).strip()}")
+        if metadata.get('document'):
+            tags.add(f"document:{str(metadata['document']).strip()}")
+    return tags
+
+
+def public_metadata(metadata: Optional[Dict]) -> Dict:
+    """Chunk metadata without bookkeeping keys, as returned to API clients"""
+    return {key: value for key, value in (metadata or {}).items() if key not in BOOKKEEPING_METADATA}
+
+
+def invalidation_tags(dieus: Iterable = (), documents: Iterable = ()) -> Set[str]:
+    """Tags matching the articles / documents that changed"""
+    tags = {f"dieu:{str(d).strip()}" for d in dieus or ()}
+    tags.update(f"document:{str(d).strip()}" for d in documents or ())
+    return tags
+
+
+class CorpusRegistry:
+    """
+    Shared corpus generation ID plus reverse tag index for caches
+
+    - The generation ID is stored in Redis and changes on full re-ingestion;
+      caches embed it in keys / entries so older data stops matching.
+    - Each cache registers its keys under the articles and documents they
+      were computed from, so a routine legal-text update evicts only the
+      affected entries.
+    - Every corpus change is an index event with an increasing revision,
+      published on a Redis stream. Each worker applies it to its own
+      keyword / vector indexes; until it has, its indexes are behind and
+      it must not write rankings or answers to the shared caches.
+    """
+
+    def __init__(self, redis_url: str = None, refresh_seconds: float = None):
+        """
+        Args:
+            redis_url: Redis connection URL
+            refresh_seconds: How long a worker reuses the generation it last read
+        """
+        self.refresh_seconds = (
+            Config.CORPUS_GENERATION_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        )
+        self._generation = Config.CORPUS_VERSION
+        self._checked_at = 0.0
+        self._instance_id = uuid.uuid4().hex
+        self._latest_revision = 0
+        self._applied_revision = 0
+        self._revision_checked_at = 0.0
+
+        try:
+            self.redis_client = redis.from_url(redis_url or Config.REDIS_URL, decode_responses=True)
+            self.redis_client.ping()
+            # Record the configured version unless a generation derived from it exists
+            current = self.redis_client.get(GENERATION_KEY)
+            if current is None or current.split(".")[0] != Config.CORPUS_VERSION:
+                self.redis_client.set(GENERATION_KEY, Config.CORPUS_VERSION)
+            # Indexes count as behind until the worker has loaded them (start_index_tracking)
+            self._latest_revision = int(self.redis_client.get(REVISION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Corpus registry running without Redis: {e}")
+            self.redis_client = None
+
+    # ============================================
+    # GENERATION
+    # ============================================
+
+    def get_generation(self) -> str:
+        """Current corpus generation ID (re-read from Redis every few seconds)"""
+        if self.redis_client is None:
+            return self._generation
+
+        now = time.time()
+        if now - self._checked_at >= self.refresh_seconds:
+            try:
+                self._generation = self.redis_client.get(GENERATION_KEY) or self._generation
+            except Exception as e:
+                logger.debug(f"Corpus generation read failed: {e}")
+            self._checked_at = now
+
+        return self._generation
+
+    def next_generation(self) -> str:
+        """New generation ID, not yet published (indexes can be built for it first)"""
+        return f"{Config.CORPUS_VERSION}.{time.time_ns():x}"
+
+    def bump_generation(self, generation: Optional[str] = None) -> str:
+        """
+        Start a new corpus generation (call after a full re-ingestion)
+        Every cache entry tagged with an older generation becomes a miss.
+
+        Args:
+            generation: ID from next_generation() (defaults to a new one)
+        """
+        generation = generation or self.next_generation()
+        if self.redis_client is not None:
+            self.redis_client.set(GENERATION_KEY, generation)
+        self._generation = generation
+        self._checked_at = time.time()
+        logger.info(f"Corpus generation bumped to {generation}")
+        return generation
+
+    # ============================================
+    # INDEX EVENTS
+    # ============================================
+
+    def _read_revision(self) -> int:
+        try:
+            return int(self.redis_client.get(REVISION_KEY) or 0)
+        except Exception as e:
+            logger.debug(f"Corpus revision read failed: {e}")
+            return self._latest_revision
+
+    def current_revision(self) -> int:
+        """
+        Latest published revision (read before streaming the corpus, it is
+        a lower bound of the changes a freshly built index contains)
+        """
+        if self.redis_client is None:
+            return self._latest_revision
+        return self._read_revision()
+
+    def start_index_tracking(self) -> Tuple[int, str]:
+        """
+        Call before loading the search indexes
+
+        Indexes loaded from snapshots may be older than the returned
+        revision; bring them up to it (index_events_between) and then call
+        mark_applied(revision). Later events are read from the returned
+        stream position.
+
+        Returns:
+            (current revision, stream position to read later index events from)
+        """
+        if self.redis_client is None:
+            return self._latest_revision, "0-0"
+
+        revision = self._read_revision()
+        self.note_revision(revision)
+        self._revision_checked_at = time.time()
+        try:
+            latest = self.redis_client.xrevrange(INDEX_STREAM_KEY, count=1)
+            return revision, (latest[0][0] if latest else "0-0")
+        except Exception as e:
+            logger.debug(f"Index event stream unavailable: {e}")
+            return revision, "0-0"
+
+    def index_events_between(self, after_revision: int, until_revision: int) -> Optional[List[Dict]]:
+        """
+        Index events with after_revision < revision <= until_revision, in order
+
+        Returns:
+            The events, or None if the stream was trimmed past some of them
+            (the indexes must then be rebuilt instead of caught up)
+        """
+        if until_revision <= after_revision:
+            return []
+        if self.redis_client is None:
+            return None
+
+        try:
+            entries = self.redis_client.xrange(INDEX_STREAM_KEY)
+        except Exception as e:
+            logger.warning(f"Index event stream unavailable: {e}")
+            return None
+
+        events = [self._decode_index_event(fields) for _, fields in entries]
+        events = [e for e in events if after_revision < e['revision'] <= until_revision]
+        if {e['revision'] for e in events} != set(range(after_revision + 1, until_revision + 1)):
+            return None
+        return events
+
+    def _decode_index_event(self, fields: Dict) -> Dict:
+        return {
+            'op': fields.get('op'),
+            'revision': int(fields.get('revision', 0)),
+            'own': fields.get('origin') == self._instance_id,
+            'dieus': json.loads(fields.get('dieus') or "[]"),
+            'documents': json.loads(fields.get('documents') or "[]"),
+            'generation': fields.get('generation', ''),
+        }
+
+    def publish_index_event(self, op: str, dieus: list = None, documents: list = None,
+                            generation: str = "") -> int:
+        """
+        Announce a corpus change every worker must apply to its indexes
+
+        Args:
+            op: 'refresh' (re-read these articles / documents) or 'reload' (full rebuild)
+            dieus: Changed article numbers ('refresh')
+            documents: Changed document names ('refresh')
+            generation: Corpus generation to rebuild for ('reload')
+
+        Returns:
+            Revision of the event (pass it to mark_applied once applied here)
+        """
+        if self.redis_client is None:
+            self._latest_revision += 1
+            return self._latest_revision
+
+        revision = int(self.redis_client.incr(REVISION_KEY))
+        self.redis_client.xadd(
+            INDEX_STREAM_KEY,
+            {'op': op, 'revision': revision, 'origin': self._instance_id,
+             'dieus': json.dumps(dieus or []), 'documents': json.dumps(documents or []),
+             'generation': generation},
+            maxlen=INDEX_STREAM_MAXLEN,
+            approximate=True
+        )
+        self.note_revision(revision)
+        logger.info(f"Published index event {op} (revision {revision})")
+        return revision
+
+    def read_index_events(self, last_id: str, block_ms: int = 5000) -> List[tuple]:
+        """
+        Index events after `last_id`, waiting up to block_ms for one
+
+        Returns:
+            [(event_id, fields)] with fields decoded; events published by
+            this worker are included (flagged 'own')
+        """
+        if self.redis_client is None:
+            return []
+        response = self.redis_client.xread({INDEX_STREAM_KEY: last_id}, block=block_ms)
+
+        events = []
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                event = self._decode_index_event(fields)
+                self.note_revision(event['revision'])
+                events.append((event_id, event))
+        return events
+
+    def note_revision(self, revision: int):
+        """A corpus change exists up to `revision` (this worker may not have it yet)"""
+        self._latest_revision = max(self._latest_revision, revision)
+
+    def mark_applied(self, revision: int):
+        """This worker's indexes now include every change up to `revision`"""
+        self._applied_revision = max(self._applied_revision, revision)
+
+    def indexes_current(self) -> bool:
+        """
+        Whether this worker's indexes include the latest corpus change
+        (the shared revision is re-read every few seconds as a fallback
+        to the event stream)
+        """
+        if self.redis_client is not None:
+            now = time.time()
+            if now - self._revision_checked_at >= self.refresh_seconds:
+                self.note_revision(self._read_revision())
+                self._revision_checked_at = now
+        return self._applied_revision >= self._latest_revision
+
+    # ============================================
+    # TAG INDEX
+    # ============================================
+
+    def _tag_key(self, namespace: str, tag: str) -> str:
+        return f"{TAG_KEY_PREFIX}{namespace}:{tag}"
+
+    def tag(self, namespace: str, key: str, tags: Iterable[str], ttl_seconds: int, pipe=None):
+        """
+        Record that a cache key depends on the given source tags
+
+        Args:
+            namespace: Cache name ('answer', 'retrieval', 'node')
+            key: Cache key
+            tags: Tags from source_tags()
+            ttl_seconds: Lifetime of the cache key (tag sets live at least as long)
+            pipe: Optional pipeline to queue the commands on
+        """
+        tags = list(tags)
+        if not tags or self.redis_client is None:
+            return
+
+        target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+        for tag in tags:
+            tag_key = self._tag_key(namespace, tag)
+            target.sadd(tag_key, key)
+            target.expire(tag_key, max(1, int(ttl_seconds)))
+
+        if pipe is None:
+            try:
+                target.execute()
+            except Exception as e:
+                logger.debug(f"Corpus tag write failed: {e}")
+
+    def pop_tagged(self, namespace: str, tags: Iterable[str]) -> List[str]:
+        """
+        Return (and forget) every key of a namespace depending on any of the tags
+        """
+        tag_keys = [self._tag_key(namespace, tag) for tag in tags]
+        if not tag_keys or self.redis_client is None:
+            return []
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.sunion(tag_keys)
+        pipe.unlink(*tag_keys)
+        keys, _ = pipe.execute()
+        return sorted(keys)
+
+
+# Singleton instance
+_registry_instance: Optional[CorpusRegistry] = None
+
+
+def get_corpus_registry() -> CorpusRegistry:
+    """
+    Get or create corpus registry singleton
+    """
+    global _registry_instance
+
+    if _registry_instance is None:
+        _registry_instance = CorpusRegistry()
+
+    return _registry_instance
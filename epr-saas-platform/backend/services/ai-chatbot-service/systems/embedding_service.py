@@ -0,0 +1,214 @@
+"""
+Shared Embedding Service
+Memoizes query embeddings so every consumer (semantic cache, vector
+retriever, query variants) gets the same vector from one API call
+"""
+import logging
+import hashlib
+import unicodedata
+from typing import List, Optional, Any
+import numpy as np
+import redis
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.openai import OpenAIEmbedding
+from config import Config
+from systems.local_cache import LocalLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+EMBEDDING_KEY_PREFIX = "embedding_cache:"
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for embedding cache keys"""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.lower().split())
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper with two memoization tiers:
+    1. In-process LRU + TTL keyed by normalized text hash
+    2. Optional Redis tier shared across workers (raw float32 bytes)
+
+    It is a regular LlamaIndex embedding, so it can be handed to
+    VectorStoreIndex / VectorIndexRetriever as well as SemanticCache.
+    """
+
+    _inner: Any = PrivateAttr()
+    _local: Any = PrivateAttr()
+    _redis: Any = PrivateAttr()
+    _ttl_seconds: int = PrivateAttr()
+    _api_calls: int = PrivateAttr()
+
+    def __init__(
+        self,
+        inner: BaseEmbedding,
+        redis_url: Optional[str] = None,
+        max_entries: int = None,
+        ttl_seconds: int = None,
+        use_redis: bool = None,
+        **kwargs
+    ):
+        """
+        Args:
+            inner: Underlying embedding model (e.g. OpenAIEmbedding)
+            redis_url: Redis URL for the shared tier
+            max_entries: Size of the in-process tier
+            ttl_seconds: Lifetime of memoized vectors
+            use_redis: Enable the Redis tier
+        """
+        super().__init__(
+            model_name=getattr(inner, "model_name", "unknown"),
+            embed_batch_size=getattr(inner, "embed_batch_size", 100),
+            **kwargs
+        )
+        self._inner = inner
+        self._ttl_seconds = ttl_seconds or Config.EMBEDDING_CACHE_TTL_SECONDS
+        self._local = LocalLRUCache(
+            max_entries=max_entries or Config.EMBEDDING_CACHE_SIZE,
+            ttl_seconds=self._ttl_seconds
+        )
+        self._api_calls = 0
+
+        self._redis = None
+        use_redis = Config.EMBEDDING_CACHE_REDIS if use_redis is None else use_redis
+        if use_redis:
+            try:
+                self._redis = redis.from_url(redis_url or Config.REDIS_URL, decode_responses=False)
+                self._redis.ping()
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis tier unavailable: {e}")
+                self._redis = None
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    # ============================================
+    # CACHE TIERS
+    # ============================================
+
+    def _cache_key(self, text: str) -> str:
+        """Hash of model + normalized text"""
+        digest = hashlib.sha1(
+            f"{self.model_name}\x00{normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+        return f"{EMBEDDING_KEY_PREFIX}{self.model_name}:{digest}"
+
+    def _lookup(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Resolve keys from the local tier, then Redis for the rest"""
+        found = [self._local.get(key) for key in keys]
+
+        missing = [i for i, vec in enumerate(found) if vec is None]
+        if missing and self._redis is not None:
+            try:
+                values = self._redis.mget([keys[i] for i in missing])
+                for i, raw in zip(missing, values):
+                    if raw:
+                        vec = np.frombuffer(raw, dtype="<f4").tolist()
+                        self._local.set(keys[i], vec)
+                        found[i] = vec
+            except Exception as e:
+                logger.debug(f"Embedding cache Redis lookup failed: {e}")
+
+        return found
+
+    def _store(self, keys: List[str], vectors: List[List[float]]):
+        """Write freshly computed vectors to both tiers"""
+        for key, vec in zip(keys, vectors):
+            self._local.set(key, vec)
+
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for key, vec in zip(keys, vectors):
+                    pipe.setex(key, self._ttl_seconds, np.asarray(vec, dtype="<f4").tobytes())
+                pipe.execute()
+            except Exception as e:
+                logger.debug(f"Embedding cache Redis store failed: {e}")
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, calling the model only for cache misses
+        Duplicate texts in one call are embedded once
+        """
+        keys = [self._cache_key(t) for t in texts]
+        vectors = self._lookup(keys)
+
+        pending = {}
+        for i, vec in enumerate(vectors):
+            if vec is None:
+                pending.setdefault(keys[i], []).append(i)
+
+        if pending:
+            first_index = [positions[0] for positions in pending.values()]
+            batch_texts = [texts[i] for i in first_index]
+            # text-embedding-3 uses the same engine for queries and documents
+            computed = self._inner.get_text_embedding_batch(batch_texts)
+            self._api_calls += 1
+            self._store(list(pending.keys()), computed)
+
+            for positions, vec in zip(pending.values(), computed):
+                for i in positions:
+                    vectors[i] = vec
+
+        return vectors
+
+    # ============================================
+    # BaseEmbedding INTERFACE
+    # ============================================
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        key = self._cache_key(query)
+        cached = self._lookup([key])[0]
+        if cached is not None:
+            return cached
+
+        vec = self._inner.get_query_embedding(query)
+        self._api_calls += 1
+        self._store([key], [vec])
+        return vec
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed_many([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_many(texts)
+
+    def get_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries with at most one API request"""
+        return self._embed_many(queries)
+
+    def get_stats(self) -> dict:
+        """Memoization statistics"""
+        stats = self._local.get_stats()
+        stats['api_calls'] = self._api_calls
+        stats['redis_tier'] = self._redis is not None
+        return stats
+
+
+# Singleton instance
+_embedding_instance: Optional[BaseEmbedding] = None
+
+
+def get_embedding_service() -> BaseEmbedding:
+    """
+    Get or create the shared embedding model
+    Returns the plain OpenAIEmbedding when memoization is disabled
+    """
+    global _embedding_instance
+
+    if _embedding_instance is None:
+        base_model = OpenAIEmbedding(model=Config.EMBEDDING_MODEL)
+        if Config.ENABLE_EMBEDDING_CACHE:
+            _embedding_instance = CachedEmbedding(base_model)
+        else:
+            _embedding_instance = base_model
+
+    return _embedding_instance
@@ -5,9 +5,13 @@ import json
 import logging
 import re
 from typing import Optional, Dict
+from systems.llm_call_cache import cached_chat_completion
 
 logger = logging.getLogger(__name__)
 
+# Bump when the matching prompt changes (invalidates cached decisions)
+FAQ_PROMPT_VERSION = "1"
+
 class FAQSystem:
     def __init__(self, openai_client):
         self.openai_client = openai_client
@@ -79,14 +83,14 @@ QUAN TRỌNG:
 
 CHỈ TRẢ LỜI MỘT SỐ:"""
 
-            response = self.openai_client.chat.completions.create(
+            result = cached_chat_completion(
+                self.openai_client, "faq_match", FAQ_PROMPT_VERSION, user_query,
+                context="\n".join(faq_questions_list),
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": matching_prompt}],
                 max_tokens=5,
                 temperature=0
             )
-            
-            result = response.choices[0].message.content.strip()
             logger.info(f"GPT FAQ matching result: '{result}' for query: {user_query[:100]}...")
             
             # Extract number from result
@@ -0,0 +1,162 @@
+"""
+LLM Sub-call Cache
+Memoizes deterministic classifier-style chat completions (scope check,
+routing, FAQ / app-info matching) keyed by call name, model, prompt
+version and normalized input
+"""
+import hashlib
+import logging
+from typing import Optional, Dict, Any
+import redis
+from config import Config
+from systems.local_cache import LocalLRUCache
+from systems.embedding_service import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+LLM_CALL_KEY_PREFIX = "llm_call_cache:"
+
+
+class LLMCallCache:
+    """
+    Two-tier cache of raw completion text (in-process LRU + shared Redis)
+
+    Only the text is cached; callers keep their own parsing, so a cached
+    answer goes through exactly the same code path as a fresh one.
+    """
+
+    def __init__(self, redis_url: str = None, ttl_seconds: int = None, max_entries: int = None):
+        """
+        Args:
+            redis_url: Redis connection URL
+            ttl_seconds: Lifetime of cached completions
+            max_entries: Size of the in-process tier
+        """
+        self.ttl_seconds = ttl_seconds or Config.LLM_CALL_CACHE_TTL_SECONDS
+        self.local = LocalLRUCache(
+            max_entries=max_entries or Config.LLM_CALL_CACHE_LOCAL_ENTRIES,
+            ttl_seconds=self.ttl_seconds
+        )
+
+        try:
+            self.redis_client = redis.from_url(redis_url or Config.REDIS_URL, decode_responses=True)
+            self.redis_client.ping()
+        except Exception as e:
+            logger.warning(f"LLM call cache running without Redis: {e}")
+            self.redis_client = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, call_name: str, model: str, prompt_version: str,
+                 cache_input: str, context: str = "") -> str:
+        """
+        Args:
+            call_name: Which classifier ('scope_check', 'route', ...)
+            model: Model name
+            prompt_version: Version of the prompt template (bump on edits)
+            cache_input: The user-dependent input (normalized here)
+            context: Other data baked into the prompt (e.g. the FAQ list)
+        """
+        context_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()[:12] if context else ""
+        digest = hashlib.sha1(
+            f"{model}\x00{prompt_version}\x00{context_hash}\x00{normalize_text(cache_input)}".encode("utf-8")
+        ).hexdigest()
+        return f"{LLM_CALL_KEY_PREFIX}{call_name}:{digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached completion text or None"""
+        text = self.local.get(key)
+        if text is None and self.redis_client:
+            try:
+                text = self.redis_client.get(key)
+                if text is not None:
+                    self.local.set(key, text)
+            except Exception as e:
+                logger.debug(f"LLM call cache read failed: {e}")
+
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def set(self, key: str, text: str):
+        """Store completion text"""
+        self.local.set(key, text)
+        if self.redis_client:
+            try:
+                self.redis_client.setex(key, self.ttl_seconds, text)
+            except Exception as e:
+                logger.debug(f"LLM call cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss statistics"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+# Singleton instance
+_llm_call_cache_instance: Optional[LLMCallCache] = None
+
+
+def get_llm_call_cache() -> Optional[LLMCallCache]:
+    """
+    Get or create LLM call cache singleton
+    """
+    global _llm_call_cache_instance
+
+    if not Config.ENABLE_LLM_CALL_CACHE:
+        return None
+
+    if _llm_call_cache_instance is None:
+        try:
+            _llm_call_cache_instance = LLMCallCache()
+        except Exception as e:
+            logger.error(f"Failed to initialize LLM call cache: {e}")
+            return None
+
+    return _llm_call_cache_instance
+
+
+def cached_chat_completion(
+    client,
+    call_name: str,
+    prompt_version: str,
+    cache_input: str,
+    context: str = "",
+    **create_kwargs
+) -> str:
+    """
+    chat.completions.create() returning the stripped message text,
+    served from the LLM call cache when the same input was classified before
+
+    Args:
+        client: OpenAI client
+        call_name: Which classifier is calling
+        prompt_version: Version of the caller's prompt template
+        cache_input: The user-dependent part of the prompt (usually the query)
+        context: Other data baked into the prompt
+        **create_kwargs: Arguments for chat.completions.create (model, messages, ...)
+    """
+    cache = get_llm_call_cache()
+    key = None
+    if cache is not None:
+        key = cache.make_key(call_name, create_kwargs.get('model', ''), prompt_version,
+                             cache_input, context)
+        text = cache.get(key)
+        if text is not None:
+            logger.debug(f"LLM call cache hit ({call_name})")
+            return text
+
+    response = client.chat.completions.create(**create_kwargs)
+    text = response.choices[0].message.content.strip()
+
+    if cache is not None:
+        cache.set(key, text)
+    return text
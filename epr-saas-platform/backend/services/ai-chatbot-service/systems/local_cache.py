@@ -0,0 +1,147 @@
+"""
+In-process LRU Cache with TTL
+Small thread-safe building block for per-worker memoization
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLRUCache:
+    """
+    Thread-safe LRU cache with TTL and an optional byte budget
+
+    Eviction is TTL-aware: when the cache is over its entry or byte
+    budget, expired entries are dropped first, then the least recently
+    used ones.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """
+        Args:
+            max_entries: Maximum number of entries kept
+            ttl_seconds: Default entry lifetime (None = no expiry)
+            max_bytes: Total size budget (None = unbounded)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size_bytes)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _pop(self, key: Hashable):
+        """Remove an entry and release its bytes (lock held)"""
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def _over_budget(self) -> bool:
+        if len(self._data) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _evict(self):
+        """Drop expired entries, then LRU entries, until within budget (lock held)"""
+        if not self._over_budget():
+            return
+
+        now = time.time()
+        expired = [k for k, (_, exp, _) in self._data.items() if exp is not None and exp <= now]
+        for key in expired:
+            self._pop(key)
+
+        while self._data and self._over_budget():
+            key = next(iter(self._data))
+            self._pop(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value (and mark it recently used)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, _ = item
+            if expires_at is not None and expires_at <= time.time():
+                self._pop(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_expiry(self, key: Hashable) -> Optional[float]:
+        """Expiry timestamp of a live entry (None if missing or no TTL)"""
+        with self._lock:
+            item = self._data.get(key)
+            return item[1] if item else None
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        size_bytes: int = 0
+    ):
+        """
+        Insert or replace a value
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Lifetime for this entry (defaults to the cache TTL)
+            size_bytes: Approximate size counted against max_bytes
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.time() + ttl if ttl else None
+
+        if self.max_bytes is not None and size_bytes > self.max_bytes:
+            return
+
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires_at, size_bytes)
+            self._bytes += size_bytes
+            self._evict()
+
+    def delete(self, key: Hashable):
+        """Remove a key if present"""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
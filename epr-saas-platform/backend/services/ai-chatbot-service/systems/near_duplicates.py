@@ -0,0 +1,163 @@
+"""
+Near-Duplicate Detection
+MinHash signatures over word shingles, used to drop repeated legal text at
+ingestion and to collapse near-identical candidates before reranking
+"""
+import base64
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Dict, List, Optional
+import numpy as np
+from llama_index.core.schema import NodeWithScore
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+MINHASH_METADATA_KEY = "minhash"
+NUM_PERMUTATIONS = 64
+SHINGLE_SIZE = 3
+# LSH: 16 bands x 4 rows flags pairs from about 0.5 Jaccard; candidates are then verified
+LSH_BANDS = 16
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+_PRIME = np.uint64(4294967291)  # Largest prime below 2^32
+_rng = np.random.default_rng(20220110)  # Fixed: signatures are persisted
+# a, b < 2^31 and shingle hashes < 2^32 keep a*x + b inside uint64
+_A = _rng.integers(1, 1 << 31, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """32-bit hashes of the text's overlapping word 3-grams (the words if shorter)"""
+    words = _WORD_PATTERN.findall(unicodedata.normalize("NFC", text or "").lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) <= SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest() for s in shingles)
+    return np.frombuffer(digests, dtype="<u4").astype(np.uint64)
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """
+    MinHash signature (NUM_PERMUTATIONS uint32 values), None for empty text
+
+    The share of equal positions between two signatures estimates the
+    Jaccard similarity of the texts' shingle sets.
+    """
+    hashes = _shingle_hashes(text)
+    if not len(hashes):
+        return None
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / NUM_PERMUTATIONS
+
+
+def encode_signature(signature: np.ndarray) -> str:
+    """Metadata form of a signature (base64 of little-endian uint32s)"""
+    return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+
+def decode_signature(value: str) -> Optional[np.ndarray]:
+    try:
+        signature = np.frombuffer(base64.b64decode(value), dtype="<u4")
+    except (TypeError, ValueError):
+        return None
+    return signature if len(signature) == NUM_PERMUTATIONS else None
+
+
+def node_signature(node) -> Optional[np.ndarray]:
+    """Stored signature of a node, computed from its text if it has none"""
+    stored = (node.metadata or {}).get(MINHASH_METADATA_KEY)
+    if stored:
+        signature = decode_signature(stored)
+        if signature is not None:
+            return signature
+    return minhash(node.get_content())
+
+
+class MinHashIndex:
+    """
+    Finds stored signatures similar to a new one
+
+    LSH banding: signatures agreeing on every row of some band become
+    candidates, and only candidates are compared in full.
+    """
+
+    def __init__(self, threshold: Optional[float] = None):
+        """
+        Args:
+            threshold: Smallest estimated Jaccard similarity still a duplicate
+                (defaults to Config.NEAR_DUPLICATE_THRESHOLD)
+        """
+        self.threshold = Config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self._rows = NUM_PERMUTATIONS // LSH_BANDS
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(LSH_BANDS)]
+        self._signatures: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self._rows:(i + 1) * self._rows].tobytes() for i in range(LSH_BANDS)]
+
+    def find(self, signature: np.ndarray) -> Optional[int]:
+        """Position of a stored near-duplicate of `signature`, or None"""
+        checked = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            for position in bucket.get(key, ()):
+                if position in checked:
+                    continue
+                checked.add(position)
+                if similarity(self._signatures[position], signature) >= self.threshold:
+                    return position
+        return None
+
+    def add(self, signature: np.ndarray) -> int:
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(position)
+        return position
+
+    def add_if_new(self, signature: np.ndarray) -> bool:
+        """Add a signature unless a near-duplicate is already stored"""
+        if self.find(signature) is not None:
+            return False
+        self.add(signature)
+        return True
+
+
+def collapse_near_duplicates(
+    nodes: List[NodeWithScore],
+    threshold: Optional[float] = None
+) -> List[NodeWithScore]:
+    """
+    Keep only the best-ranked node of each near-duplicate cluster
+
+    Args:
+        nodes: Candidates, best first
+        threshold: Smallest estimated Jaccard similarity still a duplicate
+
+    Returns:
+        Candidates in the same order, near-duplicates of a better one removed
+    """
+    index = MinHashIndex(threshold)
+    kept = []
+    for node_with_score in nodes:
+        signature = node_signature(node_with_score.node)
+        if signature is None or index.add_if_new(signature):
+            kept.append(node_with_score)
+
+    if len(kept) < len(nodes):
+        logger.debug(f"Collapsed {len(nodes) - len(kept)} near-duplicate candidates")
+    return kept
@@ -6,9 +6,13 @@ import logging
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from config import Config
+from systems.llm_call_cache import cached_chat_completion
 
 logger = logging.getLogger(__name__)
 
+# Bump when the routing prompt changes (invalidates cached decisions)
+ROUTING_PROMPT_VERSION = "1"
+
 
 @dataclass
 class QueryProfile:
@@ -286,15 +290,14 @@ Trả về JSON:
     "reasoning": "Lý do ngắn gọn"
 }}"""
 
-            response = self.llm_client.chat.completions.create(
+            result = cached_chat_completion(
+                self.llm_client, "route", ROUTING_PROMPT_VERSION, query,
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0,
                 max_tokens=200
             )
 
-            result = response.choices[0].message.content.strip()
-
             # Parse JSON
             import re
             import json
@@ -0,0 +1,120 @@
+"""
+Rank Fusion
+Merges any number of ranked lists (query variants x retrievers) into one
+bounded, ordered candidate list with weighted RRF or normalized scores
+"""
+import logging
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Sequence, Tuple
+from llama_index.core.schema import NodeWithScore
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+FUSION_METHODS = ("rrf", "score")
+
+
+@dataclass
+class RankedList:
+    """One retriever's results for one query, best first"""
+    items: Sequence[Tuple[Hashable, float]]  # (key, score)
+    weight: float = 1.0
+
+
+def _contributions(ranking: RankedList, method: str, k: int) -> List[Tuple[Hashable, float]]:
+    """Per-item share of one list in the fused score"""
+    if method == "rrf":
+        # Σ weight * 1/(k + rank)
+        return [(key, ranking.weight * (1 / (k + rank))) for rank, (key, _) in enumerate(ranking.items, 1)]
+
+    # Min-max normalized scores; a list of equal scores counts fully
+    scores = [score if score is not None else 0.0 for _, score in ranking.items]
+    low, high = min(scores), max(scores)
+    span = high - low
+    return [
+        (key, ranking.weight * ((score - low) / span if span > 0 else 1.0))
+        for (key, _), score in zip(ranking.items, scores)
+    ]
+
+
+def fuse_rankings(
+    rankings: Sequence[RankedList],
+    method: str = "rrf",
+    k: int = 60,
+    limit: Optional[int] = None
+) -> List[Tuple[Hashable, float]]:
+    """
+    Weighted fusion of ranked lists
+
+    A key counts once per list (at its best rank). Equal fused scores keep
+    first-appearance order: earlier lists first, then better ranks.
+
+    Args:
+        rankings: Lists to fuse
+        method: "rrf" (rank based) or "score" (min-max normalized scores)
+        k: RRF constant (typically 60)
+        limit: Keep only the best `limit` keys
+
+    Returns:
+        (key, fused score) tuples, best first
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    fused = {}
+    for ranking in rankings:
+        if not ranking.items:
+            continue
+        seen = set()
+        for key, share in _contributions(ranking, method, k):
+            if key in seen:
+                continue
+            seen.add(key)
+            fused[key] = fused.get(key, 0.0) + share
+
+    # sorted() is stable, so ties stay in first-appearance order
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return ordered[:limit] if limit else ordered
+
+
+def fuse_nodes(
+    node_lists: Sequence[List[NodeWithScore]],
+    weights: Optional[Sequence[float]] = None,
+    method: Optional[str] = None,
+    k: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[NodeWithScore]:
+    """
+    Fuse ranked NodeWithScore lists (e.g. one per query variant) by node ID
+
+    Args:
+        node_lists: Ranked lists, best first
+        weights: Weight per list (default 1.0 each)
+        method: Fusion method (defaults to Config.RANK_FUSION_METHOD)
+        k: RRF constant (defaults to Config.RANK_FUSION_K)
+        limit: Maximum candidates returned
+
+    Returns:
+        Unique nodes carrying their fused score, best first
+    """
+    weights = weights or [1.0] * len(node_lists)
+    nodes_by_id = {}
+    rankings = []
+    for nodes, weight in zip(node_lists, weights):
+        items = []
+        for node_with_score in nodes:
+            node_id = node_with_score.node.id_
+            nodes_by_id.setdefault(node_id, node_with_score.node)
+            items.append((node_id, node_with_score.score))
+        rankings.append(RankedList(items, weight))
+
+    fused = fuse_rankings(
+        rankings,
+        method=method or Config.RANK_FUSION_METHOD,
+        k=k or Config.RANK_FUSION_K,
+        limit=limit
+    )
+    logger.debug(f"Fused {sum(len(nodes) for nodes in node_lists)} results "
+                 f"from {len(node_lists)} lists into {len(fused)}")
+    return [NodeWithScore(node=nodes_by_id[node_id], score=score) for node_id, score in fused]
@@ -0,0 +1,387 @@
+"""
+Retrieval Result Cache
+Caches ranked node IDs + scores for retrieval and reranking, separately
+from the final-answer semantic cache. Node text and metadata live in a
+shared node store so cached rankings stay small. Keys carry the corpus
+generation and are tagged with the articles / documents they depend on.
+"""
+import logging
+import hashlib
+import json
+import time
+import uuid
+from typing import Optional, Dict, List, Tuple, Iterable
+import redis
+from llama_index.core.schema import NodeWithScore, TextNode
+from config import Config
+from systems.local_cache import LocalLRUCache
+from systems.embedding_service import normalize_text
+from systems.corpus_version import get_corpus_registry, source_tags, invalidation_tags
+
+logger = logging.getLogger(__name__)
+
+
+RETRIEVAL_KEY_PREFIX = "retrieval_cache:"
+NODE_KEY_PREFIX = "node_store:"
+EVICTION_STREAM_KEY = "retrieval_cache:evictions"
+
+
+def node_id_of(node) -> str:
+    """ID of a NodeWithScore / node"""
+    inner = node.node if hasattr(node, 'node') else node
+    return inner.node_id
+
+
+class NodeStore:
+    """
+    Node ID → (text, metadata) store
+    In-process LRU of TextNode objects backed by Redis hashes
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        ttl_seconds: int = None,
+        max_entries: int = 20000,
+        registry=None
+    ):
+        """
+        Args:
+            redis_client: Redis client (decode_responses=True) or None for local-only
+            ttl_seconds: Lifetime of node records in Redis
+            max_entries: Size of the in-process tier
+            registry: Optional CorpusRegistry used to tag nodes by source
+        """
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds or Config.NODE_STORE_TTL_SECONDS
+        self.local = LocalLRUCache(max_entries=max_entries, ttl_seconds=self.ttl_seconds)
+        self.registry = registry
+
+    def put_nodes(self, nodes: Iterable):
+        """Remember text + metadata for nodes returned by a retriever"""
+        pipe = self.redis_client.pipeline(transaction=False) if self.redis_client else None
+        for item in nodes:
+            node = item.node if hasattr(item, 'node') else item
+            node_id = node.node_id
+            if self.local.get(node_id) is not None:
+                continue
+
+            text_node = TextNode(
+                text=node.get_content(),
+                id_=node_id,
+                metadata=dict(node.metadata or {})
+            )
+            self.local.set(node_id, text_node)
+
+            if pipe is not None:
+                key = f"{NODE_KEY_PREFIX}{node_id}"
+                pipe.hset(key, mapping={
+                    'text': text_node.text,
+                    'metadata': json.dumps(text_node.metadata, ensure_ascii=False, default=str)
+                })
+                pipe.expire(key, self.ttl_seconds)
+                if self.registry is not None:
+                    self.registry.tag('node', node_id, source_tags([text_node.metadata]),
+                                      self.ttl_seconds, pipe=pipe)
+
+        if pipe is not None:
+            try:
+                pipe.execute()
+            except Exception as e:
+                logger.debug(f"Node store write failed: {e}")
+
+    def get_nodes(self, node_ids: List[str]) -> Dict[str, TextNode]:
+        """Resolve node IDs (local tier first, then one Redis pipeline)"""
+        found = {}
+        missing = []
+        for node_id in node_ids:
+            node = self.local.get(node_id)
+            if node is not None:
+                found[node_id] = node
+            else:
+                missing.append(node_id)
+
+        if missing and self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for node_id in missing:
+                    pipe.hmget(f"{NODE_KEY_PREFIX}{node_id}", ['text', 'metadata'])
+                for node_id, (text, metadata) in zip(missing, pipe.execute()):
+                    if text is None:
+                        continue
+                    node = TextNode(
+                        text=text,
+                        id_=node_id,
+                        metadata=json.loads(metadata) if metadata else {}
+                    )
+                    self.local.set(node_id, node)
+                    found[node_id] = node
+            except Exception as e:
+                logger.debug(f"Node store read failed: {e}")
+
+        return found
+
+    def drop_local(self, node_ids: Iterable[str]):
+        """Forget the in-process copies of nodes (deleted by another worker)"""
+        for node_id in node_ids:
+            self.local.delete(node_id)
+
+    def delete_nodes(self, node_ids: List[str]):
+        """Forget nodes whose source text changed"""
+        self.drop_local(node_ids)
+        if node_ids and self.redis_client:
+            try:
+                self.redis_client.unlink(*[f"{NODE_KEY_PREFIX}{node_id}" for node_id in node_ids])
+            except Exception as e:
+                logger.debug(f"Node store delete failed: {e}")
+
+
+class RetrievalCache:
+    """
+    Cache of ranked (node_id, score) lists keyed by
+    (normalized query or variant, strategy, top_k, corpus generation)
+
+    Targeted invalidations are published on a Redis stream; every worker
+    applies them to its in-process rankings and nodes before reading.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = None,
+        ttl_seconds: int = None,
+        corpus_version: str = None
+    ):
+        """
+        Args:
+            redis_url: Redis connection URL
+            ttl_seconds: Lifetime of cached rankings
+            corpus_version: Fixed corpus identifier baked into every key
+                (defaults to the shared corpus generation in Redis)
+        """
+        self.ttl_seconds = ttl_seconds or Config.RETRIEVAL_CACHE_TTL_SECONDS
+        self._corpus_version = corpus_version
+        self.registry = get_corpus_registry()
+
+        try:
+            self.redis_client = redis.from_url(
+                redis_url or Config.REDIS_URL,
+                decode_responses=True
+            )
+            self.redis_client.ping()
+        except Exception as e:
+            logger.warning(f"Retrieval cache running without Redis: {e}")
+            self.redis_client = None
+
+        self.local = LocalLRUCache(
+            max_entries=Config.RETRIEVAL_CACHE_LOCAL_ENTRIES,
+            ttl_seconds=self.ttl_seconds
+        )
+        self.node_store = NodeStore(self.redis_client, registry=self.registry)
+
+        # Evictions made by other workers (read from the stream position at startup)
+        self._instance_id = uuid.uuid4().hex
+        self._stream_last_id = "0-0"
+        self._last_sync = 0.0
+        if self.redis_client:
+            try:
+                latest = self.redis_client.xrevrange(EVICTION_STREAM_KEY, count=1)
+                self._stream_last_id = latest[0][0] if latest else "0-0"
+            except Exception as e:
+                logger.debug(f"Retrieval cache eviction stream unavailable: {e}")
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def corpus_version(self) -> str:
+        """Corpus generation the cache currently reads and writes"""
+        return self._corpus_version or self.registry.get_generation()
+
+    # ============================================
+    # KEYS & RAW RANKINGS
+    # ============================================
+
+    def make_key(self, query: str, strategy: str, top_k: int, extra: str = "") -> str:
+        """
+        Build cache key for a ranking
+
+        Args:
+            query: Query text or transform variant
+            strategy: Retrieval/rerank strategy name
+            top_k: Result size
+            extra: Anything else the ranking depends on (weights, candidates)
+        """
+        digest = hashlib.sha1(
+            f"{strategy}\x00{top_k}\x00{extra}\x00{normalize_text(query)}".encode("utf-8")
+        ).hexdigest()
+        return f"{RETRIEVAL_KEY_PREFIX}{self.corpus_version}:{digest}"
+
+    def get_ranked(self, key: str) -> Optional[List[Tuple[str, float]]]:
+        """Cached [(node_id, score), ...] or None"""
+        self._sync_evictions()
+        ranked = self.local.get(key)
+        if ranked is None and self.redis_client:
+            try:
+                raw = self.redis_client.get(key)
+                if raw:
+                    ranked = [tuple(item) for item in json.loads(raw)]
+                    self.local.set(key, ranked)
+            except Exception as e:
+                logger.debug(f"Retrieval cache read failed: {e}")
+
+        if ranked is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return ranked
+
+    def set_ranked(self, key: str, ranked: List[Tuple[str, float]], nodes: Optional[List] = None):
+        """
+        Store a ranking
+
+        Args:
+            key: Key from make_key()
+            ranked: [(node_id, score), ...]
+            nodes: The ranked nodes, used to tag the key by article / document
+        """
+        if not self.registry.indexes_current():
+            logger.debug("Indexes behind the latest corpus change, ranking not cached")
+            return
+
+        self.local.set(key, ranked)
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, self.ttl_seconds, json.dumps(ranked))
+                if nodes:
+                    tags = source_tags((n.node if hasattr(n, 'node') else n).metadata for n in nodes)
+                    self.registry.tag('retrieval', key, tags, self.ttl_seconds, pipe=pipe)
+                pipe.execute()
+            except Exception as e:
+                logger.debug(f"Retrieval cache write failed: {e}")
+
+    # ============================================
+    # NODE-LEVEL HELPERS
+    # ============================================
+
+    def get_nodes(self, key: str) -> Optional[List[NodeWithScore]]:
+        """
+        Rebuild a cached ranking as fresh NodeWithScore objects
+        Returns None if the ranking or any of its nodes is unavailable
+        """
+        ranked = self.get_ranked(key)
+        if ranked is None:
+            return None
+
+        nodes = self.node_store.get_nodes([node_id for node_id, _ in ranked])
+        if len(nodes) < len(ranked):
+            logger.debug("Retrieval cache hit with evicted nodes, treating as miss")
+            self.hits -= 1
+            self.misses += 1
+            return None
+
+        return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in ranked]
+
+    def set_nodes(self, key: str, nodes: List):
+        """Store a ranking and the nodes it references"""
+        self.node_store.put_nodes(nodes)
+        self.set_ranked(key, [(node_id_of(n), float(n.score or 0.0)) for n in nodes], nodes=nodes)
+
+    # ============================================
+    # INVALIDATION
+    # ============================================
+
+    def _sync_evictions(self):
+        """
+        Apply evictions published by other workers since the last sync
+        """
+        if not self.redis_client:
+            return
+
+        now = time.time()
+        if (now - self._last_sync) * 1000 < Config.CACHE_INDEX_SYNC_INTERVAL_MS:
+            return
+        self._last_sync = now
+
+        try:
+            response = self.redis_client.xread(
+                {EVICTION_STREAM_KEY: self._stream_last_id},
+                count=Config.CACHE_INDEX_STREAM_MAXLEN
+            )
+        except Exception as e:
+            logger.debug(f"Retrieval cache eviction sync failed: {e}")
+            return
+
+        for _, events in response or []:
+            for event_id, fields in events:
+                self._stream_last_id = event_id
+                if fields.get('origin') == self._instance_id:
+                    continue
+                for key in json.loads(fields.get('rankings') or "[]"):
+                    self.local.delete(key)
+                self.node_store.drop_local(json.loads(fields.get('nodes') or "[]"))
+
+    def invalidate_sources(self, dieus: List = None, documents: List = None) -> int:
+        """
+        Evict rankings and nodes that depend on changed articles / documents,
+        here and (through the eviction stream) in every other worker
+
+        Returns:
+            Number of rankings evicted
+        """
+        tags = invalidation_tags(dieus, documents)
+        keys = self.registry.pop_tagged('retrieval', tags)
+        node_ids = self.registry.pop_tagged('node', tags)
+        for key in keys:
+            self.local.delete(key)
+        self.node_store.delete_nodes(node_ids)
+
+        if self.redis_client:
+            if keys:
+                self.redis_client.unlink(*keys)
+            if keys or node_ids:
+                self.redis_client.xadd(
+                    EVICTION_STREAM_KEY,
+                    {'origin': self._instance_id,
+                     'rankings': json.dumps(keys),
+                     'nodes': json.dumps(node_ids)},
+                    maxlen=Config.CACHE_INDEX_STREAM_MAXLEN,
+                    approximate=True
+                )
+
+        logger.info(f"Retrieval cache: evicted {len(keys)} rankings for {sorted(tags)}")
+        return len(keys)
+
+    def get_stats(self) -> Dict:
+        """Hit/miss statistics"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'corpus_version': self.corpus_version,
+            'enabled': True
+        }
+
+
+# Singleton instance
+_retrieval_cache_instance: Optional[RetrievalCache] = None
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Get or create retrieval cache singleton
+    """
+    global _retrieval_cache_instance
+
+    if not Config.ENABLE_RETRIEVAL_CACHE:
+        return None
+
+    if _retrieval_cache_instance is None:
+        try:
+            _retrieval_cache_instance = RetrievalCache()
+        except Exception as e:
+            logger.error(f"Failed to initialize retrieval cache: {e}")
+            return None
+
+    return _retrieval_cache_instance
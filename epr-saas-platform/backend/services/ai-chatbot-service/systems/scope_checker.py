@@ -5,9 +5,13 @@ import logging
 from typing import Dict
 import openai
 from config import Config
+from systems.llm_call_cache import cached_chat_completion
 
 logger = logging.getLogger(__name__)
 
+# Bump when the classification prompt changes (invalidates cached decisions)
+SCOPE_PROMPT_VERSION = "1"
+
 class ScopeChecker:
     """
     Uses LLM to determine if a question is related to EPR law or off-topic.
@@ -77,8 +81,9 @@ Trả lời theo định dạng JSON:
 
             user_prompt = f"Câu hỏi: {query}"
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
+            # Call OpenAI API (memoized per normalized question)
+            result_text = cached_chat_completion(
+                self.client, "scope_check", SCOPE_PROMPT_VERSION, query,
                 model=Config.LLM_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -88,9 +93,6 @@ Trả lời theo định dạng JSON:
                 max_tokens=150
             )
 
-            # Parse response
-            result_text = response.choices[0].message.content.strip()
-
             # Try to parse as JSON
             import json
             try:
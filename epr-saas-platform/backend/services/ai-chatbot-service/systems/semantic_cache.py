@@ -3,22 +3,59 @@ Semantic Caching Layer
 Caches RAG responses based on semantic similarity of queries
 """
 import logging
-import json
 import hashlib
-from typing import Optional, Dict, Any
+import time
+import uuid
+from typing import Optional, Dict, Any, List
 import redis
-from datetime import timedelta
-from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.core.base.embeddings.base import BaseEmbedding
 import numpy as np
 from config import Config
+from systems.cache_index import CacheVectorIndex
+from systems.local_cache import LocalLRUCache
+from systems import cache_codec
+from systems.embedding_service import get_embedding_service
+from systems.corpus_version import get_corpus_registry, source_tags, invalidation_tags
+from systems.cache_policy import CachePolicy, entry_cost
 
 logger = logging.getLogger(__name__)
 
 
+CACHE_KEY_PREFIX = "semantic_cache:"
+INDEX_STREAM_KEY = "semantic_cache_index:events"
+REFRESH_LOCK_PREFIX = "semantic_cache_index:refresh:"
+SCAN_BATCH_SIZE = 500
+
+
 class SemanticCache:
     """
     Semantic cache that stores query-answer pairs
     and retrieves based on semantic similarity
+
+    Similarity search runs against an in-process CacheVectorIndex.
+    Workers keep their index in sync through a Redis stream of
+    set/delete events, with a periodic SCAN rebuild as a safety net.
+
+    Entries are Redis hashes (see cache_codec) so the vector can be
+    fetched without the response body; version-1 JSON string entries
+    are still readable and are rewritten when the index is rebuilt.
+
+    Decoded bodies are kept in an L1 in-process LRU (byte budget,
+    TTL bounded by the Redis TTL). Hot entries close to expiry are
+    served stale and flagged for a single background refresh.
+
+    Follow-up questions are cached under a conversation context key
+    (see ConversationMemory.get_context_fingerprint): both the exact
+    hash and the similarity search are scoped to that context, while
+    context-free questions ("" key) are shared across sessions.
+
+    Entries record the corpus generation they were answered from and are
+    tagged with the articles / documents cited in their sources, so a
+    re-ingestion only evicts the answers it actually affects.
+
+    Storage is bounded by a CachePolicy: a TinyLFU sketch gates admission
+    once the memory budget is full, and the entries with the lowest
+    frequency x recompute-cost / bytes are evicted first.
     """
 
     def __init__(
@@ -26,7 +63,7 @@ class SemanticCache:
         redis_url: str = None,
         ttl_seconds: int = None,
         similarity_threshold: float = None,
-        embed_model: Optional[OpenAIEmbedding] = None
+        embed_model: Optional[BaseEmbedding] = None
     ):
         """
         Args:
@@ -34,6 +71,7 @@ class SemanticCache:
             ttl_seconds: Time-to-live for cache entries
             similarity_threshold: Minimum cosine similarity for cache hit
             embed_model: Embedding model for query encoding
+                (defaults to the shared memoizing embedding service)
         """
         self.redis_url = redis_url or Config.REDIS_URL
         self.ttl_seconds = ttl_seconds or Config.CACHE_TTL_SECONDS
@@ -43,7 +81,7 @@ class SemanticCache:
         try:
             self.redis_client = redis.from_url(
                 self.redis_url,
-                decode_responses=True
+                decode_responses=False
             )
             # Test connection
             self.redis_client.ping()
@@ -52,16 +90,42 @@ class SemanticCache:
             logger.warning(f"Failed to connect to Redis: {e}. Cache disabled.")
             self.redis_client = None
 
-        # Initialize embedding model
-        self.embed_model = embed_model or OpenAIEmbedding(
-            model="text-embedding-3-small"
-        )
+        # Shared embedding model (memoized across cache, retriever, variants)
+        self.embed_model = embed_model or get_embedding_service()
+
+        self.embedding_dtype = Config.CACHE_EMBEDDING_DTYPE
+        self.corpus_registry = get_corpus_registry()
 
         # Cache stats
         self.hits = 0
         self.misses = 0
         self.total_queries = 0
 
+        # In-process similarity index
+        self.index = CacheVectorIndex()
+        self._instance_id = uuid.uuid4().hex
+        self._stream_last_id = "0-0"
+        self._last_sync = 0.0
+        self._last_rebuild = 0.0
+
+        # L1: decoded bodies in front of Redis
+        self.local_cache = None
+        if Config.ENABLE_L1_CACHE:
+            self.local_cache = LocalLRUCache(
+                max_entries=Config.L1_CACHE_MAX_ENTRIES,
+                max_bytes=Config.L1_CACHE_MAX_BYTES
+            )
+        self._hit_counts = LocalLRUCache(max_entries=Config.L1_CACHE_MAX_ENTRIES * 4)
+        self.stale_hits = 0
+
+        # Admission / eviction under a memory budget
+        self.policy = None
+        if self.redis_client and Config.ENABLE_CACHE_ADMISSION:
+            self.policy = CachePolicy(self.redis_client)
+
+        if self.redis_client:
+            self._rebuild_index()
+
     def _get_query_embedding(self, query: str) -> np.ndarray:
         """
         Get embedding vector for query
@@ -73,42 +137,359 @@ class SemanticCache:
             logger.error(f"Failed to get query embedding: {e}")
             return None
 
-    def _cosine_similarity(
+    def _generate_cache_key(self, query_hash: str) -> str:
+        """Generate Redis key for cache entry"""
+        return f"{CACHE_KEY_PREFIX}{query_hash}"
+
+    def _hash_query(self, query: str, context_key: str = "") -> str:
+        """Generate hash for exact match caching (scoped to a conversation context)"""
+        text = query.lower().strip()
+        if context_key:
+            text = f"{context_key}\x00{text}"
+        return hashlib.md5(text.encode()).hexdigest()
+
+    # ============================================
+    # INDEX MAINTENANCE
+    # ============================================
+
+    def _scan_cache_keys(self):
+        """Iterate cache keys with SCAN (never blocks Redis like KEYS)"""
+        for key in self.redis_client.scan_iter(
+            match=f"{CACHE_KEY_PREFIX}*",
+            count=SCAN_BATCH_SIZE
+        ):
+            yield key.decode() if isinstance(key, bytes) else key
+
+    def _fetch_entry(self, key: str) -> tuple:
+        """
+        Fetch and decode only the body of an entry (L1 first, then Redis)
+        Falls back to the legacy JSON string layout
+
+        Returns:
+            (body dict, expires_at timestamp) or (None, None)
+        """
+        if self.local_cache is not None:
+            body = self.local_cache.get(key)
+            if body is not None:
+                return body, self.local_cache.get_expiry(key)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hmget(key, [cache_codec.FIELD_CODEC, cache_codec.FIELD_BODY])
+        pipe.pttl(key)
+        fields, pttl = pipe.execute(raise_on_error=False)
+
+        if pttl == -2:
+            return None, None
+        ttl = pttl / 1000.0 if isinstance(pttl, int) and pttl > 0 else self.ttl_seconds
+
+        if isinstance(fields, redis.ResponseError):
+            raw = self.redis_client.get(key)
+            legacy = cache_codec.decode_legacy_entry(raw)
+            body = legacy['body'] if legacy else None
+            size = len(raw or b"")
+        else:
+            body = cache_codec.decode_entry_body(fields[0], fields[1])
+            size = len(fields[1] or b"")
+
+        if body is None:
+            return None, None
+
+        if self.local_cache is not None:
+            self.local_cache.set(key, body, ttl_seconds=ttl, size_bytes=size)
+
+        return body, time.time() + ttl
+
+    def _build_hit(
         self,
-        vec1: np.ndarray,
-        vec2: np.ndarray
-    ) -> float:
+        key: str,
+        body: Dict[str, Any],
+        expires_at: Optional[float],
+        hit_type: str
+    ) -> Dict[str, Any]:
         """
-        Calculate cosine similarity between two vectors
+        Copy a cached body for the caller and apply stale-while-revalidate
         """
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+        result = dict(body)
+        if isinstance(result.get('response'), dict):
+            result['response'] = dict(result['response'])
+        result['cache_hit_type'] = hit_type
+
+        hits = (self._hit_counts.get(key) or 0) + 1
+        self._hit_counts.set(key, hits)
+
+        if self.policy is not None and body.get('cache_size'):
+            self.policy.touch(
+                key, self.policy.sketch.estimate(key),
+                body.get('cache_cost', 1.0), body['cache_size']
+            )
 
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
+        if expires_at is not None and expires_at - time.time() <= Config.CACHE_STALE_WINDOW_SECONDS:
+            result['is_stale'] = True
+            self.stale_hits += 1
+            # Follow-up answers can't be recomputed without their conversation
+            refreshable = not body.get('context_key')
+            if refreshable and hits >= Config.CACHE_SWR_MIN_HITS and self._claim_refresh(key):
+                result['needs_refresh'] = True
 
-        return dot_product / (norm1 * norm2)
+        return result
 
-    def _generate_cache_key(self, query_hash: str) -> str:
-        """Generate Redis key for cache entry"""
-        return f"semantic_cache:{query_hash}"
+    def _claim_refresh(self, key: str) -> bool:
+        """Ensure only one worker refreshes a given stale entry"""
+        try:
+            return bool(self.redis_client.set(
+                f"{REFRESH_LOCK_PREFIX}{key}",
+                self._instance_id,
+                nx=True,
+                ex=Config.CACHE_REFRESH_LOCK_SECONDS
+            ))
+        except Exception as e:
+            logger.debug(f"Refresh lock failed for {key}: {e}")
+            return False
+
+    def _write_entry(
+        self,
+        key: str,
+        embedding,
+        body: Dict[str, Any],
+        ttl_seconds: float,
+        pipe,
+        context_key: str = ""
+    ):
+        """Queue the commands that store one hash entry"""
+        mapping = cache_codec.encode_entry(embedding, body, self.embedding_dtype, context_key)
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, max(1, int(ttl_seconds)))
+
+        if self.local_cache is not None:
+            self.local_cache.set(
+                key, body,
+                ttl_seconds=ttl_seconds,
+                size_bytes=len(mapping[cache_codec.FIELD_BODY])
+            )
+
+    def _load_embeddings(self, keys: List[str]) -> int:
+        """
+        Fetch only the vectors for keys in one pipeline and upsert them
+        Legacy JSON entries found on the way are migrated to the hash layout
+
+        Returns:
+            Number of vectors added to the index
+        """
+        if not keys:
+            return 0
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, [
+                cache_codec.FIELD_EMBEDDING,
+                cache_codec.FIELD_DTYPE,
+                cache_codec.FIELD_CONTEXT
+            ])
+            pipe.pttl(key)
+        results = pipe.execute(raise_on_error=False)
+
+        now = time.time()
+        loaded = 0
+        legacy_keys = []
+        for i, key in enumerate(keys):
+            fields, pttl = results[2 * i], results[2 * i + 1]
+            ttl = pttl / 1000.0 if isinstance(pttl, int) and pttl > 0 else self.ttl_seconds
+
+            if isinstance(fields, redis.ResponseError):
+                # WRONGTYPE: version-1 JSON string entry
+                legacy_keys.append((key, ttl))
+                continue
 
-    def _hash_query(self, query: str) -> str:
-        """Generate hash for exact match caching"""
-        return hashlib.md5(query.lower().strip().encode()).hexdigest()
+            try:
+                embedding = cache_codec.decode_entry_embedding(fields[0], fields[1])
+            except Exception as e:
+                logger.debug(f"Error decoding cache entry {key}: {e}")
+                continue
+            if embedding is None:
+                self.index.remove(key)
+                continue
+
+            context_key = cache_codec.decode_entry_context(fields[2])
+            self.index.upsert(key, embedding, now + ttl, context_key)
+            loaded += 1
+
+        if legacy_keys:
+            loaded += self._migrate_legacy_entries(legacy_keys)
+
+        return loaded
+
+    def _migrate_legacy_entries(self, keys_with_ttl: List[tuple]) -> int:
+        """
+        Rewrite version-1 JSON entries in the binary hash layout,
+        preserving their remaining TTL
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, _ in keys_with_ttl:
+            pipe.get(key)
+        raw_entries = pipe.execute(raise_on_error=False)
+
+        now = time.time()
+        migrated = 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (key, ttl), raw in zip(keys_with_ttl, raw_entries):
+            if not isinstance(raw, bytes):
+                continue
+            legacy = cache_codec.decode_legacy_entry(raw)
+            if not legacy or legacy['embedding'] is None:
+                continue
+
+            self._write_entry(key, legacy['embedding'], legacy['body'], ttl, pipe)
+            self.index.upsert(key, legacy['embedding'], now + ttl)
+            migrated += 1
+
+        if migrated:
+            pipe.execute()
+            logger.info(f"Migrated {migrated} legacy semantic cache entries")
+
+        return migrated
+
+    def _rebuild_index(self):
+        """
+        Rebuild the in-process index from Redis using SCAN
+        """
+        try:
+            # Remember the stream position first so no event is missed
+            latest = self.redis_client.xrevrange(INDEX_STREAM_KEY, count=1)
+            self._stream_last_id = latest[0][0].decode() if latest else "0-0"
+
+            self.index.clear()
+            batch = []
+            loaded = 0
+            for key in self._scan_cache_keys():
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    loaded += self._load_embeddings(batch)
+                    batch = []
+            loaded += self._load_embeddings(batch)
+
+            if self.policy is not None:
+                self.policy.reconcile()
+
+            self._last_rebuild = self._last_sync = time.time()
+            logger.info(f"Semantic cache index rebuilt with {loaded} entries")
+
+        except Exception as e:
+            logger.warning(f"Semantic cache index rebuild failed: {e}")
+
+    def _publish_event(self, op: str, key: str = "", pipe=None):
+        """Append an index event to the shared Redis stream"""
+        target = pipe if pipe is not None else self.redis_client
+        target.xadd(
+            INDEX_STREAM_KEY,
+            {'op': op, 'key': key, 'origin': self._instance_id},
+            maxlen=Config.CACHE_INDEX_STREAM_MAXLEN,
+            approximate=True
+        )
+
+    def _drop_local(self, key: str):
+        """Forget the L1 copy of an entry changed elsewhere"""
+        if self.local_cache is not None:
+            self.local_cache.delete(key)
+
+    def _evict_keys(self, keys: List[str]):
+        """Delete entries everywhere and tell the other workers"""
+        if not keys:
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*keys)
+        for key in keys:
+            self._publish_event('del', key, pipe=pipe)
+        pipe.execute()
+
+        for key in keys:
+            self.index.remove(key)
+            self._drop_local(key)
+
+        if self.policy is not None:
+            self.policy.forget(keys)
+
+    def _is_current(self, key: str, body: Dict[str, Any]) -> bool:
+        """
+        Check an entry was answered from the current corpus generation
+        Entries from older generations are evicted on sight
+        """
+        generation = body.get('corpus_generation', Config.CORPUS_VERSION)
+        if generation == self.corpus_registry.get_generation():
+            return True
+
+        logger.debug(f"Evicting cache entry from corpus generation {generation}: {key}")
+        self._evict_keys([key])
+        return False
+
+    def _sync_index(self):
+        """
+        Apply index events written by other workers since the last sync
+        """
+        now = time.time()
+        if now - self._last_rebuild >= Config.CACHE_INDEX_REBUILD_SECONDS:
+            self._rebuild_index()
+            return
+
+        if (now - self._last_sync) * 1000 < Config.CACHE_INDEX_SYNC_INTERVAL_MS:
+            return
+        self._last_sync = now
+
+        try:
+            response = self.redis_client.xread(
+                {INDEX_STREAM_KEY: self._stream_last_id},
+                count=Config.CACHE_INDEX_STREAM_MAXLEN
+            )
+        except Exception as e:
+            logger.debug(f"Semantic cache index sync failed: {e}")
+            return
+
+        pending_keys = []
+        for _, events in response or []:
+            for event_id, raw_fields in events:
+                self._stream_last_id = event_id.decode()
+                fields = {k.decode(): v.decode() for k, v in raw_fields.items()}
+                if fields.get('origin') == self._instance_id:
+                    continue
+
+                op = fields.get('op')
+                key = fields.get('key', '')
+                if op == 'set':
+                    pending_keys.append(key)
+                    self._drop_local(key)
+                elif op == 'del':
+                    self.index.remove(key)
+                    self._drop_local(key)
+                elif op == 'clear':
+                    self.index.clear()
+                    if self.local_cache is not None:
+                        self.local_cache.clear()
+                    pending_keys = []
+
+        if pending_keys:
+            self._load_embeddings(list(dict.fromkeys(pending_keys)))
+
+        self.index.prune_expired(now)
+
+    # ============================================
+    # CACHE OPERATIONS
+    # ============================================
 
     def get(
         self,
         query: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        context_key: str = ""
     ) -> Optional[Dict[str, Any]]:
         """
         Retrieve cached response for query
 
         Args:
             query: User query
-            session_id: Optional session ID for context-aware caching
+            session_id: Optional session ID (informational)
+            context_key: Conversation fingerprint for follow-up questions
+                ("" looks up context-free entries shared by all sessions)
 
         Returns:
             Cached response dict or None if cache miss
@@ -119,17 +500,21 @@ class SemanticCache:
         self.total_queries += 1
 
         try:
+            # Apply other workers' deletions first: L1 would otherwise keep
+            # serving an invalidated exact match until its TTL
+            self._sync_index()
+
             # 1. Try exact match first (fast path)
-            query_hash = self._hash_query(query)
+            query_hash = self._hash_query(query, context_key)
             exact_key = self._generate_cache_key(query_hash)
+            if self.policy is not None:
+                self.policy.record(exact_key)
 
-            cached_data = self.redis_client.get(exact_key)
-            if cached_data:
+            body, expires_at = self._fetch_entry(exact_key)
+            if body and self._is_current(exact_key, body):
                 self.hits += 1
                 logger.info(f"Cache HIT (exact): {query[:50]}...")
-                result = json.loads(cached_data)
-                result['cache_hit_type'] = 'exact'
-                return result
+                return self._build_hit(exact_key, body, expires_at, 'exact')
 
             # 2. Semantic similarity search
             query_embedding = self._get_query_embedding(query)
@@ -137,50 +522,31 @@ class SemanticCache:
                 self.misses += 1
                 return None
 
-            # Get all cache keys
-            cache_keys = self.redis_client.keys("semantic_cache:*")
+            # Vectorized top-1 over the in-process index
+            best_key, best_similarity = self.index.search(
+                query_embedding, context_key=context_key
+            )
 
             best_match = None
-            best_similarity = 0.0
-
-            for cache_key in cache_keys[:100]:  # Limit search to avoid performance issues
-                try:
-                    cached_data = self.redis_client.get(cache_key)
-                    if not cached_data:
-                        continue
-
-                    cached_entry = json.loads(cached_data)
-
-                    # Get cached embedding
-                    cached_embedding_list = cached_entry.get('query_embedding')
-                    if not cached_embedding_list:
-                        continue
-
-                    cached_embedding = np.array(cached_embedding_list)
-
-                    # Calculate similarity
-                    similarity = self._cosine_similarity(
-                        query_embedding,
-                        cached_embedding
-                    )
-
-                    # Update best match
-                    if similarity > best_similarity:
-                        best_similarity = similarity
-                        best_match = cached_entry
-
-                except Exception as e:
-                    logger.debug(f"Error processing cache entry: {e}")
-                    continue
+            expires_at = None
+            if best_key and best_similarity >= self.similarity_threshold:
+                best_match, expires_at = self._fetch_entry(best_key)
+                if not best_match:
+                    # Entry expired or was evicted since it was indexed
+                    self.index.remove(best_key)
+                elif not self._is_current(best_key, best_match):
+                    best_match = None
 
             # Check if best match exceeds threshold
             if best_match and best_similarity >= self.similarity_threshold:
                 self.hits += 1
+                if self.policy is not None:
+                    self.policy.record(best_key)
                 logger.info(f"Cache HIT (semantic): {query[:50]}... "
                           f"(similarity: {best_similarity:.3f})")
-                best_match['cache_hit_type'] = 'semantic'
-                best_match['similarity_score'] = best_similarity
-                return best_match
+                result = self._build_hit(best_key, best_match, expires_at, 'semantic')
+                result['similarity_score'] = best_similarity
+                return result
 
             # Cache miss
             self.misses += 1
@@ -197,7 +563,9 @@ class SemanticCache:
         self,
         query: str,
         response: Dict[str, Any],
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        context_key: str = "",
+        compute_ms: Optional[float] = None
     ):
         """
         Store query-response pair in cache
@@ -206,9 +574,14 @@ class SemanticCache:
             query: User query
             response: RAG response dict
             session_id: Optional session ID
+            context_key: Conversation fingerprint the answer depends on
+            compute_ms: Time it took to produce the response (recompute cost)
         """
         if not self.redis_client:
             return
+        if not self.corpus_registry.indexes_current():
+            logger.debug("Indexes behind the latest corpus change, answer not cached")
+            return
 
         try:
             # Get query embedding
@@ -217,32 +590,55 @@ class SemanticCache:
                 logger.warning("Failed to get embedding, skipping cache")
                 return
 
-            # Prepare cache entry
+            # Prepare cache entry (embedding is stored in its own field)
             cache_entry = {
                 'query': query,
-                'query_embedding': query_embedding.tolist(),
                 'response': response,
                 'session_id': session_id,
-                'cached_at': str(timedelta())
+                'context_key': context_key,
+                'corpus_generation': self.corpus_registry.get_generation(),
+                'cached_at': time.time()
             }
 
             # Generate cache key
-            query_hash = self._hash_query(query)
+            query_hash = self._hash_query(query, context_key)
             cache_key = self._generate_cache_key(query_hash)
 
-            # Store in Redis with TTL
-            self.redis_client.setex(
-                cache_key,
-                self.ttl_seconds,
-                json.dumps(cache_entry)
-            )
+            # Admission: a full cache only takes entries worth more than its weakest one
+            if self.policy is not None:
+                tokens = response.get('tokens_used', 0) if isinstance(response, dict) else 0
+                cost = entry_cost(compute_ms, tokens)
+                size = (len(cache_codec.encode_embedding(query_embedding, self.embedding_dtype))
+                        + len(cache_codec.encode_body(cache_entry)))
+                if not self.policy.admit(cache_key, cost, size):
+                    logger.debug(f"Cache admission rejected: {query[:50]}...")
+                    return
+                cache_entry['cache_cost'] = cost
+                cache_entry['cache_size'] = size
+
+            # Store in Redis with TTL and announce it to other workers
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._write_entry(cache_key, query_embedding, cache_entry, self.ttl_seconds, pipe,
+                              context_key=context_key)
+            self._publish_event('set', cache_key, pipe=pipe)
+            if isinstance(response, dict):
+                tags = source_tags(src.get('metadata') for src in response.get('sources') or [])
+                self.corpus_registry.tag('answer', cache_key, tags, self.ttl_seconds, pipe=pipe)
+            pipe.execute()
+
+            self.index.upsert(cache_key, query_embedding, time.time() + self.ttl_seconds,
+                              context_key)
+
+            if self.policy is not None:
+                self.policy.on_insert(cache_key, cost, size)
+                self._evict_keys(self.policy.evict_over_budget())
 
             logger.debug(f"Cached response for query: {query[:50]}...")
 
         except Exception as e:
             logger.error(f"Cache set error: {e}")
 
-    def invalidate(self, query: str):
+    def invalidate(self, query: str, context_key: str = ""):
         """
         Invalidate cache entry for specific query
         """
@@ -250,13 +646,37 @@ class SemanticCache:
             return
 
         try:
-            query_hash = self._hash_query(query)
+            query_hash = self._hash_query(query, context_key)
             cache_key = self._generate_cache_key(query_hash)
-            self.redis_client.delete(cache_key)
+            self._evict_keys([cache_key])
             logger.info(f"Invalidated cache for: {query[:50]}...")
         except Exception as e:
             logger.error(f"Cache invalidate error: {e}")
 
+    def invalidate_sources(self, dieus: List = None, documents: List = None) -> int:
+        """
+        Invalidate answers whose sources cite changed articles or documents
+
+        Args:
+            dieus: Article numbers (metadata 'dieu') that changed
+            documents: Document names (metadata 'document') that changed
+
+        Returns:
+            Number of entries evicted
+        """
+        if not self.redis_client:
+            return 0
+
+        try:
+            tags = invalidation_tags(dieus, documents)
+            keys = self.corpus_registry.pop_tagged('answer', tags)
+            self._evict_keys(keys)
+            logger.info(f"Invalidated {len(keys)} cache entries for {sorted(tags)}")
+            return len(keys)
+        except Exception as e:
+            logger.error(f"Cache invalidate error: {e}")
+            return 0
+
     def clear_all(self):
         """
         Clear all cache entries
@@ -265,10 +685,23 @@ class SemanticCache:
             return
 
         try:
-            keys = self.redis_client.keys("semantic_cache:*")
-            if keys:
-                self.redis_client.delete(*keys)
-                logger.info(f"Cleared {len(keys)} cache entries")
+            cleared = 0
+            batch = []
+            for key in self._scan_cache_keys():
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    cleared += self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                cleared += self.redis_client.unlink(*batch)
+
+            self._publish_event('clear')
+            if self.policy is not None:
+                self.policy.clear()
+            self.index.clear()
+            if self.local_cache is not None:
+                self.local_cache.clear()
+            logger.info(f"Cleared {cleared} cache entries")
         except Exception as e:
             logger.error(f"Cache clear error: {e}")
 
@@ -286,15 +719,20 @@ class SemanticCache:
             'hits': self.hits,
             'misses': self.misses,
             'hit_rate': hit_rate,
-            'enabled': self.redis_client is not None
+            'enabled': self.redis_client is not None,
+            'index_memory_bytes': self.index.memory_bytes(),
+            'stale_hits': self.stale_hits,
+            'corpus_generation': self.corpus_registry.get_generation(),
+            'policy': self.policy.get_stats() if self.policy is not None else None,
+            'l1': self.local_cache.get_stats() if self.local_cache is not None else None
         }
 
         if self.redis_client:
-            try:
-                cache_keys = self.redis_client.keys("semantic_cache:*")
-                stats['total_entries'] = len(cache_keys)
-            except:
-                stats['total_entries'] = 0
+            # The index mirrors the Redis entries (kept in sync through the
+            # event stream and pruned by TTL), so counting it avoids a SCAN
+            self._sync_index()
+            stats['total_entries'] = len(self.index)
+        stats['index_entries'] = len(self.index)
 
         return stats
 
@@ -303,6 +741,7 @@ class SemanticCache:
         self.hits = 0
         self.misses = 0
         self.total_queries = 0
+        self.stale_hits = 0
         logger.info("Cache statistics reset")
 
 
@@ -310,9 +749,12 @@ class SemanticCache:
 _cache_instance: Optional[SemanticCache] = None
 
 
-def get_semantic_cache() -> Optional[SemanticCache]:
+def get_semantic_cache(embed_model: Optional[BaseEmbedding] = None) -> Optional[SemanticCache]:
     """
     Get or create semantic cache singleton
+
+    Args:
+        embed_model: Embedding model to share with the retrievers
     """
     global _cache_instance
 
@@ -321,7 +763,7 @@ def get_semantic_cache() -> Optional[SemanticCache]:
 
     if _cache_instance is None:
         try:
-            _cache_instance = SemanticCache()
+            _cache_instance = SemanticCache(embed_model=embed_model)
         except Exception as e:
             logger.error(f"Failed to initialize semantic cache: {e}")
             return None
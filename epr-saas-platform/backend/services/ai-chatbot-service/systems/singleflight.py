@@ -0,0 +1,200 @@
+"""
+Singleflight Request Coalescing
+Concurrent identical queries share one pipeline run: within a process via a
+shared future, across workers via a short Redis lock plus a result key
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, Tuple
+import redis
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+SINGLEFLIGHT_PREFIX = "singleflight:"
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key
+
+    The first caller (leader) runs the function. Callers in the same process
+    wait on the leader's future; callers in other workers see the leader's
+    Redis lock and poll for the result it publishes. If the leader fails or
+    takes longer than the wait budget, followers compute for themselves.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = None,
+        lock_seconds: float = None,
+        wait_seconds: float = None,
+        result_ttl_seconds: float = None,
+        poll_interval_ms: int = None
+    ):
+        """
+        Args:
+            redis_url: Redis URL for cross-worker coalescing (local-only if unreachable)
+            lock_seconds: Leader lock lifetime (upper bound on one pipeline run)
+            wait_seconds: How long a follower waits before computing itself
+            result_ttl_seconds: How long a published result stays readable
+            poll_interval_ms: Follower polling interval for remote results
+        """
+        self.lock_ms = int((lock_seconds or Config.SINGLEFLIGHT_LOCK_SECONDS) * 1000)
+        self.wait_seconds = wait_seconds or Config.SINGLEFLIGHT_WAIT_SECONDS
+        self.result_ttl_ms = int((result_ttl_seconds or Config.SINGLEFLIGHT_RESULT_TTL_SECONDS) * 1000)
+        self.poll_interval = (poll_interval_ms or Config.SINGLEFLIGHT_POLL_MS) / 1000.0
+
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Future] = {}
+
+        try:
+            self.redis_client = redis.from_url(redis_url or Config.REDIS_URL, decode_responses=True)
+            self.redis_client.ping()
+        except Exception as e:
+            logger.warning(f"Singleflight running process-local only: {e}")
+            self.redis_client = None
+
+        self.leaders = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key across concurrent callers
+
+        Args:
+            key: Coalescing key (e.g. context key + normalized query)
+            fn: Zero-argument function producing a JSON-serializable result
+
+        Returns:
+            (result, shared) where shared is True if another caller computed it
+        """
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            future = self._flights.get(digest)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._flights[digest] = future
+
+        if not is_leader:
+            try:
+                result = future.result(timeout=self.wait_seconds)
+                self.coalesced_local += 1
+                return copy.deepcopy(result), True
+            except FutureTimeout:
+                logger.warning("Singleflight wait timed out, computing locally")
+            except Exception:
+                logger.info("Singleflight leader failed, computing locally")
+            return fn(), False
+
+        try:
+            result, shared = self._do_across_workers(digest, fn)
+            # Followers get a snapshot; the leader's copy may be mutated by its caller
+            future.set_result(copy.deepcopy(result))
+            return result, shared
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(digest, None)
+
+    # ============================================
+    # CROSS-WORKER COORDINATION
+    # ============================================
+
+    def _do_across_workers(self, digest: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Leader election through a Redis lock; losers poll the winner's result"""
+        if self.redis_client is None:
+            self.leaders += 1
+            return fn(), False
+
+        lock_key = f"{SINGLEFLIGHT_PREFIX}lock:{digest}"
+        deadline = time.time() + self.wait_seconds
+
+        while True:
+            token = uuid.uuid4().hex
+            try:
+                acquired = self.redis_client.set(lock_key, token, nx=True, px=self.lock_ms)
+            except Exception as e:
+                logger.debug(f"Singleflight lock failed: {e}")
+                acquired = None
+                deadline = 0
+
+            if acquired or time.time() >= deadline:
+                self.leaders += 1
+                result = None
+                try:
+                    result = fn()
+                    return result, False
+                finally:
+                    if acquired:
+                        self._publish_and_release(lock_key, digest, token, result)
+
+            result = self._wait_for_result(lock_key, digest, deadline)
+            if result is not None:
+                self.coalesced_remote += 1
+                return result, True
+
+    def _wait_for_result(self, lock_key: str, digest: str, deadline: float) -> Optional[Any]:
+        """
+        Poll for the current leader's result
+
+        Returns None when the leader went away without publishing (caller
+        then tries to take over) or when the wait budget is spent.
+        """
+        try:
+            token = self.redis_client.get(lock_key)
+            while token and time.time() < deadline:
+                raw = self.redis_client.get(f"{SINGLEFLIGHT_PREFIX}result:{digest}:{token}")
+                if raw is not None:
+                    return json.loads(raw)
+                if self.redis_client.get(lock_key) != token:
+                    # Leader finished or died; its result (if any) is already visible
+                    raw = self.redis_client.get(f"{SINGLEFLIGHT_PREFIX}result:{digest}:{token}")
+                    return json.loads(raw) if raw is not None else None
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            logger.debug(f"Singleflight wait failed: {e}")
+        return None
+
+    def _publish_and_release(self, lock_key: str, digest: str, token: str, result: Any):
+        """Publish the result for remote followers, then drop our lock"""
+        try:
+            if result is not None:
+                self.redis_client.set(
+                    f"{SINGLEFLIGHT_PREFIX}result:{digest}:{token}",
+                    json.dumps(result, ensure_ascii=False, default=str),
+                    px=self.result_ttl_ms
+                )
+
+            # Compare-and-delete so an expired lock taken over by another leader survives
+            with self.redis_client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except Exception as e:
+            logger.debug(f"Singleflight release failed: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Coalescing counters"""
+        return {
+            'leaders': self.leaders,
+            'coalesced_local': self.coalesced_local,
+            'coalesced_remote': self.coalesced_remote,
+            'in_flight': len(self._flights)
+        }
@@ -0,0 +1,35 @@
+"""
+Shared pytest fixtures for the AI chatbot service
+"""
+import os
+import sys
+
+import pytest
+import redis
+
+# Service modules import each other from the service root (`from config import Config`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Route every redis.from_url() to one in-memory server, so several
+    clients (one per simulated worker) share the same keyspace
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+
+    def from_url(url, **kwargs):
+        return fakeredis.FakeRedis(server=server, **kwargs)
+
+    monkeypatch.setattr(redis, "from_url", from_url)
+    return server
+
+
+@pytest.fixture
+def corpus_registry(fake_redis, monkeypatch):
+    """Fresh CorpusRegistry singleton on the in-memory Redis"""
+    from systems import corpus_version
+    monkeypatch.setattr(corpus_version, "_registry_instance", None)
+    return corpus_version.get_corpus_registry()
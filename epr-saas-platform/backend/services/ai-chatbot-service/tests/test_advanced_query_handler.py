@@ -0,0 +1,20 @@
+"""
+Tests for the answer payload built by the advanced query handler
+"""
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from handlers.advanced_query_handler import AdvancedQueryHandler
+from systems.near_duplicates import MINHASH_METADATA_KEY
+
+
+def test_sources_do_not_expose_bookkeeping_metadata():
+    handler = AdvancedQueryHandler.__new__(AdvancedQueryHandler)
+    node = TextNode(text="Điều 15 ...", metadata={
+        'dieu': '15', 'document': 'Nghị định 08', 'file_name': 'nd08.pdf', MINHASH_METADATA_KEY: 'A' * 344
+    })
+
+    [source] = handler._format_sources([NodeWithScore(node=node, score=0.8)])
+
+    assert source == {'metadata': {'dieu': '15', 'document': 'Nghị định 08'},
+                      'text': "Điều 15 ...", 'score': 0.8}
+    assert MINHASH_METADATA_KEY in node.metadata  # The stored chunk is untouched
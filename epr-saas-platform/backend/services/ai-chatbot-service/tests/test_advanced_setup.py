@@ -0,0 +1,71 @@
+"""
+Tests for bringing snapshot-loaded indexes up to the current corpus revision
+"""
+import pytest
+
+from retriever.advanced_setup import AdvancedRetrieverSystem
+from retriever.corpus_loader import BM25Corpus
+from retriever.hybrid_retriever import HybridRetriever
+
+
+class RecordingSystem(AdvancedRetrieverSystem):
+    """Keyword index at a given snapshot revision; records index updates"""
+
+    def __init__(self, snapshot_revision: int):
+        super().__init__()
+        corpus = BM25Corpus.build([{'id': 'a', 'text': 'Điều 1 bao bì', 'metadata': {'dieu': '1'}}])
+        corpus.revision = snapshot_revision
+        self.hybrid_retriever = HybridRetriever(None, [], corpus=corpus)
+        self.calls = []
+
+    def _refresh_indexes(self, dieus=None, documents=None, revision=0):
+        self.calls.append(('refresh', dieus, revision))
+        return 0
+
+    def _reload_indexes(self, generation, min_revision=0):
+        self.calls.append(('reload', generation, min_revision))
+
+
+@pytest.fixture
+def published(corpus_registry):
+    corpus_registry.publish_index_event('refresh', dieus=['1'])
+    corpus_registry.publish_index_event('refresh', dieus=['2'])
+    return corpus_registry
+
+
+def test_snapshot_missing_a_refresh_replays_it(published):
+    system = RecordingSystem(snapshot_revision=1)
+    revision, _ = published.start_index_tracking()
+
+    system._catch_up_indexes(revision)
+
+    assert system.calls == [('refresh', ['2'], 2)]
+    assert published.indexes_current()
+
+
+def test_current_snapshot_replays_nothing(published):
+    system = RecordingSystem(snapshot_revision=2)
+    system._catch_up_indexes(published.start_index_tracking()[0])
+
+    assert system.calls == []
+    assert published.indexes_current()
+
+
+def test_only_the_latest_reload_and_later_refreshes_are_replayed(published):
+    published.publish_index_event('reload', generation='v1.b')
+    published.publish_index_event('refresh', documents=['Luật BVMT'])
+    system = RecordingSystem(snapshot_revision=0)
+
+    system._catch_up_indexes(published.start_index_tracking()[0])
+
+    assert system.calls == [('reload', 'v1.b', 3), ('refresh', [], 4)]
+
+
+def test_trimmed_stream_forces_a_rebuild(published):
+    published.redis_client.delete('corpus:index_events')
+    system = RecordingSystem(snapshot_revision=0)
+
+    system._catch_up_indexes(published.start_index_tracking()[0])
+
+    assert system.calls == [('reload', published.get_generation(), 2)]
+    assert published.indexes_current()
@@ -0,0 +1,68 @@
+"""
+Tests for the service-level endpoints in app.py
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import app as app_module
+from middleware.auth import verify_admin_key
+
+
+class RecordingRetrieverSystem:
+    def __init__(self):
+        self.calls = []
+
+    def invalidate_corpus(self, dieus=None, documents=None):
+        self.calls.append((dieus, documents))
+        return {"scope": "targeted"}
+
+
+@pytest.fixture
+def retriever_system(monkeypatch):
+    system = RecordingRetrieverSystem()
+    monkeypatch.setattr(app_module.app.state, "advanced_retriever_system", system)
+    monkeypatch.setitem(app_module.app.dependency_overrides, verify_admin_key, lambda: True)
+    return system
+
+
+def _invalidate(body):
+    async def send():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/system/cache/invalidate", json=body)
+    return asyncio.run(send())
+
+
+def test_invalidate_accepts_lists(retriever_system):
+    response = _invalidate({"dieu": ["5", "54"], "documents": ["Nghị định 08/2022/NĐ-CP"]})
+
+    assert response.status_code == 200
+    assert retriever_system.calls == [(["5", "54"], ["Nghị định 08/2022/NĐ-CP"])]
+
+
+@pytest.mark.parametrize("dieu", ["15", 15, [15]])
+def test_invalidate_wraps_a_single_article(retriever_system, dieu):
+    response = _invalidate({"dieu": dieu})
+
+    assert response.status_code == 200
+    assert retriever_system.calls == [(["15"], None)]  # Not Điều 1 and Điều 5
+
+
+def test_invalidate_requires_a_scope(retriever_system):
+    assert _invalidate({}).status_code == 400
+    assert _invalidate({"dieu": []}).status_code == 400
+    assert retriever_system.calls == []
+
+
+def test_invalidate_full_reload(retriever_system):
+    response = _invalidate({"full": True})
+
+    assert response.status_code == 200
+    assert retriever_system.calls == [(None, None)]
+
+
+def test_invalidate_rejects_malformed_body(retriever_system):
+    assert _invalidate({"dieu": {"n": 15}}).status_code == 422
+    assert retriever_system.calls == []
@@ -0,0 +1,133 @@
+"""
+Tests for the CSR BM25 index against a reference BM25 Okapi computation
+(the rank_bm25.BM25Okapi formula it replaces)
+"""
+import json
+import math
+import os
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from retriever.bm25_index import BM25Index
+
+CORPUS = [
+    "điều 1 phạm vi điều chỉnh bao bì".split(),
+    "điều 2 trách nhiệm tái chế bao bì nhựa của nhà sản xuất".split(),
+    "điều 3 thu gom chất thải điện tử".split(),
+    "điều 4 quỹ bảo vệ môi trường việt nam".split(),
+    "điều 5 tái chế pin ắc quy và tái chế lốp".split(),
+]
+
+
+def reference_scores(corpus, query, k1=1.5, b=0.75, epsilon=0.25):
+    """BM25 Okapi as computed by rank_bm25.BM25Okapi.get_scores"""
+    n = len(corpus)
+    avgdl = sum(len(doc) for doc in corpus) / n
+    doc_freq = Counter(term for doc in corpus for term in set(doc))
+    idf = {term: math.log(n - df + 0.5) - math.log(df + 0.5) for term, df in doc_freq.items()}
+    average_idf = sum(idf.values()) / len(idf)
+    idf = {term: value if value >= 0 else epsilon * average_idf for term, value in idf.items()}
+
+    scores = []
+    for doc in corpus:
+        tf = Counter(doc)
+        norm = k1 * (1 - b + b * len(doc) / avgdl)
+        scores.append(sum(
+            idf.get(term, 0.0) * tf[term] * (k1 + 1) / (tf[term] + norm) for term in query
+        ))
+    return scores
+
+
+def reference_top_k(corpus, query, k):
+    scores = reference_scores(corpus, query)
+    matched = [i for i, doc in enumerate(corpus) if set(query) & set(doc)]
+    return sorted(matched, key=lambda i: (-scores[i], i))[:k]
+
+
+@pytest.mark.parametrize("query", [
+    "tái chế bao bì".split(),
+    "điều tái chế tái chế".split(),  # common term (idf floor) and a repeated term
+    "không có trong kho".split(),
+])
+def test_scores_match_reference(query):
+    index = BM25Index(CORPUS)
+    assert index.get_scores(query).tolist() == pytest.approx(reference_scores(CORPUS, query), rel=1e-12)
+
+
+def test_negative_idf_is_floored_to_epsilon_times_average():
+    index = BM25Index(CORPUS)
+    # "điều" is in every document: log(0.5 / 5.5) < 0
+    floored = index.epsilon * index.average_idf
+    assert floored > 0
+    score = index.get_scores(["điều"])[3]
+    norm = index.k1 * (1 - index.b + index.b * len(CORPUS[3]) / index.avgdl)
+    assert score == pytest.approx(floored * (index.k1 + 1) / (1 + norm))
+
+
+def test_avgdl_is_mean_document_length():
+    assert BM25Index(CORPUS).avgdl == pytest.approx(np.mean([len(doc) for doc in CORPUS]))
+
+
+@pytest.mark.parametrize("filler", [0, 200])  # dense and sparse accumulation
+def test_ties_at_the_cut_are_broken_by_document_order(filler):
+    corpus = [["khác"]] * filler + [["tái", "chế", "bao", "bì"]] * 6 + [["tái", "chế"]]
+    index = BM25Index(corpus)
+    query = ["tái", "chế"]
+
+    hits = index.top_k(query, top_k=3)
+
+    scores = reference_scores(corpus, query)
+    assert scores[filler + 2] == scores[filler + 3]  # Equal documents straddle the cut
+    assert [doc for doc, _ in hits] == reference_top_k(corpus, query, 3)
+    assert [doc for doc, _ in index.top_k(query, top_k=7)] == reference_top_k(corpus, query, 7)
+
+
+@pytest.mark.parametrize("filler", [0, 200])
+def test_excluded_documents_are_skipped(filler):
+    corpus = [["khác"]] * filler + [["tái", "chế"]] * 4
+    index = BM25Index(corpus)
+
+    hits = index.top_k(["tái", "chế"], top_k=2, exclude=np.array([filler, filler + 2]))
+
+    assert [doc for doc, _ in hits] == [filler + 1, filler + 3]
+
+
+def test_documents_without_query_terms_are_not_returned():
+    index = BM25Index(CORPUS)
+    assert [doc for doc, _ in index.top_k(["ắc", "quy"], top_k=10)] == [4]
+
+
+def test_rebuild_from_postings_gives_identical_scores():
+    index = BM25Index(CORPUS)
+    rebuilt = BM25Index.from_postings(*index.posting_triples(), index.doc_len)
+    query = "tái chế bao bì nhựa".split()
+    assert rebuilt.get_scores(query).tolist() == index.get_scores(query).tolist()
+
+
+def test_save_and_mmap_load_round_trip(tmp_path):
+    index = BM25Index(CORPUS)
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path), mmap=True)
+
+    assert isinstance(loaded.impacts, np.memmap)
+    assert (loaded.avgdl, loaded.average_idf, loaded.corpus_size) == (index.avgdl, index.average_idf, 5)
+    for query in ("tái chế bao bì".split(), "điều".split(), "môi trường".split()):
+        assert loaded.get_scores(query).tolist() == index.get_scores(query).tolist()
+        assert loaded.top_k(query, top_k=3) == index.top_k(query, top_k=3)
+    assert loaded.doc_freq("tái") == index.doc_freq("tái") == 2
+
+
+def test_load_rejects_an_index_from_another_tokenizer(tmp_path):
+    BM25Index(CORPUS).save(str(tmp_path))
+    header_path = os.path.join(str(tmp_path), "bm25.json")
+    with open(header_path) as f:
+        header = json.load(f)
+    header['tokenizer'] = "other"
+    with open(header_path, "w") as f:
+        json.dump(header, f)
+
+    with pytest.raises(ValueError):
+        BM25Index.load(str(tmp_path))
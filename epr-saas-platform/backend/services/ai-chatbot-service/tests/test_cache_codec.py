@@ -0,0 +1,69 @@
+"""
+Tests for the binary semantic cache entry codec
+"""
+import json
+
+import numpy as np
+import pytest
+
+from systems import cache_codec
+
+BODY = {"query": "Điều 15 quy định gì?", "response": {"answer": "Tái chế bao bì", "sources": []}}
+
+
+@pytest.mark.parametrize("codec", ["json+zlib", "msgpack+zlib", "json+zstd", "msgpack+zstd"])
+def test_body_round_trip(codec):
+    serializer, compressor = codec.split("+")
+    if serializer == "msgpack":
+        pytest.importorskip("msgpack")
+    if compressor == "zstd":
+        pytest.importorskip("zstandard")
+
+    assert cache_codec.decode_body(cache_codec.encode_body(BODY, codec), codec) == BODY
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float32", 0.0), ("float16", 1e-3)])
+def test_embedding_round_trip(dtype, tolerance):
+    vector = np.random.default_rng(0).standard_normal(64).astype(np.float32)
+
+    data = cache_codec.encode_embedding(vector, dtype)
+    decoded = cache_codec.decode_embedding(data, dtype)
+
+    assert len(data) == 64 * np.dtype(dtype).itemsize
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, vector, atol=tolerance * 4)
+
+
+def test_unsupported_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        cache_codec.encode_embedding([1.0], "float64")
+
+
+def test_entry_fields_decode_back():
+    mapping = cache_codec.encode_entry([0.5, -0.25], BODY, "float16", context_key="conv-a")
+
+    assert mapping[cache_codec.FIELD_VERSION] == str(cache_codec.FORMAT_VERSION)
+    assert cache_codec.decode_entry_body(
+        mapping[cache_codec.FIELD_CODEC].encode(), mapping[cache_codec.FIELD_BODY]
+    ) == BODY
+    assert cache_codec.decode_entry_context(mapping[cache_codec.FIELD_CONTEXT].encode()) == "conv-a"
+    np.testing.assert_array_equal(
+        cache_codec.decode_entry_embedding(mapping[cache_codec.FIELD_EMBEDDING], b"float16"),
+        np.array([0.5, -0.25], dtype=np.float32)
+    )
+
+
+def test_missing_fields_decode_to_defaults():
+    assert cache_codec.decode_entry_body(None, None) is None
+    assert cache_codec.decode_entry_context(None) == ""
+    assert cache_codec.decode_entry_embedding(None, None) is None
+
+
+def test_legacy_entry_splits_embedding_from_body():
+    raw = json.dumps({**BODY, "query_embedding": [0.1, 0.2]}).encode()
+
+    legacy = cache_codec.decode_legacy_entry(raw)
+
+    assert legacy["body"] == BODY
+    np.testing.assert_allclose(legacy["embedding"], [0.1, 0.2])
+    assert cache_codec.decode_legacy_entry(b"not json") is None
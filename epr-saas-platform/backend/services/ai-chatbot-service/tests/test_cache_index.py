@@ -0,0 +1,72 @@
+"""
+Tests for the in-process semantic cache vector index
+"""
+from systems.cache_index import CacheVectorIndex
+
+NOW = 1_000.0
+LIVE = NOW + 3_600
+
+
+def test_search_is_scoped_to_the_conversation_context():
+    index = CacheVectorIndex(initial_capacity=2)
+    index.upsert("shared", [1.0, 0.0], LIVE)
+    index.upsert("follow-up", [1.0, 0.0], LIVE, context_key="conv-a")
+
+    assert index.search([1.0, 0.0], now=NOW) == ("shared", 1.0)
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-a")[0] == "follow-up"
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-b") == (None, 0.0)
+
+
+def test_context_code_is_freed_with_its_last_row():
+    index = CacheVectorIndex()
+    index.upsert("a1", [1.0, 0.0], LIVE, context_key="conv-a")
+    index.upsert("a2", [0.0, 1.0], LIVE, context_key="conv-a")
+    assert index.context_count() == 2
+
+    index.remove("a1")
+    assert index.context_count() == 2  # a2 still uses the code
+    index.remove("a2")
+    assert index.context_count() == 1  # Only the context-free code remains
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-a") == (None, 0.0)
+
+
+def test_expired_rows_free_their_contexts():
+    index = CacheVectorIndex()
+    for i in range(50):
+        index.upsert(f"k{i}", [1.0, float(i)], NOW + 1, context_key=f"conv-{i}")
+    index.upsert("shared", [1.0, 0.0], LIVE)
+
+    assert index.prune_expired(now=NOW + 2) == 50
+    assert index.context_count() == 1
+    assert index.search([1.0, 0.0], now=NOW + 2) == ("shared", 1.0)
+
+
+def test_reused_code_does_not_leak_into_other_contexts():
+    index = CacheVectorIndex()
+    index.upsert("old", [1.0, 0.0], LIVE, context_key="conv-old")
+    index.upsert("keep", [0.0, 1.0], LIVE, context_key="conv-keep")
+    index.remove("old")
+    index.upsert("new", [1.0, 0.0], LIVE, context_key="conv-new")
+
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-new")[0] == "new"
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-old") == (None, 0.0)
+    assert index.search([0.0, 1.0], now=NOW, context_key="conv-keep")[0] == "keep"
+
+
+def test_upsert_moving_a_key_to_another_context_releases_the_old_one():
+    index = CacheVectorIndex()
+    index.upsert("k", [1.0, 0.0], LIVE, context_key="conv-a")
+    index.upsert("k", [1.0, 0.0], LIVE, context_key="conv-b")
+
+    assert index.context_count() == 2
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-a") == (None, 0.0)
+    assert index.search([1.0, 0.0], now=NOW, context_key="conv-b")[0] == "k"
+
+
+def test_context_free_code_survives_emptying_the_index():
+    index = CacheVectorIndex()
+    index.upsert("shared", [1.0, 0.0], LIVE)
+    index.remove("shared")
+    index.upsert("again", [1.0, 0.0], LIVE)
+
+    assert index.search([1.0, 0.0], now=NOW) == ("again", 1.0)
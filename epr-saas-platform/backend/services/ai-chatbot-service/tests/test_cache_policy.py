@@ -0,0 +1,85 @@
+"""
+Tests for the cost-aware semantic cache admission and eviction policy
+"""
+import pytest
+import redis
+
+from systems.cache_policy import CachePolicy, FrequencySketch, entry_cost
+
+
+def test_entry_cost_grows_with_time_and_tokens():
+    assert entry_cost() == 1.0
+    assert entry_cost(compute_ms=2500, tokens=3000) == pytest.approx(6.5)
+
+
+def test_sketch_ignores_one_hit_wonders_and_saturates():
+    sketch = FrequencySketch(width=256, sample_size=10_000)
+
+    assert sketch.increment("once") == 1  # Doorkeeper only
+    assert sketch.estimate("never") == 0
+    for _ in range(40):
+        sketch.increment("hot")
+    assert sketch.estimate("hot") == FrequencySketch.MAX_COUNT + 1
+
+
+def test_sketch_ages_old_popularity():
+    sketch = FrequencySketch(width=256, sample_size=9)
+    for _ in range(9):
+        sketch.increment("hot")  # The 9th event triggers aging
+
+    assert sketch.estimate("hot") == 8 // 2
+
+
+@pytest.fixture
+def policy(fake_redis):
+    client = redis.from_url("redis://fake")
+    return CachePolicy(client, namespace="test", max_bytes=100,
+                       sketch=FrequencySketch(width=256, sample_size=10_000))
+
+
+def _store(policy, key, cost, size):
+    policy.redis_client.set(key, b"x")
+    assert policy.admit(key, cost, size)
+    policy.on_insert(key, cost, size)
+
+
+def test_admits_everything_under_budget(policy):
+    _store(policy, "a", 1.0, 60)
+    _store(policy, "b", 1.0, 40)
+
+    assert policy.get_stats()["bytes_used"] == 100
+    assert policy.get_stats()["entries"] == 2
+    assert policy.evict_over_budget() == []
+
+
+def test_full_cache_rejects_cold_cheap_entries(policy):
+    _store(policy, "a", 5.0, 50)
+    _store(policy, "b", 5.0, 50)
+
+    assert not policy.admit("cold", 1.0, 50)
+    for _ in range(5):
+        policy.record("popular")
+    assert policy.admit("popular", 5.0, 50)
+
+
+def test_eviction_pops_lowest_priority_until_under_budget(policy):
+    _store(policy, "cheap", 1.0, 50)
+    _store(policy, "costly", 10.0, 50)
+    policy.on_insert("new", 5.0, 50)
+
+    assert policy.evict_over_budget() == ["cheap"]
+    assert policy.get_stats()["bytes_used"] == 100
+    assert policy.get_stats()["entries"] == 2
+
+
+def test_forget_and_reconcile_release_bytes(policy):
+    _store(policy, "a", 1.0, 30)
+    _store(policy, "b", 1.0, 30)
+    _store(policy, "c", 1.0, 30)
+
+    policy.forget(["a"])
+    policy.redis_client.delete("b")  # Expired through its TTL
+    policy.reconcile()
+
+    assert policy.get_stats()["bytes_used"] == 30
+    assert policy.get_stats()["entries"] == 1
@@ -0,0 +1,84 @@
+"""
+Tests for the startup cache warmer
+"""
+import json
+
+import pytest
+
+from config import Config
+from systems.cache_warmer import CacheWarmer
+
+
+class RecordingHandler:
+    def __init__(self, cached=(), failing=()):
+        self.cached = set(cached)
+        self.failing = set(failing)
+        self.queries = []
+
+    def process_query(self, query, session_id=None, evaluate=True):
+        self.queries.append(query)
+        if query in self.failing:
+            raise RuntimeError("pipeline error")
+        return {"answer": "...", "from_cache": query in self.cached}
+
+
+@pytest.fixture
+def warmer_factory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "MAX_COST_PER_QUERY_USD", 1.0)
+
+    def make(handler, log_lines=(), faq=None, **kwargs):
+        if faq is not None:
+            (tmp_path / "faq.json").write_text(json.dumps(faq), encoding="utf-8")
+        log = tmp_path / "queries.jsonl"
+        log.write_text("\n".join(log_lines), encoding="utf-8")
+        kwargs.setdefault("max_workers", 1)
+        kwargs.setdefault("max_cost_usd", 100.0)
+        return CacheWarmer(handler, query_log_path=str(log), database_url="", **kwargs)
+    return make
+
+
+def test_query_log_is_ranked_by_frequency(warmer_factory):
+    warmer = warmer_factory(RecordingHandler(), log_lines=[
+        json.dumps({"query": "thu gom"}),
+        "tái chế",
+        json.dumps({"role": "assistant", "content": "tái chế"}),
+        json.dumps({"role": "user", "content": "tái chế"}),
+        "xử phạt",
+        "{broken",
+    ], top_n=2)
+
+    assert warmer._history_from_log() == ["tái chế", "thu gom"]
+
+
+def test_faq_comes_first_and_duplicates_are_dropped(warmer_factory):
+    warmer = warmer_factory(
+        RecordingHandler(),
+        log_lines=["Tái chế là gì?", "thu gom"],
+        faq={"meta": [{"Câu hỏi": "tái chế  là gì?"}, {"question": "EPR là gì?"}, {"other": 1}]}
+    )
+
+    assert warmer.collect_queries() == ["tái chế  là gì?", "EPR là gì?", "thu gom"]
+
+
+def test_budget_caps_pipeline_runs(warmer_factory):
+    handler = RecordingHandler()
+    warmer = warmer_factory(handler, max_cost_usd=2.0)
+
+    stats = warmer.run(["q1", "q2", "q3", "q4"])
+
+    assert handler.queries == ["q1", "q2"]
+    assert stats["skipped_budget"] == 2
+    assert stats["estimated_cost_usd"] == 2.0
+
+
+def test_cache_hits_give_their_reservation_back(warmer_factory):
+    handler = RecordingHandler(cached={"q1", "q2"}, failing={"q3"})
+    warmer = warmer_factory(handler, max_cost_usd=2.0)
+
+    stats = warmer.run(["q1", "q2", "q3", "q4", "q5"])
+
+    assert handler.queries == ["q1", "q2", "q3", "q4"]
+    assert (stats["already_cached"], stats["failed"], stats["completed"]) == (2, 1, 3)
+    assert stats["skipped_budget"] == 1
+    assert stats["running"] is False
@@ -0,0 +1,51 @@
+"""
+Tests for conversation-dependent question detection and session state
+"""
+import pytest
+
+from systems.conversation_memory import ConversationMemory, is_follow_up_question
+
+
+@pytest.mark.parametrize("query", [
+    "Nghị định 08 quy định thế nào về tái chế bao bì?",
+    "Trách nhiệm của nhà sản xuất như thế nào?",
+    "Điều 15 quy định gì?",
+    "Theo 08/2022/NĐ-CP, ai phải đóng góp vào quỹ?",
+    "Vậy thì Điều 77 áp dụng cho ai?",
+    "Doanh nghiệp phải nộp báo cáo kế hoạch hằng năm vào thời điểm nào?",
+    "Giấy phép môi trường còn hiệu lực trong bao lâu kể từ ngày cấp?",
+])
+def test_self_contained_questions_are_not_follow_ups(query):
+    assert is_follow_up_question(query) is False
+
+
+@pytest.mark.parametrize("query", [
+    "Điều đó áp dụng cho doanh nghiệp nhỏ không?",
+    "Cho tôi biết thêm chi tiết về cái này được không ạ?",
+    "Còn đối với hộ kinh doanh cá thể thì sao?",
+    "Vậy thì doanh nghiệp cần chuẩn bị những giấy tờ gì?",
+    "Thế thì hạn cuối cùng để nộp hồ sơ là khi nào?",
+    "Trường hợp này có bị xử phạt hành chính hay không?",
+    "Quy định nêu trên có ngoại lệ nào cho doanh nghiệp không?",
+    "Chi phí là bao nhiêu?",
+])
+def test_back_references_are_follow_ups(query):
+    assert is_follow_up_question(query) is True
+
+
+def test_fingerprint_is_empty_without_history():
+    memory = ConversationMemory()
+    assert memory.get_context_fingerprint("s1") == ""
+
+    memory.add_message("s1", "user", "Điều 15 quy định gì?")
+    assert memory.get_context_fingerprint("s1") != ""
+
+
+def test_current_document_follows_latest_legal_answer():
+    memory = ConversationMemory()
+    memory.add_message("s1", "assistant", "...", {"documents": ["Luật BVMT", "Nghị định 08", "Nghị định 08"]})
+    assert memory.get_current_document("s1") == "Nghị định 08"
+
+    memory.add_message("s1", "assistant", "...", {"documents": ["Luật BVMT"]})
+    assert memory.get_current_document("s1") == "Luật BVMT"
+    assert memory.get_current_document("missing") is None
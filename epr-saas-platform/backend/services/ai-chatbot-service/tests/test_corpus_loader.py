@@ -0,0 +1,116 @@
+"""
+Tests for streaming the keyword corpus from Weaviate and its mmap snapshots
+"""
+import os
+from types import SimpleNamespace
+
+from retriever import corpus_loader
+from retriever.bm25_index import tokenize
+from retriever.corpus_loader import (
+    BlobSequence, BM25Corpus, WeaviateCorpusLoader, load_bm25_corpus, snapshot_path, write_snapshot
+)
+
+
+def weaviate_object(uuid, text, dieu, vector=None):
+    properties = {"text": text, "dieu": dieu, "doc_id": "ref", "_node_type": "TextNode"}
+    return SimpleNamespace(uuid=uuid, properties=properties, vector=vector)
+
+
+class FakeCollection:
+    def __init__(self, objects):
+        self.objects = objects
+        self.iterations = []
+
+    def iterator(self, include_vector=False, cache_size=None):
+        self.iterations.append((include_vector, cache_size))
+        return iter(self.objects)
+
+
+class FakeClient:
+    def __init__(self, objects):
+        self.collection = FakeCollection(objects)
+        self.collections = SimpleNamespace(get=lambda name: self.collection)
+
+
+OBJECTS = [
+    weaviate_object("u1", "Điều 1 phạm vi điều chỉnh", "1", vector={"default": [1.0, 0.0]}),
+    weaviate_object("u2", "Điều 2 trách nhiệm tái chế bao bì", "2", vector=[0.0, 1.0]),
+    weaviate_object("u3", "", "3"),
+]
+
+
+def test_blob_sequence_round_trips_unicode():
+    items = ["Điều 1", "", "tái chế bao bì"]
+    blob, offsets = BlobSequence.pack(items)
+    sequence = BlobSequence(blob, offsets)
+
+    assert list(sequence) == items
+    assert sequence[-1] == "tái chế bao bì"
+    assert sequence[0:2] == ["Điều 1", ""]
+
+
+def test_loader_streams_documents_without_internal_properties():
+    client = FakeClient(OBJECTS)
+
+    documents = WeaviateCorpusLoader(client, page_size=50).load_documents()
+
+    assert [doc["id"] for doc in documents] == ["u1", "u2"]  # Empty chunk dropped
+    assert documents[1]["metadata"] == {"dieu": "2"}
+    assert client.collection.iterations == [(False, 50)]
+
+
+def test_loader_reads_default_named_vector():
+    vectors = [vector for _, vector in WeaviateCorpusLoader(FakeClient(OBJECTS)).iter_vectors()]
+
+    assert vectors == [[1.0, 0.0], [0.0, 1.0], None]
+
+
+def test_snapshot_keeps_documents_and_search(tmp_path):
+    corpus = BM25Corpus.build([
+        {"id": "u1", "text": "Điều 1 phạm vi điều chỉnh", "metadata": {"dieu": "1"}},
+        {"id": "u2", "text": "Điều 2 trách nhiệm tái chế bao bì", "metadata": {"dieu": "2"}},
+    ])
+    corpus.revision = 4
+    path = str(tmp_path / "snap")
+    write_snapshot(corpus, path)
+
+    loaded = BM25Corpus.load(path)
+
+    assert loaded.revision == 4
+    assert loaded.documents[1] == {"id": "u2", "text": "Điều 2 trách nhiệm tái chế bao bì",
+                                   "metadata": {"dieu": "2"}}
+    assert loaded.bm25.top_k(tokenize("tái chế"), 1) == corpus.bm25.top_k(tokenize("tái chế"), 1)
+
+
+def test_snapshot_path_is_sanitized_and_tokenizer_specific(tmp_path):
+    path = snapshot_path("v1/2024 09", str(tmp_path))
+
+    assert os.path.dirname(path) == str(tmp_path)
+    assert "v1_2024_09" in os.path.basename(path)
+    assert os.path.basename(path).endswith(corpus_loader.tokenizer_version())
+
+
+def test_first_start_builds_and_next_start_maps_the_snapshot(corpus_registry, tmp_path, monkeypatch):
+    client = FakeClient(OBJECTS)
+    old = snapshot_path("v0", str(tmp_path))
+    os.makedirs(old)
+
+    built = load_bm25_corpus(client, "v1", str(tmp_path), use_snapshot=True)
+    loaded = load_bm25_corpus(client, "v1", str(tmp_path), use_snapshot=True)
+
+    assert len(client.collection.iterations) == 1  # Second start never touches Weaviate
+    assert list(loaded.doc_ids) == list(built.doc_ids) == ["u1", "u2"]
+    assert not os.path.exists(old)  # Snapshots of older versions are dropped
+
+
+def test_unreadable_snapshot_is_rebuilt(corpus_registry, tmp_path):
+    path = snapshot_path("v1", str(tmp_path))
+    os.makedirs(path)
+    with open(os.path.join(path, "corpus.json"), "w") as f:
+        f.write("{")
+    client = FakeClient(OBJECTS)
+
+    corpus = load_bm25_corpus(client, "v1", str(tmp_path), use_snapshot=True)
+
+    assert list(corpus.doc_ids) == ["u1", "u2"]
+    assert len(client.collection.iterations) == 1
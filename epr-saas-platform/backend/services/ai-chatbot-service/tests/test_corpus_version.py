@@ -0,0 +1,65 @@
+"""
+Tests for corpus index events and per-worker index freshness
+"""
+from systems.corpus_version import (
+    CorpusRegistry, INDEX_STREAM_KEY, invalidation_tags, public_metadata, source_tags
+)
+
+
+def test_source_and_invalidation_tags_match():
+    tags = source_tags([{'dieu': ' 15 ', 'document': 'Nghị định 08'}, None, {}])
+    assert tags == {'dieu:15', 'document:Nghị định 08'}
+    assert invalidation_tags(['15'], ['Nghị định 08']) == tags
+
+
+def test_worker_is_behind_until_it_applies_the_start_revision(corpus_registry):
+    corpus_registry.publish_index_event('refresh', dieus=['15'])
+    worker = CorpusRegistry()
+
+    revision, _ = worker.start_index_tracking()
+
+    assert revision == 1
+    assert not worker.indexes_current()
+    worker.mark_applied(revision)
+    assert worker.indexes_current()
+
+
+def test_index_events_between_returns_events_in_order(corpus_registry):
+    for dieu in ('1', '2', '3'):
+        corpus_registry.publish_index_event('refresh', dieus=[dieu])
+
+    events = corpus_registry.index_events_between(1, 3)
+
+    assert [(e['revision'], e['dieus']) for e in events] == [(2, ['2']), (3, ['3'])]
+    assert corpus_registry.index_events_between(3, 3) == []
+
+
+def test_index_events_between_detects_a_trimmed_stream(corpus_registry):
+    for dieu in ('1', '2', '3'):
+        corpus_registry.publish_index_event('refresh', dieus=[dieu])
+    corpus_registry.redis_client.xtrim(INDEX_STREAM_KEY, maxlen=1, approximate=False)
+
+    assert corpus_registry.index_events_between(1, 3) is None
+    assert [e['revision'] for e in corpus_registry.index_events_between(2, 3)] == [3]
+
+
+def test_other_workers_see_events_as_not_own(corpus_registry):
+    other = CorpusRegistry()
+    _, position = other.start_index_tracking()
+    corpus_registry.publish_index_event('reload', generation='v1.abc')
+
+    [(_, event)] = other.read_index_events(position, block_ms=10)
+
+    assert event['op'] == 'reload' and event['generation'] == 'v1.abc'
+    assert not event['own']
+    assert not other.indexes_current()
+
+
+def test_public_metadata_drops_bookkeeping_keys():
+    from systems.near_duplicates import MINHASH_METADATA_KEY
+
+    metadata = {'dieu': '15', 'document': 'Nghị định 08', 'file_name': 'nd08.pdf',
+                'pages': [3, 4], 'parent_id': 'p1', 'pdf_url': 'http://x', MINHASH_METADATA_KEY: 'AAAA'}
+
+    assert public_metadata(metadata) == {'dieu': '15', 'document': 'Nghị định 08'}
+    assert public_metadata(None) == {}
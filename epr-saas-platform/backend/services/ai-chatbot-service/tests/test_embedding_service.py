@@ -0,0 +1,88 @@
+"""
+Tests for the memoizing embedding service
+"""
+from typing import List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from systems.embedding_service import CachedEmbedding, normalize_text
+
+
+class CountingEmbedding(BaseEmbedding):
+    """Embeds a text as [len, word count]; records every model call"""
+
+    _calls: list = PrivateAttr(default_factory=list)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CountingEmbedding"
+
+    @staticmethod
+    def _vector(text: str) -> List[float]:
+        return [float(len(text)), float(len(text.split()))]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self._calls.append([query])
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._calls.append(list(texts))
+        return [self._vector(t) for t in texts]
+
+
+def _cached(inner):
+    return CachedEmbedding(inner, use_redis=False)
+
+
+def test_normalized_text_shares_one_key():
+    assert normalize_text("  Tái  chế\nBao bì ") == "tái chế bao bì"
+
+
+def test_query_embedding_is_memoized_across_spellings():
+    inner = CountingEmbedding()
+    model = _cached(inner)
+
+    first = model.get_query_embedding("Tái chế bao bì")
+    second = model.get_query_embedding("  tái chế   bao bì")
+
+    assert first == second
+    assert len(inner._calls) == 1
+    assert model.get_stats()["api_calls"] == 1
+
+
+def test_batch_embeds_only_distinct_misses_in_one_call():
+    inner = CountingEmbedding()
+    model = _cached(inner)
+    model.get_query_embedding("điều 15")
+
+    vectors = model.get_query_embeddings(["điều 15", "thu gom", "Thu gom", "xử phạt"])
+
+    assert inner._calls[-1] == ["thu gom", "xử phạt"]
+    assert len(inner._calls) == 2
+    assert vectors[1] == vectors[2]
+    assert vectors[0] == CountingEmbedding._vector("điều 15")
+
+
+def test_redis_tier_is_shared_between_workers(fake_redis):
+    first_inner, second_inner = CountingEmbedding(), CountingEmbedding()
+    first = CachedEmbedding(first_inner, redis_url="redis://fake", use_redis=True)
+    second = CachedEmbedding(second_inner, redis_url="redis://fake", use_redis=True)
+
+    vector = first.get_query_embedding("trách nhiệm tái chế")
+
+    assert second.get_query_embedding("Trách nhiệm tái chế") == vector
+    assert second_inner._calls == []
+
+
+def test_models_do_not_share_vectors():
+    small = _cached(CountingEmbedding(model_name="small"))
+    large = _cached(CountingEmbedding(model_name="large"))
+
+    assert small._cache_key("điều 15") != large._cache_key("điều 15")
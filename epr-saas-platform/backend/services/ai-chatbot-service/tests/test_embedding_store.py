@@ -0,0 +1,154 @@
+"""
+Tests for the content-addressed embedding store and the upsert manifest
+"""
+import sqlite3
+
+import pytest
+
+from ingestion.embedding_store import EmbeddingStore, manifest_target
+from ingestion.legal_splitter import LegalSplitter
+from ingestion.pdf_reader import Page
+from ingestion.pipeline import IngestionPipeline, SourceDocument
+
+SOURCE = SourceDocument(path="/data/nd08.pdf", document="Nghị định 08/2022/NĐ-CP")
+
+PAGES = [Page(1, "Điều 1. Phạm vi điều chỉnh\nNghị định này quy định về bảo vệ môi trường.\n"
+                 "Điều 2. Đối tượng áp dụng\nTổ chức, cá nhân sản xuất bao bì.\n"
+                 "Điều 3. Giải thích từ ngữ\nTái chế là hoạt động thu hồi vật liệu.")]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite"), "text-embedding-3-small", "http://a/Docs")
+    yield store
+    store.close()
+
+
+class CountingEmbedder:
+    """Embeds a text as [len, word count]; records every batch request"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_text_embedding_batch(self, texts):
+        self.requests.append(list(texts))
+        return [[float(len(t)), float(len(t.split()))] for t in texts]
+
+
+def test_content_hash_covers_model_and_text(store, tmp_path):
+    other = EmbeddingStore(str(tmp_path / "other.sqlite"), "text-embedding-3-large")
+
+    assert store.content_hash("tái chế") == store.content_hash("tái chế")
+    assert store.content_hash("tái chế") != store.content_hash("tái chế bao bì")
+    assert store.content_hash("tái chế") != other.content_hash("tái chế")
+    other.close()
+
+
+def test_vectors_round_trip_as_float32(store):
+    key = store.content_hash("thu gom")
+    store.put_vectors({key: [0.5, -0.25, 1.0]})
+
+    assert store.get_vectors([key, key, "missing"]) == {key: [0.5, -0.25, 1.0]}
+
+
+def test_object_hash_changes_with_any_property():
+    base = EmbeddingStore.object_hash("abc", {"text": "Điều 1", "dieu": "1"})
+
+    assert base == EmbeddingStore.object_hash("abc", {"dieu": "1", "text": "Điều 1"})
+    assert base != EmbeddingStore.object_hash("abc", {"text": "Điều 1", "dieu": "2"})
+    assert base != EmbeddingStore.object_hash("abd", {"text": "Điều 1", "dieu": "1"})
+
+
+def test_manifest_is_kept_per_target(store):
+    store.record_objects([("id-1", "nd08.pdf", "h1"), ("id-2", "nd08.pdf", "h2"), ("id-3", "luat.pdf", "h3")])
+    store.target = "http://b/Docs"
+
+    assert store.file_objects("nd08.pdf") == set()
+    store.record_objects([("id-1", "nd08.pdf", "other")])
+    store.target = "http://a/Docs"
+
+    assert store.get_object_hashes(["id-1", "id-2", "id-9"]) == {"id-1": "h1", "id-2": "h2"}
+    store.forget_objects(["id-2"])
+    assert store.file_objects("nd08.pdf") == {"id-1"}
+    store.forget_file("nd08.pdf")
+    assert store.get_stats()["objects"] == 1
+    store.clear_objects()
+    assert store.get_stats()["objects"] == 0
+    store.target = "http://b/Docs"
+    assert store.file_objects("nd08.pdf") == {"id-1"}
+
+
+def test_untargeted_manifest_is_dropped(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE objects (object_id TEXT PRIMARY KEY, file_name TEXT, object_hash TEXT)")
+    conn.execute("INSERT INTO objects VALUES ('id-1', 'nd08.pdf', 'h1')")
+    conn.commit()
+    conn.close()
+
+    store = EmbeddingStore(path, "text-embedding-3-small", "http://a/Docs")
+
+    assert store.get_stats()["objects"] == 0
+    store.record_objects([("id-1", "nd08.pdf", "h1")])
+    assert store.file_objects("nd08.pdf") == {"id-1"}
+    store.close()
+
+
+def test_manifest_target_names_cluster_and_collection():
+    assert manifest_target("http://weaviate:8080/", "LegalDocs") == "http://weaviate:8080/LegalDocs"
+
+
+def _pipeline(store, embedder):
+    pipeline = IngestionPipeline(client=None, embed_model=embedder, class_name="Docs",
+                                 splitter=LegalSplitter(parent_words=200, child_words=5),
+                                 embed_batch_size=4, embedding_store=store, cluster_url="http://a", dedup=False)
+    pipeline._pages = lambda source: iter(PAGES)
+    return pipeline
+
+
+def _embed_all(pipeline):
+    batches = pipeline._batched(pipeline.document_nodes(SOURCE), 3)
+    return [vector for _, _, vectors in pipeline._embedded(batches) for vector in vectors]
+
+
+def test_second_run_reuses_every_vector(store):
+    first_embedder, second_embedder = CountingEmbedder(), CountingEmbedder()
+
+    first = _embed_all(_pipeline(store, first_embedder))
+    pipeline = _pipeline(store, second_embedder)
+    second = _embed_all(pipeline)
+
+    assert second == first
+    assert second_embedder.requests == []
+    assert pipeline.stats.reused == len(first) and pipeline.stats.embedded == 0
+    # Misses of several batches are pooled into requests of embed_batch_size texts
+    assert all(len(request) <= 4 for request in first_embedder.requests)
+    assert sum(len(request) for request in first_embedder.requests) == len(first)
+    assert store.target == "http://a/Docs"
+
+
+def test_only_edited_chunks_are_embedded_again(store):
+    _embed_all(_pipeline(store, CountingEmbedder()))
+    PAGES.append(Page(2, "Điều 4. Thu gom\nNhà sản xuất tổ chức thu gom bao bì."))
+    try:
+        embedder = CountingEmbedder()
+        pipeline = _pipeline(store, embedder)
+        _embed_all(pipeline)
+    finally:
+        PAGES.pop()
+
+    embedded = [text for request in embedder.requests for text in request]
+    assert embedded and all("Thu gom" in text or "thu gom" in text for text in embedded)
+    assert pipeline.stats.embedded == len(embedded)
+
+
+@pytest.mark.parametrize("stored,resynced", [(2, 0), (0, 1), (5, 1)])
+def test_manifest_is_forgotten_when_the_collection_disagrees(store, stored, resynced):
+    pipeline = _pipeline(store, CountingEmbedder())
+    store.record_objects([("id-1", "nd08.pdf", "h1"), ("id-2", "nd08.pdf", "h2")])
+    pipeline._count_objects = lambda file_name: stored
+
+    pipeline._verify_manifest(SOURCE)
+
+    assert pipeline.stats.resynced == resynced
+    assert len(store.file_objects("nd08.pdf")) == (0 if resynced else 2)
@@ -0,0 +1,77 @@
+"""
+Tests for merging sibling child chunks into their parent article
+"""
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from retriever.hierarchical_merger import HierarchicalMerger
+from retriever.hybrid_retriever import HybridRetriever
+
+ND08 = "Nghị định 08/2022/NĐ-CP"
+
+
+def chunk(node_id, text, dieu, **metadata):
+    return {'id': node_id, 'text': text, 'metadata': {'document': ND08, 'dieu': dieu, **metadata}}
+
+
+DOCUMENTS = [
+    chunk('15a', 'Điều 15 khoản 1 trách nhiệm tái chế', '15'),
+    chunk('16a', 'Điều 16 khoản 1 thu gom', '16'),
+    chunk('15b', 'Điều 15 khoản 2 tỷ lệ tái chế bắt buộc', '15'),
+    chunk('15c', 'Điều 15 khoản 3 quy cách tái chế', '15'),
+    chunk('p1', 'Phụ lục phần một', '', parent_id='phu-luc'),
+    chunk('p2', 'Phụ lục phần hai', '', parent_id='phu-luc'),
+]
+
+
+def hit(node_id, score):
+    document = next(doc for doc in DOCUMENTS if doc['id'] == node_id)
+    return NodeWithScore(node=TextNode(id_=node_id, text=document['text'], metadata=document['metadata']),
+                         score=score)
+
+
+def make_merger(**kwargs):
+    return HierarchicalMerger(HybridRetriever(None, DOCUMENTS, top_k=5), **kwargs)
+
+
+def test_siblings_are_replaced_by_their_parent_at_the_best_rank():
+    merger = make_merger(min_siblings=2, max_parent_words=100)
+
+    merged = merger.merge([hit('16a', 0.9), hit('15b', 0.8), hit('p1', 0.7), hit('15a', 0.6)])
+
+    assert [n.node.id_ for n in merged] == ['16a', f'{ND08}#dieu-15', 'p1']
+    parent = merged[1]
+    assert parent.score == 0.8
+    # Whole article in index order, including the child that was not retrieved
+    assert parent.node.text.splitlines() == [DOCUMENTS[0]['text'], DOCUMENTS[2]['text'], DOCUMENTS[3]['text']]
+    assert parent.node.metadata['child_count'] == 3
+    assert merger.get_stats() == {'merged_parents': 1, 'merged_children': 2, 'oversized_parents': 0}
+
+
+def test_explicit_parent_id_groups_children():
+    merged = make_merger(min_siblings=2, max_parent_words=100).merge([hit('p2', 0.5), hit('p1', 0.4)])
+
+    assert [(n.node.id_, n.node.text) for n in merged] == [('phu-luc', 'Phụ lục phần một\nPhụ lục phần hai')]
+
+
+def test_single_hits_stay_children():
+    nodes = [hit('15a', 0.9), hit('16a', 0.8)]
+
+    assert make_merger(min_siblings=2).merge(nodes) == nodes
+
+
+def test_oversized_parent_stays_split():
+    merger = make_merger(min_siblings=2, max_parent_words=10)
+    nodes = [hit('15a', 0.9), hit('15b', 0.8)]
+
+    assert merger.merge(nodes) == nodes
+    assert merger.get_stats()['oversized_parents'] == 1
+
+
+def test_parent_fetch_failure_keeps_children():
+    class Broken:
+        def fetch_parents(self, keys):
+            raise RuntimeError("index unavailable")
+
+    nodes = [hit('15a', 0.9), hit('15b', 0.8)]
+
+    assert HierarchicalMerger(Broken(), min_siblings=2).merge(nodes) == nodes
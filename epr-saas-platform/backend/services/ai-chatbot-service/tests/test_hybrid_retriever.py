@@ -0,0 +1,125 @@
+"""
+Tests for the hybrid retriever's concurrent vector / BM25 legs
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from retriever.hybrid_retriever import HybridRetriever
+
+DOCUMENTS = [
+    {'id': 'd1', 'text': 'Điều 77 trách nhiệm tái chế bao bì của nhà sản xuất', 'metadata': {'dieu': '77'}},
+    {'id': 'd2', 'text': 'Điều 78 trách nhiệm thu gom chất thải của nhà nhập khẩu', 'metadata': {'dieu': '78'}},
+    {'id': 'd3', 'text': 'Điều 79 quỹ bảo vệ môi trường Việt Nam', 'metadata': {'dieu': '79'}},
+]
+
+
+class FakeVectorRetriever:
+    """Returns d3 for every query after an optional delay"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def retrieve(self, query_bundle):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return [NodeWithScore(node=TextNode(text=DOCUMENTS[2]['text'], id_='d3'), score=0.9)]
+
+
+def make_retriever(vector_retriever, workers: int = 8) -> HybridRetriever:
+    retriever = HybridRetriever(vector_retriever, DOCUMENTS, top_k=5)
+    retriever._leg_executor = ThreadPoolExecutor(max_workers=workers)
+    retriever.leg_timeouts = {'vector': 0.3, 'bm25': 0.3}
+    return retriever
+
+
+def test_both_legs_are_fused():
+    retriever = make_retriever(FakeVectorRetriever())
+
+    ids = [n.node.id_ for n in retriever.retrieve("trách nhiệm tái chế bao bì")]
+
+    assert ids[0] in ('d1', 'd3')
+    assert {'d1', 'd3'} <= set(ids)
+    assert retriever.leg_failures == {'vector': 0, 'bm25': 0}
+
+
+def test_time_queued_behind_other_requests_does_not_count():
+    retriever = make_retriever(FakeVectorRetriever(delay=0.05), workers=1)
+    # Another request holds the only worker for longer than either leg timeout
+    retriever._leg_executor.submit(time.sleep, 0.5)
+
+    ids = [n.node.id_ for n in retriever.retrieve("tái chế bao bì")]
+
+    assert retriever.leg_failures == {'vector': 0, 'bm25': 0}
+    assert {'d1', 'd3'} <= set(ids)
+
+
+def test_slow_leg_is_dropped_from_fusion():
+    retriever = make_retriever(FakeVectorRetriever(delay=0.6))
+
+    ids = [n.node.id_ for n in retriever.retrieve("tái chế bao bì")]
+
+    assert retriever.leg_failures['vector'] == 1
+    assert ids == ['d1']
+
+
+def test_leg_without_a_worker_is_cancelled():
+    retriever = make_retriever(FakeVectorRetriever(), workers=1)
+    retriever.leg_queue_timeout = 0.1
+    retriever._leg_executor.submit(time.sleep, 0.5)
+
+    with pytest.raises(RuntimeError):
+        retriever.retrieve("tái chế bao bì")
+    assert retriever.leg_failures == {'vector': 1, 'bm25': 1}
+
+
+class ConcurrencyProbe(FakeVectorRetriever):
+    """Tracks how many searches run at once; fails queries containing 'lỗi'"""
+
+    def __init__(self, delay: float = 0.02):
+        super().__init__(delay)
+        self.active = 0
+        self.peak = 0
+
+    def retrieve(self, query_bundle):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if 'lỗi' in query_bundle.query_str:
+                raise ConnectionError("weaviate unavailable")
+            return super().retrieve(query_bundle)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_variant_searches_are_limited_per_request():
+    probe = ConcurrencyProbe()
+    retriever = make_retriever(probe)
+    retriever.vector_fanout = 2
+    variants = [f"tái chế bao bì {i}" for i in range(5)]
+
+    batches = retriever.retrieve_batch(variants)
+
+    assert probe.calls == 5
+    assert probe.peak <= 2
+    assert all('d3' in {n.node.id_ for n in batch} for batch in batches)
+
+
+def test_failed_variant_search_only_affects_that_variant():
+    retriever = make_retriever(ConcurrencyProbe())
+    retriever.vector_fanout = 2
+
+    batches = retriever.retrieve_batch(["tái chế bao bì", "lỗi bao bì", "thu gom chất thải"])
+
+    assert retriever.leg_failures['vector'] == 1
+    assert 'd3' not in {n.node.id_ for n in batches[1]}
+    assert 'd3' in {n.node.id_ for n in batches[0]}
+    assert 'd3' in {n.node.id_ for n in batches[2]}
@@ -0,0 +1,115 @@
+"""
+Tests for legal section splitting and the ingestion pipeline's chunk nodes
+"""
+import pytest
+
+from ingestion.legal_splitter import LegalSplitter
+from ingestion.pdf_reader import Page
+from ingestion.pipeline import IngestionPipeline, SourceDocument
+from systems.corpus_version import BOOKKEEPING_METADATA
+from systems.near_duplicates import MINHASH_METADATA_KEY
+
+PAGES = [
+    Page(1, "Chương I\nQUY ĐỊNH CHUNG\nĐiều 1. Phạm vi điều chỉnh\n"
+            "Nghị định này quy định về bảo vệ môi trường.\n1"),
+    Page(2, "Điều 2. Đối tượng áp dụng\nTổ chức, cá nhân sản xuất bao bì.\n"
+            "Điều 5 của Luật này không áp dụng cho hộ gia đình.\n2"),
+    Page(3, "Chương II\nTRÁCH NHIỆM TÁI CHẾ\nMục 1\nTỶ LỆ TÁI CHẾ\n"
+            "Điều 54. Trách nhiệm tái chế của nhà sản xuất\n"
+            "Nhà sản xuất phải tái chế sản phẩm, bao bì theo tỷ lệ bắt buộc."),
+]
+
+SOURCE = SourceDocument(path="/data/nd08.pdf", document="Nghị định 08/2022/NĐ-CP",
+                        pdf_url="https://example.org/nd08.pdf")
+
+
+def test_sections_follow_the_legal_structure():
+    sections = list(LegalSplitter(parent_words=200, child_words=50).sections(PAGES))
+
+    assert [s.dieu for s in sections] == ["1", "2", "54"]
+    first, second, third = sections
+    assert first.metadata() == {
+        'chuong': "I", 'chuong_title': "QUY ĐỊNH CHUNG", 'muc': "", 'muc_title': "",
+        'dieu': "1", 'dieu_title': "Phạm vi điều chỉnh", 'pages': "1",
+    }
+    # A reference in running text is not a heading; page numbers are dropped
+    assert second.lines[-1] == "Điều 5 của Luật này không áp dụng cho hộ gia đình."
+    assert "2" not in second.lines
+    assert (third.chuong, third.chuong_title) == ("II", "TRÁCH NHIỆM TÁI CHẾ")
+    assert (third.muc, third.muc_title) == ("1", "TỶ LỆ TÁI CHẾ")
+    assert third.lines[0].startswith("Điều 54.")
+
+
+def test_long_article_is_continued_in_parts():
+    body = [Page(7, "Điều 9. Thu gom\n" + "\n".join(f"Khoản {i} thu gom chất thải." for i in range(1, 4))),
+            Page(8, "\n".join(f"Khoản {i} thu gom chất thải." for i in range(4, 7)))]
+
+    sections = list(LegalSplitter(parent_words=10, child_words=5).sections(body))
+
+    assert [s.part for s in sections] == list(range(len(sections)))
+    assert len(sections) > 1
+    assert all(s.dieu == "9" and s.dieu_title == "Thu gom" for s in sections)
+    assert all(s.words <= 10 for s in sections)
+    assert sections[0].pages == "7" and sections[-1].pages == "8"
+
+
+@pytest.mark.parametrize("child_words", [3, 5, 50])
+def test_chunks_rebuild_the_section(child_words):
+    splitter = LegalSplitter(parent_words=200, child_words=child_words)
+    section = list(splitter.sections(PAGES))[-1]
+
+    chunks = splitter.chunks(section)
+
+    assert all(len(chunk.split()) <= child_words for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(section.text.split())
+
+
+def _pipeline(pages, dedup=False):
+    pipeline = IngestionPipeline(client=None, embed_model=object(),
+                                 splitter=LegalSplitter(parent_words=200, child_words=8), dedup=dedup)
+    pipeline._pages = lambda source: iter(pages)
+    return pipeline
+
+
+def test_node_ids_are_stable_and_grouped_by_article():
+    first = list(_pipeline(PAGES).document_nodes(SOURCE))
+    second = list(_pipeline(PAGES).document_nodes(SOURCE))
+
+    assert [n.node_id for n in first] == [n.node_id for n in second]
+    assert len({n.node_id for n in first}) == len(first)
+    by_article = {}
+    for node in first:
+        by_article.setdefault(node.metadata['dieu'], set()).add(node.metadata['parent_id'])
+    assert sorted(by_article) == ["1", "2", "54"]
+    assert all(len(parents) == 1 for parents in by_article.values())
+
+
+def test_editing_one_article_keeps_the_other_ids():
+    edited = PAGES[:2] + [Page(3, PAGES[2].text + "\nTỷ lệ được điều chỉnh ba năm một lần.")]
+
+    before = {n.node_id: n.metadata['dieu'] for n in _pipeline(PAGES).document_nodes(SOURCE)}
+    after = {n.node_id: n.metadata['dieu'] for n in _pipeline(edited).document_nodes(SOURCE)}
+
+    unchanged = {node_id for node_id, dieu in before.items() if dieu != "54"}
+    assert unchanged <= set(after)
+
+
+def test_nodes_carry_document_metadata_kept_out_of_the_embedding():
+    node = next(iter(_pipeline(PAGES).document_nodes(SOURCE)))
+
+    assert node.metadata['document'] == "Nghị định 08/2022/NĐ-CP"
+    assert node.metadata['file_name'] == "nd08.pdf"
+    assert node.metadata['pdf_url'] == "https://example.org/nd08.pdf"
+    assert MINHASH_METADATA_KEY in node.metadata
+    assert set(BOOKKEEPING_METADATA) <= set(node.excluded_embed_metadata_keys)
+    assert set(BOOKKEEPING_METADATA) <= set(node.excluded_llm_metadata_keys)
+
+
+def test_repeated_article_number_gets_its_own_parent():
+    annex = PAGES + [Page(4, "Điều 1. Phạm vi điều chỉnh\nPhụ lục về danh mục sản phẩm.")]
+
+    nodes = list(_pipeline(annex).document_nodes(SOURCE))
+
+    parents = {n.metadata['parent_id'] for n in nodes if n.metadata['dieu'] == "1"}
+    assert len(parents) == 2
+
@@ -0,0 +1,76 @@
+"""
+Tests for the classifier LLM sub-call cache
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from systems import llm_call_cache
+from systems.llm_call_cache import LLMCallCache, cached_chat_completion
+
+
+class FakeOpenAI:
+    """Minimal chat.completions client that counts calls"""
+
+    def __init__(self, reply):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.reply = reply
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=f"  {self.reply}\n")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def cache(fake_redis, monkeypatch):
+    monkeypatch.setattr(Config, "ENABLE_LLM_CALL_CACHE", True)
+    monkeypatch.setattr(llm_call_cache, "_llm_call_cache_instance", LLMCallCache(redis_url="redis://fake"))
+    return llm_call_cache.get_llm_call_cache()
+
+
+def _classify(client, query, prompt_version="v1", context=""):
+    return cached_chat_completion(
+        client, "scope_check", prompt_version, query, context=context,
+        model="gpt-4o-mini", messages=[{"role": "user", "content": query}], temperature=0
+    )
+
+
+def test_same_normalized_input_calls_the_model_once(cache):
+    client = FakeOpenAI("IN_SCOPE")
+
+    assert _classify(client, "Tái chế bao bì?") == "IN_SCOPE"
+    assert _classify(client, "  tái chế   bao bì?") == "IN_SCOPE"
+    assert client.calls == 1
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_prompt_version_and_context_are_part_of_the_key(cache):
+    client = FakeOpenAI("IN_SCOPE")
+
+    _classify(client, "tái chế")
+    _classify(client, "tái chế", prompt_version="v2")
+    _classify(client, "tái chế", context="faq list A")
+    _classify(client, "tái chế", context="faq list B")
+
+    assert client.calls == 4
+
+
+def test_completions_are_shared_between_workers(cache):
+    _classify(FakeOpenAI("IN_SCOPE"), "xử phạt")
+    other_worker = LLMCallCache(redis_url="redis://fake")
+
+    key = other_worker.make_key("scope_check", "gpt-4o-mini", "v1", "Xử phạt")
+    assert other_worker.get(key) == "IN_SCOPE"
+
+
+def test_disabled_cache_always_calls_the_model(monkeypatch):
+    monkeypatch.setattr(Config, "ENABLE_LLM_CALL_CACHE", False)
+    client = FakeOpenAI("OUT_OF_SCOPE")
+
+    _classify(client, "thời tiết")
+    _classify(client, "thời tiết")
+
+    assert client.calls == 2
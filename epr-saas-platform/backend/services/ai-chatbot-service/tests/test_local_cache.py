@@ -0,0 +1,61 @@
+"""
+Tests for the in-process LRU/TTL cache
+"""
+import time
+
+from systems.local_cache import LocalLRUCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LocalLRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_expired_entries_are_misses():
+    cache = LocalLRUCache(ttl_seconds=60)
+    cache.set("old", 1, ttl_seconds=0.01)
+    cache.set("fresh", 2)
+    time.sleep(0.02)
+
+    assert cache.get("old") is None
+    assert cache.get("fresh") == 2
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 1
+
+
+def test_expired_entries_go_before_recently_used_ones():
+    cache = LocalLRUCache(max_entries=2)
+    cache.set("short", 1, ttl_seconds=0.01)
+    cache.set("long", 2)
+    time.sleep(0.02)
+    cache.set("new", 3)
+
+    assert cache.get("long") == 2 and cache.get("new") == 3
+
+
+def test_byte_budget_bounds_the_cache():
+    cache = LocalLRUCache(max_entries=100, max_bytes=100)
+    cache.set("a", "x", size_bytes=60)
+    cache.set("b", "y", size_bytes=60)
+
+    assert cache.get("a") is None and cache.get("b") == "y"
+    assert cache.get_stats()["bytes"] == 60
+
+    cache.set("huge", "z", size_bytes=101)  # Larger than the budget: never stored
+    assert cache.get("huge") is None and cache.get("b") == "y"
+
+
+def test_replacing_a_key_releases_its_bytes():
+    cache = LocalLRUCache(max_bytes=100)
+    cache.set("a", "x", size_bytes=80)
+    cache.set("a", "y", size_bytes=30)
+    cache.delete("missing")
+
+    assert cache.get_stats()["bytes"] == 30
+    cache.delete("a")
+    assert cache.get_stats()["bytes"] == 0 and len(cache) == 0
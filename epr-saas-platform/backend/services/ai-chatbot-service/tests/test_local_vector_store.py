@@ -0,0 +1,149 @@
+"""
+Tests for the in-process vector search backend
+"""
+import numpy as np
+import pytest
+from llama_index.core import QueryBundle
+
+from retriever import local_vector_store
+from retriever.corpus_loader import write_snapshot
+from retriever.local_vector_store import LocalVectorIndex, LocalVectorRetriever, load_local_vector_index
+
+
+def records(n=200, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return [
+        ({'id': f"c{i}", 'text': f"Nội dung {i}", 'metadata': {'dieu': str(i % 10)}}, vectors[i].tolist())
+        for i in range(n)
+    ]
+
+
+def brute_force(index_records, query, top_k):
+    matrix = np.array([vector for _, vector in index_records], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    scores = matrix @ (query / np.linalg.norm(query))
+    return [f"c{i}" for i in np.argsort(-scores, kind="stable")[:top_k]]
+
+
+def test_flat_search_is_exact_cosine():
+    data = records()
+    index = LocalVectorIndex.build(data)
+    query = np.random.default_rng(1).standard_normal(32).astype(np.float32)
+
+    hits = index.search(query, top_k=5)
+
+    assert [index.doc_ids[row] for row, _ in hits] == brute_force(data, query, 5)
+    assert hits[0][1] >= hits[-1][1]
+    assert -1.0 <= hits[-1][1] <= hits[0][1] <= 1.0
+
+
+def test_chunks_without_text_or_vector_are_skipped():
+    data = records(n=3)
+    data[0][0]['text'] = ""
+    data[1] = (data[1][0], None)
+
+    index = LocalVectorIndex.build(data)
+
+    assert list(index.doc_ids) == ["c2"]
+    assert index.search([1.0] * 32, top_k=10)[0][0] == 0
+    assert LocalVectorIndex.build([]).search([1.0], top_k=3) == []
+
+
+def test_retriever_prefers_the_bundle_embedding():
+    class NoEmbedding:
+        def get_query_embedding(self, query):
+            raise AssertionError("bundle already carries an embedding")
+
+    data = records(n=20)
+    retriever = LocalVectorRetriever(LocalVectorIndex.build(data), NoEmbedding(), similarity_top_k=3)
+
+    nodes = retriever.retrieve(QueryBundle("tái chế", embedding=data[7][1]))
+
+    assert nodes[0].node.id_ == "c7"
+    assert nodes[0].node.metadata == {'dieu': '7'}
+    assert nodes[0].score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_replace_sources_swaps_only_the_changed_article():
+    data = records(n=20)
+    index = LocalVectorIndex.build(data)
+    new_chunk = ({'id': 'new3', 'text': 'Điều 3 mới', 'metadata': {'dieu': '3'}}, data[0][1])
+
+    replaced = index.replace_sources({'dieu:3'}, [new_chunk])
+
+    assert 'c3' not in replaced.doc_ids and 'c13' not in replaced.doc_ids
+    assert len(replaced) == len(index) - 1
+    assert len(index) == 20  # The live index is untouched until swapped in
+
+
+def test_snapshot_is_memory_mapped_and_reused(corpus_registry, tmp_path, monkeypatch):
+    data = records(n=50)
+    exports = []
+
+    class Loader:
+        def __init__(self, client):
+            pass
+
+        def iter_vectors(self):
+            exports.append(1)
+            return iter(data)
+
+    monkeypatch.setattr(local_vector_store, "WeaviateCorpusLoader", Loader)
+
+    built = load_local_vector_index(None, "v1", "flat", "none", snapshot_dir=str(tmp_path))
+    loaded = load_local_vector_index(None, "v1", "flat", "none", snapshot_dir=str(tmp_path))
+
+    assert len(exports) == 1
+    assert isinstance(loaded.vectors, np.memmap)
+    assert list(loaded.doc_ids) == list(built.doc_ids)
+    query = np.array(data[4][1])
+    assert loaded.search(query, 3) == built.search(query, 3)
+
+
+# ============================================
+# QUANTIZATION
+# ============================================
+
+@pytest.mark.parametrize("quantization,min_recall,compression", [("int8", 0.95, 4), ("binary", 0.6, 32)])
+def test_quantized_candidates_are_rescored_exactly(quantization, min_recall, compression, monkeypatch):
+    monkeypatch.setattr(local_vector_store.Config, "VECTOR_RESCORE_CANDIDATES", 40)
+    data = records(n=400)
+    exact = LocalVectorIndex.build(data)
+    quantized = LocalVectorIndex.build(data, quantization=quantization)
+
+    query = np.array(data[11][1]) + np.random.default_rng(2).normal(0, 0.05, 32)
+    exact_hits = exact.search(query, 5)
+    quantized_hits = quantized.search(query, 5)
+
+    assert quantized_hits[0] == pytest.approx(exact_hits[0])  # Rescored in float32
+    assert quantized.recall['recall'] >= min_recall
+    assert quantized.recall['compression'] == pytest.approx(compression)
+
+
+def test_rescoring_a_full_short_list_matches_exact_search(monkeypatch):
+    monkeypatch.setattr(local_vector_store.Config, "VECTOR_RESCORE_CANDIDATES", 1000)
+    data = records(n=100)
+    query = np.random.default_rng(3).standard_normal(32)
+
+    quantized = LocalVectorIndex.build(data, quantization="binary")
+
+    assert quantized.search(query, 10) == pytest.approx(LocalVectorIndex.build(data).search(query, 10))
+
+
+def test_codes_are_persisted_and_recomputed_for_another_quantization(tmp_path):
+    index = LocalVectorIndex.build(records(n=60), quantization="int8")
+    path = str(tmp_path / "vectors-test")
+    write_snapshot(index, path, prefix="vectors-")
+
+    same = LocalVectorIndex.load(path)
+    other = LocalVectorIndex.load(path, quantization="binary")
+
+    assert isinstance(same.codes, np.memmap)
+    np.testing.assert_array_equal(same.codes, index.codes)
+    np.testing.assert_array_equal(same.scales, index.scales)
+    assert other.quantization == "binary" and other.codes.shape == (60, 4)
+
+
+def test_unknown_quantization_is_rejected():
+    with pytest.raises(ValueError):
+        LocalVectorIndex.build(records(n=5), quantization="pq")
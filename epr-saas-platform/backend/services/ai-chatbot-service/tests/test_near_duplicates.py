@@ -0,0 +1,105 @@
+"""
+Tests for MinHash near-duplicate detection
+"""
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from ingestion.legal_splitter import LegalSplitter
+from ingestion.pdf_reader import Page
+from ingestion.pipeline import IngestionPipeline, SourceDocument
+from systems.near_duplicates import (
+    MINHASH_METADATA_KEY, NUM_PERMUTATIONS, MinHashIndex, collapse_near_duplicates,
+    decode_signature, encode_signature, minhash, similarity
+)
+
+ARTICLE = ("Nhà sản xuất, nhập khẩu sản phẩm, bao bì có trách nhiệm tái chế theo tỷ lệ và quy cách "
+           "tái chế bắt buộc, trừ trường hợp đóng góp tài chính vào Quỹ Bảo vệ môi trường Việt Nam "
+           "để hỗ trợ hoạt động tái chế sản phẩm, bao bì do mình sản xuất, nhập khẩu")
+# One word changed: most shingles are shared
+AMENDED = ARTICLE.replace("bắt buộc", "tối thiểu")
+OTHER = ("Tổ chức, cá nhân vi phạm quy định về thu gom, vận chuyển chất thải rắn sinh hoạt thì bị "
+         "xử phạt vi phạm hành chính theo quy định của Chính phủ")
+
+
+def test_signature_is_deterministic_and_case_insensitive():
+    signature = minhash(ARTICLE)
+
+    assert signature.dtype == np.uint32 and len(signature) == NUM_PERMUTATIONS
+    np.testing.assert_array_equal(signature, minhash(ARTICLE.upper()))
+    assert minhash("") is None and minhash(" , . ") is None
+
+
+def test_similarity_estimates_overlap():
+    assert similarity(minhash(ARTICLE), minhash(ARTICLE)) == 1.0
+    assert similarity(minhash(ARTICLE), minhash(AMENDED)) >= 0.7
+    assert similarity(minhash(ARTICLE), minhash(OTHER)) < 0.3
+
+
+def test_signature_metadata_round_trip():
+    signature = minhash(ARTICLE)
+
+    np.testing.assert_array_equal(decode_signature(encode_signature(signature)), signature)
+    assert decode_signature(encode_signature(signature[:8])) is None
+    assert decode_signature("not base64!") is None
+
+
+def test_index_keeps_the_first_occurrence():
+    index = MinHashIndex(threshold=0.7)
+
+    assert index.add_if_new(minhash(ARTICLE))
+    assert not index.add_if_new(minhash(AMENDED))
+    assert index.add_if_new(minhash(OTHER))
+    assert len(index) == 2
+    assert index.find(minhash(AMENDED)) == 0
+
+
+def test_threshold_decides_what_is_a_duplicate():
+    strict = MinHashIndex(threshold=1.0)
+    strict.add(minhash(ARTICLE))
+
+    assert strict.find(minhash(AMENDED)) is None
+    assert strict.find(minhash(ARTICLE)) == 0
+
+
+def _candidate(node_id, text, score, signed=True):
+    metadata = {MINHASH_METADATA_KEY: encode_signature(minhash(text))} if signed else {}
+    return NodeWithScore(node=TextNode(id_=node_id, text=text, metadata=metadata), score=score)
+
+
+def test_collapse_keeps_the_best_ranked_copy():
+    nodes = [_candidate("nd08", AMENDED, 0.9), _candidate("other", OTHER, 0.8),
+             _candidate("luat", ARTICLE, 0.7, signed=False)]
+
+    kept = collapse_near_duplicates(nodes, threshold=0.7)
+
+    assert [n.node.node_id for n in kept] == ["nd08", "other"]
+
+
+@pytest.mark.parametrize("threshold,kept", [(0.7, 2), (1.0, 3)])
+def test_collapse_threshold(threshold, kept):
+    nodes = [_candidate("a", ARTICLE, 0.9), _candidate("b", AMENDED, 0.8), _candidate("c", OTHER, 0.7)]
+
+    assert len(collapse_near_duplicates(nodes, threshold=threshold)) == kept
+
+
+def test_candidates_without_text_are_kept():
+    nodes = [_candidate("a", ARTICLE, 0.9), NodeWithScore(node=TextNode(id_="empty", text=""), score=0.1)]
+
+    assert len(collapse_near_duplicates(nodes)) == 2
+
+
+def test_dry_run_drops_repeated_articles():
+    pages = [Page(1, f"Điều 54. Trách nhiệm tái chế\n{ARTICLE}\nĐiều 55. Xử phạt\n{OTHER}"),
+             Page(2, f"Điều 80. Trách nhiệm tái chế\n{AMENDED}")]
+    source = SourceDocument(path="/data/nd08.pdf", document="Nghị định 08/2022/NĐ-CP")
+
+    def pipeline(dedup):
+        pipeline = IngestionPipeline(client=None, embed_model=object(),
+                                     splitter=LegalSplitter(parent_words=200, child_words=200), dedup=dedup)
+        pipeline._pages = lambda source: iter(pages)
+        return pipeline
+
+    deduplicated = pipeline(True).dry_run([source])
+    assert pipeline(False).dry_run([source]).chunks == 3
+    assert (deduplicated.chunks, deduplicated.duplicates) == (2, 1)
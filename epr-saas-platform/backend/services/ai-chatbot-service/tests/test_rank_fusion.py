@@ -0,0 +1,69 @@
+"""
+Tests for N-way weighted rank fusion
+"""
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from systems.rank_fusion import RankedList, fuse_nodes, fuse_rankings
+
+
+def test_rrf_sums_weighted_reciprocal_ranks():
+    fused = dict(fuse_rankings([
+        RankedList([("a", 9.0), ("b", 5.0)], weight=2.0),
+        RankedList([("b", 0.9), ("c", 0.1)]),
+    ], k=60))
+
+    assert fused["a"] == pytest.approx(2.0 / 61)
+    assert fused["b"] == pytest.approx(2.0 / 62 + 1 / 61)
+    assert fused["c"] == pytest.approx(1 / 62)
+
+
+def test_rrf_ignores_raw_score_scales():
+    ranked = fuse_rankings([
+        RankedList([("a", 1000.0), ("b", 999.0)]),
+        RankedList([("b", 0.02), ("a", 0.01)]),
+        RankedList([("b", 7.0)]),
+    ])
+
+    assert [key for key, _ in ranked] == ["b", "a"]
+
+
+def test_key_counts_once_per_list_at_its_best_rank():
+    fused = dict(fuse_rankings([RankedList([("a", 1.0), ("b", 0.5), ("a", 0.2)])], k=60))
+
+    assert fused["a"] == pytest.approx(1 / 61)
+
+
+def test_score_fusion_normalizes_each_list():
+    fused = dict(fuse_rankings([
+        RankedList([("a", 30.0), ("b", 20.0), ("c", 10.0)]),
+        RankedList([("c", 0.8), ("d", 0.8)]),  # All equal: each counts fully
+    ], method="score"))
+
+    assert fused == pytest.approx({"a": 1.0, "b": 0.5, "c": 1.0, "d": 1.0})
+
+
+def test_ties_keep_first_appearance_order_and_limit_applies():
+    ranked = fuse_rankings([RankedList([("x", 1.0)]), RankedList([("y", 1.0)]), RankedList([("z", 1.0)])],
+                           limit=2)
+
+    assert [key for key, _ in ranked] == ["x", "y"]
+
+
+def test_empty_lists_and_unknown_methods():
+    assert fuse_rankings([RankedList([]), RankedList([("a", None)])], method="score") == [("a", 1.0)]
+    with pytest.raises(ValueError):
+        fuse_rankings([], method="borda")
+
+
+def _nodes(*ids):
+    return [NodeWithScore(node=TextNode(id_=node_id, text=node_id), score=1.0 / (i + 1))
+            for i, node_id in enumerate(ids)]
+
+
+def test_fuse_nodes_returns_unique_nodes_with_fused_scores():
+    fused = fuse_nodes([_nodes("n1", "n2"), _nodes("n2", "n3")], weights=[1.5, 1.0],
+                       method="rrf", k=60, limit=2)
+
+    assert [n.node.id_ for n in fused] == ["n2", "n1"]
+    assert fused[0].score == pytest.approx(1.5 / 62 + 1 / 61)
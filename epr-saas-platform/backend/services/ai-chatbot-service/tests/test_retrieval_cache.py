@@ -0,0 +1,89 @@
+"""
+Tests for the retrieval ranking cache and its node store
+"""
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from config import Config
+
+
+def _node(node_id, dieu, score):
+    return NodeWithScore(
+        node=TextNode(id_=node_id, text=f"Nội dung Điều {dieu}", metadata={"dieu": dieu}),
+        score=score
+    )
+
+
+@pytest.fixture
+def make_cache(corpus_registry, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_INDEX_SYNC_INTERVAL_MS", 0)
+    corpus_registry.mark_applied(corpus_registry.current_revision())
+
+    from systems.retrieval_cache import RetrievalCache
+    return lambda: RetrievalCache(redis_url="redis://fake")
+
+
+def test_key_depends_on_normalized_query_and_parameters(make_cache):
+    cache = make_cache()
+    key = cache.make_key("Điều 15  quy định", "hybrid", 10)
+
+    assert cache.make_key("điều 15 quy định", "hybrid", 10) == key
+    assert cache.make_key("điều 15 quy định", "hybrid", 5) != key
+    assert cache.make_key("điều 15 quy định", "rerank", 10) != key
+    assert cache.make_key("điều 15 quy định", "hybrid", 10, extra="w=0.7") != key
+
+
+def test_ranking_and_nodes_are_shared_between_workers(make_cache):
+    writer, reader = make_cache(), make_cache()
+    key = writer.make_key("tái chế", "hybrid", 2)
+    writer.set_nodes(key, [_node("n1", "15", 0.9), _node("n2", "54", 0.4)])
+
+    nodes = reader.get_nodes(key)
+
+    assert [(n.node.node_id, n.score) for n in nodes] == [("n1", 0.9), ("n2", 0.4)]
+    assert nodes[0].node.metadata == {"dieu": "15"}
+    assert reader.get_stats()["hits"] == 1
+
+
+def test_ranking_with_an_evicted_node_is_a_miss(make_cache):
+    cache = make_cache()
+    key = cache.make_key("tái chế", "hybrid", 2)
+    cache.set_nodes(key, [_node("n1", "15", 0.9), _node("n2", "54", 0.4)])
+    cache.node_store.delete_nodes(["n2"])
+
+    assert cache.get_nodes(key) is None
+    assert cache.get_stats()["misses"] == 1 and cache.get_stats()["hits"] == 0
+
+
+def test_nothing_is_cached_while_indexes_are_behind(make_cache, corpus_registry):
+    cache = make_cache()
+    corpus_registry.publish_index_event("refresh", ["15"], [])
+    key = cache.make_key("tái chế", "hybrid", 1)
+
+    cache.set_nodes(key, [_node("n1", "15", 0.9)])
+
+    assert cache.get_ranked(key) is None
+
+
+def test_new_generation_changes_every_key(make_cache, corpus_registry):
+    cache = make_cache()
+    key = cache.make_key("tái chế", "hybrid", 1)
+
+    corpus_registry.bump_generation()
+
+    assert cache.make_key("tái chế", "hybrid", 1) != key
+
+
+def test_targeted_invalidation_reaches_other_workers(make_cache):
+    writer, reader = make_cache(), make_cache()
+    changed = writer.make_key("tái chế", "hybrid", 1)
+    kept = writer.make_key("thu gom", "hybrid", 1)
+    writer.set_nodes(changed, [_node("n1", "15", 0.9)])
+    writer.set_nodes(kept, [_node("n2", "54", 0.8)])
+    assert reader.get_nodes(changed) and reader.get_nodes(kept)  # Now in the reader's local tier
+
+    assert writer.invalidate_sources(dieus=["15"]) == 1
+
+    assert reader.get_ranked(changed) is None
+    assert reader.node_store.get_nodes(["n1"]) == {}
+    assert [n.node.node_id for n in reader.get_nodes(kept)] == ["n2"]
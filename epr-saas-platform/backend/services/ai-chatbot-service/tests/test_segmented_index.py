@@ -0,0 +1,110 @@
+"""
+Tests for the segmented keyword index: deltas, tombstones, merges and snapshots
+"""
+import os
+
+import pytest
+
+from retriever import corpus_loader
+from retriever.bm25_index import tokenize
+from retriever.corpus_loader import BM25Corpus, load_bm25_corpus, write_snapshot
+from retriever.segmented_index import SegmentedBM25Index
+
+
+def chunk(node_id, text, dieu):
+    return {'id': node_id, 'text': text, 'metadata': {'dieu': dieu, 'document': 'Nghị định 08'}}
+
+
+BASE = [
+    chunk('a', 'Điều 1 phạm vi điều chỉnh bao bì', '1'),
+    chunk('b', 'Điều 2 trách nhiệm tái chế bao bì nhựa', '2'),
+    chunk('c', 'Điều 3 thu gom chất thải điện tử', '3'),
+    chunk('d', 'Điều 4 quỹ bảo vệ môi trường', '4'),
+]
+
+
+@pytest.fixture
+def index():
+    return SegmentedBM25Index(BM25Corpus.build(BASE), merge_delay_seconds=3600)
+
+
+def test_replaced_source_is_searched_from_its_delta(index):
+    index.replace_sources({'dieu:2'}, [chunk('b2', 'Điều 2 trách nhiệm tái chế pin', '2')])
+
+    snapshot = index.snapshot
+    hits = [snapshot.doc_ids[i] for i, _ in snapshot.top_k(tokenize("tái chế"), top_k=5)]
+
+    assert hits == ['b2']
+    assert index.get_stats()['tombstones'] == 1
+
+
+def test_snapshot_revision_follows_applied_writes(index):
+    assert index.snapshot.revision == 0
+    index.replace_sources({'dieu:2'}, [chunk('b2', 'Điều 2 tái chế pin', '2')], revision=7)
+    index.delete(['c'])
+
+    assert index.snapshot.revision == 7
+
+
+def test_merged_base_is_persisted_with_its_revision(tmp_path):
+    path = str(tmp_path / "bm25-v1")
+    index = SegmentedBM25Index(BM25Corpus.build(BASE), merge_delay_seconds=3600, snapshot_path=path)
+    index.replace_sources({'dieu:2'}, [chunk('b2', 'Điều 2 tái chế pin', '2')], revision=3)
+
+    assert index.merge()
+
+    loaded = BM25Corpus.load(path)
+    assert loaded.revision == 3
+    assert list(loaded.doc_ids) == ['a', 'c', 'd', 'b2']
+
+
+def test_snapshot_without_revision_header_counts_as_oldest(tmp_path):
+    path = str(tmp_path / "bm25-legacy")
+    write_snapshot(BM25Corpus.build(BASE), path)
+    os.remove(os.path.join(path, "corpus.json"))
+
+    assert BM25Corpus.load(path).revision == 0
+
+
+def test_stale_snapshot_is_rebuilt_for_a_newer_revision(corpus_registry, tmp_path, monkeypatch):
+    corpus = BM25Corpus.build(BASE)
+    corpus.revision = 1
+    write_snapshot(corpus, corpus_loader.snapshot_path("v1", str(tmp_path)))
+    for _ in range(2):
+        corpus_registry.publish_index_event('refresh', dieus=['2'])
+    refreshed = BASE[:1] + [chunk('b2', 'Điều 2 tái chế pin', '2')]
+    monkeypatch.setattr(corpus_loader.WeaviateCorpusLoader, "__init__", lambda self, client: None)
+    monkeypatch.setattr(corpus_loader.WeaviateCorpusLoader, "load_documents", lambda self: refreshed)
+
+    assert load_bm25_corpus(None, "v1", str(tmp_path), use_snapshot=True).revision == 1
+
+    rebuilt = load_bm25_corpus(None, "v1", str(tmp_path), use_snapshot=True, min_revision=2)
+    assert rebuilt.revision == 2
+    assert list(rebuilt.doc_ids) == ['a', 'b2']
+    assert BM25Corpus.load(corpus_loader.snapshot_path("v1", str(tmp_path))).revision == 2
+
+
+def test_scores_before_merge_equal_scores_after_merge(index):
+    index.replace_sources({'dieu:2'}, [chunk('b2', 'Điều 2 trách nhiệm tái chế bao bì nhựa và pin', '2')])
+    index.upsert([chunk('e', 'Điều 5 tái chế lốp xe', '5')])
+    index.delete(['c'])
+    query = tokenize("tái chế bao bì")
+
+    def ranked(snapshot):
+        return [(snapshot.doc_ids[i], score) for i, score in snapshot.top_k(query, top_k=10)]
+
+    before = ranked(index.snapshot)
+    assert index.merge()
+    after = ranked(index.snapshot)
+
+    assert [doc for doc, _ in before] == [doc for doc, _ in after]
+    assert [score for _, score in before] == pytest.approx([score for _, score in after], rel=1e-9)
+
+
+def test_snapshot_statistics_exclude_tombstones(index):
+    index.delete(['c', 'd'])
+    snapshot = index.snapshot
+
+    assert snapshot.live_size == 2
+    lengths = [len(tokenize(doc['text'])) for doc in BASE[:2]]
+    assert snapshot.avgdl == pytest.approx(sum(lengths) / 2)
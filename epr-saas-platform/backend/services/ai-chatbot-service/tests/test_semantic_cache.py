@@ -0,0 +1,134 @@
+"""
+Tests for the Redis-backed semantic cache
+"""
+import json
+
+import pytest
+import redis
+
+from config import Config
+from systems import cache_codec
+
+
+class KeywordEmbedding:
+    """Deterministic embeddings: one axis per known keyword"""
+
+    AXES = ["tái chế", "bao bì", "thu gom", "xử phạt"]
+
+    def get_query_embedding(self, query):
+        return [1.0 if word in query else 0.0 for word in self.AXES] + [0.01]
+
+
+@pytest.fixture
+def make_cache(corpus_registry, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_INDEX_SYNC_INTERVAL_MS", 0)
+    corpus_registry.mark_applied(corpus_registry.current_revision())
+
+    from systems.semantic_cache import SemanticCache
+
+    def make():
+        return SemanticCache(redis_url="redis://fake", embed_model=KeywordEmbedding())
+    return make
+
+
+def test_similar_query_hits_entry_written_by_another_worker(make_cache):
+    writer, reader = make_cache(), make_cache()
+    writer.set("Quy định tái chế bao bì", {"answer": "A"})
+
+    hit = reader.get("quy định về tái chế bao bì?")
+
+    assert hit is not None and hit["response"] == {"answer": "A"}
+    assert hit["cache_hit_type"] == "semantic"
+
+
+def test_stats_count_entries_without_scanning(make_cache, monkeypatch):
+    writer, reader = make_cache(), make_cache()
+    writer.set("tái chế", {"answer": "A"})
+    writer.set("thu gom", {"answer": "B"})
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("get_stats must not SCAN the keyspace")
+    monkeypatch.setattr(reader.redis_client, "scan_iter", no_scan)
+
+    assert reader.get_stats()["total_entries"] == 2
+    writer.invalidate("tái chế")
+    assert reader.get_stats()["total_entries"] == 1
+
+
+def test_legacy_json_entry_is_migrated_to_a_hash(make_cache, fake_redis):
+    from systems.semantic_cache import CACHE_KEY_PREFIX
+
+    client = redis.from_url("redis://fake")
+    key = f"{CACHE_KEY_PREFIX}legacy"
+    embedding = KeywordEmbedding().get_query_embedding("thu gom")
+    client.set(key, json.dumps({
+        "query": "thu gom", "response": {"answer": "C"}, "query_embedding": embedding
+    }), ex=600)
+
+    cache = make_cache()
+
+    assert client.type(key) == b"hash"
+    assert 0 < client.ttl(key) <= 600
+    assert client.hget(key, cache_codec.FIELD_VERSION) == str(cache_codec.FORMAT_VERSION).encode()
+    hit = cache.get("thu gom rác")
+    assert hit is not None and hit["response"] == {"answer": "C"}
+
+
+def test_hot_entry_near_expiry_is_served_stale_and_refreshed_once(make_cache, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_STALE_WINDOW_SECONDS", 300)
+    monkeypatch.setattr(Config, "CACHE_SWR_MIN_HITS", 2)
+    first, second = make_cache(), make_cache()
+    first.ttl_seconds = second.ttl_seconds = 100  # Inside the stale window from the start
+    first.set("tái chế", {"answer": "A"})
+
+    hits = [first.get("tái chế"), first.get("tái chế"), second.get("tái chế"), second.get("tái chế")]
+
+    assert all(hit["is_stale"] for hit in hits)
+    # Refreshed once the entry is hot, and by a single worker
+    assert [bool(hit.get("needs_refresh")) for hit in hits] == [False, True, False, False]
+
+
+def test_follow_up_entries_are_never_refreshed(make_cache, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_SWR_MIN_HITS", 1)
+    cache = make_cache()
+    cache.ttl_seconds = 100
+    cache.set("còn thu gom thì sao?", {"answer": "B"}, context_key="conv-a")
+
+    hit = cache.get("còn thu gom thì sao?", context_key="conv-a")
+
+    assert hit["is_stale"] and not hit.get("needs_refresh")
+
+
+def test_l1_serves_repeat_hits(make_cache):
+    cache = make_cache()
+    cache.set("xử phạt", {"answer": "D"})
+
+    cache.get("xử phạt")
+    cache.get("xử phạt")
+
+    assert cache.local_cache.get_stats()["hits"] >= 2
+
+
+def _answer(dieu):
+    return {"answer": f"Điều {dieu}", "sources": [{"metadata": {"dieu": dieu}}]}
+
+
+def test_targeted_invalidation_reaches_other_workers(make_cache):
+    writer, reader = make_cache(), make_cache()
+    writer.set("tái chế", _answer("15"))
+    writer.set("thu gom", _answer("54"))
+    assert reader.get("tái chế") and reader.get("thu gom")  # Now in the reader's L1
+
+    assert writer.invalidate_sources(dieus=["15"]) == 1
+
+    assert reader.get("tái chế") is None
+    assert reader.get("thu gom")["response"] == _answer("54")
+
+
+def test_new_corpus_generation_misses_older_answers(make_cache, corpus_registry):
+    cache = make_cache()
+    cache.set("tái chế", _answer("15"))
+
+    corpus_registry.bump_generation()
+
+    assert cache.get("tái chế") is None
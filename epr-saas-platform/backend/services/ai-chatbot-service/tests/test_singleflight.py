@@ -0,0 +1,133 @@
+"""
+Tests for request coalescing within a worker, across workers and through the API route
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from systems.singleflight import SingleFlight
+
+
+class SlowPipeline:
+    """Counts runs; each run takes long enough for concurrent callers to overlap"""
+
+    def __init__(self, delay: float = 0.3):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return {"answer": "Điều 77", "sources": []}
+
+
+def _run_concurrently(*targets):
+    threads = [threading.Thread(target=t) for t in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+
+
+def test_concurrent_callers_share_one_run(fake_redis):
+    flight = SingleFlight(poll_interval_ms=10)
+    pipeline = SlowPipeline()
+    results = []
+
+    def call():
+        results.append(flight.do("ctx|điều 77 quy định gì", pipeline))
+
+    _run_concurrently(call, call, call)
+
+    assert pipeline.calls == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert all(result == {"answer": "Điều 77", "sources": []} for result, _ in results)
+
+
+def test_follower_in_other_worker_reuses_leader_result(fake_redis):
+    worker_a = SingleFlight(poll_interval_ms=10)
+    worker_b = SingleFlight(poll_interval_ms=10)
+    pipeline = SlowPipeline()
+    results = {}
+
+    def leader():
+        results["a"] = worker_a.do("q", pipeline)
+
+    def follower():
+        time.sleep(0.05)
+        results["b"] = worker_b.do("q", pipeline)
+
+    _run_concurrently(leader, follower)
+
+    assert pipeline.calls == 1
+    assert results["b"] == ({"answer": "Điều 77", "sources": []}, True)
+    assert worker_b.get_stats()["coalesced_remote"] == 1
+
+
+def test_failed_leader_lets_followers_compute(fake_redis):
+    flight = SingleFlight(poll_interval_ms=10)
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("LLM down")
+
+    errors, results = [], []
+
+    def leader():
+        try:
+            flight.do("q", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    def follower():
+        time.sleep(0.02)
+        results.append(flight.do("q", lambda: {"answer": "ok"}))
+
+    _run_concurrently(leader, follower)
+
+    assert len(errors) == 1
+    assert results == [({"answer": "ok"}, False)]
+
+
+def test_query_route_coalesces_concurrent_requests(fake_redis):
+    from middleware.auth import verify_token
+    from routes.api_routes import router
+
+    pipeline = SlowPipeline()
+    flight = SingleFlight(poll_interval_ms=10)
+
+    class Handler:
+        def process_query(self, query_text, session_id=None):
+            result, _ = flight.do(query_text, pipeline)
+            return result
+
+    class PackageClient:
+        async def check_quota(self, token):
+            return True, None
+
+        async def record_query(self, token):
+            return None
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[verify_token] = lambda: {"sub": "u1"}
+    app.state.query_handler = Handler()
+    app.state.package_client = PackageClient()
+
+    async def send_two():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/query", json={"query": "Điều 77 quy định gì?"})
+                for _ in range(2)
+            ])
+
+    responses = asyncio.run(send_two())
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert pipeline.calls == 1
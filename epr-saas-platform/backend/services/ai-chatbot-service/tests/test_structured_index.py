@@ -0,0 +1,97 @@
+"""
+Tests for exact article / chapter reference lookup
+"""
+import pytest
+
+from retriever.hybrid_retriever import HybridRetriever
+from retriever.structured_index import (
+    LegalReference, StructuredIndex, document_numbers, lookup_positions, parent_key, parse_reference
+)
+
+ND08 = "Nghị định 08/2022/NĐ-CP"
+LUAT = "Luật Bảo vệ môi trường 72/2020/QH14"
+
+METADATA = [
+    {"document": ND08, "chuong": "Chương III", "muc": "1", "dieu": "15"},
+    {"document": ND08, "chuong": "III", "muc": "2", "dieu": "16"},
+    {"document": ND08, "chuong": "3", "dieu": "15"},
+    {"document": LUAT, "chuong": "IV", "dieu": "15"},
+    {"document": LUAT, "dieu": "54", "parent_id": "luat-54"},
+]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("Điều 15 quy định gì?", LegalReference(dieus=("15",))),
+    ("So sánh Điều 5 và điều 07 Nghị định 08/2022", LegalReference(dieus=("5", "7"),
+                                                                   document_numbers=("8/2022",))),
+    ("dieu 15 dieu 15", LegalReference(dieus=("15",))),
+    ("Chương 3 mục 2", LegalReference(chuong="III", muc="2")),
+    ("trách nhiệm tái chế 2022", None),
+])
+def test_parse_reference(query, expected):
+    assert parse_reference(query) == expected
+
+
+def test_document_numbers_are_normalized():
+    assert document_numbers(ND08) == {"8/2022"}
+    assert document_numbers("Thông tư 02 / 2022 và 123/20221") == {"2/2022"}
+
+
+def test_parent_key_prefers_parent_id():
+    assert parent_key(METADATA[4]) == ("parent", "luat-54")
+    assert parent_key({"document": ND08, "dieu": "Điều 015"}) == ("dieu", ND08, "15")
+    assert parent_key({}) is None
+
+
+@pytest.fixture
+def segments():
+    return [(StructuredIndex(METADATA[:3]), 0), (StructuredIndex(METADATA[3:]), 3)]
+
+
+def test_unqualified_article_matches_every_document(segments):
+    assert lookup_positions(segments, parse_reference("Điều 15")) == [0, 2, 3]
+
+
+def test_document_number_or_current_document_narrows_the_article(segments):
+    assert lookup_positions(segments, parse_reference("Điều 15 Nghị định 08/2022")) == [0, 2]
+    assert lookup_positions(segments, parse_reference("Điều 15"), document=LUAT) == [3]
+    assert lookup_positions(segments, parse_reference("Điều 15 Nghị định 99/2030")) == []
+    assert lookup_positions(segments, parse_reference("Điều 15"), document="Thông tư khác") == []
+
+
+def test_chapter_and_section_levels(segments):
+    assert lookup_positions(segments, parse_reference("Chương III mục 2"), document=ND08) == [1]
+    assert lookup_positions(segments, parse_reference("chương 3 Nghị định 08/2022")) == [0, 1, 2]
+
+
+DOCUMENTS = [
+    {"id": f"c{i}", "text": f"Nội dung {i}", "metadata": metadata} for i, metadata in enumerate(METADATA)
+]
+
+
+@pytest.fixture
+def retriever():
+    return HybridRetriever(None, DOCUMENTS, top_k=5)
+
+
+def test_ambiguous_article_is_left_to_search(retriever):
+    assert retriever.lookup_reference("Điều 15 quy định gì?") == []
+
+
+def test_article_resolves_in_the_named_or_current_document(retriever):
+    named = retriever.lookup_reference("Điều 15 Nghị định 08/2022 quy định gì?")
+    current = retriever.lookup_reference("Điều 15 quy định gì?", document=LUAT)
+
+    assert [n.node.id_ for n in named] == ["c0", "c2"]
+    assert [n.node.id_ for n in current] == ["c3"]
+
+
+def test_unique_article_needs_no_document(retriever):
+    nodes = retriever.lookup_reference("Điều 54 là gì?")
+
+    assert [n.node.id_ for n in nodes] == ["c4"]
+    assert nodes[0].node.metadata["parent_id"] == "luat-54"
+
+
+def test_question_without_reference_is_not_looked_up(retriever):
+    assert retriever.lookup_reference("trách nhiệm tái chế bao bì") == []
@@ -0,0 +1,43 @@
+"""
+Tests for the Vietnamese keyword analyzer
+"""
+import unicodedata
+
+from retriever.vietnamese_analyzer import BIGRAM_JOINER, VietnameseAnalyzer, fold_diacritics
+
+
+def test_syllables_bigrams_and_folded_shadows():
+    terms = VietnameseAnalyzer().analyze("Điều 15, tái chế bao bì")
+
+    assert terms[:2] == ["điều", "15"]
+    assert {"tái", "chế", "bao", "bì", "tái_chế", "chế_bao", "bao_bì"} <= set(terms)
+    assert "15_tái" not in terms  # Bigrams stop at punctuation
+    assert {"tai_che", "bao_bi"} <= set(terms)
+    assert "tai" not in terms  # Single syllables get no shadow
+
+
+def test_pre_segmented_words_match_spaced_text():
+    analyzer = VietnameseAnalyzer()
+
+    segmented = analyzer.analyze("trách_nhiệm tái_chế")
+    spaced = analyzer.analyze("trách nhiệm tái chế")
+
+    assert sorted(segmented) == sorted(spaced)
+    assert segmented.count("tái_chế") == 1  # Only the generated bigram
+
+
+def test_joiner_never_appears_inside_a_syllable():
+    analyzer = VietnameseAnalyzer(fold=False, bigrams=False)
+    assert analyzer.analyze("a_b __ c_") == ["a", "b", "c"]
+    assert all(BIGRAM_JOINER not in term for term in analyzer.analyze("tái_chế_bao_bì"))
+
+
+def test_nfc_normalization_and_folding():
+    decomposed = "tíi"  # NFD input
+    assert VietnameseAnalyzer(fold=False, bigrams=False).analyze(decomposed) == ["tíi"]
+    assert fold_diacritics("Đường") == "Duong"
+
+
+def test_version_changes_with_options():
+    versions = {VietnameseAnalyzer(f, b).version for f in (True, False) for b in (True, False)}
+    assert len(versions) == 4